@@ -18,6 +18,8 @@ RÈGLES DE FILTRAGE PAR RÔLE :
 
 from django.shortcuts import get_object_or_404
 
+from core.scope_context import request_cached, resolve_annee_scolaire_id, user_cached
+
 
 def get_role_name(user):
     if hasattr(user, 'role') and user.role:
@@ -65,6 +67,9 @@ def get_user_academic_context(request):
       2. Query param annee_scolaire_id
       3. Attribut utilisateur (annee_scolaire_active_id)
 
+    Calculé une fois par requête ; la classe/le groupe de l'apprenant sont
+    mis en cache par utilisateur et par année (voir core.scope_context).
+
     Returns:
         dict: {
             'bypass': bool,
@@ -77,6 +82,11 @@ def get_user_academic_context(request):
             'enfants_ids': list,
         }
     """
+    ctx = request_cached(request, "academics", lambda: _build_academic_context(request))
+    return {**ctx, "enfants_ids": list(ctx["enfants_ids"])}
+
+
+def _build_academic_context(request):
     user = request.user
 
     ctx = {
@@ -101,15 +111,7 @@ def get_user_academic_context(request):
 
     # ── Résolution de l'année scolaire ────────────────────────────────────
     # Priorité : header > query param > attribut profil
-    annee_header = request.headers.get("X-Annee-Scolaire-ID")
-    annee_param  = request.query_params.get("annee_scolaire_id")
-    annee_profil = getattr(user, "annee_scolaire_active_id", None)
-
-    ctx["annee_scolaire_id"] = (
-        _to_int(annee_header)
-        or _to_int(annee_param)
-        or _to_int(annee_profil)
-    )
+    ctx["annee_scolaire_id"] = resolve_annee_scolaire_id(request)
 
     # Parent : récupérer les enfants (pas de filtre année sur le contexte parent)
     if role_name == 'Parent':
@@ -118,29 +120,43 @@ def get_user_academic_context(request):
 
     # Apprenant : récupérer sa classe/groupe depuis l'inscription active
     if role_name == 'Apprenant':
-        from .models import Inscription
-        inscription = Inscription.objects.filter(
-            apprenant=user,
-            statut="actif"
-        ).select_related('classe').first()
-
-        if inscription and inscription.classe:
-            ctx["user_classe_id"] = inscription.classe_id
-            # Filtrer le groupe par année si une année est sélectionnée
-            groupes_qs = inscription.classe.groupes
-            if ctx["annee_scolaire_id"]:
-                groupes_qs = groupes_qs.filter(annee_scolaire_id=ctx["annee_scolaire_id"])
-            premier_groupe = groupes_qs.first()
-            if premier_groupe:
-                ctx["user_groupe_id"] = premier_groupe.id
-
-        # Fallback groupe direct
-        if not ctx["user_groupe_id"] and hasattr(user, 'groupe_id'):
-            ctx["user_groupe_id"] = user.groupe_id
+        annee_scolaire_id = ctx["annee_scolaire_id"]
+        classe_groupe = user_cached(
+            request,
+            f"academics:{annee_scolaire_id}",
+            lambda: _load_apprenant_classe_groupe(user, annee_scolaire_id),
+        )
+        ctx.update(classe_groupe)
 
     return ctx
 
 
+def _load_apprenant_classe_groupe(user, annee_scolaire_id):
+    from .models import Inscription
+
+    data = {"user_classe_id": None, "user_groupe_id": None}
+    inscription = Inscription.objects.filter(
+        apprenant=user,
+        statut="actif"
+    ).select_related('classe').first()
+
+    if inscription and inscription.classe:
+        data["user_classe_id"] = inscription.classe_id
+        # Filtrer le groupe par année si une année est sélectionnée
+        groupes_qs = inscription.classe.groupes
+        if annee_scolaire_id:
+            groupes_qs = groupes_qs.filter(annee_scolaire_id=annee_scolaire_id)
+        premier_groupe = groupes_qs.first()
+        if premier_groupe:
+            data["user_groupe_id"] = premier_groupe.id
+
+    # Fallback groupe direct
+    if not data["user_groupe_id"] and hasattr(user, 'groupe_id'):
+        data["user_groupe_id"] = user.groupe_id
+
+    return data
+
+
 def filter_academics_queryset(queryset, request, model_name, is_detail=False):
     """
     Filtre un queryset academics selon le rôle et l'année scolaire sélectionnée.
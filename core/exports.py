@@ -0,0 +1,71 @@
+# core/exports.py
+"""
+Écriture de fichiers tabulaires (CSV / XLSX) à mémoire constante.
+
+Les lignes sont fournies par un itérable (générateur sur .iterator()) :
+- CSV  : octets produits ligne à ligne (StreamingHttpResponse ou fichier)
+- XLSX : openpyxl en mode write_only, écrit dans un fichier
+
+Usage :
+    from core.exports import csv_stream, xlsx_tempfile
+
+    StreamingHttpResponse(csv_stream(entetes, lignes), content_type=CONTENT_TYPE_CSV)
+"""
+
+import csv
+import tempfile
+from datetime import datetime
+
+from django.utils import timezone
+
+
+CONTENT_TYPE_CSV = "text/csv; charset=utf-8-sig"
+CONTENT_TYPE_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+class _Echo:
+    """Pseudo-fichier : write() retourne la ligne au lieu de la stocker."""
+
+    def write(self, value):
+        return value
+
+
+def csv_stream(entetes, lignes):
+    """Octets CSV (';', UTF-8 avec BOM) produits ligne à ligne."""
+    writer = csv.writer(_Echo(), delimiter=';')
+    yield "\ufeff".encode("utf-8")
+    yield writer.writerow(entetes).encode("utf-8")
+    for ligne in lignes:
+        yield writer.writerow(ligne).encode("utf-8")
+
+
+def ecrire_csv(entetes, lignes, fichier):
+    """Écrit le CSV dans un fichier binaire ouvert."""
+    for chunk in csv_stream(entetes, lignes):
+        fichier.write(chunk)
+
+
+def _cellule_xlsx(value):
+    # Excel ne gère pas les fuseaux horaires
+    if isinstance(value, datetime) and timezone.is_aware(value):
+        return timezone.localtime(value).replace(tzinfo=None)
+    return value
+
+
+def ecrire_xlsx(entetes, lignes, titre, fichier):
+    """Écrit le classeur en mode write_only (lignes jamais gardées en mémoire)."""
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(titre)
+    ws.append(entetes)
+    for ligne in lignes:
+        ws.append([_cellule_xlsx(v) for v in ligne])
+    wb.save(fichier)
+
+
+def xlsx_tempfile(entetes, lignes, titre):
+    """Classeur écrit dans un fichier temporaire, rembobiné (supprimé à la fermeture)."""
+    fichier = tempfile.TemporaryFile(suffix=".xlsx")
+    ecrire_xlsx(entetes, lignes, titre, fichier)
+    fichier.seek(0)
+    return fichier
@@ -0,0 +1,165 @@
+# core/file_delivery.py
+"""
+Livraison de fichiers protégés (ressources, blocs, réponses d'évaluation).
+
+Les contrôles d'accès restent dans la vue Django ; le transfert des octets est
+délégué selon FILE_DELIVERY_BACKEND :
+- "x-accel"    : nginx (X-Accel-Redirect vers FILE_DELIVERY_ACCEL_PREFIX + nom)
+- "x-sendfile" : Apache / lighttpd (X-Sendfile vers le chemin disque)
+- "python"     : (défaut) Django sert le fichier lui-même, en flux, avec
+                 prise en charge de Range / If-Range (206, 416)
+
+nginx, Apache et lighttpd gèrent eux-mêmes Range sur les deux premiers modes.
+
+Usage :
+    from core.file_delivery import serve_file, is_first_range
+
+    if is_first_range(request):
+        Model.objects.filter(pk=pk).update(compteur=F("compteur") + 1)
+    return serve_file(request, instance.fichier)
+"""
+
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.encoding import escape_uri_path
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+
+
+STREAM_BLOCK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _backend():
+    return getattr(settings, "FILE_DELIVERY_BACKEND", "python")
+
+
+def is_first_range(request):
+    """
+    Vrai si la requête démarre un téléchargement (pas de Range, ou Range depuis 0).
+    Évite de compter chaque saut de lecture vidéo comme un téléchargement.
+    """
+    header = request.META.get("HTTP_RANGE")
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return True
+    return match.group(1) == "0"
+
+
+def _content_disposition(filename, as_attachment):
+    kind = "attachment" if as_attachment else "inline"
+    try:
+        filename.encode("ascii")
+        return f'{kind}; filename="{filename}"'
+    except UnicodeEncodeError:
+        return f"{kind}; filename*=utf-8''{escape_uri_path(filename)}"
+
+
+def _validators(field_file, size):
+    """(etag fort, timestamp de modification) ou (None, None) si le storage ne le permet pas."""
+    try:
+        modified = field_file.storage.get_modified_time(field_file.name)
+    except (NotImplementedError, OSError, AttributeError):
+        return None, None
+    ts = modified.timestamp()
+    return f'"{size:x}-{int(ts * 1_000_000):x}"', ts
+
+
+def _parse_range(header, size):
+    """
+    Retourne (début, fin incluse), None si l'en-tête est absent/ignoré,
+    ou False si la plage est insatisfaisable. Les plages multiples sont
+    ignorées (réponse complète, autorisé par la RFC 9110).
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return None
+    first, last = match.groups()
+    if first == "" and last == "":
+        return None
+    if first == "":
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+def _if_range_matches(request, etag, modified_ts):
+    header = request.META.get("HTTP_IF_RANGE")
+    if not header:
+        return True
+    if header.startswith(('"', 'W/')):
+        return etag is not None and etag in parse_etags(header)
+    since = parse_http_date_safe(header)
+    return since is not None and modified_ts is not None and int(modified_ts) <= since
+
+
+def _iter_file(fh, start, length):
+    try:
+        fh.seek(start)
+        remaining = length
+        while remaining > 0:
+            block = fh.read(min(STREAM_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+    finally:
+        fh.close()
+
+
+def serve_file(request, field_file, filename=None, as_attachment=True):
+    """
+    Réponse HTTP pour un FieldFile (FileField / ImageField) déjà autorisé.
+    """
+    filename = filename or os.path.basename(field_file.name)
+    content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    backend = _backend()
+
+    if backend in ("x-accel", "x-sendfile"):
+        response = HttpResponse(content_type=content_type)
+        if backend == "x-accel":
+            prefix = getattr(settings, "FILE_DELIVERY_ACCEL_PREFIX", "/protected-media/")
+            response["X-Accel-Redirect"] = escape_uri_path(prefix + field_file.name)
+        else:
+            response["X-Sendfile"] = field_file.path
+        response["Content-Disposition"] = _content_disposition(filename, as_attachment)
+        return response
+
+    size = field_file.size
+    etag, modified_ts = _validators(field_file, size)
+    byte_range = _parse_range(request.META.get("HTTP_RANGE", ""), size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    if byte_range is not None and not _if_range_matches(request, etag, modified_ts):
+        byte_range = None  # le fichier a changé : réponse complète
+
+    start, end = byte_range if byte_range else (0, size - 1)
+    length = max(end - start + 1, 0)
+
+    response = StreamingHttpResponse(
+        _iter_file(field_file.open("rb"), start, length),
+        status=206 if byte_range else 200,
+        content_type=content_type,
+    )
+    response["Content-Length"] = str(length)
+    response["Accept-Ranges"] = "bytes"
+    response["Content-Disposition"] = _content_disposition(filename, as_attachment)
+    if byte_range:
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    if etag:
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(modified_ts)
+    return response
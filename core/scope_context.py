@@ -0,0 +1,159 @@
+# core/scope_context.py
+"""
+Service de contexte de périmètre (rôle, institution, année scolaire).
+
+Principe :
+- Le contexte d'un utilisateur est calculé UNE SEULE FOIS par requête
+  (mémoïsé sur l'objet HttpRequest sous-jacent, partagé par les wrappers DRF)
+- La partie coûteuse (rôle, inscription active de l'apprenant, classe/groupe)
+  est mise en cache entre les requêtes, par utilisateur
+- Invalidation par clé de version : chaque utilisateur possède un numéro de
+  version en cache ; le changer (après commit) rend caduques toutes ses
+  entrées d'un coup
+- Cache inter-requêtes actif seulement avec un cache partagé (Redis) : en
+  mémoire locale, une invalidation n'atteindrait pas les autres processus
+  (SCOPE_CONTEXT_CACHE_TIMEOUT = 0 → mémoïsation par requête uniquement)
+
+Déclencheurs d'invalidation (voir courses/signals.py et users/signals.py) :
+- InscriptionCours / Inscription créée, modifiée ou supprimée
+- User modifié (institution, annee_scolaire_active, rôle, groupe)
+
+Usage :
+    from core.scope_context import request_cached, user_cached, resolve_annee_scolaire_id
+
+    ctx = request_cached(request, "courses", lambda: _build(request))
+    scope = user_cached(request, "courses", lambda: _load(request.user))
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+CACHE_PREFIX = "scope_ctx"
+_REQUEST_ATTR = "_scope_context_memo"
+_MISSING = object()
+
+
+def _timeout():
+    return getattr(settings, "SCOPE_CONTEXT_CACHE_TIMEOUT", 300)
+
+
+def _to_int(v):
+    if v is None:
+        return None
+    if isinstance(v, int):
+        return v
+    try:
+        return int(str(v).strip())
+    except (ValueError, TypeError):
+        return None
+
+
+def _new_version():
+    # Horodatage plutôt que compteur : si la clé de version est évincée du
+    # cache, la nouvelle valeur ne peut pas retomber sur une ancienne entrée.
+    return time.time_ns()
+
+
+def _version_key(user_id):
+    return f"{CACHE_PREFIX}:ver:{user_id}"
+
+
+# ============================================================================
+# MÉMOÏSATION PAR REQUÊTE
+# ============================================================================
+
+def _request_memo(request):
+    raw = getattr(request, "_request", request)
+    memo = getattr(raw, _REQUEST_ATTR, None)
+    if memo is None:
+        memo = {}
+        setattr(raw, _REQUEST_ATTR, memo)
+    return memo
+
+
+def request_cached(request, key, builder):
+    """
+    Retourne builder() mémoïsé pour la durée de la requête.
+    """
+    memo = _request_memo(request)
+    value = memo.get(key, _MISSING)
+    if value is _MISSING:
+        value = builder()
+        memo[key] = value
+    return value
+
+
+# ============================================================================
+# CACHE INTER-REQUÊTES PAR UTILISATEUR
+# ============================================================================
+
+def get_scope_version(user_id):
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_user_scope(*user_ids):
+    """
+    Rend caduc le contexte mis en cache des utilisateurs donnés (après
+    commit : avant, une requête concurrente relirait l'ancien périmètre
+    et le remettrait en cache sous la nouvelle version).
+    """
+    if _timeout() <= 0:
+        return
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return
+
+    def _bump():
+        for user_id in user_ids:
+            cache.set(_version_key(user_id), _new_version(), None)
+
+    transaction.on_commit(_bump)
+
+
+def user_cached(request, facet, loader):
+    """
+    Retourne loader() pour l'utilisateur de la requête :
+    mémoïsé sur la requête, puis mis en cache sous
+    scope_ctx:<user_id>:<version>:<facet>.
+    """
+    def _load():
+        user_id = getattr(request.user, "pk", None)
+        if user_id is None or _timeout() <= 0:
+            return loader()
+
+        key = f"{CACHE_PREFIX}:{user_id}:{get_scope_version(user_id)}:{facet}"
+        value = cache.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            cache.set(key, value, _timeout())
+        return value
+
+    return request_cached(request, f"user:{facet}", _load)
+
+
+# ============================================================================
+# ANNÉE SCOLAIRE DEMANDÉE
+# ============================================================================
+
+def resolve_annee_scolaire_id(request):
+    """
+    Priorité : header X-Annee-Scolaire-ID > query param > profil utilisateur.
+    """
+    def _resolve():
+        query_params = getattr(request, "query_params", None) or request.GET
+        return (
+            _to_int(request.headers.get("X-Annee-Scolaire-ID"))
+            or _to_int(query_params.get("annee_scolaire_id"))
+            or _to_int(getattr(request.user, "annee_scolaire_active_id", None))
+        )
+
+    return request_cached(request, "annee_scolaire_id", _resolve)
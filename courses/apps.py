@@ -7,4 +7,6 @@ class CoursesConfig(AppConfig):
     
     def ready(self):
         import courses.signals  # noqa — déclenche l'enregistrement des signaux
+        from courses.services.scope_index import register_scope_paths
+        register_scope_paths()
 
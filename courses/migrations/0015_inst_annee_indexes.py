@@ -0,0 +1,43 @@
+# Generated by Django 5.1.6 on 2026-10-17 01:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0013_remove_classe_groupes'),
+        ('courses', '0014_aianalysisrequest_blocgenere_quizgenere_and_more'),
+        ('users', '0027_user_photo'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cours',
+            index=models.Index(fields=['institution', 'annee_scolaire'], name='cours_inst_annee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inscriptioncours',
+            index=models.Index(fields=['institution', 'annee_scolaire'], name='inscription_inst_annee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='module',
+            index=models.Index(fields=['institution', 'annee_scolaire'], name='module_inst_annee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='participation',
+            index=models.Index(fields=['institution', 'annee_scolaire'], name='participation_inst_annee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sequence',
+            index=models.Index(fields=['institution', 'annee_scolaire'], name='sequence_inst_annee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['institution', 'annee_scolaire'], name='session_inst_annee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='suivi',
+            index=models.Index(fields=['institution', 'annee_scolaire'], name='suivi_inst_annee_idx'),
+        ),
+    ]
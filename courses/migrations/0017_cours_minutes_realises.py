@@ -0,0 +1,34 @@
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F, Sum
+
+
+def remplir_minutes_realises(apps, schema_editor):
+    Cours = apps.get_model('courses', 'Cours')
+    Session = apps.get_model('courses', 'Session')
+    duree = ExpressionWrapper(F('date_fin') - F('date_debut'), output_field=models.DurationField())
+    totaux = (
+        Session.objects.order_by()
+        .values('cours_id')
+        .annotate(total=Sum(duree))
+    )
+    for row in totaux:
+        if row['total']:
+            Cours.objects.filter(pk=row['cours_id']).update(
+                minutes_realises=int(row['total'].total_seconds() // 60)
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0016_cours_module_sequence_date_modification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cours',
+            name='minutes_realises',
+            field=models.IntegerField(default=0, editable=False, help_text='Total des minutes de sessions réalisées (calculé)'),
+        ),
+        migrations.RunPython(remplir_minutes_realises, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.6 on 2026-10-17 01:54
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0017_cours_minutes_realises'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChunkedUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(max_length=20)),
+                ('nom_fichier', models.CharField(max_length=255)),
+                ('taille_totale', models.BigIntegerField()),
+                ('offset', models.BigIntegerField(default=0, help_text='Octets confirmés (checksum validé)')),
+                ('chemin_final', models.CharField(blank=True, default='', max_length=500)),
+                ('statut', models.CharField(choices=[('en_cours', 'En cours'), ('termine', 'Terminé'), ('annule', 'Annulé')], default='en_cours', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('utilisateur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunked_uploads', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Upload fragmenté',
+                'verbose_name_plural': 'Uploads fragmentés',
+                'indexes': [models.Index(fields=['statut', 'updated_at'], name='chunked_upload_statut_idx')],
+            },
+        ),
+    ]
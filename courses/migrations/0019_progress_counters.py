@@ -0,0 +1,93 @@
+# Generated by Django 5.1.6 on 2026-10-17 01:58
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def _count(qs, path, **outer):
+    return Coalesce(
+        Subquery(
+            qs.filter(**outer).order_by().values(path).annotate(n=Count('id')).values('n'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def remplir_compteurs(apps, schema_editor):
+    """Compteurs initiaux (blocs comptés = visibles et obligatoires) ; est_termine inchangé."""
+    BlocContenu = apps.get_model('courses', 'BlocContenu')
+    BlocProgress = apps.get_model('courses', 'BlocProgress')
+    Sequence = apps.get_model('courses', 'Sequence')
+    Module = apps.get_model('courses', 'Module')
+    SequenceProgress = apps.get_model('courses', 'SequenceProgress')
+    ModuleProgress = apps.get_model('courses', 'ModuleProgress')
+    CoursProgress = apps.get_model('courses', 'CoursProgress')
+
+    SequenceProgress.objects.update(
+        nb_total=_count(
+            BlocContenu.objects.filter(est_visible=True, est_obligatoire=True),
+            'sequence_id', sequence_id=OuterRef('sequence_id'),
+        ),
+        nb_termines=_count(
+            BlocProgress.objects.filter(est_termine=True, bloc__est_visible=True, bloc__est_obligatoire=True),
+            'bloc__sequence_id',
+            apprenant_id=OuterRef('apprenant_id'), bloc__sequence_id=OuterRef('sequence_id'),
+        ),
+    )
+    ModuleProgress.objects.update(
+        nb_total=_count(Sequence.objects.all(), 'module_id', module_id=OuterRef('module_id')),
+        nb_termines=_count(
+            SequenceProgress.objects.filter(est_termine=True), 'sequence__module_id',
+            apprenant_id=OuterRef('apprenant_id'), sequence__module_id=OuterRef('module_id'),
+        ),
+    )
+    CoursProgress.objects.update(
+        nb_total=_count(Module.objects.all(), 'cours_id', cours_id=OuterRef('cours_id')),
+        nb_termines=_count(
+            ModuleProgress.objects.filter(est_termine=True), 'module__cours_id',
+            apprenant_id=OuterRef('apprenant_id'), module__cours_id=OuterRef('cours_id'),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0018_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coursprogress',
+            name='nb_termines',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='coursprogress',
+            name='nb_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='moduleprogress',
+            name='nb_termines',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='moduleprogress',
+            name='nb_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='sequenceprogress',
+            name='nb_termines',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='sequenceprogress',
+            name='nb_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(remplir_compteurs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.6 on 2026-10-17 02:12
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0019_progress_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('type_export', models.CharField(choices=[('evaluation', "Passages d'une évaluation"), ('progression_cours', "Progression des apprenants d'un cours"), ('presences_cours', "Présences aux sessions d'un cours")], max_length=30)),
+                ('format', models.CharField(choices=[('csv', 'CSV'), ('xlsx', 'XLSX')], default='csv', max_length=10)),
+                ('parametres', models.JSONField(blank=True, default=dict)),
+                ('empreinte', models.CharField(help_text='SHA-256 de (type, format, paramètres) : réutilisation des exports identiques', max_length=64)),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('termine', 'Terminé'), ('echec', 'Échec')], default='en_attente', max_length=20)),
+                ('progression', models.PositiveIntegerField(default=0, help_text='Lignes écrites')),
+                ('total', models.PositiveIntegerField(default=0, help_text='Lignes attendues')),
+                ('fichier', models.FileField(blank=True, upload_to='exports/')),
+                ('nom_fichier', models.CharField(blank=True, default='', max_length=255)),
+                ('erreur', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('expire_le', models.DateTimeField(blank=True, null=True)),
+                ('utilisateur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Export asynchrone',
+                'verbose_name_plural': 'Exports asynchrones',
+                'indexes': [models.Index(fields=['utilisateur', 'empreinte', 'created_at'], name='export_job_empreinte_idx'), models.Index(fields=['expire_le'], name='export_job_expire_idx')],
+            },
+        ),
+    ]
@@ -1,16 +1,54 @@
 # -*- coding: utf-8 -*-
 # courses/models.py
 
+import uuid
+
+from django.conf import settings
 from django.db import models
+from django.db.models import ExpressionWrapper, F, OuterRef, Subquery, Sum
 from django.core.validators import MinValueValidator, MaxValueValidator
 from academics.models import Groupe, Matiere, Institution, AnneeScolaire
 from users.models import Apprenant, Formateur
+from courses.services.scope_index import mark_instance_scoped
+
+
+# Durée d'une session, calculée en base
+DUREE_SESSION = ExpressionWrapper(
+    F("date_fin") - F("date_debut"), output_field=models.DurationField()
+)
 
 
 # ============================================================================
 # COURS
 # ============================================================================
 
+class CoursQuerySet(models.QuerySet):
+
+    def with_execution_metrics(self):
+        """
+        Annote chaque cours avec la durée cumulée de ses sessions
+        (sous-requête SUM(date_fin - date_debut), sans N+1).
+        Les propriétés total_minutes_realises / taux_execution lisent
+        cette annotation quand elle est présente.
+        """
+        return self.annotate(_duree_sessions=Subquery(
+            Session.objects
+            .filter(cours=OuterRef("pk"))
+            .order_by()
+            .values("cours")
+            .annotate(total=Sum(DUREE_SESSION))
+            .values("total"),
+            output_field=models.DurationField(),
+        ))
+
+
+def duree_en_minutes(duree):
+    """timedelta (ou None) -> minutes entières."""
+    if not duree:
+        return 0
+    return int(duree.total_seconds() // 60)
+
+
 class Cours(models.Model):
     titre = models.CharField(max_length=255, null=True, blank=True)
     groupe = models.ForeignKey(Groupe, on_delete=models.CASCADE, related_name="cours")
@@ -44,11 +82,24 @@ class Cours(models.Model):
         null=True, blank=True,
         help_text="Année scolaire à laquelle ce cours est rattaché"
     )
+    date_modification = models.DateTimeField(auto_now=True)
+
+    # Dénormalisation pour les tableaux de bord (tri / filtre en SQL),
+    # tenue à jour par les signaux post_save / post_delete de Session
+    minutes_realises = models.IntegerField(
+        default=0, editable=False,
+        help_text="Total des minutes de sessions réalisées (calculé)"
+    )
+
+    objects = CoursQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Cours"
         verbose_name_plural = "Cours"
         ordering = ["-date_debut"]
+        indexes = [
+            models.Index(fields=["institution", "annee_scolaire"], name="cours_inst_annee_idx"),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=["groupe", "matiere", "enseignant", "annee_scolaire"],
@@ -59,10 +110,20 @@ class Cours(models.Model):
     def __str__(self):
         return self.titre or f"Cours {self.matiere.nom} - {self.groupe.nom}"
 
+    def calculer_duree_sessions(self):
+        """Durée cumulée des sessions (timedelta ou None), en une requête."""
+        return self.sessions.aggregate(total=Sum(DUREE_SESSION))["total"]
+
     @property
     def total_minutes_realises(self):
-        """Calcule le total des minutes de sessions réalisées"""
-        return sum(s.duree_minutes or 0 for s in self.sessions.all())
+        """
+        Total des minutes de sessions réalisées.
+        Lit l'annotation de with_execution_metrics() si présente,
+        sinon l'agrège une fois et la garde sur l'instance.
+        """
+        if not hasattr(self, "_duree_sessions"):
+            self._duree_sessions = self.calculer_duree_sessions()
+        return duree_en_minutes(self._duree_sessions)
 
     @property
     def total_heures_realisees(self):
@@ -101,11 +162,15 @@ class Module(models.Model):
         related_name="modules",
         help_text="Hérité du cours parent"
     )
+    date_modification = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "Module"
         verbose_name_plural = "Modules"
         ordering = ["id"]
+        indexes = [
+            models.Index(fields=["institution", "annee_scolaire"], name="module_inst_annee_idx"),
+        ]
 
     def __str__(self):
         return self.titre
@@ -116,6 +181,7 @@ class Module(models.Model):
             self.institution = self.cours.institution
             self.annee_scolaire = self.cours.annee_scolaire
         super().save(*args, **kwargs)
+        mark_instance_scoped(self)
 
 
 # ============================================================================
@@ -141,11 +207,15 @@ class Sequence(models.Model):
         null=True, blank=True,
         help_text="Hérité du module parent"
     )
+    date_modification = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "Séquence"
         verbose_name_plural = "Séquences"
         ordering = ["id"]
+        indexes = [
+            models.Index(fields=["institution", "annee_scolaire"], name="sequence_inst_annee_idx"),
+        ]
 
     def __str__(self):
         return self.titre
@@ -156,6 +226,7 @@ class Sequence(models.Model):
             self.institution = self.module.institution
             self.annee_scolaire = self.module.annee_scolaire
         super().save(*args, **kwargs)
+        mark_instance_scoped(self)
 
 
 # ============================================================================
@@ -471,6 +542,9 @@ class InscriptionCours(models.Model):
         verbose_name = "Inscription cours"
         verbose_name_plural = "Inscriptions cours"
         unique_together = ("apprenant", "cours")
+        indexes = [
+            models.Index(fields=["institution", "annee_scolaire"], name="inscription_inst_annee_idx"),
+        ]
 
     def __str__(self):
         return f"{self.apprenant} - {self.cours}"
@@ -481,6 +555,7 @@ class InscriptionCours(models.Model):
             self.institution = self.cours.institution
             self.annee_scolaire = self.cours.annee_scolaire
         super().save(*args, **kwargs)
+        mark_instance_scoped(self)
 
 
 # ============================================================================
@@ -531,6 +606,9 @@ class Suivi(models.Model):
         verbose_name = "Suivi"
         verbose_name_plural = "Suivis"
         unique_together = ("apprenant", "cours")
+        indexes = [
+            models.Index(fields=["institution", "annee_scolaire"], name="suivi_inst_annee_idx"),
+        ]
 
     def __str__(self):
         return f"Suivi {self.apprenant} - {self.cours}"
@@ -541,6 +619,7 @@ class Suivi(models.Model):
             self.institution = self.cours.institution
             self.annee_scolaire = self.cours.annee_scolaire
         super().save(*args, **kwargs)
+        mark_instance_scoped(self)
 
 
 # ============================================================================
@@ -591,6 +670,9 @@ class Session(models.Model):
         verbose_name = "Session"
         verbose_name_plural = "Sessions"
         ordering = ["-date_debut"]
+        indexes = [
+            models.Index(fields=["institution", "annee_scolaire"], name="session_inst_annee_idx"),
+        ]
 
     def __str__(self):
         return f"{self.titre} - {self.date_debut.strftime('%d/%m/%Y')}"
@@ -609,6 +691,7 @@ class Session(models.Model):
             self.institution = self.cours.institution
             self.annee_scolaire = self.cours.annee_scolaire
         super().save(*args, **kwargs)
+        mark_instance_scoped(self)
 
 
 # ============================================================================
@@ -667,6 +750,9 @@ class Participation(models.Model):
         verbose_name = "Participation"
         verbose_name_plural = "Participations"
         unique_together = ("session", "apprenant")
+        indexes = [
+            models.Index(fields=["institution", "annee_scolaire"], name="participation_inst_annee_idx"),
+        ]
 
     def __str__(self):
         return f"{self.apprenant} - {self.session} ({self.statut})"
@@ -677,6 +763,7 @@ class Participation(models.Model):
             self.institution = self.session.institution
             self.annee_scolaire = self.session.annee_scolaire
         super().save(*args, **kwargs)
+        mark_instance_scoped(self)
 
 
 # ============================================================================
@@ -721,6 +808,9 @@ class SequenceProgress(models.Model):
         related_name="progress_records"
     )
     est_termine = models.BooleanField(default=False)
+    # Compteurs tenus par courses.services.progression
+    nb_termines = models.PositiveIntegerField(default=0)
+    nb_total = models.PositiveIntegerField(default=0)
     completed_at = models.DateTimeField(null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -746,6 +836,9 @@ class ModuleProgress(models.Model):
         related_name="progress_records"
     )
     est_termine = models.BooleanField(default=False)
+    # Compteurs tenus par courses.services.progression
+    nb_termines = models.PositiveIntegerField(default=0)
+    nb_total = models.PositiveIntegerField(default=0)
     completed_at = models.DateTimeField(null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -771,6 +864,9 @@ class CoursProgress(models.Model):
         related_name="progress_records"
     )
     est_termine = models.BooleanField(default=False)
+    # Compteurs tenus par courses.services.progression
+    nb_termines = models.PositiveIntegerField(default=0)
+    nb_total = models.PositiveIntegerField(default=0)
     completed_at = models.DateTimeField(null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -781,3 +877,116 @@ class CoursProgress(models.Model):
 
     def __str__(self):
         return f"{self.apprenant} - {self.cours}"
+
+
+# ============================================================================
+# TÉLÉVERSEMENTS FRAGMENTÉS (upload par morceaux, reprenable)
+# ============================================================================
+
+class ChunkedUpload(models.Model):
+    """
+    Session d'upload par morceaux : init → PUT des morceaux à un offset → finalisation.
+    Les morceaux sont écrits dans un fichier temporaire (CHUNKED_UPLOAD_TEMP_DIR),
+    puis le fichier complet est transmis en flux au storage à la finalisation.
+    """
+    STATUT_CHOICES = [
+        ("en_cours", "En cours"),
+        ("termine", "Terminé"),
+        ("annule", "Annulé"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    utilisateur = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="chunked_uploads"
+    )
+    kind = models.CharField(max_length=20)
+    nom_fichier = models.CharField(max_length=255)
+    taille_totale = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0, help_text="Octets confirmés (checksum validé)")
+    chemin_final = models.CharField(max_length=500, blank=True, default="")
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default="en_cours")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Upload fragmenté"
+        verbose_name_plural = "Uploads fragmentés"
+        indexes = [
+            models.Index(fields=["statut", "updated_at"], name="chunked_upload_statut_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.nom_fichier} ({self.offset}/{self.taille_totale})"
+
+    @property
+    def est_complet(self):
+        return self.offset >= self.taille_totale
+
+
+# ============================================================================
+# EXPORTS ASYNCHRONES (rapports volumineux, voir courses/services/export_jobs.py)
+# ============================================================================
+
+class ExportJob(models.Model):
+    """
+    Export construit en tâche de fond (Celery) : soumission → progression →
+    fichier sous MEDIA_ROOT/exports/, téléchargeable jusqu'à expire_le.
+    """
+    TYPE_CHOICES = [
+        ("evaluation", "Passages d'une évaluation"),
+        ("progression_cours", "Progression des apprenants d'un cours"),
+        ("presences_cours", "Présences aux sessions d'un cours"),
+    ]
+    FORMAT_CHOICES = [
+        ("csv", "CSV"),
+        ("xlsx", "XLSX"),
+    ]
+    STATUT_CHOICES = [
+        ("en_attente", "En attente"),
+        ("en_cours", "En cours"),
+        ("termine", "Terminé"),
+        ("echec", "Échec"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    utilisateur = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="export_jobs"
+    )
+    type_export = models.CharField(max_length=30, choices=TYPE_CHOICES)
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default="csv")
+    parametres = models.JSONField(default=dict, blank=True)
+    empreinte = models.CharField(
+        max_length=64,
+        help_text="SHA-256 de (type, format, paramètres) : réutilisation des exports identiques"
+    )
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default="en_attente")
+    progression = models.PositiveIntegerField(default=0, help_text="Lignes écrites")
+    total = models.PositiveIntegerField(default=0, help_text="Lignes attendues")
+    fichier = models.FileField(upload_to="exports/", blank=True)
+    nom_fichier = models.CharField(max_length=255, blank=True, default="")
+    erreur = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expire_le = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Export asynchrone"
+        verbose_name_plural = "Exports asynchrones"
+        indexes = [
+            models.Index(fields=["utilisateur", "empreinte", "created_at"], name="export_job_empreinte_idx"),
+            models.Index(fields=["expire_le"], name="export_job_expire_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.type_export} ({self.statut})"
+
+    @property
+    def pourcentage(self):
+        if self.statut == "termine":
+            return 100.0
+        return round(min(self.progression / self.total, 1) * 100, 1) if self.total else 0.0
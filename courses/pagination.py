@@ -0,0 +1,131 @@
+# courses/pagination.py
+"""
+Pagination par curseur (keyset) pour les listes de l'application courses.
+
+Mode opt-in : le front actuel continue de recevoir la liste complète.
+Le mode curseur est activé par ?cursor=<jeton>, ?page_size=<n> ou
+?pagination=cursor (ou par défaut si COURSES_CURSOR_PAGINATION_DEFAULT=True ;
+?pagination=none force alors la liste complète).
+
+Tri stable sur (-<horodatage>, -id) : chaque page est une requête
+WHERE (ts < x) OR (ts = x AND id < y) ORDER BY ts DESC, id DESC LIMIT n+1,
+quel que soit le rang de la page. Le total est une estimation mise en cache.
+"""
+
+import base64
+import hashlib
+import json
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+@dataclass
+class KeysetPage:
+    items: list
+    next_cursor: str
+    page_size: int
+    count_estimate: int
+
+    def as_meta(self):
+        return {
+            "mode": "cursor",
+            "next_cursor": self.next_cursor,
+            "has_next": self.next_cursor is not None,
+            "page_size": self.page_size,
+            "count_estimate": self.count_estimate,
+        }
+
+
+def use_cursor_pagination(request):
+    params = request.query_params
+    mode = (params.get("pagination") or "").strip().lower()
+    if mode in ("none", "off", "0", "false"):
+        return False
+    if mode == "cursor" or "cursor" in params or "page_size" in params:
+        return True
+    return getattr(settings, "COURSES_CURSOR_PAGINATION_DEFAULT", False)
+
+
+def _page_size(request):
+    default = getattr(settings, "COURSES_CURSOR_PAGE_SIZE", DEFAULT_PAGE_SIZE)
+    try:
+        size = int(request.query_params.get("page_size", default))
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(value, pk):
+    raw = json.dumps([value.isoformat(), pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        value, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        parsed = parse_datetime(value)
+    except (ValueError, TypeError, json.JSONDecodeError):
+        raise InvalidCursor("Curseur illisible.")
+    if parsed is None or not isinstance(pk, int):
+        raise InvalidCursor("Curseur illisible.")
+    return parsed, pk
+
+
+def estimate_count(qs):
+    """
+    Nombre de lignes du queryset filtré, mis en cache quelques secondes
+    (clé = SQL du queryset, donc propre au périmètre de l'utilisateur).
+    """
+    sql = str(qs.order_by().query)
+    key = "keyset_count:" + hashlib.sha1(sql.encode()).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = qs.order_by().count()
+        cache.set(key, count, getattr(settings, "COURSES_CURSOR_COUNT_TIMEOUT", 60))
+    return count
+
+
+def paginate_keyset(qs, request, order_field="updated_at", ascending=False):
+    """
+    Retourne une KeysetPage ordonnée sur (-order_field, -id),
+    ou (order_field, id) si ascending (files d'attente : plus ancien d'abord).
+    """
+    page_size = _page_size(request)
+    count_estimate = estimate_count(qs)
+
+    sign, cmp = ("", "gt") if ascending else ("-", "lt")
+    qs = qs.order_by(f"{sign}{order_field}", f"{sign}id")
+    token = request.query_params.get("cursor")
+    if token:
+        value, pk = decode_cursor(token)
+        qs = qs.filter(
+            Q(**{f"{order_field}__{cmp}": value})
+            | Q(**{order_field: value, f"id__{cmp}": pk})
+        )
+
+    items = list(qs[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, order_field), last.pk)
+
+    return KeysetPage(
+        items=items,
+        next_cursor=next_cursor,
+        page_size=page_size,
+        count_estimate=count_estimate,
+    )
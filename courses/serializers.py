@@ -64,6 +64,7 @@ class CoursSerializer(serializers.ModelSerializer):
             "total_minutes_realises",
             "total_heures_realisees",
             "taux_execution",
+            "minutes_realises",
         ]
         extra_kwargs = {
             "titre": {"required": False, "allow_null": True, "allow_blank": True},
@@ -593,4 +594,13 @@ class CoursProgressSerializer(serializers.ModelSerializer):
 
 # Serializer "action" (PUT) simple pour set terminé/non terminé
 class ProgressToggleSerializer(serializers.Serializer):
-    est_termine = serializers.BooleanField()
\ No newline at end of file
+    est_termine = serializers.BooleanField()
+
+class ProgressBatchItemSerializer(serializers.Serializer):
+    level = serializers.ChoiceField(choices=["bloc", "sequence", "module", "cours"])
+    id = serializers.IntegerField(min_value=1)
+    est_termine = serializers.BooleanField()
+
+
+class ProgressBatchSerializer(serializers.Serializer):
+    items = ProgressBatchItemSerializer(many=True, allow_empty=False, max_length=500)
@@ -0,0 +1,201 @@
+# courses/services/chunked_upload.py
+"""
+Upload par morceaux (chunked), reprenable, pour les fichiers de blocs de contenu.
+
+Protocole :
+  1. init      : POST {kind, filename, size}  → upload_id, offset=0
+  2. morceau   : PUT  corps brut + en-têtes Upload-Offset / X-Chunk-SHA256
+                 → écrit à l'offset, vérifie le checksum, avance l'offset confirmé
+  3. reprise   : GET  → offset confirmé, le client renvoie à partir de là
+  4. finaliser : POST → le fichier temporaire est transmis en flux au storage
+
+Aucun morceau n'est chargé entier en mémoire : lecture du corps par blocs de
+STREAM_BLOCK_SIZE octets, taille d'un morceau bornée par CHUNKED_UPLOAD_MAX_CHUNK_SIZE.
+"""
+
+import hashlib
+import os
+import shutil
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from courses.models import ChunkedUpload
+
+
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+class ChunkError(Exception):
+    """Morceau refusé ; http_status indique le code à renvoyer."""
+
+    def __init__(self, message, http_status=400, offset=None):
+        super().__init__(message)
+        self.http_status = http_status
+        self.offset = offset
+
+
+def max_chunk_size():
+    return getattr(settings, "CHUNKED_UPLOAD_MAX_CHUNK_SIZE", 8 * 1024 * 1024)
+
+
+def _temp_dir():
+    path = getattr(settings, "CHUNKED_UPLOAD_TEMP_DIR", None) or os.path.join(
+        settings.BASE_DIR, "tmp", "chunked_uploads"
+    )
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def temp_path(upload):
+    return os.path.join(_temp_dir(), f"{upload.id}.part")
+
+
+def _remove_temp(upload):
+    try:
+        os.remove(temp_path(upload))
+    except FileNotFoundError:
+        pass
+
+
+# ============================================================================
+# INIT
+# ============================================================================
+
+def init_upload(user, kind, filename, size):
+    upload = ChunkedUpload.objects.create(
+        utilisateur=user,
+        kind=kind,
+        nom_fichier=filename,
+        taille_totale=size,
+    )
+    # Fichier vide créé d'emblée : les morceaux y sont écrits en r+b
+    open(temp_path(upload), "wb").close()
+    return upload
+
+
+# ============================================================================
+# MORCEAUX
+# ============================================================================
+
+def write_chunk(upload, stream, offset, length, checksum):
+    """
+    Écrit `length` octets lus depuis `stream` à la position `offset`.
+
+    - offset doit être l'offset confirmé (sinon 409 + offset attendu)
+    - checksum = SHA-256 hexadécimal du morceau (sinon 400, morceau annulé)
+    Retourne le nouvel offset confirmé.
+    """
+    if upload.statut != "en_cours":
+        raise ChunkError("Upload déjà finalisé ou annulé.", 409, upload.offset)
+    if offset != upload.offset:
+        raise ChunkError("Offset inattendu.", 409, upload.offset)
+    if length <= 0 or length > max_chunk_size():
+        raise ChunkError(f"Taille de morceau invalide (max {max_chunk_size()} octets).")
+    if offset + length > upload.taille_totale:
+        raise ChunkError("Le morceau dépasse la taille annoncée à l'init.")
+    if not checksum:
+        raise ChunkError("En-tête X-Chunk-SHA256 requis.")
+
+    path = temp_path(upload)
+    if not os.path.exists(path):
+        raise ChunkError("Fichier temporaire introuvable, upload expiré.", 410)
+
+    # Morceau reçu dans un fichier à part (propre à cette requête) : un PUT
+    # concurrent au même offset ne peut pas écrire dans le fichier assemblé
+    part = os.path.join(_temp_dir(), f"{upload.id}.{offset}.{uuid.uuid4().hex}.chunk")
+    try:
+        digest = hashlib.sha256()
+        received = 0
+        with open(part, "wb") as fh:
+            while received < length:
+                block = stream.read(min(STREAM_BLOCK_SIZE, length - received))
+                if not block:
+                    break
+                digest.update(block)
+                fh.write(block)
+                received += len(block)
+
+        if received != length or digest.hexdigest() != checksum.strip().lower():
+            raise ChunkError("Checksum invalide ou morceau incomplet.", 400, offset)
+
+        # Avance conditionnelle puis copie dans la même transaction : le
+        # verrou de la ligne sérialise les PUT concurrents, un seul écrit ;
+        # un échec de copie annule l'avance
+        with transaction.atomic():
+            updated = ChunkedUpload.objects.filter(
+                pk=upload.pk, offset=offset, statut="en_cours"
+            ).update(offset=offset + length, updated_at=timezone.now())
+            if not updated:
+                upload.refresh_from_db(fields=["offset", "statut"])
+                raise ChunkError("Morceau déjà reçu.", 409, upload.offset)
+            with open(part, "rb") as src, open(path, "r+b") as dst:
+                dst.seek(offset)
+                shutil.copyfileobj(src, dst, STREAM_BLOCK_SIZE)
+    finally:
+        try:
+            os.remove(part)
+        except FileNotFoundError:
+            pass
+
+    upload.offset = offset + length
+    return upload.offset
+
+
+# ============================================================================
+# FINALISATION
+# ============================================================================
+
+def finalize_upload(upload, upload_path, checksum=None):
+    """
+    Transmet le fichier complet au storage (en flux, via File) et retourne
+    le chemin enregistré. checksum optionnel = SHA-256 du fichier entier.
+    """
+    if upload.statut == "termine":
+        return upload.chemin_final
+    if upload.statut != "en_cours":
+        raise ChunkError("Upload annulé.", 409)
+    if not upload.est_complet:
+        raise ChunkError("Upload incomplet.", 409, upload.offset)
+
+    path = temp_path(upload)
+    if checksum:
+        digest = hashlib.sha256()
+        with open(path, "rb") as fh:
+            for block in iter(lambda: fh.read(STREAM_BLOCK_SIZE), b""):
+                digest.update(block)
+        if digest.hexdigest() != checksum.strip().lower():
+            raise ChunkError("Checksum du fichier complet invalide.")
+
+    with open(path, "rb") as fh:
+        saved_path = default_storage.save(upload_path, File(fh, name=upload.nom_fichier))
+
+    upload.chemin_final = saved_path
+    upload.statut = "termine"
+    upload.save(update_fields=["chemin_final", "statut", "updated_at"])
+    _remove_temp(upload)
+    return saved_path
+
+
+def cancel_upload(upload):
+    upload.statut = "annule"
+    upload.save(update_fields=["statut", "updated_at"])
+    _remove_temp(upload)
+
+
+def purge_expired_uploads(max_age_hours=None):
+    """Supprime les uploads inachevés inactifs (et leurs fichiers temporaires)."""
+    max_age_hours = max_age_hours or getattr(settings, "CHUNKED_UPLOAD_EXPIRATION_HOURS", 24)
+    limite = timezone.now() - timedelta(hours=max_age_hours)
+    expired = ChunkedUpload.objects.filter(statut="en_cours", updated_at__lt=limite)
+    count = 0
+    for upload in expired.iterator():
+        _remove_temp(upload)
+        count += 1
+    expired.update(statut="annule")
+    return count
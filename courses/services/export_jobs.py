@@ -0,0 +1,304 @@
+# courses/services/export_jobs.py
+"""
+Exports asynchrones (ExportJob) : rapports trop volumineux pour être
+construits dans la requête (délais des proxys).
+
+  1. soumettre  : contrôle d'accès, réutilisation d'un export identique
+                  demandé depuis moins de EXPORT_JOB_REUSE_SECONDS, sinon
+                  création du job et envoi à Celery après commit
+  2. executer   : tâche generer_export — lignes écrites dans un fichier
+                  temporaire (mémoire constante), progression enregistrée
+                  toutes les EXPORT_JOB_PROGRESS_EVERY lignes, fichier
+                  rangé sous MEDIA_ROOT/exports/, notification du demandeur
+  3. télécharger jusqu'à expire_le (EXPORT_JOB_TTL_HOURS, fixé dès la
+     création) ; les exports expirés sont purgés par la tâche
+     purger_exports_expires
+  4. un job pris par un worker interrompu (ou jamais pris) depuis plus de
+     EXPORT_JOB_STALE_MINUTES passe en échec (tâche interrompre_exports_bloques)
+     et n'est plus réutilisé
+
+Types : "evaluation" {evaluation_id, detail}, "progression_cours" {cours_id},
+"presences_cours" {cours_id}.
+"""
+
+import hashlib
+import json
+import logging
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q
+from django.http import Http404
+from django.utils import timezone
+
+from core.exports import ecrire_csv, ecrire_xlsx
+from courses.models import Cours, ExportJob
+from courses.services import rapports
+from courses.utils import get_filtered_object
+
+
+logger = logging.getLogger(__name__)
+
+ROLES_AUTORISES = ("Admin", "Responsable", "ResponsableAcademique", "Formateur")
+
+
+class ExportError(Exception):
+    """Export refusé ; http_status indique le code à renvoyer."""
+
+    def __init__(self, message, http_status=400):
+        super().__init__(message)
+        self.http_status = http_status
+
+
+def _reuse_seconds():
+    return getattr(settings, "EXPORT_JOB_REUSE_SECONDS", 600)
+
+
+def _ttl():
+    return timedelta(hours=getattr(settings, "EXPORT_JOB_TTL_HOURS", 24))
+
+
+def _progress_every():
+    return getattr(settings, "EXPORT_JOB_PROGRESS_EVERY", 500)
+
+
+def _limite_blocage():
+    return timezone.now() - timedelta(minutes=getattr(settings, "EXPORT_JOB_STALE_MINUTES", 60))
+
+
+def _bloques():
+    limite = _limite_blocage()
+    return Q(statut="en_cours", started_at__lte=limite) | Q(statut="en_attente", created_at__lte=limite)
+
+
+# ============================================================================
+# TYPES D'EXPORT
+# ============================================================================
+
+def _int_param(parametres, name):
+    try:
+        return int(parametres.get(name))
+    except (TypeError, ValueError):
+        raise ExportError(f"Paramètre '{name}' (entier) requis.")
+
+
+def _cours_accessible(request, cours_id):
+    try:
+        return get_filtered_object(Cours, cours_id, request, "Cours")
+    except Http404:
+        raise ExportError("Cours introuvable.", 404)
+
+
+def _normaliser(request, type_export, parametres):
+    """Paramètres canoniques du type d'export, après contrôle d'accès."""
+    if type_export == "evaluation":
+        from evaluations.models import Evaluation
+        evaluation_id = _int_param(parametres, "evaluation_id")
+        cours_id = Evaluation.objects.filter(pk=evaluation_id).values_list("cours_id", flat=True).first()
+        if cours_id is None:
+            raise ExportError("Évaluation introuvable.", 404)
+        _cours_accessible(request, cours_id)
+        detail = str(parametres.get("detail", "false")).lower() in ("1", "true")
+        return {"evaluation_id": evaluation_id, "detail": detail}
+
+    if type_export in ("progression_cours", "presences_cours"):
+        cours_id = _int_param(parametres, "cours_id")
+        _cours_accessible(request, cours_id)
+        return {"cours_id": cours_id}
+
+    raise ExportError(f"Type d'export inconnu : {type_export}.")
+
+
+def _construire(job):
+    """(entêtes, lignes, titre de feuille, nb de lignes, nom de fichier sans extension)."""
+    p = job.parametres
+    if job.type_export == "evaluation":
+        from evaluations.models import Evaluation, PassageEvaluation, ReponseQuestion
+        from evaluations.services import exports
+        evaluation = Evaluation.objects.select_related("cours").get(pk=p["evaluation_id"])
+        entetes, lignes = exports.entetes_et_lignes(evaluation, p["detail"])
+        if p["detail"]:
+            total = ReponseQuestion.objects.filter(passage_evaluation__evaluation=evaluation).count()
+        else:
+            total = PassageEvaluation.objects.filter(evaluation=evaluation).count()
+        nom = exports.nom_fichier(evaluation, p["detail"], job.format).rsplit(".", 1)[0]
+        return entetes, lignes, "Détail" if p["detail"] else "Résumé", total, nom
+
+    cours = Cours.objects.get(pk=p["cours_id"])
+    if job.type_export == "progression_cours":
+        return (rapports.ENTETES_PROGRESSION, rapports.lignes_progression(cours), "Progression",
+                rapports.nb_lignes_progression(cours), f"cours_{cours.id}_progression")
+    return (rapports.ENTETES_PRESENCES, rapports.lignes_presences(cours), "Présences",
+            rapports.nb_lignes_presences(cours), f"cours_{cours.id}_presences")
+
+
+# ============================================================================
+# SOUMISSION
+# ============================================================================
+
+def empreinte(type_export, export_format, parametres):
+    canon = json.dumps([type_export, export_format, parametres], sort_keys=True)
+    return hashlib.sha256(canon.encode("utf-8")).hexdigest()
+
+
+def soumettre(request, type_export, export_format, parametres):
+    """
+    Retourne (job, créé ?). Un export identique du même utilisateur, en
+    cours ou encore téléchargeable, demandé dans la fenêtre de réutilisation
+    est renvoyé tel quel.
+    """
+    role = getattr(getattr(request.user, "role", None), "name", None)
+    if role not in ROLES_AUTORISES:
+        raise ExportError("Accès refusé.", 403)
+    if export_format not in dict(ExportJob.FORMAT_CHOICES):
+        raise ExportError("Format attendu : csv ou xlsx.")
+
+    parametres = _normaliser(request, type_export, parametres or {})
+    cle = empreinte(type_export, export_format, parametres)
+    now = timezone.now()
+
+    existant = (
+        ExportJob.objects.filter(
+            utilisateur=request.user, empreinte=cle,
+            created_at__gte=now - timedelta(seconds=_reuse_seconds()),
+            statut__in=("en_attente", "en_cours", "termine"),
+        )
+        .exclude(expire_le__lte=now)
+        .exclude(_bloques())
+        .order_by("-created_at")
+        .first()
+    )
+    if existant:
+        return existant, False
+
+    job = ExportJob.objects.create(
+        utilisateur=request.user, type_export=type_export, format=export_format,
+        parametres=parametres, empreinte=cle, expire_le=now + _ttl(),
+    )
+    transaction.on_commit(lambda: _planifier(job))
+    return job, True
+
+
+def _planifier(job):
+    try:
+        from master_backend_api.tasks import generer_export
+        generer_export.delay(str(job.id))
+    except Exception:
+        logger.warning("[exports] planification impossible (job %s)", job.id, exc_info=True)
+        now = timezone.now()
+        ExportJob.objects.filter(pk=job.pk, statut="en_attente").update(
+            statut="echec", erreur="File de tâches indisponible.", finished_at=now, expire_le=now + _ttl(),
+        )
+
+
+# ============================================================================
+# EXÉCUTION (tâche Celery)
+# ============================================================================
+
+def _compter(job_id, lignes):
+    """Fait suivre les lignes en enregistrant la progression par paliers."""
+    every = _progress_every()
+    n = 0
+    for n, ligne in enumerate(lignes, 1):
+        yield ligne
+        if n % every == 0:
+            ExportJob.objects.filter(pk=job_id).update(progression=n)
+    ExportJob.objects.filter(pk=job_id).update(progression=n)
+
+
+def executer(job_id):
+    """Construit le fichier de l'export ; retourne le job (None s'il est déjà pris)."""
+    # Prise du job par UPDATE conditionnel : une seule exécution par job
+    if not ExportJob.objects.filter(pk=job_id, statut="en_attente").update(
+        statut="en_cours", started_at=timezone.now()
+    ):
+        return None
+    job = ExportJob.objects.get(pk=job_id)
+
+    try:
+        entetes, lignes, titre, total, nom = _construire(job)
+        ExportJob.objects.filter(pk=job.pk).update(total=total)
+        lignes = _compter(job.pk, lignes)
+
+        with tempfile.TemporaryFile(suffix=f".{job.format}") as tmp:
+            if job.format == "xlsx":
+                ecrire_xlsx(entetes, lignes, titre, tmp)
+            else:
+                ecrire_csv(entetes, lignes, tmp)
+            tmp.seek(0)
+            job.refresh_from_db(fields=["progression", "total"])
+            job.nom_fichier = f"{nom}.{job.format}"
+            job.fichier.save(f"{job.id}.{job.format}", File(tmp), save=False)
+
+        job.statut = "termine"
+        job.finished_at = timezone.now()
+        job.expire_le = job.finished_at + _ttl()
+        job.save(update_fields=["statut", "fichier", "nom_fichier", "progression", "total",
+                                "finished_at", "expire_le"])
+    except Exception as e:
+        logger.exception("[exports] échec du job %s", job.id)
+        job.statut = "echec"
+        job.erreur = str(e)
+        job.finished_at = timezone.now()
+        job.expire_le = job.finished_at + _ttl()
+        job.save(update_fields=["statut", "erreur", "finished_at", "expire_le"])
+
+    _notifier(job)
+    return job
+
+
+def _notifier(job):
+    from notifications.models import EntityType, Notification, PrioriteNotification, TypeNotification
+    ok = job.statut == "termine"
+    try:
+        Notification.creer(
+            recipient=job.utilisateur,
+            type_notif=TypeNotification.EXPORT_TERMINE,
+            titre="Export prêt" if ok else "Échec de l'export",
+            message=(f"Votre export « {job.nom_fichier} » est prêt au téléchargement."
+                     if ok else f"Votre export n'a pas pu être généré : {job.erreur}"),
+            priorite=PrioriteNotification.MOYENNE if ok else PrioriteNotification.HAUTE,
+            entity_type=EntityType.AUTRE,
+            institution=getattr(job.utilisateur, "institution", None),
+            expires_at=job.expire_le,
+            export_id=str(job.id),
+        )
+    except Exception:
+        logger.warning("[exports] notification impossible (job %s)", job.id, exc_info=True)
+
+
+# ============================================================================
+# PURGE
+# ============================================================================
+
+def purger_expires():
+    """Supprime les exports expirés et leurs fichiers ; retourne leur nombre."""
+    n = 0
+    for job in ExportJob.objects.filter(expire_le__lte=timezone.now()).iterator():
+        if job.fichier:
+            job.fichier.delete(save=False)
+        job.delete()
+        n += 1
+    return n
+
+
+def interrompre_bloques():
+    """
+    Passe en échec les exports bloqués (worker interrompu, tâche perdue) et
+    prévient leurs demandeurs ; retourne leur nombre.
+    """
+    n = 0
+    for job in ExportJob.objects.filter(_bloques()).select_related("utilisateur").iterator():
+        now = timezone.now()
+        # Conditionnel : le worker a pu terminer entre-temps
+        if not ExportJob.objects.filter(pk=job.pk, statut=job.statut).update(
+            statut="echec", erreur="Export interrompu.", finished_at=now, expire_le=now + _ttl(),
+        ):
+            continue
+        job.refresh_from_db()
+        _notifier(job)
+        n += 1
+    return n
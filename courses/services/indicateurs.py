@@ -0,0 +1,141 @@
+# courses/services/indicateurs.py
+"""
+Indicateurs d'un cours pour toute la classe (tableau de bord formateur).
+
+Un nombre fixe de requêtes quel que soit l'effectif :
+  1. apprenants inscrits (InscriptionCours)
+  2. total des blocs visibles du cours
+  3. blocs terminés        GROUP BY apprenant_id (BlocProgress)
+  4. durée passée (sec.)   GROUP BY apprenant_id (BlocAnalyticsSummary)
+
+Le résultat est mis en cache par cours sous une clé versionnée ; toute
+écriture de progression, d'analytics, d'inscription ou de structure du
+cours change la version (voir courses/signals.py). Sans cache partagé
+(COURS_INDICATEURS_CACHE_TIMEOUT = 0) ni cache ni invalidation.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from courses.models import BlocContenu, BlocProgress, InscriptionCours
+
+
+CACHE_PREFIX = "cours_indic"
+
+
+def _timeout():
+    return getattr(settings, "COURS_INDICATEURS_CACHE_TIMEOUT", 0)
+
+
+def _version_key(cours_id):
+    return f"{CACHE_PREFIX}:ver:{cours_id}"
+
+
+def _get_version(cours_id):
+    key = _version_key(cours_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+# ============================================================================
+# INVALIDATION
+# ============================================================================
+
+def invalidate_cours_indicateurs(*cours_ids):
+    """Rend caduques les indicateurs de classe des cours donnés (après commit)."""
+    cours_ids = {c for c in cours_ids if c}
+    if not cours_ids or _timeout() <= 0:
+        return
+
+    def _bump():
+        for cours_id in cours_ids:
+            cache.set(_version_key(cours_id), time.time_ns(), None)
+
+    transaction.on_commit(_bump)
+
+
+def invalidate_for_blocs(bloc_ids):
+    """Invalide les cours auxquels appartiennent les blocs donnés."""
+    bloc_ids = [b for b in bloc_ids if b]
+    if not bloc_ids or _timeout() <= 0:
+        return
+    invalidate_cours_indicateurs(*BlocContenu.objects.filter(id__in=bloc_ids).values_list(
+        "sequence__module__cours_id", flat=True
+    ).distinct())
+
+
+# ============================================================================
+# CALCUL
+# ============================================================================
+
+def _heures_par_apprenant(cours_id):
+    try:
+        from analytics.models import BlocAnalyticsSummary
+    except ImportError:
+        return {}
+    return {
+        apprenant_id: round((total or 0) / 3600, 2)
+        for apprenant_id, total in BlocAnalyticsSummary.objects.filter(
+            bloc__sequence__module__cours_id=cours_id,
+        ).order_by().values("apprenant_id").annotate(
+            total=Sum("duree_totale_sec")
+        ).values_list("apprenant_id", "total")
+    }
+
+
+def _calculer(cours_id):
+    inscrits = list(
+        InscriptionCours.objects.filter(cours_id=cours_id)
+        .order_by("apprenant__nom", "apprenant__prenom")
+        .values_list("apprenant_id", "apprenant__nom", "apprenant__prenom", "apprenant__matricule")
+    )
+
+    total_blocs = BlocContenu.objects.filter(
+        sequence__module__cours_id=cours_id, est_visible=True,
+    ).count()
+
+    termines = dict(
+        BlocProgress.objects.filter(
+            bloc__sequence__module__cours_id=cours_id,
+            bloc__est_visible=True,
+            est_termine=True,
+        ).order_by().values("apprenant_id").annotate(n=Count("id")).values_list("apprenant_id", "n")
+    )
+    heures = _heures_par_apprenant(cours_id)
+
+    apprenants = []
+    for apprenant_id, nom, prenom, matricule in inscrits:
+        blocs_termines = termines.get(apprenant_id, 0)
+        apprenants.append({
+            "apprenant_id":     apprenant_id,
+            "nom":              nom,
+            "prenom":           prenom,
+            "matricule":        matricule,
+            "blocs_termines":   blocs_termines,
+            "progression_pct":  round(blocs_termines / total_blocs * 100, 1) if total_blocs else 0,
+            "heures_realisees": heures.get(apprenant_id, 0.0),
+        })
+
+    return {"total_blocs": total_blocs, "apprenants": apprenants}
+
+
+def indicateurs_classe(cours_id):
+    """
+    {"total_blocs", "apprenants": [{apprenant_id, nom, prenom, matricule,
+    blocs_termines, progression_pct, heures_realisees}, ...]}
+    """
+    if _timeout() <= 0:
+        return _calculer(cours_id)
+    key = f"{CACHE_PREFIX}:{cours_id}:{_get_version(cours_id)}"
+    data = cache.get(key)
+    if data is None:
+        data = _calculer(cours_id)
+        cache.set(key, data, _timeout())
+    return data
@@ -0,0 +1,127 @@
+# courses/services/progress_batch.py
+"""
+Mise à jour groupée de la progression d'un apprenant (blocs, séquences,
+modules, cours) en une transaction.
+
+- les items sont regroupés par niveau ; seuls les blocs dont l'état change
+  sont écrits, par bulk_create(update_conflicts=True), sur des lignes
+  verrouillées (select_for_update) pour que les bascules ne comptent qu'une fois
+- la cascade passe par le moteur à compteurs (courses.services.progression) :
+  un delta par séquence touchée, remontée uniquement sur bascule
+- un niveau fourni explicitement dans le lot est forcé à la valeur demandée
+"""
+
+from django.db import transaction
+from django.utils import timezone
+
+from courses.models import (
+    BlocContenu, Sequence, Module, Cours,
+    BlocProgress, SequenceProgress, ModuleProgress, CoursProgress,
+)
+from courses.services import indicateurs, progression
+
+
+LEVELS = ("bloc", "sequence", "module", "cours")
+
+# niveau -> (modèle de progression, champ FK, modèle cible)
+LEVEL_CONFIG = {
+    "bloc":     (BlocProgress,     "bloc",     BlocContenu),
+    "sequence": (SequenceProgress, "sequence", Sequence),
+    "module":   (ModuleProgress,   "module",   Module),
+    "cours":    (CoursProgress,    "cours",    Cours),
+}
+
+
+class ProgressBatchError(Exception):
+    def __init__(self, missing):
+        super().__init__("Objets introuvables")
+        self.missing = missing
+
+
+def _upsert_blocs(apprenant_id, wanted):
+    """
+    Écrit les blocs dont l'état change.
+    Retourne (ids écrits, {bloc_id: est_termine} qui modifient les compteurs).
+    """
+    crees = set(wanted) - set(BlocProgress.objects.filter(
+        apprenant_id=apprenant_id, bloc_id__in=list(wanted)
+    ).values_list("bloc_id", flat=True))
+    # Lignes manquantes créées à False puis toutes verrouillées : deux lots
+    # identiques concurrents lisent l'état l'un après l'autre et un seul
+    # applique la bascule aux compteurs
+    if crees:
+        BlocProgress.objects.bulk_create(
+            [BlocProgress(apprenant_id=apprenant_id, bloc_id=oid) for oid in crees],
+            ignore_conflicts=True,
+        )
+    existing = {
+        oid: (done, completed_at)
+        for oid, done, completed_at in BlocProgress.objects.select_for_update().filter(
+            apprenant_id=apprenant_id, bloc_id__in=list(wanted)
+        ).values_list("bloc_id", "est_termine", "completed_at")
+    }
+    written = {oid: done for oid, done in wanted.items() if existing[oid][0] != done}
+    if not written:
+        return sorted(crees), {}
+
+    now = timezone.now()
+    BlocProgress.objects.bulk_create(
+        [
+            BlocProgress(
+                apprenant_id=apprenant_id,
+                bloc_id=oid,
+                est_termine=done,
+                completed_at=(existing[oid][1] or now) if done else None,
+            )
+            for oid, done in written.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["apprenant", "bloc"],
+        update_fields=["est_termine", "completed_at", "updated_at"],
+    )
+    return sorted(crees | set(written)), written
+
+
+@transaction.atomic
+def apply_progress_batch(apprenant_id, items):
+    """
+    items : [{"level", "id", "est_termine"}, ...] (déjà validés).
+    Retourne {niveau: [ids modifiés]} pour tous les niveaux, cascade comprise.
+    Lève ProgressBatchError si des objets n'existent pas.
+    """
+    requested = {level: {} for level in LEVELS}
+    for item in items:
+        requested[item["level"]][item["id"]] = item["est_termine"]  # le dernier l'emporte
+
+    missing = []
+    for level, wanted in requested.items():
+        if not wanted:
+            continue
+        target = LEVEL_CONFIG[level][2]
+        found = set(target.objects.filter(id__in=list(wanted)).values_list("id", flat=True))
+        missing += [{"level": level, "id": oid} for oid in wanted if oid not in found]
+    if missing:
+        raise ProgressBatchError(missing)
+
+    written, bloc_flips = _upsert_blocs(apprenant_id, requested["bloc"]) if requested["bloc"] else ([], {})
+    # bulk_create ne déclenche pas post_save : invalidation explicite
+    indicateurs.invalidate_for_blocs(written)
+    changed = progression.propagate(
+        apprenant_id,
+        deltas={"sequence": progression.sequence_deltas(bloc_flips)},
+        explicit={level: requested[level] for level in progression.LEVELS},
+    )
+    changed["bloc"] = written
+    return changed
+
+
+def changed_rows(apprenant_id, changed):
+    """Lignes de progression modifiées, par niveau (pour réconciliation côté client)."""
+    rows = {}
+    for level in LEVELS:
+        ids = changed.get(level) or []
+        model, fk, _ = LEVEL_CONFIG[level]
+        rows[level] = list(
+            model.objects.filter(apprenant_id=apprenant_id, **{f"{fk}_id__in": ids})
+        ) if ids else []
+    return rows
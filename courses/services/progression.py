@@ -1,85 +1,278 @@
 # courses/services/progression.py
+"""
+Moteur de progression à compteurs (séquence → module → cours).
+
+Chaque ligne SequenceProgress / ModuleProgress / CoursProgress porte :
+  nb_termines : enfants terminés (blocs comptés / séquences / modules)
+  nb_total    : nombre d'enfants
+  est_termine : nb_total == 0 ou nb_termines >= nb_total (sauf forçage explicite)
+
+Règle unique des blocs comptés : visibles ET obligatoires (BLOCS_COMPTES).
+
+Deux chemins :
+- incrémental (propagate) : un apprenant bascule des blocs → deltas F() sur
+  les séquences ; on ne remonte d'un niveau que si l'état terminé bascule
+- structurel (resync) : bloc ajouté / masqué / rendu optionnel, séquence ou
+  module ajouté / supprimé → un recomptage ensembliste (UPDATE … SUBQUERY)
+  pour tous les apprenants concernés, puis remontée des bascules
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+
 from courses.models import (
-    BlocContenu, BlocProgress,
-    SequenceProgress, ModuleProgress, CoursProgress,
+    BlocContenu, Sequence, Module, Cours,
+    SequenceProgress, ModuleProgress, CoursProgress, BlocProgress,
 )
 
-def _required_blocs_qs(sequence):
-    # Ajuste ici la règle métier : obligatoires + visibles
-    return BlocContenu.objects.filter(
-        sequence=sequence,
-        est_visible=True,
-        est_obligatoire=True,
+
+LEVELS = ("sequence", "module", "cours")
+
+BLOCS_COMPTES = Q(est_visible=True, est_obligatoire=True)
+
+# niveau -> (modèle de progression, champ FK, modèle cible, champ parent, niveau parent)
+LEVEL_CONFIG = {
+    "sequence": (SequenceProgress, "sequence", Sequence, "module_id", "module"),
+    "module":   (ModuleProgress,   "module",   Module,   "cours_id",  "cours"),
+    "cours":    (CoursProgress,    "cours",    Cours,    None,        None),
+}
+
+
+def _children_total(level):
+    """(queryset des enfants, chemin vers l'id du niveau)"""
+    if level == "sequence":
+        return BlocContenu.objects.filter(BLOCS_COMPTES), "sequence_id"
+    if level == "module":
+        return Sequence.objects.all(), "module_id"
+    return Module.objects.all(), "cours_id"
+
+
+def _children_done(level):
+    """(queryset des progressions enfants terminées, chemin vers l'id du niveau)"""
+    if level == "sequence":
+        return BlocProgress.objects.filter(
+            est_termine=True, bloc__est_visible=True, bloc__est_obligatoire=True
+        ), "bloc__sequence_id"
+    if level == "module":
+        return SequenceProgress.objects.filter(est_termine=True), "sequence__module_id"
+    return ModuleProgress.objects.filter(est_termine=True), "module__cours_id"
+
+
+def _is_complete(done, total):
+    return total == 0 or done >= total
+
+
+def _count_subquery(qs, path, **outer):
+    return Coalesce(
+        Subquery(
+            qs.filter(**outer).order_by().values(path).annotate(n=Count("id")).values("n"),
+            output_field=IntegerField(),
+        ),
+        Value(0),
     )
 
-def recompute_sequence(apprenant, sequence):
-    required_blocs = _required_blocs_qs(sequence)
-    total = required_blocs.count()
-
-    if total == 0:
-        # si pas de blocs requis => on peut considérer terminé ou non, à toi de décider
-        est_termine = True
-    else:
-        done = BlocProgress.objects.filter(
-            apprenant=apprenant,
-            bloc__in=required_blocs,
-            est_termine=True
-        ).count()
-        est_termine = (done == total)
-
-    sp, _ = SequenceProgress.objects.get_or_create(apprenant=apprenant, sequence=sequence)
-    sp.est_termine = est_termine
-    sp.completed_at = timezone.now() if est_termine else None
-    sp.save(update_fields=["est_termine", "completed_at", "updated_at"])
-
-    return sp.est_termine
-
-def recompute_module(apprenant, module):
-    sequences = module.sequences.all()
-    total = sequences.count()
-    if total == 0:
-        est_termine = True
-    else:
-        done = SequenceProgress.objects.filter(
-            apprenant=apprenant,
-            sequence__in=sequences,
-            est_termine=True
-        ).count()
-        est_termine = (done == total)
-
-    mp, _ = ModuleProgress.objects.get_or_create(apprenant=apprenant, module=module)
-    mp.est_termine = est_termine
-    mp.completed_at = timezone.now() if est_termine else None
-    mp.save(update_fields=["est_termine", "completed_at", "updated_at"])
-
-    return mp.est_termine
-
-def recompute_cours(apprenant, cours):
-    modules = cours.modules.all()
-    total = modules.count()
-    if total == 0:
-        est_termine = True
-    else:
-        done = ModuleProgress.objects.filter(
-            apprenant=apprenant,
-            module__in=modules,
-            est_termine=True
-        ).count()
-        est_termine = (done == total)
-
-    cp, _ = CoursProgress.objects.get_or_create(apprenant=apprenant, cours=cours)
-    cp.est_termine = est_termine
-    cp.completed_at = timezone.now() if est_termine else None
-    cp.save(update_fields=["est_termine", "completed_at", "updated_at"])
-
-    return cp.est_termine
 
-def recompute_all_from_bloc(apprenant, bloc):
-    sequence = bloc.sequence
-    module = sequence.module
-    cours = module.cours
+def _parents(level, ids):
+    _, _, target, parent_field, _ = LEVEL_CONFIG[level]
+    if not parent_field or not ids:
+        return {}
+    return dict(target.objects.filter(id__in=ids).values_list("id", parent_field))
+
+
+def _init_rows(level, apprenant_id, ids):
+    """Crée les lignes manquantes d'un apprenant avec des compteurs exacts (est_termine=False)."""
+    model, fk, _, _, _ = LEVEL_CONFIG[level]
+    total_qs, total_path = _children_total(level)
+    done_qs, done_path = _children_done(level)
+    totals = dict(
+        total_qs.filter(**{f"{total_path}__in": ids})
+        .values(total_path).annotate(n=Count("id")).values_list(total_path, "n")
+    )
+    done = dict(
+        done_qs.filter(apprenant_id=apprenant_id, **{f"{done_path}__in": ids})
+        .values(done_path).annotate(n=Count("id")).values_list(done_path, "n")
+    )
+    model.objects.bulk_create(
+        [
+            model(
+                apprenant_id=apprenant_id,
+                nb_termines=done.get(oid, 0),
+                nb_total=totals.get(oid, 0),
+                **{f"{fk}_id": oid},
+            )
+            for oid in ids
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def _write_flags(model, flips, now):
+    """flips : {pk: bool}"""
+    on = [pk for pk, done in flips.items() if done]
+    off = [pk for pk, done in flips.items() if not done]
+    if on:
+        model.objects.filter(pk__in=on).update(
+            est_termine=True, completed_at=Coalesce(F("completed_at"), Value(now)), updated_at=now
+        )
+    if off:
+        model.objects.filter(pk__in=off).update(est_termine=False, completed_at=None, updated_at=now)
+
+
+# ============================================================================
+# CHEMIN INCRÉMENTAL (un apprenant)
+# ============================================================================
+
+def sequence_deltas(bloc_flips):
+    """
+    {bloc_id: est_termine} (blocs dont l'état a changé) → {sequence_id: delta}.
+    Les blocs non comptés (masqués / optionnels) sont ignorés.
+    """
+    if not bloc_flips:
+        return {}
+    deltas = defaultdict(int)
+    for bloc_id, sequence_id in BlocContenu.objects.filter(
+        BLOCS_COMPTES, id__in=list(bloc_flips)
+    ).values_list("id", "sequence_id"):
+        deltas[sequence_id] += 1 if bloc_flips[bloc_id] else -1
+    return dict(deltas)
+
 
-    recompute_sequence(apprenant, sequence)
-    recompute_module(apprenant, module)
-    recompute_cours(apprenant, cours)
+@transaction.atomic
+def propagate(apprenant_id, deltas=None, explicit=None):
+    """
+    deltas   : {"sequence": {sequence_id: ±n}} issus des blocs basculés
+    explicit : {"sequence"|"module"|"cours": {id: bool}} états forcés
+
+    Retourne {niveau: [ids dont l'état terminé a basculé]}.
+    """
+    explicit = explicit or {}
+    pending = dict((deltas or {}).get("sequence", {}))
+    changed = {}
+    now = timezone.now()
+
+    for level in LEVELS:
+        model, fk, _, _, parent_level = LEVEL_CONFIG[level]
+        forced = explicit.get(level, {})
+        pending = {oid: d for oid, d in pending.items() if d}
+        ids = set(pending) | set(forced)
+        changed[level] = []
+        if not ids:
+            pending = {}
+            continue
+
+        qs = model.objects.filter(apprenant_id=apprenant_id)
+
+        by_delta = defaultdict(list)
+        for oid, d in pending.items():
+            by_delta[d].append(oid)
+        for d, oids in by_delta.items():
+            qs.filter(**{f"{fk}_id__in": oids}).update(nb_termines=F("nb_termines") + d, updated_at=now)
+
+        fields = ("pk", f"{fk}_id", "nb_termines", "nb_total", "est_termine")
+        rows = list(qs.filter(**{f"{fk}_id__in": ids}).values_list(*fields))
+        missing = ids - {row[1] for row in rows}
+        if missing:
+            # Ligne absente : compteurs recalculés depuis la vérité (delta déjà inclus)
+            _init_rows(level, apprenant_id, missing)
+            rows += list(qs.filter(**{f"{fk}_id__in": missing}).values_list(*fields))
+
+        flips = {}
+        for pk, oid, done, total, est_termine in rows:
+            target = forced[oid] if oid in forced else _is_complete(done, total)
+            if target != est_termine:
+                flips[pk] = target
+                changed[level].append(oid)
+        _write_flags(model, flips, now)
+
+        if not parent_level:
+            break
+        state = {oid: flips[pk] for pk, oid, *_ in rows if pk in flips}
+        parents = _parents(level, list(state))
+        pending = defaultdict(int)
+        for oid, done in state.items():
+            if parents.get(oid):
+                pending[parents[oid]] += 1 if done else -1
+
+    return changed
+
+
+def on_blocs_changed(apprenant_id, bloc_flips):
+    """Point d'entrée après écriture de BlocProgress : {bloc_id: est_termine}."""
+    return propagate(apprenant_id, deltas={"sequence": sequence_deltas(bloc_flips)})
+
+
+# ============================================================================
+# CHEMIN STRUCTUREL (ensembliste, tous apprenants)
+# ============================================================================
+
+@transaction.atomic
+def resync(level, ids, apprenant_ids=None):
+    """
+    Recompte nb_termines / nb_total des lignes du niveau pour les ids donnés
+    (tous apprenants, ou apprenant_ids), resynchronise est_termine et remonte
+    aux parents des lignes qui ont basculé.
+    """
+    ids = [oid for oid in set(ids) if oid]
+    if not ids:
+        return
+    model, fk, _, _, parent_level = LEVEL_CONFIG[level]
+    now = timezone.now()
+
+    if apprenant_ids:
+        for apprenant_id in apprenant_ids:
+            existing = set(model.objects.filter(
+                apprenant_id=apprenant_id, **{f"{fk}_id__in": ids}
+            ).values_list(f"{fk}_id", flat=True))
+            if set(ids) - existing:
+                _init_rows(level, apprenant_id, set(ids) - existing)
+
+    rows = model.objects.filter(**{f"{fk}_id__in": ids})
+    if apprenant_ids:
+        rows = rows.filter(apprenant_id__in=apprenant_ids)
+
+    total_qs, total_path = _children_total(level)
+    done_qs, done_path = _children_done(level)
+    rows.update(
+        nb_total=_count_subquery(total_qs, total_path, **{total_path: OuterRef(f"{fk}_id")}),
+        nb_termines=_count_subquery(
+            done_qs, done_path,
+            apprenant_id=OuterRef("apprenant_id"), **{done_path: OuterRef(f"{fk}_id")},
+        ),
+    )
+
+    complete = Q(nb_total=0) | Q(nb_termines__gte=F("nb_total"))
+    flips = {}
+    for pk, apprenant_id, oid in rows.filter(complete, est_termine=False).values_list("pk", "apprenant_id", f"{fk}_id"):
+        flips[pk] = (True, apprenant_id, oid)
+    for pk, apprenant_id, oid in rows.filter(~complete, est_termine=True).values_list("pk", "apprenant_id", f"{fk}_id"):
+        flips[pk] = (False, apprenant_id, oid)
+    _write_flags(model, {pk: v[0] for pk, v in flips.items()}, now)
+
+    if parent_level and flips:
+        parents = _parents(level, list({v[2] for v in flips.values()}))
+        resync(
+            parent_level,
+            [parents.get(v[2]) for v in flips.values()],
+            apprenant_ids=None if not apprenant_ids else apprenant_ids,
+        )
+
+
+def resync_sequences(sequence_ids, apprenant_ids=None):
+    resync("sequence", sequence_ids, apprenant_ids)
+
+
+def resync_modules(module_ids, apprenant_ids=None):
+    resync("module", module_ids, apprenant_ids)
+
+
+def resync_cours(cours_ids, apprenant_ids=None):
+    resync("cours", cours_ids, apprenant_ids)
+
+
+def recompute_all_from_bloc(apprenant, bloc):
+    """Compatibilité : recalcul complet de la chaîne d'un bloc pour un apprenant."""
+    resync_sequences([bloc.sequence_id], apprenant_ids=[apprenant.id])
@@ -0,0 +1,65 @@
+# courses/services/rapports.py
+"""
+Lignes des rapports d'un cours (exports asynchrones, voir export_jobs.py).
+
+- progression : une ligne par apprenant inscrit, depuis les indicateurs de
+  classe (services/indicateurs.py, en cache)
+- présences   : une ligne par participation aux sessions du cours, lue par
+  paquets (.iterator)
+"""
+
+from django.conf import settings
+
+from courses.models import Participation
+from courses.services import indicateurs
+
+
+ENTETES_PROGRESSION = [
+    "cours_id", "cours", "apprenant_id", "nom", "prenom", "matricule",
+    "blocs_termines", "total_blocs", "progression_pct", "heures_realisees",
+]
+ENTETES_PRESENCES = [
+    "cours_id", "cours", "session_id", "session", "date_debut", "date_fin",
+    "apprenant_id", "nom", "prenom", "email", "statut", "source",
+]
+
+
+def _chunk_size():
+    return getattr(settings, "EXPORT_CHUNK_SIZE", 2000)
+
+
+def lignes_progression(cours):
+    data = indicateurs.indicateurs_classe(cours.id)
+    for a in data["apprenants"]:
+        yield [
+            cours.id, cours.titre, a["apprenant_id"], a["nom"] or "", a["prenom"] or "",
+            a["matricule"] or "", a["blocs_termines"], data["total_blocs"],
+            a["progression_pct"], a["heures_realisees"],
+        ]
+
+
+def nb_lignes_progression(cours):
+    return len(indicateurs.indicateurs_classe(cours.id)["apprenants"])
+
+
+def _participations(cours):
+    return Participation.objects.filter(session__cours=cours)
+
+
+def lignes_presences(cours):
+    participations = (
+        _participations(cours)
+        .select_related("session", "apprenant")
+        .order_by("session__date_debut", "session_id", "apprenant__nom", "apprenant__prenom")
+    )
+    for p in participations.iterator(chunk_size=_chunk_size()):
+        yield [
+            cours.id, cours.titre, p.session_id, p.session.titre,
+            p.session.date_debut, p.session.date_fin,
+            p.apprenant_id, p.apprenant.nom or "", p.apprenant.prenom or "", p.apprenant.email or "",
+            p.statut, p.source,
+        ]
+
+
+def nb_lignes_presences(cours):
+    return _participations(cours).count()
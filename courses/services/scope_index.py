@@ -0,0 +1,118 @@
+# courses/services/scope_index.py
+"""
+Index de périmètre (institution / année scolaire) des modèles courses.
+
+Remplace les sondes exécutées à chaque requête par _apply_context_filter :
+- les chemins de champs (institution_id, sequence__institution_id…) sont
+  résolus une seule fois au démarrage (CoursesConfig.ready)
+- la réponse à « ce modèle a-t-il des lignes rattachées ? » est gardée en
+  cache et mise à jour par les hooks save() d'héritage (Module, Sequence…)
+  au lieu d'un qs.filter(institution_id__isnull=False).exists() par appel
+
+Une valeur True est définitive (une ligne rattachée ne redevient pas
+orpheline) ; une valeur False est revérifiée après SCOPE_INDEX_FALSE_TIMEOUT
+secondes pour rattraper les insertions faites sans save() (bulk_create…).
+"""
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+
+
+SCOPE_FIELDS = ("institution", "annee_scolaire")
+CACHE_PREFIX = "scope_index"
+
+# modèle -> {"institution": "institution_id", "annee_scolaire": "annee_scolaire_id"}
+_SCOPE_PATHS = {}
+# (label_modèle, champ) -> True, copie locale des valeurs définitives
+_SCOPED = {}
+
+
+def _false_timeout():
+    return getattr(settings, "SCOPE_INDEX_FALSE_TIMEOUT", 60)
+
+
+def _resolve_paths(model):
+    field_names = {f.name for f in model._meta.get_fields()}
+    return {
+        field: f"{field}_id"
+        for field in SCOPE_FIELDS
+        if field in field_names
+    }
+
+
+def register_scope_paths(app_label="courses"):
+    """
+    Résout les chemins de périmètre de tous les modèles d'une application.
+    Appelé une fois depuis AppConfig.ready().
+    """
+    for model in apps.get_app_config(app_label).get_models():
+        _SCOPE_PATHS[model] = _resolve_paths(model)
+
+
+def scope_path(model, field):
+    """
+    Retourne le nom de colonne (ex. "institution_id") si le modèle porte
+    directement le champ de périmètre, sinon None.
+    """
+    paths = _SCOPE_PATHS.get(model)
+    if paths is None:
+        paths = _SCOPE_PATHS[model] = _resolve_paths(model)
+    return paths.get(field)
+
+
+# ============================================================================
+# INDEX « LIGNES RATTACHÉES »
+# ============================================================================
+
+def _cache_key(model, field):
+    return f"{CACHE_PREFIX}:{model._meta.label_lower}:{field}"
+
+
+def has_scoped_rows(model, field):
+    """
+    Indique si au moins une ligne du modèle a le champ de périmètre renseigné.
+    Sans requête SQL tant que l'index est en cache.
+    """
+    local_key = (model._meta.label_lower, field)
+    if _SCOPED.get(local_key):
+        return True
+
+    key = _cache_key(model, field)
+    value = cache.get(key)
+    if value is None:
+        column = scope_path(model, field)
+        value = bool(column) and model._default_manager.filter(
+            **{f"{column}__isnull": False}
+        ).exists()
+        cache.set(key, value, None if value else _false_timeout())
+
+    if value:
+        _SCOPED[local_key] = True
+    return value
+
+
+def mark_scoped(model, **values):
+    """
+    Enregistre qu'une ligne rattachée existe pour les champs donnés
+    (ex. mark_scoped(Module, institution=5, annee_scolaire=None)).
+    Appelé par les hooks save() d'héritage.
+    """
+    for field, value in values.items():
+        if value is None:
+            continue
+        local_key = (model._meta.label_lower, field)
+        if _SCOPED.get(local_key):
+            continue
+        _SCOPED[local_key] = True
+        cache.set(_cache_key(model, field), True, None)
+
+
+def mark_instance_scoped(instance):
+    model = type(instance)
+    values = {}
+    for field in SCOPE_FIELDS:
+        column = scope_path(model, field)
+        if column:
+            values[field] = getattr(instance, column)
+    mark_scoped(model, **values)
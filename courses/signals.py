@@ -1,8 +1,15 @@
 # courses/signals.py
 
-from django.db.models.signals import post_save
+import threading
+
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.db.models import Sum
 from django.dispatch import receiver
-from .models import Cours, InscriptionCours
+from core.scope_context import invalidate_user_scope
+from courses.services import indicateurs, progression
+from courses.services.scope_index import mark_scoped
+from .models import DUREE_SESSION, BlocContenu, BlocProgress, Cours, InscriptionCours, Module, Sequence, Session, duree_en_minutes
 
 
 @receiver(post_save, sender=Cours)
@@ -50,6 +57,13 @@ def inscrire_apprenants_groupe(sender, instance, created, **kwargs):
         ],
         ignore_conflicts=True
     )
+    # bulk_create ne passe pas par InscriptionCours.save() ni post_save
+    invalidate_user_scope(*apprenants_ids)
+    mark_scoped(
+        InscriptionCours,
+        institution=instance.institution_id,
+        annee_scolaire=instance.annee_scolaire_id,
+    )
 
 
 @receiver(post_save, sender='academics.Inscription')
@@ -91,4 +105,176 @@ def inscrire_apprenant_aux_cours_de_la_classe(sender, instance, created, **kwarg
             for cours_id, institution_id, annee_scolaire_id in cours_ids
         ],
         ignore_conflicts=True
-    )
\ No newline at end of file
+    )
+    mark_scoped(
+        InscriptionCours,
+        institution=next((i for _, i, _ in cours_ids if i), None),
+        annee_scolaire=next((a for _, _, a in cours_ids if a), None),
+    )
+
+
+@receiver(post_save, sender=InscriptionCours)
+@receiver(post_delete, sender=InscriptionCours)
+@receiver(post_save, sender='academics.Inscription')
+@receiver(post_delete, sender='academics.Inscription')
+def invalider_contexte_apprenant(sender, instance, **kwargs):
+    """
+    Une inscription modifie l'institution/année forcées de l'apprenant
+    ainsi que sa classe/son groupe : on invalide son contexte en cache.
+    """
+    invalidate_user_scope(instance.apprenant_id)
+
+
+# ============================================================================
+# MINUTES RÉALISÉES (colonne dénormalisée Cours.minutes_realises)
+# ============================================================================
+
+def rafraichir_minutes_realises(*cours_ids):
+    """Recalcule Cours.minutes_realises par agrégat SQL (sans passer par save())."""
+    for cours_id in {c for c in cours_ids if c}:
+        duree = Session.objects.filter(cours_id=cours_id).aggregate(
+            total=Sum(DUREE_SESSION)
+        )['total']
+        Cours.objects.filter(pk=cours_id).update(minutes_realises=duree_en_minutes(duree))
+
+
+@receiver(post_init, sender=Session)
+def memoriser_cours_session(sender, instance, **kwargs):
+    # Permet de recalculer aussi l'ancien cours si la session change de cours
+    instance._cours_id_initial = instance.__dict__.get('cours_id')
+
+
+@receiver(post_save, sender=Session)
+@receiver(post_delete, sender=Session)
+def maj_minutes_realises_cours(sender, instance, **kwargs):
+    rafraichir_minutes_realises(instance.cours_id, getattr(instance, '_cours_id_initial', None))
+    instance._cours_id_initial = instance.cours_id
+
+
+# ============================================================================
+# PROGRESSION : changements de structure → recomptage ensembliste
+# ============================================================================
+# Un bloc ajouté / supprimé / masqué / rendu optionnel modifie nb_total des
+# séquences ; une séquence ou un module ajouté / supprimé / déplacé modifie
+# celui du niveau parent. Recomptage une fois, après commit, pour tous les
+# apprenants ayant une progression (voir courses.services.progression).
+
+_lots = threading.local()
+
+
+def _apres_commit(action, ids):
+    """
+    Regroupe les ids par action et par transaction : un seul on_commit
+    action(ids) quel que soit le nombre de lignes touchées (suppression en
+    cascade cours → modules → séquences → blocs).
+    """
+    ids = {i for i in ids if i}
+    if not ids:
+        return
+    if not connection.in_atomic_block:
+        action(ids)
+        return
+    lots = getattr(_lots, "en_attente", None)
+    if lots is None:
+        lots = _lots.en_attente = {}
+    lot = lots.get(action)
+    # Lot encore enregistré ? (retiré après exécution, ou par un rollback)
+    if lot is None or not any(f is lot["rappel"] for _, f, *_ in connection.run_on_commit):
+        lot = {"ids": set()}
+
+        def rappel(lot=lot):
+            if lots.get(action) is lot:
+                del lots[action]
+            action(lot["ids"])
+
+        lot["rappel"] = rappel
+        lots[action] = lot
+        transaction.on_commit(rappel)
+    lot["ids"] |= ids
+
+
+def _cle_bloc(bloc):
+    # via __dict__ : ne déclenche pas de requête sur les champs différés (only())
+    champs = bloc.__dict__
+    compte = bool(champs.get('est_visible') and champs.get('est_obligatoire'))
+    return champs.get('sequence_id'), compte
+
+
+@receiver(post_init, sender=BlocContenu)
+def memoriser_structure_bloc(sender, instance, **kwargs):
+    instance._cle_progression = _cle_bloc(instance)
+
+
+@receiver(post_save, sender=BlocContenu)
+@receiver(post_delete, sender=BlocContenu)
+def resync_progression_bloc(sender, instance, signal, created=False, **kwargs):
+    avant = (None, False) if created else getattr(instance, '_cle_progression', (None, False))
+    apres = (None, False) if signal is post_delete else _cle_bloc(instance)
+    instance._cle_progression = apres
+    if avant == apres:
+        return
+    _apres_commit(progression.resync_sequences, {seq for seq, compte in (avant, apres) if compte})
+
+
+@receiver(post_init, sender=Sequence)
+def memoriser_module_sequence(sender, instance, **kwargs):
+    instance._module_id_initial = instance.__dict__.get('module_id')
+
+
+@receiver(post_save, sender=Sequence)
+@receiver(post_delete, sender=Sequence)
+def resync_progression_sequence(sender, instance, signal, created=False, **kwargs):
+    avant = None if created else getattr(instance, '_module_id_initial', None)
+    apres = None if signal is post_delete else instance.module_id
+    instance._module_id_initial = instance.module_id
+    if avant == apres:
+        return
+    _apres_commit(progression.resync_modules, (avant, apres))
+
+
+@receiver(post_init, sender=Module)
+def memoriser_cours_module(sender, instance, **kwargs):
+    instance._cours_id_initial = instance.__dict__.get('cours_id')
+
+
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+def resync_progression_module(sender, instance, signal, created=False, **kwargs):
+    avant = None if created else getattr(instance, '_cours_id_initial', None)
+    apres = None if signal is post_delete else instance.cours_id
+    instance._cours_id_initial = instance.cours_id
+    if avant == apres:
+        return
+    _apres_commit(progression.resync_cours, (avant, apres))
+
+
+# ============================================================================
+# INDICATEURS DE CLASSE (cache par cours, voir courses.services.indicateurs)
+# ============================================================================
+
+@receiver(post_save, sender=BlocProgress)
+@receiver(post_delete, sender=BlocProgress)
+@receiver(post_save, sender='analytics.BlocAnalyticsSummary')
+@receiver(post_delete, sender='analytics.BlocAnalyticsSummary')
+def invalider_indicateurs_bloc(sender, instance, **kwargs):
+    indicateurs.invalidate_for_blocs([instance.bloc_id])
+
+
+@receiver(post_save, sender=BlocContenu)
+@receiver(post_delete, sender=BlocContenu)
+def invalider_indicateurs_structure(sender, instance, **kwargs):
+    # Le total des blocs visibles du cours peut changer ; cours résolus en
+    # une requête après commit pour toutes les séquences touchées
+    _apres_commit(_invalider_indicateurs_sequences, [instance.sequence_id])
+
+
+def _invalider_indicateurs_sequences(sequence_ids):
+    indicateurs.invalidate_cours_indicateurs(*Sequence.objects.filter(
+        pk__in=sequence_ids
+    ).values_list('module__cours_id', flat=True).distinct())
+
+
+@receiver(post_save, sender=InscriptionCours)
+@receiver(post_delete, sender=InscriptionCours)
+def invalider_indicateurs_inscription(sender, instance, **kwargs):
+    indicateurs.invalidate_cours_indicateurs(instance.cours_id)
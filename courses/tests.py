@@ -1,3 +1,536 @@
-from django.test import TestCase
+import hashlib
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from academics.models import AnneeScolaire, Classe, Groupe, Institution, Matiere
+from core import scope_context
+from core.file_delivery import is_first_range, serve_file
+from locations.models import Pays
+from users.models import Apprenant, Formateur, UserRole
+
+from .models import (
+    BlocContenu, BlocProgress, ChunkedUpload, Cours, CoursProgress, ExportJob, InscriptionCours,
+    Module, ModuleProgress, Sequence, SequenceProgress,
+)
+from .pagination import InvalidCursor, paginate_keyset
+from .services import chunked_upload, export_jobs, indicateurs, progress_batch, progression
+from .utils import _load_user_scope, get_user_context
+
+
+def creer_cours(nb_sequences=2, nb_blocs=2, nb_apprenants=1):
+    """Institution, formateur, apprenants inscrits et cours (1 module, n séquences, n blocs)."""
+    pays = Pays.objects.create(code="SN", nom="Sénégal")
+    institution = Institution.objects.create(nom="Institution", pays=pays)
+    annee = AnneeScolaire.objects.create(institution=institution, annee_format_classique="2025-2026")
+    roles = {n: UserRole.objects.get_or_create(name=n)[0] for n in ("Formateur", "Apprenant")}
+    classe = Classe.objects.create(nom="C1", institution=institution, annee_scolaire=annee)
+    groupe = Groupe.objects.create(nom="G1", institution=institution, annee_scolaire=annee, classe=classe)
+    matiere = Matiere.objects.create(nom="Maths", institution=institution)
+    commun = dict(nom="N", prenom="P", institution=institution, annee_scolaire_active=annee)
+    formateur = Formateur.objects.create(email="f@test.sn", role=roles["Formateur"], **commun)
+    apprenants = [
+        Apprenant.objects.create(email=f"a{i}@test.sn", role=roles["Apprenant"], **commun)
+        for i in range(nb_apprenants)
+    ]
+    cours = Cours.objects.create(
+        titre="Cours", groupe=groupe, enseignant=formateur, matiere=matiere,
+        institution=institution, annee_scolaire=annee,
+    )
+    for apprenant in apprenants:
+        InscriptionCours.objects.get_or_create(apprenant=apprenant, cours=cours)
+    module = Module.objects.create(titre="M", cours=cours)
+    sequences = []
+    for s in range(nb_sequences):
+        sequence = Sequence.objects.create(titre=f"S{s}", module=module)
+        for b in range(nb_blocs):
+            BlocContenu.objects.create(sequence=sequence, titre=f"B{s}{b}", type_bloc="texte", ordre=b)
+        sequences.append(sequence)
+    return cours, module, sequences, apprenants
+
+
+# ============================================================================
+# CONTEXTE DE PÉRIMÈTRE (par requête / par utilisateur)
+# ============================================================================
+
+class ContextePerimetreTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.cours, _, _, (self.apprenant,) = creer_cours(nb_sequences=0)
+
+    def contexte(self):
+        request = Request(APIRequestFactory().get("/"))
+        request.user = self.apprenant
+        return request, get_user_context(request)
+
+    def test_calcule_une_fois_par_requete(self):
+        request, ctx = self.contexte()
+        self.assertEqual(ctx["role_name"], "Apprenant")
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_context(request), ctx)
+
+    def test_sans_cache_partage_recalcule_a_chaque_requete(self):
+        with mock.patch("courses.utils._load_user_scope", wraps=_load_user_scope) as charger:
+            self.contexte()
+            self.contexte()
+        self.assertEqual(charger.call_count, 2)
+
+    @override_settings(SCOPE_CONTEXT_CACHE_TIMEOUT=300)
+    def test_cache_invalide_apres_commit(self):
+        with mock.patch("courses.utils._load_user_scope", wraps=_load_user_scope) as charger:
+            self.contexte()
+            self.contexte()
+        self.assertEqual(charger.call_count, 1)
+
+        version = scope_context.get_scope_version(self.apprenant.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            InscriptionCours.objects.get(apprenant=self.apprenant).save()
+            # Avant commit, une requête concurrente relirait l'ancien périmètre
+            self.assertEqual(scope_context.get_scope_version(self.apprenant.pk), version)
+        self.assertNotEqual(scope_context.get_scope_version(self.apprenant.pk), version)
+
+
+# ============================================================================
+# MOTEUR DE PROGRESSION (propagate / resync)
+# ============================================================================
+
+class ProgressionTests(TestCase):
+
+    def setUp(self):
+        # Resync structurels regroupés par transaction : exécutés comme au commit
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cours, self.module, self.sequences, (self.apprenant,) = creer_cours()
+
+    def terminer(self, sequence):
+        flips = {}
+        for bloc in sequence.blocs_contenu.all():
+            BlocProgress.objects.update_or_create(apprenant=self.apprenant, bloc=bloc, defaults={"est_termine": True})
+            flips[bloc.id] = True
+        return progression.on_blocs_changed(self.apprenant.id, flips)
+
+    def etat(self, model, **filtre):
+        return model.objects.filter(apprenant=self.apprenant, **filtre).values_list(
+            "nb_termines", "nb_total", "est_termine"
+        ).get()
+
+    def test_propagate_remonte_seulement_les_bascules(self):
+        premiere, seconde = self.sequences
+
+        changed = self.terminer(premiere)
+        self.assertEqual(changed, {"sequence": [premiere.id], "module": [], "cours": []})
+        self.assertEqual(self.etat(SequenceProgress, sequence=premiere), (2, 2, True))
+        self.assertEqual(self.etat(ModuleProgress, module=self.module), (1, 2, False))
+
+        changed = self.terminer(seconde)
+        self.assertEqual(changed, {"sequence": [seconde.id], "module": [self.module.id], "cours": [self.cours.id]})
+        self.assertEqual(self.etat(ModuleProgress, module=self.module), (2, 2, True))
+        self.assertEqual(self.etat(CoursProgress, cours=self.cours), (1, 1, True))
+
+    def test_propagate_bloc_non_compte_ignore(self):
+        premiere = self.sequences[0]
+        optionnel = BlocContenu.objects.create(sequence=premiere, titre="opt", type_bloc="texte",
+                                               ordre=9, est_obligatoire=False)
+        self.assertEqual(progression.sequence_deltas({optionnel.id: True}), {})
+
+    def test_propagate_decompte_un_bloc_rouvert(self):
+        premiere = self.sequences[0]
+        self.terminer(premiere)
+        bloc = premiere.blocs_contenu.first()
+        BlocProgress.objects.filter(apprenant=self.apprenant, bloc=bloc).update(est_termine=False)
+
+        changed = progression.on_blocs_changed(self.apprenant.id, {bloc.id: False})
+        self.assertEqual(changed["sequence"], [premiere.id])
+        self.assertEqual(self.etat(SequenceProgress, sequence=premiere), (1, 2, False))
+
+    def test_resync_apres_ajout_ou_masquage_de_bloc(self):
+        for sequence in self.sequences:
+            self.terminer(sequence)
+        seconde = self.sequences[1]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            nouveau = BlocContenu.objects.create(sequence=seconde, titre="nouveau", type_bloc="texte", ordre=5)
+        self.assertEqual(self.etat(SequenceProgress, sequence=seconde), (2, 3, False))
+        self.assertEqual(self.etat(ModuleProgress, module=self.module), (1, 2, False))
+        self.assertEqual(self.etat(CoursProgress, cours=self.cours), (0, 1, False))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            nouveau.est_visible = False
+            nouveau.save()
+        self.assertEqual(self.etat(SequenceProgress, sequence=seconde), (2, 2, True))
+        self.assertEqual(self.etat(CoursProgress, cours=self.cours), (1, 1, True))
+
+    def test_resync_recompte_depuis_la_verite(self):
+        premiere = self.sequences[0]
+        self.terminer(premiere)
+        # Compteurs faussés : le recomptage ensembliste les corrige
+        SequenceProgress.objects.filter(apprenant=self.apprenant).update(nb_termines=0, nb_total=7)
+
+        progression.resync_sequences([premiere.id])
+        self.assertEqual(self.etat(SequenceProgress, sequence=premiere), (2, 2, True))
+
+    def basculer(self, bloc, est_termine):
+        client = APIClient()
+        client.force_authenticate(self.apprenant)
+        reponse = client.put(f"/api/progress/blocs/{bloc.id}/", {"est_termine": est_termine}, format="json")
+        self.assertEqual(reponse.status_code, 200)
+
+    def test_bascule_repetee_comptee_une_fois(self):
+        premiere = self.sequences[0]
+        bloc = premiere.blocs_contenu.first()
+        for est_termine in (True, True, False, False):
+            self.basculer(bloc, est_termine)
+        self.assertEqual(self.etat(SequenceProgress, sequence=premiere), (0, 2, False))
+
+    def test_bascule_concurrente_lue_perimee(self):
+        premiere = self.sequences[0]
+        bloc = premiere.blocs_contenu.first()
+        self.basculer(bloc, True)
+        # Seconde requête identique qui a lu la ligne avant la première écriture
+        perime = BlocProgress.objects.get(apprenant=self.apprenant, bloc=bloc)
+        perime.est_termine = False
+        with mock.patch.object(BlocProgress.objects, "get_or_create", return_value=(perime, False)):
+            self.basculer(bloc, True)
+        self.assertEqual(self.etat(SequenceProgress, sequence=premiere), (1, 2, False))
+
+    def test_lot_rejoue_compte_une_fois(self):
+        premiere = self.sequences[0]
+        items = [{"level": "bloc", "id": bloc.id, "est_termine": True} for bloc in premiere.blocs_contenu.all()]
+        changed = progress_batch.apply_progress_batch(self.apprenant.id, items)
+        self.assertEqual(changed["sequence"], [premiere.id])
+        changed = progress_batch.apply_progress_batch(self.apprenant.id, items)
+        self.assertEqual((changed["bloc"], changed["sequence"]), ([], []))
+        self.assertEqual(self.etat(SequenceProgress, sequence=premiere), (2, 2, True))
+
+        rouvert = [dict(items[0], est_termine=False)] * 2
+        progress_batch.apply_progress_batch(self.apprenant.id, rouvert)
+        progress_batch.apply_progress_batch(self.apprenant.id, rouvert)
+        self.assertEqual(self.etat(SequenceProgress, sequence=premiere), (1, 2, False))
+
+
+# ============================================================================
+# PAGINATION PAR CURSEUR (KEYSET)
+# ============================================================================
+
+class PaginationKeysetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cours, _, sequences, (apprenant,) = creer_cours(nb_sequences=1, nb_blocs=7)
+        cls.apprenant = apprenant
+        for bloc in sequences[0].blocs_contenu.all():
+            BlocProgress.objects.create(apprenant=apprenant, bloc=bloc)
+
+    def page(self, **params):
+        request = Request(APIRequestFactory().get("/", params))
+        return paginate_keyset(BlocProgress.objects.filter(apprenant=self.apprenant), request)
+
+    def parcourir(self, page_size):
+        vus, cursor = [], None
+        while True:
+            params = {"page_size": page_size}
+            if cursor:
+                params["cursor"] = cursor
+            page = self.page(**params)
+            vus += [p.pk for p in page.items]
+            cursor = page.next_cursor
+            if cursor is None:
+                return vus
+
+    def test_parcours_complet_sans_doublon(self):
+        attendu = list(
+            BlocProgress.objects.filter(apprenant=self.apprenant)
+            .order_by("-updated_at", "-id").values_list("pk", flat=True)
+        )
+        self.assertEqual(self.parcourir(3), attendu)
+
+    def test_horodatages_egaux_departages_par_id(self):
+        premier = BlocProgress.objects.filter(apprenant=self.apprenant).values_list("updated_at", flat=True).first()
+        BlocProgress.objects.filter(apprenant=self.apprenant).update(updated_at=premier)
+        attendu = sorted(BlocProgress.objects.filter(apprenant=self.apprenant).values_list("pk", flat=True),
+                         reverse=True)
+        self.assertEqual(self.parcourir(2), attendu)
+
+    def test_meta_derniere_page(self):
+        page = self.page(page_size=50)
+        self.assertEqual(len(page.items), 7)
+        self.assertEqual(page.as_meta()["has_next"], False)
+        self.assertEqual(page.count_estimate, 7)
+
+    def test_curseur_illisible(self):
+        with self.assertRaises(InvalidCursor):
+            self.page(cursor="pas-un-curseur")
+
+
+# ============================================================================
+# UPLOAD PAR MORCEAUX (offsets)
+# ============================================================================
+
+class ChunkedUploadTests(TestCase):
+
+    def setUp(self):
+        self.temp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp, ignore_errors=True)
+        reglages = override_settings(CHUNKED_UPLOAD_TEMP_DIR=self.temp, CHUNKED_UPLOAD_MAX_CHUNK_SIZE=4)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        _, _, _, (self.apprenant,) = creer_cours(nb_sequences=0)
+        self.contenu = b"0123456789"
+        self.upload = chunked_upload.init_upload(self.apprenant, "fichier", "f.bin", len(self.contenu))
+
+    def envoyer(self, offset, morceau, checksum=None):
+        checksum = checksum or hashlib.sha256(morceau).hexdigest()
+        return chunked_upload.write_chunk(self.upload, io.BytesIO(morceau), offset, len(morceau), checksum)
+
+    def test_morceaux_successifs_et_reprise(self):
+        self.assertEqual(self.envoyer(0, b"0123"), 4)
+        self.assertEqual(self.envoyer(4, b"4567"), 8)
+        # Reprise : l'offset confirmé est celui de la base
+        self.upload = ChunkedUpload.objects.get(pk=self.upload.pk)
+        self.assertEqual(self.upload.offset, 8)
+        self.assertEqual(self.envoyer(8, b"89"), 10)
+        with open(chunked_upload.temp_path(self.upload), "rb") as fh:
+            self.assertEqual(fh.read(), self.contenu)
+
+    def test_offset_inattendu(self):
+        self.envoyer(0, b"0123")
+        with self.assertRaises(chunked_upload.ChunkError) as ctx:
+            self.envoyer(0, b"0123")
+        self.assertEqual((ctx.exception.http_status, ctx.exception.offset), (409, 4))
+
+    def test_morceau_deja_recu_par_une_requete_concurrente(self):
+        perime = ChunkedUpload.objects.get(pk=self.upload.pk)
+        self.envoyer(0, b"0123")
+        # Même offset avec un état lu avant la première écriture
+        self.upload = perime
+        with self.assertRaises(chunked_upload.ChunkError) as ctx:
+            self.envoyer(0, b"abcd")
+        self.assertEqual((ctx.exception.http_status, ctx.exception.offset), (409, 4))
+        with open(chunked_upload.temp_path(perime), "rb") as fh:
+            self.assertEqual(fh.read(4), b"0123")
+
+    def test_checksum_invalide_n_avance_pas(self):
+        with self.assertRaises(chunked_upload.ChunkError) as ctx:
+            self.envoyer(0, b"0123", checksum="0" * 64)
+        self.assertEqual(ctx.exception.http_status, 400)
+        self.assertEqual(ChunkedUpload.objects.get(pk=self.upload.pk).offset, 0)
+
+    def test_depassement_de_la_taille_annoncee(self):
+        self.envoyer(0, b"0123")
+        self.envoyer(4, b"4567")
+        with self.assertRaises(chunked_upload.ChunkError):
+            self.envoyer(8, b"890")
+
+
+# ============================================================================
+# INDICATEURS DE CLASSE
+# ============================================================================
+
+class IndicateursClasseTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.cours, _, (sequence,), self.apprenants = creer_cours(nb_sequences=1, nb_blocs=4, nb_apprenants=3)
+        self.blocs = list(sequence.blocs_contenu.order_by("ordre"))
+
+    def terminer(self, apprenant, n):
+        for bloc in self.blocs[:n]:
+            BlocProgress.objects.create(apprenant=apprenant, bloc=bloc, est_termine=True)
+
+    def termines(self, apprenant):
+        lignes = indicateurs.indicateurs_classe(self.cours.id)["apprenants"]
+        return next(a["blocs_termines"] for a in lignes if a["apprenant_id"] == apprenant.id)
+
+    def lire(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get(f"/api/cours/{self.cours.id}/indicateurs/classe/")
+
+    def test_toute_la_classe_en_un_appel(self):
+        premier, second, _ = self.apprenants
+        self.terminer(premier, 2)
+        self.terminer(second, 4)
+
+        reponse = self.lire(self.cours.enseignant)
+        self.assertEqual(reponse.status_code, 200)
+        data = reponse.json()["data"]
+        self.assertEqual(data["total_blocs"], 4)
+        self.assertEqual(
+            {a["apprenant_id"]: (a["blocs_termines"], a["progression_pct"]) for a in data["apprenants"]},
+            {premier.id: (2, 50.0), second.id: (4, 100.0), self.apprenants[2].id: (0, 0)},
+        )
+
+    def test_requetes_independantes_de_l_effectif(self):
+        self.terminer(self.apprenants[0], 1)
+        with self.assertNumQueries(4):
+            indicateurs.indicateurs_classe(self.cours.id)
+
+    def test_apprenant_refuse(self):
+        self.assertEqual(self.lire(self.apprenants[0]).status_code, 403)
+
+    def test_sans_cache_partage_toujours_a_jour(self):
+        indicateurs.indicateurs_classe(self.cours.id)
+        # Écriture sans signal : seul un calcul à chaque appel la voit
+        BlocProgress.objects.bulk_create([BlocProgress(apprenant=self.apprenants[0], bloc=self.blocs[0],
+                                                       est_termine=True)])
+        self.assertEqual(self.termines(self.apprenants[0]), 1)
+
+    @override_settings(COURS_INDICATEURS_CACHE_TIMEOUT=300)
+    def test_cache_invalide_par_la_progression(self):
+        indicateurs.indicateurs_classe(self.cours.id)
+        with self.assertNumQueries(0):
+            indicateurs.indicateurs_classe(self.cours.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.terminer(self.apprenants[0], 1)
+        self.assertEqual(self.termines(self.apprenants[0]), 1)
+
+
+# ============================================================================
+# EXPORTS ASYNCHRONES
+# ============================================================================
+
+class ExportJobTests(TestCase):
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        reglages = override_settings(MEDIA_ROOT=media)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        planifier = mock.patch.object(export_jobs, "_planifier")
+        self.planifier = planifier.start()
+        self.addCleanup(planifier.stop)
+
+        self.cours, _, _, self.apprenants = creer_cours(nb_sequences=1, nb_apprenants=2)
+        self.client = APIClient()
+        self.client.force_authenticate(self.cours.enseignant)
+
+    def soumettre(self, type_export="progression_cours", export_format="csv"):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post("/api/exports/", {
+                "type_export": type_export, "format": export_format,
+                "parametres": {"cours_id": self.cours.id},
+            }, format="json")
+
+    def test_export_identique_reutilise(self):
+        premiere = self.soumettre()
+        self.assertEqual(premiere.status_code, 202)
+        seconde = self.soumettre()
+        self.assertEqual(seconde.status_code, 200)
+        self.assertEqual(seconde.json()["data"]["export_id"], premiere.json()["data"]["export_id"])
+        self.assertEqual(self.soumettre(export_format="xlsx").status_code, 202)
+        self.assertEqual(self.planifier.call_count, 2)
+
+    def test_apprenant_refuse(self):
+        self.client.force_authenticate(self.apprenants[0])
+        self.assertEqual(self.soumettre().status_code, 403)
+
+    def test_execute_une_fois_puis_telecharge(self):
+        export_id = self.soumettre().json()["data"]["export_id"]
+        job = export_jobs.executer(export_id)
+        self.assertEqual((job.statut, job.total, job.progression), ("termine", 2, 2))
+        self.assertIsNone(export_jobs.executer(export_id))
+
+        reponse = self.client.get(f"/api/exports/{export_id}/telecharger/")
+        self.assertEqual(reponse.status_code, 200)
+        lignes = b"".join(reponse.streaming_content).decode("utf-8-sig").splitlines()
+        self.assertEqual(len(lignes), 3)
+
+    def test_export_expire(self):
+        export_id = self.soumettre().json()["data"]["export_id"]
+        export_jobs.executer(export_id)
+        ExportJob.objects.filter(pk=export_id).update(expire_le=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self.client.get(f"/api/exports/{export_id}/telecharger/").status_code, 410)
+        self.assertEqual(self.soumettre().status_code, 202)
+        self.assertEqual(export_jobs.purger_expires(), 1)
+
+    def test_export_bloque_interrompu_et_non_reutilise(self):
+        export_id = self.soumettre().json()["data"]["export_id"]
+        ExportJob.objects.filter(pk=export_id).update(
+            statut="en_cours", started_at=timezone.now() - timedelta(hours=2),
+        )
+        self.assertEqual(export_jobs.interrompre_bloques(), 1)
+        job = ExportJob.objects.get(pk=export_id)
+        self.assertEqual((job.statut, job.erreur), ("echec", "Export interrompu."))
+        self.assertEqual(self.soumettre().json()["data"]["statut"], "en_attente")
+        self.assertEqual(ExportJob.objects.count(), 2)
+
+
+# ============================================================================
+# LIVRAISON DE FICHIERS (Range) ET ETAG DE L'ARBRE
+# ============================================================================
+
+class LivraisonFichierTests(TestCase):
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        reglages = override_settings(MEDIA_ROOT=media, FILE_DELIVERY_BACKEND="python")
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        self.fichier = ExportJob().fichier
+        self.fichier.save("f.bin", ContentFile(b"0123456789"), save=False)
+
+    def servir(self, **entetes):
+        reponse = serve_file(APIRequestFactory().get("/", **entetes), self.fichier)
+        return reponse, b"".join(reponse.streaming_content) if reponse.streaming else reponse.content
+
+    def test_fichier_complet(self):
+        reponse, contenu = self.servir()
+        self.assertEqual((reponse.status_code, contenu), (200, b"0123456789"))
+        self.assertEqual((reponse["Accept-Ranges"], reponse["Content-Length"]), ("bytes", "10"))
+        self.assertTrue(reponse["ETag"].startswith('"'))
+
+    def test_plages(self):
+        for plage, attendu, content_range in (
+            ("bytes=2-5", b"2345", "bytes 2-5/10"),
+            ("bytes=7-", b"789", "bytes 7-9/10"),
+            ("bytes=-3", b"789", "bytes 7-9/10"),
+            ("bytes=8-99", b"89", "bytes 8-9/10"),
+        ):
+            with self.subTest(plage=plage):
+                reponse, contenu = self.servir(HTTP_RANGE=plage)
+                self.assertEqual((reponse.status_code, contenu), (206, attendu))
+                self.assertEqual(reponse["Content-Range"], content_range)
+
+    def test_plage_insatisfaisable(self):
+        reponse, _ = self.servir(HTTP_RANGE="bytes=10-")
+        self.assertEqual((reponse.status_code, reponse["Content-Range"]), (416, "bytes */10"))
+
+    def test_if_range(self):
+        etag = self.servir()[0]["ETag"]
+        self.assertEqual(self.servir(HTTP_RANGE="bytes=0-1", HTTP_IF_RANGE=etag)[0].status_code, 206)
+        # Fichier modifié depuis : réponse complète
+        reponse, contenu = self.servir(HTTP_RANGE="bytes=0-1", HTTP_IF_RANGE='"autre"')
+        self.assertEqual((reponse.status_code, contenu), (200, b"0123456789"))
+
+    def test_premiere_plage_seulement_comptee(self):
+        requete = APIRequestFactory().get
+        self.assertTrue(is_first_range(requete("/")))
+        self.assertTrue(is_first_range(requete("/", HTTP_RANGE="bytes=0-")))
+        self.assertFalse(is_first_range(requete("/", HTTP_RANGE="bytes=500-")))
+
+    def test_etag_de_l_arbre(self):
+        cours, _, (sequence, _), _ = creer_cours()
+        client = APIClient()
+        client.force_authenticate(cours.enseignant)
+        url = f"/api/cours/{cours.id}/arbre/"
+
+        etag = client.get(url)["ETag"]
+        reponse = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((reponse.status_code, reponse["ETag"]), (304, etag))
+
+        BlocContenu.objects.create(sequence=sequence, titre="Nouveau", type_bloc="texte", ordre=9)
+        reponse = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(reponse.status_code, 200)
+        self.assertNotEqual(reponse["ETag"], etag)
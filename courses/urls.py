@@ -3,15 +3,25 @@
 from django.urls import path
 from .views import (
     # Cours
+    BlocContenuFichierAPIView,
     BlocContenuUploadView,
+    ChunkedUploadChunkAPIView,
+    ChunkedUploadFinalizeAPIView,
+    ChunkedUploadInitAPIView,
+    ExportJobCreateAPIView,
+    ExportJobDetailAPIView,
+    ExportJobDownloadAPIView,
     BlocProgressListAPIView,
     BlocProgressToggleAPIView,
     CoursIndicateursAPIView,
+    CoursIndicateursClasseAPIView,
     CoursListCreateAPIView,
+    CoursArbreAPIView,
     CoursDetailAPIView,
     CoursModulesAPIView,
     CoursProgressListAPIView,
     CoursProgressToggleAPIView,
+    ProgressBatchAPIView,
     
     # Modules
     ModuleListCreateAPIView,
@@ -54,7 +64,9 @@ urlpatterns = [
     path('cours/', CoursListCreateAPIView.as_view(), name='cours-list-create'),
     path('cours/<int:pk>/', CoursDetailAPIView.as_view(), name='cours-detail'),
     path('cours/<int:cours_id>/modules/', CoursModulesAPIView.as_view(), name='cours-modules'),
+    path('cours/<int:pk>/arbre/', CoursArbreAPIView.as_view(), name='cours-arbre'),
     path('cours/<int:pk>/indicateurs/',  CoursIndicateursAPIView.as_view()),
+    path('cours/<int:pk>/indicateurs/classe/',  CoursIndicateursClasseAPIView.as_view()),
     
     # Modules
     path('modules/', ModuleListCreateAPIView.as_view(), name='module-list-create'),
@@ -70,7 +82,16 @@ urlpatterns = [
     # Blocs de contenu
     path('blocs-contenu/', BlocContenuListCreateAPIView.as_view(), name='bloc-contenu-list-create'),
     path('blocs-contenu/<int:pk>/', BlocContenuDetailAPIView.as_view(), name='bloc-contenu-detail'),
+    path('blocs-contenu/<int:pk>/fichier/', BlocContenuFichierAPIView.as_view(), name='bloc-contenu-fichier'),
     path('blocs-contenu/upload/', BlocContenuUploadView.as_view(), name='bloc-contenu-upload'),
+    path('blocs-contenu/upload/chunked/', ChunkedUploadInitAPIView.as_view(), name='bloc-contenu-upload-chunked-init'),
+    path('blocs-contenu/upload/chunked/<uuid:upload_id>/', ChunkedUploadChunkAPIView.as_view(), name='bloc-contenu-upload-chunked'),
+    path('blocs-contenu/upload/chunked/<uuid:upload_id>/finaliser/', ChunkedUploadFinalizeAPIView.as_view(), name='bloc-contenu-upload-chunked-finaliser'),
+
+    # Exports asynchrones (évaluations, progression, présences)
+    path('exports/', ExportJobCreateAPIView.as_view(), name='export-job-create'),
+    path('exports/<uuid:export_id>/', ExportJobDetailAPIView.as_view(), name='export-job-detail'),
+    path('exports/<uuid:export_id>/telecharger/', ExportJobDownloadAPIView.as_view(), name='export-job-telecharger'),
     
     # Ressources / Pièces jointes
     path('ressources/', RessourceSequenceListCreateAPIView.as_view(), name='ressource-list-create'),
@@ -98,6 +119,7 @@ urlpatterns = [
      # =========================================================================
     # PROGRESSION
     # =========================================================================
+    path('progress/batch/', ProgressBatchAPIView.as_view(), name='progress-batch'),
     path('progress/blocs/', BlocProgressListAPIView.as_view(), name='progress-blocs-list'),
     path('progress/blocs/<int:bloc_id>/', BlocProgressToggleAPIView.as_view(), name='progress-bloc-toggle'),
 
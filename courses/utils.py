@@ -1,70 +1,22 @@
 # courses/utils.py
-from django.db import transaction
 from django.shortcuts import get_object_or_404
-from django.utils import timezone
 from django.db.models.functions import Lower
 
-from courses.models import (
-    BlocContenu, Sequence, Module, Cours,
-    BlocProgress, SequenceProgress, ModuleProgress, CoursProgress
-)
+from core.scope_context import request_cached, resolve_annee_scolaire_id, user_cached
+from courses.services.scope_index import scope_path
+from courses.models import BlocContenu, Sequence, Module, Cours
 
-
-def _set_done_flag(obj, done: bool):
-    if done:
-        obj.est_termine = True
-        obj.completed_at = obj.completed_at or timezone.now()
-    else:
-        obj.est_termine = False
-        obj.completed_at = None
+ACTIVE_INSCRIPTION_STATUTS = ["inscrit", "en_cours", "en cours", "encours"]
 
 
-@transaction.atomic
 def recompute_cascade(apprenant, sequence: Sequence):
-    module = sequence.module
-    cours = module.cours
-
-    blocs_ids = sequence.blocs_contenu.filter(est_visible=True).values_list("id", flat=True)
-    total_blocs = len(blocs_ids)
-    if total_blocs == 0:
-        seq_done = True
-    else:
-        done_blocs = BlocProgress.objects.filter(
-            apprenant=apprenant, bloc_id__in=blocs_ids, est_termine=True
-        ).count()
-        seq_done = (done_blocs == total_blocs)
-
-    sp, _ = SequenceProgress.objects.get_or_create(apprenant=apprenant, sequence=sequence)
-    _set_done_flag(sp, seq_done)
-    sp.save(update_fields=["est_termine", "completed_at", "updated_at"])
-
-    seq_ids = module.sequences.values_list("id", flat=True)
-    total_seq = module.sequences.count()
-    if total_seq == 0:
-        mod_done = True
-    else:
-        done_seq = SequenceProgress.objects.filter(
-            apprenant=apprenant, sequence_id__in=seq_ids, est_termine=True
-        ).count()
-        mod_done = (done_seq == total_seq)
-
-    mp, _ = ModuleProgress.objects.get_or_create(apprenant=apprenant, module=module)
-    _set_done_flag(mp, mod_done)
-    mp.save(update_fields=["est_termine", "completed_at", "updated_at"])
-
-    mod_ids = cours.modules.values_list("id", flat=True)
-    total_mod = cours.modules.count()
-    if total_mod == 0:
-        cours_done = True
-    else:
-        done_mod = ModuleProgress.objects.filter(
-            apprenant=apprenant, module_id__in=mod_ids, est_termine=True
-        ).count()
-        cours_done = (done_mod == total_mod)
+    """
+    Recalcule séquence → module → cours pour un apprenant.
+    Délègue au moteur à compteurs (courses.services.progression).
+    """
+    from courses.services.progression import resync_sequences
 
-    cp, _ = CoursProgress.objects.get_or_create(apprenant=apprenant, cours=cours)
-    _set_done_flag(cp, cours_done)
-    cp.save(update_fields=["est_termine", "completed_at", "updated_at"])
+    resync_sequences([sequence.id], apprenant_ids=[apprenant.id])
 
 
 # ============================================================================
@@ -97,7 +49,14 @@ def get_user_context(request):
 
     Pour l'Apprenant, l'année est forcée depuis son inscription active
     (le header front ne peut pas la surcharger — sécurité).
+
+    Calculé une fois par requête ; la partie dépendant uniquement de
+    l'utilisateur est mise en cache (voir core.scope_context).
     """
+    return dict(request_cached(request, "courses", lambda: _build_user_context(request)))
+
+
+def _build_user_context(request):
     user = request.user
 
     ctx = {
@@ -106,6 +65,7 @@ def get_user_context(request):
         "annee_scolaire_id": None,
         "strict": False,
         "role_name": None,
+        "apprenant_id": None,
     }
 
     # SuperUser : bypass complet
@@ -113,69 +73,22 @@ def get_user_context(request):
         ctx["bypass"] = True
         return ctx
 
-    # Résolution du rôle
-    _role = getattr(user, "role", None)
-    if _role is None:
-        ctx["role_name"] = None
-    elif isinstance(_role, str):
-        ctx["role_name"] = _role.strip() or None
-    elif hasattr(_role, "name"):
-        ctx["role_name"] = _role.name
-    else:
-        ctx["role_name"] = str(_role) or None
-
-    # Normalisation des rôles
-    if ctx["role_name"] in ("ResponsableAcademique", "Responsable académique"):
-        ctx["role_name"] = "Responsable"
-
-    # Fallback héritage multi-table
-    if ctx["role_name"] is None:
-        from users.models import Apprenant as _Apprenant
-        if isinstance(user, _Apprenant):
-            ctx["role_name"] = "Apprenant"
+    scope = user_cached(request, "courses", lambda: _load_user_scope(user))
+    ctx["role_name"] = scope["role_name"]
 
     # ── APPRENANT : année forcée depuis l'inscription active ─────────────
-    if ctx["role_name"] == "Apprenant" or (
-        ctx["role_name"] is None and hasattr(user, "apprenant")
-    ):
-        from .models import InscriptionCours
-
+    if scope["strict"]:
         ctx["strict"] = True
-        apprenant_obj = _get_apprenant_obj(user)
-
-        if apprenant_obj is not None:
-            inscription = (
-                InscriptionCours.objects
-                .filter(apprenant=apprenant_obj)
-                .annotate(statut_l=Lower("statut"))
-                .filter(statut_l__in=["inscrit", "en_cours", "en cours", "encours"])
-                .select_related("institution", "annee_scolaire")
-                .order_by("-id")
-                .first()
-            )
-            if inscription:
-                ctx["institution_id"] = inscription.institution_id
-                ctx["annee_scolaire_id"] = inscription.annee_scolaire_id
-                return ctx
-
-        # Fallback si pas d'inscription
-        ctx["institution_id"] = getattr(user, "institution_id", None)
-        ctx["annee_scolaire_id"] = getattr(user, "annee_scolaire_active_id", None)
+        ctx["apprenant_id"] = scope["apprenant_id"]
+        ctx["institution_id"] = scope["institution_id"]
+        ctx["annee_scolaire_id"] = scope["annee_scolaire_id"]
         return ctx
 
     # ── Autres rôles (Admin, Responsable, Formateur) ──────────────────────
     ctx["institution_id"] = getattr(user, "institution_id", None)
 
     # Priorité : header > query param > attribut profil
-    annee_header = request.headers.get("X-Annee-Scolaire-ID")
-    annee_param  = request.query_params.get("annee_scolaire_id")
-    annee_profil = getattr(user, "annee_scolaire_active_id", None)
-
-    ctx["annee_scolaire_id"] = (
-        _to_int(annee_header)
-        or _to_int(annee_param)
-        or _to_int(annee_profil)
-    )
+    ctx["annee_scolaire_id"] = resolve_annee_scolaire_id(request)
 
     # Institution peut aussi être surchargée via header/param (SuperAdmin uniquement
     # ou cas cross-institution — garder le comportement existant)
@@ -189,6 +102,71 @@ def get_user_context(request):
     return ctx
 
 
+def _load_user_scope(user):
+    """
+    Partie du contexte qui ne dépend que de l'utilisateur (mise en cache).
+    """
+    scope = {
+        "role_name": None,
+        "strict": False,
+        "apprenant_id": None,
+        "institution_id": None,
+        "annee_scolaire_id": None,
+    }
+
+    # Résolution du rôle
+    _role = getattr(user, "role", None)
+    if _role is None:
+        scope["role_name"] = None
+    elif isinstance(_role, str):
+        scope["role_name"] = _role.strip() or None
+    elif hasattr(_role, "name"):
+        scope["role_name"] = _role.name
+    else:
+        scope["role_name"] = str(_role) or None
+
+    # Normalisation des rôles
+    if scope["role_name"] in ("ResponsableAcademique", "Responsable académique"):
+        scope["role_name"] = "Responsable"
+
+    # Fallback héritage multi-table
+    if scope["role_name"] is None:
+        from users.models import Apprenant as _Apprenant
+        if isinstance(user, _Apprenant):
+            scope["role_name"] = "Apprenant"
+
+    if not (scope["role_name"] == "Apprenant" or (
+        scope["role_name"] is None and hasattr(user, "apprenant")
+    )):
+        return scope
+
+    from .models import InscriptionCours
+
+    scope["strict"] = True
+    apprenant_obj = _get_apprenant_obj(user)
+
+    if apprenant_obj is not None:
+        scope["apprenant_id"] = apprenant_obj.pk
+        inscription = (
+            InscriptionCours.objects
+            .filter(apprenant=apprenant_obj)
+            .annotate(statut_l=Lower("statut"))
+            .filter(statut_l__in=ACTIVE_INSCRIPTION_STATUTS)
+            .order_by("-id")
+            .values("institution_id", "annee_scolaire_id")
+            .first()
+        )
+        if inscription:
+            scope["institution_id"] = inscription["institution_id"]
+            scope["annee_scolaire_id"] = inscription["annee_scolaire_id"]
+            return scope
+
+    # Fallback si pas d'inscription
+    scope["institution_id"] = getattr(user, "institution_id", None)
+    scope["annee_scolaire_id"] = getattr(user, "annee_scolaire_active_id", None)
+    return scope
+
+
 # ============================================================================
 # HELPERS
 # ============================================================================
@@ -205,19 +183,17 @@ def _get_apprenant_obj(user):
         return None
 
 
-def _get_apprenant_cours_ids(user, institution_id=None):
+def _get_apprenant_cours_ids(apprenant_id, institution_id=None):
     from .models import InscriptionCours
 
-    apprenant = _get_apprenant_obj(user)
-    if apprenant is None:
+    if apprenant_id is None:
         return InscriptionCours.objects.none().values_list("cours_id", flat=True)
 
-    active = ["inscrit", "en_cours", "en cours", "encours"]
     qs = (
         InscriptionCours.objects
-        .filter(apprenant=apprenant)
+        .filter(apprenant_id=apprenant_id)
         .annotate(statut_l=Lower("statut"))
-        .filter(statut_l__in=active)
+        .filter(statut_l__in=ACTIVE_INSCRIPTION_STATUTS)
     )
     if institution_id:
         qs = qs.filter(institution_id=institution_id)
@@ -232,8 +208,7 @@ def _apply_annee_filter(qs, annee_scolaire_id):
     """
     if not annee_scolaire_id:
         return qs
-    field_names = {f.name for f in qs.model._meta.get_fields()}
-    if "annee_scolaire" in field_names:
+    if scope_path(qs.model, "annee_scolaire"):
         return qs.filter(annee_scolaire_id=annee_scolaire_id)
     return qs
 
@@ -259,8 +234,8 @@ def filter_queryset_by_role(queryset, request, model_name="Cours"):
 
     # ── APPRENANT ────────────────────────────────────────────────────────
     if role_name == "Apprenant" or ctx.get("strict"):
-        cours_ids = _get_apprenant_cours_ids(user, ctx.get("institution_id"))
-        apprenant_obj = _get_apprenant_obj(user)
+        apprenant_id = ctx.get("apprenant_id")
+        cours_ids = _get_apprenant_cours_ids(apprenant_id, ctx.get("institution_id"))
 
         if model_name == "Cours":
             return queryset.filter(id__in=cours_ids)
@@ -275,19 +250,19 @@ def filter_queryset_by_role(queryset, request, model_name="Cours"):
         if model_name == "Session":
             return queryset.filter(cours_id__in=cours_ids)
         if model_name == "InscriptionCours":
-            if apprenant_obj is None:
+            if apprenant_id is None:
                 return queryset.none()
             return queryset.filter(cours_id__in=cours_ids)
         if model_name == "Participation":
             return queryset.filter(session__cours_id__in=cours_ids)
         if model_name == "Suivi":
-            if apprenant_obj is None:
+            if apprenant_id is None:
                 return queryset.none()
-            return queryset.filter(apprenant=apprenant_obj)
+            return queryset.filter(apprenant_id=apprenant_id)
         if model_name in ("BlocProgress", "SequenceProgress", "ModuleProgress", "CoursProgress"):
-            if apprenant_obj is None:
+            if apprenant_id is None:
                 return queryset.none()
-            return queryset.filter(apprenant=apprenant_obj)
+            return queryset.filter(apprenant_id=apprenant_id)
         return queryset.none()
 
     # ── PARENT ───────────────────────────────────────────────────────────
@@ -353,8 +328,7 @@ def filter_queryset_by_role(queryset, request, model_name="Cours"):
         filters = {"institution_id": institution_id}
         if annee_scolaire_id:
             # Filtre année uniquement si le champ existe sur le modèle
-            field_names = {f.name for f in queryset.model._meta.get_fields()}
-            if "annee_scolaire" in field_names:
+            if scope_path(queryset.model, "annee_scolaire"):
                 filters["annee_scolaire_id"] = annee_scolaire_id
 
         if model_name == "Cours":
@@ -393,8 +367,8 @@ def filter_queryset_by_role(queryset, request, model_name="Cours"):
 # HELPERS PUBLICS
 # ============================================================================
 
-def get_filtered_object(model_class, pk, request, model_name):
-    qs = model_class.objects.all()
+def get_filtered_object(model_class, pk, request, model_name, queryset=None):
+    qs = queryset if queryset is not None else model_class.objects.all()
     qs = filter_queryset_by_role(qs, request, model_name)
     return get_object_or_404(qs, pk=pk)
 
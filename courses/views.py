@@ -9,11 +9,12 @@
 # #7 RessourceTelechargementAPIView — filtre conditionnel
 #
 # RÈGLE APPLIQUÉE PARTOUT :
-#   On n'applique filter(X=val) QUE si au moins un objet dans le QS courant
-#   possède ce champ renseigné. Sinon on suppose que le backend a déjà filtré
-#   par séquence/cours et on laisse passer.
+#   On n'applique filter(X=val) QUE si au moins un objet du modèle
+#   possède ce champ renseigné (index de périmètre, courses/services/scope_index.py).
+#   Sinon on suppose que le backend a déjà filtré par séquence/cours et on laisse passer.
 #   Cela évite que les séquences/blocs sans institution_id soient silencieusement exclus.
 
+import hashlib
 import os
 import uuid
 
@@ -23,19 +24,25 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
 from django.db import transaction
-from django.http import FileResponse, Http404
+from django.http import Http404
 from django.core.files.storage import default_storage
 from django.conf import settings
-from django.core.files.base import ContentFile
 from rest_framework.decorators import action
 from academics.models import Inscription
-from django.db.models import Sum
+from django.db.models import Count, F, Max, Prefetch, Q, Sum
+from django.utils.http import parse_etags
 from rest_framework.parsers import MultiPartParser, FormParser
 
-from courses.utils import can_create_in_context, filter_queryset_by_role, get_filtered_object, get_user_context
+from core.file_delivery import is_first_range, serve_file
+from courses.pagination import InvalidCursor, paginate_keyset, use_cursor_pagination
+from courses.services import chunked_upload, export_jobs, indicateurs, progress_batch, progression
+from courses.services.scope_index import has_scoped_rows, scope_path
+from courses.utils import _to_int, can_create_in_context, filter_queryset_by_role, get_filtered_object, get_user_context
 from .models import (
     BlocContenu,
     BlocProgress,
+    ChunkedUpload,
+    ExportJob,
     Cours,
     CoursProgress,
     InscriptionCours,
@@ -58,6 +65,7 @@ from .serializers import (
     ModuleProgressSerializer,
     ModuleSerializer,
     ParticipationSerializer,
+    ProgressBatchSerializer,
     ProgressToggleSerializer,
     RessourceSequenceCreateSerializer,
     RessourceSequenceSerializer,
@@ -101,51 +109,78 @@ def api_error(message: str, errors=None, http_status=status.HTTP_400_BAD_REQUEST
     return Response(payload, status=http_status)
 
 
+def _cours_avec_metriques():
+    """Prefetch du cours imbriqué (CoursSerializer) avec ses métriques d'exécution annotées."""
+    return Prefetch(
+        "cours",
+        queryset=Cours.objects.select_related(
+            "groupe", "matiere", "enseignant", "institution", "annee_scolaire"
+        ).with_execution_metrics(),
+    )
+
+
+def api_list(request, qs, serializer_class, message, order_field, serializer_context=None):
+    """
+    Réponse de liste : complète par défaut, paginée par curseur (keyset)
+    sur (-order_field, -id) si le client le demande (voir courses/pagination.py).
+    Même enveloppe que api_success, avec une clé "pagination" en plus.
+    """
+    kwargs = {"many": True}
+    if serializer_context is not None:
+        kwargs["context"] = serializer_context
+
+    if not use_cursor_pagination(request):
+        return api_success(message, serializer_class(qs, **kwargs).data, status.HTTP_200_OK)
+
+    try:
+        page = paginate_keyset(qs, request, order_field)
+    except InvalidCursor as e:
+        return api_error("Curseur de pagination invalide", errors={"cursor": str(e)})
+
+    response = api_success(message, serializer_class(page.items, **kwargs).data, status.HTTP_200_OK)
+    response.data["pagination"] = page.as_meta()
+    return response
+
+
 def _apply_context_filter(qs, context, field_institution='institution_id', field_annee='annee_scolaire_id'):
     """
     Applique les filtres institution/annee_scolaire de façon conditionnelle.
-    Détecte automatiquement le bon champ selon le modèle du queryset.
+
+    Les colonnes sont résolues au démarrage et la présence de lignes
+    rattachées est lue dans l'index de périmètre (aucune requête de sonde) :
+    le queryset résultant s'exécute en une seule requête SQL.
     """
     if context.get('bypass'):
         return qs
 
-    institution_id = context.get('institution_id')
-    annee_id = context.get('annee_scolaire_id')
-
-    if institution_id:
-        # ✅ Vérifie que le champ institution_id existe directement sur le modèle
-        model = qs.model
-        field_names = [f.name for f in model._meta.get_fields()]
-
-        if 'institution' in field_names or 'institution_id' in field_names:
-            # Filtre conditionnel : seulement si au moins un objet a institution renseigné
-            if qs.filter(institution_id__isnull=False).exists():
-                qs = qs.filter(institution_id=institution_id)
-        # Si le modèle n'a pas de champ institution direct, on laisse passer
+    model = qs.model
+    filters = {}
+    for field, value in (
+        ('institution', context.get('institution_id')),
+        ('annee_scolaire', context.get('annee_scolaire_id')),
+    ):
+        column = scope_path(model, field)
+        # Si le modèle n'a pas de champ direct ou aucune ligne rattachée, on laisse passer
+        if value and column and has_scoped_rows(model, field):
+            filters[column] = value
 
-    if annee_id:
-        model = qs.model
-        field_names = [f.name for f in model._meta.get_fields()]
-        if 'annee_scolaire' in field_names or 'annee_scolaire_id' in field_names:
-            if qs.filter(annee_scolaire_id__isnull=False).exists():
-                qs = qs.filter(annee_scolaire_id=annee_id)
+    return qs.filter(**filters) if filters else qs
 
-    return qs
 
 def _apply_sequence_context_filter(qs, context):
     """
     ✅ Variante pour les QuerySets dont institution/annee_scolaire
     sont portés par la relation sequence (BlocContenu, RessourceSequence…).
     """
-    if context.get('institution_id'):
-        if qs.filter(sequence__institution_id__isnull=False).exists():
-            qs = qs.filter(sequence__institution_id=context['institution_id'])
+    filters = {}
+    for field, value in (
+        ('institution', context.get('institution_id')),
+        ('annee_scolaire', context.get('annee_scolaire_id')),
+    ):
+        if value and has_scoped_rows(Sequence, field):
+            filters[f"sequence__{scope_path(Sequence, field)}"] = value
 
-    if context.get('annee_scolaire_id'):
-        if qs.filter(sequence__annee_scolaire_id__isnull=False).exists():
-            qs = qs.filter(sequence__annee_scolaire_id=context['annee_scolaire_id'])
-
-    return qs
+    return qs.filter(**filters) if filters else qs
 
 
 # ============================================================================
@@ -170,13 +205,11 @@ class CoursListCreateAPIView(APIView):
         try:
             qs = Cours.objects.select_related(
                 "groupe", "matiere", "enseignant", "institution", "annee_scolaire"
-            ).all()
+            ).with_execution_metrics()
 
             qs = filter_queryset_by_role(qs, request, 'Cours')
             qs = qs.order_by("-id")
-            data = CoursSerializer(qs, many=True).data
-
-            return api_success("Liste des cours récupérée avec succès", data, status.HTTP_200_OK)
+            return api_list(request, qs, CoursSerializer, "Liste des cours récupérée avec succès", "date_modification")
         except Exception as e:
             return api_error(
                 "Erreur lors de la récupération des cours",
@@ -212,7 +245,10 @@ class CoursDetailAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self, pk, request):
-        return get_filtered_object(Cours, pk, request, 'Cours')
+        return get_filtered_object(
+            Cours, pk, request, 'Cours',
+            queryset=Cours.objects.with_execution_metrics(),
+        )
 
     def get(self, request, pk):
         obj = self.get_object(pk, request)
@@ -275,6 +311,159 @@ class CoursModulesAPIView(APIView):
             )
 
 
+class CoursArbreAPIView(APIView):
+    """
+    GET /api/cours/<id>/arbre/
+    Arbre complet Cours → Modules → Séquences → Blocs en un nombre fixe de requêtes.
+
+    Query params :
+    - contenu=1      : inclut les champs lourds des blocs (contenu_html, code_source…)
+    - progression=1  : superpose est_termine (blocs/séquences) de l'apprenant connecté
+    - apprenant=<id> : idem pour un apprenant donné (formateur, admin…)
+
+    Réponse avec ETag fort calculé sur les date_modification de l'arbre :
+    If-None-Match identique → 304 sans charger l'arbre.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    BLOC_FIELDS = (
+        'id', 'sequence_id', 'titre', 'type_bloc', 'ordre',
+        'video_url', 'audio_url', 'image', 'fichier', 'lien_externe', 'langage_code',
+        'duree_estimee_minutes', 'est_obligatoire', 'est_visible', 'date_modification',
+    )
+    BLOC_CONTENU_FIELDS = (
+        'contenu_texte', 'contenu_html', 'contenu_markdown', 'code_source', 'objectifs',
+    )
+
+    def get(self, request, pk):
+        try:
+            cours = get_filtered_object(Cours, pk, request, 'Cours')
+        except Http404:
+            return api_error("Cours introuvable", http_status=status.HTTP_404_NOT_FOUND)
+
+        context = get_user_context(request)
+        visibles_seulement = bool(context.get('strict')) or context.get('role_name') == 'Parent'
+        avec_contenu = request.query_params.get('contenu') in ('1', 'true')
+        apprenant_id = self._get_apprenant_id(request, context)
+
+        etag = self._compute_etag(cours, visibles_seulement, avec_contenu, apprenant_id)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        blocs_termines, sequences_terminees = set(), set()
+        if apprenant_id:
+            blocs_termines = set(BlocProgress.objects.filter(
+                apprenant_id=apprenant_id,
+                bloc__sequence__module__cours=cours,
+                est_termine=True,
+            ).values_list('bloc_id', flat=True))
+            sequences_terminees = set(SequenceProgress.objects.filter(
+                apprenant_id=apprenant_id,
+                sequence__module__cours=cours,
+                est_termine=True,
+            ).values_list('sequence_id', flat=True))
+
+        bloc_fields = self.BLOC_FIELDS + (self.BLOC_CONTENU_FIELDS if avec_contenu else ())
+        blocs_qs = BlocContenu.objects.only(*bloc_fields).order_by('ordre', 'id')
+        if visibles_seulement:
+            blocs_qs = blocs_qs.filter(est_visible=True)
+
+        modules = (
+            Module.objects
+            .filter(cours=cours)
+            .only('id', 'cours_id', 'titre', 'description')
+            .order_by('id')
+            .prefetch_related(
+                Prefetch(
+                    'sequences',
+                    queryset=Sequence.objects.only('id', 'module_id', 'titre').order_by('id'),
+                ),
+                Prefetch('sequences__blocs_contenu', queryset=blocs_qs),
+            )
+        )
+
+        data = {
+            'id': cours.id,
+            'titre': cours.titre,
+            'statut': cours.statut,
+            'modules': [
+                {
+                    'id': module.id,
+                    'titre': module.titre,
+                    'description': module.description,
+                    'sequences': [
+                        self._serialize_sequence(
+                            sequence, bloc_fields, apprenant_id,
+                            blocs_termines, sequences_terminees,
+                        )
+                        for sequence in module.sequences.all()
+                    ],
+                }
+                for module in modules
+            ],
+        }
+
+        response = api_success("Arbre du cours récupéré avec succès", data, status.HTTP_200_OK)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def _get_apprenant_id(self, request, context):
+        if context.get('apprenant_id'):
+            if request.query_params.get('progression') in ('1', 'true'):
+                return context['apprenant_id']
+            return None
+        return _to_int(request.query_params.get('apprenant'))
+
+    def _serialize_sequence(self, sequence, bloc_fields, apprenant_id, blocs_termines, sequences_terminees):
+        data = {'id': sequence.id, 'titre': sequence.titre}
+        if apprenant_id:
+            data['est_termine'] = sequence.id in sequences_terminees
+        blocs = []
+        for bloc in sequence.blocs_contenu.all():
+            bloc_data = {field: getattr(bloc, field) for field in bloc_fields if field != 'sequence_id'}
+            bloc_data['image'] = bloc.image.name or None
+            bloc_data['fichier'] = bloc.fichier.name or None
+            bloc_data['icone_type'] = bloc.icone_type
+            if apprenant_id:
+                bloc_data['est_termine'] = bloc.id in blocs_termines
+            blocs.append(bloc_data)
+        data['blocs'] = blocs
+        return data
+
+    def _compute_etag(self, cours, visibles_seulement, avec_contenu, apprenant_id):
+        """
+        ETag fort : dates de modification max et effectifs de chaque niveau
+        (les effectifs couvrent les suppressions), variantes de la requête
+        et, si demandée, la progression de l'apprenant.
+        """
+        bloc_filter = Q(modules__sequences__blocs_contenu__est_visible=True) if visibles_seulement else None
+        signature = Cours.objects.filter(pk=cours.pk).aggregate(
+            nb_modules=Count('modules', distinct=True),
+            max_module=Max('modules__date_modification'),
+            nb_sequences=Count('modules__sequences', distinct=True),
+            max_sequence=Max('modules__sequences__date_modification'),
+            nb_blocs=Count('modules__sequences__blocs_contenu', filter=bloc_filter, distinct=True),
+            max_bloc=Max('modules__sequences__blocs_contenu__date_modification', filter=bloc_filter),
+        )
+        parts = [
+            cours.pk, cours.date_modification, visibles_seulement, avec_contenu,
+            *(signature[key] for key in sorted(signature)),
+        ]
+        if apprenant_id:
+            for model, lookup in (
+                (BlocProgress, 'bloc__sequence__module__cours'),
+                (SequenceProgress, 'sequence__module__cours'),
+            ):
+                progress = model.objects.filter(
+                    apprenant_id=apprenant_id, **{lookup: cours}
+                ).aggregate(n=Count('id', filter=Q(est_termine=True)), m=Max('updated_at'))
+                parts += [apprenant_id, progress['n'], progress['m']]
+
+        digest = hashlib.sha1('|'.join(str(p) for p in parts).encode()).hexdigest()
+        return f'"{digest}"'
+
+
 # ============================================================================
 # MODULES
 # ============================================================================
@@ -592,39 +781,20 @@ class BlocContenuListCreateAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        """Récupère les blocs de contenu filtrés — avec debug temporaire"""
+        """Récupère les blocs de contenu filtrés"""
         try:
             context = get_user_context(request)
             blocs = BlocContenu.objects.select_related('sequence').all()
 
             sequence_id = request.query_params.get('sequence')
-
-            print(f"\n[BLOCS DEBUG] =============================")
-            print(f"[BLOCS DEBUG] user={request.user} (pk={request.user.pk})")
-            print(f"[BLOCS DEBUG] sequence_id={sequence_id}")
-            print(f"[BLOCS DEBUG] context={context}")
-            print(f"[BLOCS DEBUG] blocs total avant tout filtre: {blocs.count()}")
-
             if sequence_id:
                 blocs = blocs.filter(sequence_id=sequence_id)
 
-            print(f"[BLOCS DEBUG] après filter(sequence_id={sequence_id}): {blocs.count()}")
-
-            has_institution = blocs.filter(sequence__institution_id__isnull=False).exists()
-            has_annee = blocs.filter(sequence__annee_scolaire_id__isnull=False).exists()
-            print(f"[BLOCS DEBUG] has_institution={has_institution}, has_annee={has_annee}")
-
             blocs = _apply_sequence_context_filter(blocs, context)
 
-            print(f"[BLOCS DEBUG] après _apply_sequence_context_filter: {blocs.count()}")
-            print(f"[BLOCS DEBUG] =============================\n")
-
             blocs = blocs.order_by('sequence', 'ordre')
-            serializer = BlocContenuSerializer(blocs, many=True)
-
-            return api_success("Liste des blocs de contenu récupérée avec succès", serializer.data, status.HTTP_200_OK)
+            return api_list(request, blocs, BlocContenuSerializer, "Liste des blocs de contenu récupérée avec succès", "date_modification")
         except Exception as e:
-            print(f"[BLOCS DEBUG] EXCEPTION: {e}")
             return api_error("Erreur lors de la récupération des blocs", errors={'detail': str(e)}, http_status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     def post(self, request):
@@ -736,6 +906,44 @@ class BlocContenuUploadView(APIView):
         'texte':       'documents',
     }
 
+    @classmethod
+    def validate_file(cls, kind, filename, size):
+        """
+        Règles communes (upload direct et init d'upload fragmenté).
+        Retourne (extension, None) ou (None, message d'erreur).
+        """
+        if kind not in cls.ALLOWED_EXTENSIONS:
+            allowed = ', '.join(cls.ALLOWED_EXTENSIONS.keys())
+            return None, f"Type invalide : '{kind}'. Valeurs autorisées : {allowed}"
+
+        _, ext = os.path.splitext((filename or '').lower())
+        if ext not in cls.ALLOWED_EXTENSIONS[kind]:
+            allowed = ', '.join(cls.ALLOWED_EXTENSIONS[kind])
+            return None, f"Extension '{ext}' non autorisée pour '{kind}'. Autorisées : {allowed}"
+
+        if size > cls.MAX_SIZE[kind]:
+            max_mb = cls.MAX_SIZE[kind] // (1024 * 1024)
+            return None, f"Fichier trop volumineux. Maximum autorisé : {max_mb} Mo."
+
+        return ext, None
+
+    @classmethod
+    def build_upload_path(cls, kind, ext):
+        unique_name = f"{uuid.uuid4().hex}{ext}"
+        subdir = cls.UPLOAD_SUBDIR[kind]
+        return f"blocs_contenu/{subdir}/{unique_name}"
+
+    @staticmethod
+    def build_file_url(request, saved_path):
+        try:
+            file_url = default_storage.url(saved_path)
+            if file_url.startswith('/'):
+                scheme = 'https' if request.is_secure() else 'http'
+                file_url = f"{scheme}://{request.get_host()}{file_url}"
+        except Exception:
+            file_url = f"{request.scheme}://{request.get_host()}{settings.MEDIA_URL}{saved_path}"
+        return file_url
+
     def post(self, request, *args, **kwargs):
         file_obj = request.FILES.get('file')
         kind = request.data.get('kind', '').strip().lower()
@@ -743,49 +951,211 @@ class BlocContenuUploadView(APIView):
         if not file_obj:
             return Response({'error': 'Aucun fichier fourni.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        if kind not in self.ALLOWED_EXTENSIONS:
-            allowed = ', '.join(self.ALLOWED_EXTENSIONS.keys())
-            return Response(
-                {'error': f"Type invalide : '{kind}'. Valeurs autorisées : {allowed}"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        ext, error = self.validate_file(kind, file_obj.name, file_obj.size)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
 
-        _, ext = os.path.splitext(file_obj.name.lower())
-        if ext not in self.ALLOWED_EXTENSIONS[kind]:
-            allowed = ', '.join(self.ALLOWED_EXTENSIONS[kind])
+        upload_path = self.build_upload_path(kind, ext)
+
+        try:
+            # Le storage lit l'UploadedFile par morceaux (pas de file_obj.read() complet)
+            saved_path = default_storage.save(upload_path, file_obj)
+        except Exception as e:
             return Response(
-                {'error': f"Extension '{ext}' non autorisée pour '{kind}'. Autorisées : {allowed}"},
-                status=status.HTTP_400_BAD_REQUEST
+                {'error': f"Erreur lors de la sauvegarde : {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-        if file_obj.size > self.MAX_SIZE[kind]:
-            max_mb = self.MAX_SIZE[kind] // (1024 * 1024)
-            return Response(
-                {'error': f"Fichier trop volumineux. Maximum autorisé : {max_mb} Mo."},
-                status=status.HTTP_400_BAD_REQUEST
+        return Response({'url': self.build_file_url(request, saved_path)}, status=status.HTTP_201_CREATED)
+
+
+# ============================================================================
+# UPLOAD FRAGMENTÉ (chunked, reprenable) — voir courses/services/chunked_upload.py
+# ============================================================================
+
+def _chunked_upload_payload(upload):
+    return {
+        "upload_id": str(upload.id),
+        "offset": upload.offset,
+        "taille_totale": upload.taille_totale,
+        "statut": upload.statut,
+        "chunk_size_max": chunked_upload.max_chunk_size(),
+    }
+
+
+def _get_own_upload(request, upload_id):
+    return get_object_or_404(ChunkedUpload, pk=upload_id, utilisateur=request.user)
+
+
+class ChunkedUploadInitAPIView(APIView):
+    """
+    POST /api/blocs-contenu/upload/chunked/
+    Body : {kind, filename, size} — mêmes règles ALLOWED_EXTENSIONS / MAX_SIZE
+    que BlocContenuUploadView, appliquées avant tout envoi de données.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        kind = str(request.data.get('kind', '')).strip().lower()
+        filename = str(request.data.get('filename', '')).strip()
+        size = _to_int(request.data.get('size'))
+
+        if not filename or not size or size <= 0:
+            return api_error("Champs 'filename' et 'size' (> 0) requis")
+
+        _, error = BlocContenuUploadView.validate_file(kind, filename, size)
+        if error:
+            return api_error(error)
+
+        upload = chunked_upload.init_upload(request.user, kind, filename, size)
+        return api_success("Upload initialisé", _chunked_upload_payload(upload), status.HTTP_201_CREATED)
+
+
+class ChunkedUploadChunkAPIView(APIView):
+    """
+    GET    …/chunked/<upload_id>/ : offset confirmé (reprise après coupure)
+    PUT    …/chunked/<upload_id>/ : corps brut du morceau
+             en-têtes Upload-Offset: <octets> et X-Chunk-SHA256: <hex>
+    DELETE …/chunked/<upload_id>/ : annulation
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, upload_id):
+        upload = _get_own_upload(request, upload_id)
+        return api_success("État de l'upload", _chunked_upload_payload(upload))
+
+    def put(self, request, upload_id):
+        upload = _get_own_upload(request, upload_id)
+        offset = _to_int(request.headers.get('Upload-Offset'))
+        length = _to_int(request.META.get('CONTENT_LENGTH'))
+        if offset is None or length is None:
+            return api_error("En-têtes Upload-Offset et Content-Length requis")
+
+        try:
+            # request.stream : lecture du corps brut sans passer par les parsers
+            chunked_upload.write_chunk(
+                upload, request.stream, offset, length,
+                request.headers.get('X-Chunk-SHA256'),
+            )
+        except chunked_upload.ChunkError as e:
+            return api_error(
+                str(e),
+                http_status=e.http_status,
+                data={"offset": e.offset if e.offset is not None else upload.offset},
             )
 
-        unique_name = f"{uuid.uuid4().hex}{ext}"
-        subdir = self.UPLOAD_SUBDIR[kind]
-        upload_path = f"blocs_contenu/{subdir}/{unique_name}"
+        return api_success("Morceau reçu", _chunked_upload_payload(upload))
+
+    def delete(self, request, upload_id):
+        upload = _get_own_upload(request, upload_id)
+        chunked_upload.cancel_upload(upload)
+        return api_success("Upload annulé", data=None, http_status=status.HTTP_204_NO_CONTENT)
+
+
+class ChunkedUploadFinalizeAPIView(APIView):
+    """
+    POST …/chunked/<upload_id>/finaliser/  Body optionnel : {sha256}
+    Retourne l'URL du fichier, comme BlocContenuUploadView.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, upload_id):
+        upload = _get_own_upload(request, upload_id)
+        _, ext = os.path.splitext(upload.nom_fichier.lower())
+        upload_path = BlocContenuUploadView.build_upload_path(upload.kind, ext)
 
         try:
-            saved_path = default_storage.save(upload_path, ContentFile(file_obj.read()))
+            saved_path = chunked_upload.finalize_upload(upload, upload_path, request.data.get('sha256'))
+        except chunked_upload.ChunkError as e:
+            return api_error(str(e), http_status=e.http_status, data={"offset": upload.offset})
         except Exception as e:
-            return Response(
-                {'error': f"Erreur lors de la sauvegarde : {str(e)}"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            return api_error(
+                "Erreur lors de la sauvegarde",
+                errors={'detail': str(e)},
+                http_status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+        return api_success(
+            "Fichier téléversé avec succès",
+            {"url": BlocContenuUploadView.build_file_url(request, saved_path), "path": saved_path},
+            status.HTTP_201_CREATED,
+        )
+
+
+# ============================================================================
+# EXPORTS ASYNCHRONES — voir courses/services/export_jobs.py
+# ============================================================================
+
+def _export_job_payload(request, job):
+    return {
+        "export_id": str(job.id),
+        "type_export": job.type_export,
+        "format": job.format,
+        "parametres": job.parametres,
+        "statut": job.statut,
+        "progression": job.progression,
+        "total": job.total,
+        "pourcentage": job.pourcentage,
+        "erreur": job.erreur or None,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+        "expire_le": job.expire_le,
+        "download_url": request.build_absolute_uri(
+            f"/api/exports/{job.id}/telecharger/"
+        ) if job.statut == "termine" else None,
+    }
+
+
+def _get_own_export(request, export_id):
+    return get_object_or_404(ExportJob, pk=export_id, utilisateur=request.user)
+
+
+class ExportJobCreateAPIView(APIView):
+    """
+    POST /api/exports/
+    Body : {type_export, format (csv|xlsx), parametres}
+    Un export identique demandé récemment est renvoyé (200) au lieu d'être relancé.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        type_export = str(request.data.get('type_export', '')).strip()
+        export_format = str(request.data.get('format', 'csv')).strip().lower()
+        parametres = request.data.get('parametres') or {}
+        if not isinstance(parametres, dict):
+            return api_error("'parametres' doit être un objet")
+
         try:
-            file_url = default_storage.url(saved_path)
-            if file_url.startswith('/'):
-                scheme = 'https' if request.is_secure() else 'http'
-                file_url = f"{scheme}://{request.get_host()}{file_url}"
-        except Exception:
-            file_url = f"{request.scheme}://{request.get_host()}{settings.MEDIA_URL}{saved_path}"
+            job, cree = export_jobs.soumettre(request, type_export, export_format, parametres)
+        except export_jobs.ExportError as e:
+            return api_error(str(e), http_status=e.http_status)
+
+        if cree:
+            return api_success("Export planifié", _export_job_payload(request, job), status.HTTP_202_ACCEPTED)
+        return api_success("Export identique déjà demandé", _export_job_payload(request, job))
+
+
+class ExportJobDetailAPIView(APIView):
+    """GET /api/exports/<export_id>/ : état et progression de l'export."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, export_id):
+        job = _get_own_export(request, export_id)
+        return api_success("État de l'export", _export_job_payload(request, job))
+
 
-        return Response({'url': file_url}, status=status.HTTP_201_CREATED)
+class ExportJobDownloadAPIView(APIView):
+    """GET /api/exports/<export_id>/telecharger/ : fichier de l'export terminé."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, export_id):
+        job = _get_own_export(request, export_id)
+        if job.statut != "termine" or not job.fichier:
+            return api_error("Export non disponible", http_status=status.HTTP_409_CONFLICT,
+                             data={"statut": job.statut})
+        if job.expire_le and job.expire_le <= timezone.now():
+            return api_error("Export expiré", http_status=status.HTTP_410_GONE)
+        return serve_file(request, job.fichier, filename=job.nom_fichier)
 
 
 # ============================================================================
@@ -906,19 +1276,46 @@ class RessourceTelechargementAPIView(APIView):
                     http_status=status.HTTP_403_FORBIDDEN
                 )
 
-            ressource.nombre_telechargements += 1
-            ressource.save(update_fields=['nombre_telechargements'])
-
-            if ressource.fichier:
-                response = FileResponse(ressource.fichier.open('rb'))
-                response['Content-Disposition'] = f'attachment; filename="{ressource.fichier.name}"'
-                return response
-            else:
+            if not ressource.fichier:
                 return api_error("Fichier non trouvé", http_status=status.HTTP_404_NOT_FOUND)
+
+            # Incrément atomique ; les requêtes Range de reprise/lecture ne comptent pas
+            if is_first_range(request):
+                RessourceSequence.objects.filter(pk=ressource.pk).update(
+                    nombre_telechargements=F('nombre_telechargements') + 1
+                )
+
+            return serve_file(request, ressource.fichier)
+        except Http404:
+            raise
         except Exception as e:
             return api_error("Erreur lors du téléchargement", errors={'detail': str(e)}, http_status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class BlocContenuFichierAPIView(APIView):
+    """
+    GET /api/blocs-contenu/<id>/fichier/?champ=fichier|image
+    Sert le fichier ou l'image d'un bloc après contrôle d'accès (Range supporté).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    CHAMPS = ('fichier', 'image')
+
+    def get(self, request, pk):
+        champ = request.query_params.get('champ', 'fichier')
+        if champ not in self.CHAMPS:
+            return api_error(f"Champ invalide : '{champ}'. Valeurs autorisées : fichier, image")
+
+        context = get_user_context(request)
+        qs = _apply_sequence_context_filter(BlocContenu.objects.all(), context)
+        bloc = get_object_or_404(qs, pk=pk)
+
+        field_file = getattr(bloc, champ)
+        if not field_file:
+            return api_error("Fichier non trouvé", http_status=status.HTTP_404_NOT_FOUND)
+        return serve_file(request, field_file, as_attachment=(champ == 'fichier'))
+
+
 # ============================================================================
 # INSCRIPTIONS COURS
 # ============================================================================
@@ -928,36 +1325,22 @@ class InscriptionCoursListCreateAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        print("=== DEBUG InscriptionCoursListCreateAPIView ===")
-        print("user:", request.user)
-        print("user pk:", request.user.pk)
-        print("user type:", type(request.user))
-        print("role raw:", getattr(request.user, "role", None))
         try:
-            role_name = getattr(getattr(request.user, "role", None), "name", None)
-            print("role_name:", role_name)
-
             qs = InscriptionCours.objects.select_related(
-                "apprenant", "cours", "institution", "annee_scolaire"
-            ).all()
-
-            print("count avant filtre:", qs.count())
+                "apprenant", "institution", "annee_scolaire"
+            ).prefetch_related(_cours_avec_metriques())
 
             qs = filter_queryset_by_role(qs, request, "InscriptionCours")
 
-            print("count après filtre:", qs.count())
-            print("ids après filtre:", list(qs.values_list("id", flat=True)[:20]))
-
             qs = qs.order_by("-date_inscription")
-            serializer = InscriptionCoursSerializer(qs, many=True, context={"request": request})
-            return api_success(
+            return api_list(
+                request, qs, InscriptionCoursSerializer,
                 "Liste des inscriptions récupérée avec succès",
-                serializer.data,
-                status.HTTP_200_OK,
+                "date_inscription",
+                serializer_context={"request": request},
             )
 
         except Exception as e:
-            print("❌ DEBUG ERROR:", str(e))
             return api_error(
                 "Erreur lors de la récupération des inscriptions",
                 errors={"detail": str(e)},
@@ -1041,7 +1424,7 @@ class SuiviListCreateAPIView(APIView):
     def get(self, request):
         try:
             context = get_user_context(request)
-            qs = Suivi.objects.select_related('apprenant', 'cours', 'institution', 'annee_scolaire').all()
+            qs = Suivi.objects.select_related('apprenant', 'institution', 'annee_scolaire').prefetch_related(_cours_avec_metriques())
             qs = _apply_context_filter(qs, context)
             qs = qs.order_by('-date_debut')
             serializer = SuiviSerializer(qs, many=True)
@@ -1104,11 +1487,10 @@ class SessionListCreateAPIView(APIView):
     def get(self, request):
         try:
             context = get_user_context(request)
-            qs = Session.objects.select_related('formateur', 'cours', 'institution', 'annee_scolaire').all()
+            qs = Session.objects.select_related('formateur', 'institution', 'annee_scolaire').prefetch_related(_cours_avec_metriques())
             qs = _apply_context_filter(qs, context)
             qs = qs.order_by('-date_debut')
-            serializer = SessionSerializer(qs, many=True)
-            return api_success("Liste des sessions récupérée avec succès", serializer.data, status.HTTP_200_OK)
+            return api_list(request, qs, SessionSerializer, "Liste des sessions récupérée avec succès", "date_debut")
         except Exception as e:
             return api_error("Erreur lors de la récupération des sessions", errors={'detail': str(e)}, http_status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -1191,8 +1573,7 @@ class ParticipationListCreateAPIView(APIView):
             qs = Participation.objects.select_related('session', 'apprenant', 'institution', 'annee_scolaire').all()
             qs = _apply_context_filter(qs, context)
             qs = qs.order_by('-created_at')
-            serializer = ParticipationSerializer(qs, many=True)
-            return api_success("Liste des participations récupérée avec succès", serializer.data, status.HTTP_200_OK)
+            return api_list(request, qs, ParticipationSerializer, "Liste des participations récupérée avec succès", "created_at")
         except Exception as e:
             return api_error("Erreur lors de la récupération des participations", errors={'detail': str(e)}, http_status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -1257,7 +1638,7 @@ class BlocProgressListAPIView(APIView):
                 qs = BlocProgress.objects.filter(apprenant_id=apprenant_id) if apprenant_id else BlocProgress.objects.all()
 
             qs = qs.select_related("apprenant", "bloc").order_by("-updated_at")
-            return api_success("Liste des progressions de blocs récupérée avec succès", BlocProgressSerializer(qs, many=True).data)
+            return api_list(request, qs, BlocProgressSerializer, "Liste des progressions de blocs récupérée avec succès", "updated_at")
         except Exception as e:
             return api_error("Erreur lors de la récupération des progressions", errors={"detail": str(e)}, http_status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -1276,24 +1657,81 @@ class BlocProgressToggleAPIView(APIView):
             if not apprenant:
                 return api_error("Utilisateur non autorisé", http_status=status.HTTP_403_FORBIDDEN)
 
-            progress, created = BlocProgress.objects.get_or_create(
-                apprenant=apprenant,
-                bloc_id=bloc_id,
-                defaults={'est_termine': False}
-            )
-
-            progress.est_termine = serializer.validated_data['est_termine']
-            if progress.est_termine:
-                progress.completed_at = timezone.now()
-            else:
-                progress.completed_at = None
-            progress.save()
+            est_termine = serializer.validated_data['est_termine']
+            now = timezone.now()
+            with transaction.atomic():
+                progress, created = BlocProgress.objects.get_or_create(
+                    apprenant=apprenant,
+                    bloc_id=bloc_id,
+                    defaults={'est_termine': est_termine, 'completed_at': now if est_termine else None}
+                )
+                if created:
+                    # Une ligne créée à False ne change pas les compteurs
+                    bascule = est_termine
+                else:
+                    # UPDATE conditionnel : de deux requêtes identiques
+                    # concurrentes, une seule voit la bascule
+                    bascule = BlocProgress.objects.filter(pk=progress.pk).exclude(est_termine=est_termine).update(
+                        est_termine=est_termine,
+                        completed_at=now if est_termine else None,
+                        updated_at=now,
+                    )
+
+                # Cascade incrémentale séquence → module → cours (uniquement sur bascule)
+                if bascule:
+                    progression.on_blocs_changed(apprenant.id, {progress.bloc_id: est_termine})
+            if not created:
+                # update() ne déclenche pas post_save : invalidation explicite
+                indicateurs.invalidate_for_blocs([progress.bloc_id])
+                progress.refresh_from_db()
 
             return api_success("Progression mise à jour avec succès", BlocProgressSerializer(progress).data, status.HTTP_200_OK)
         except Exception as e:
             return api_error("Erreur lors de la mise à jour de la progression", errors={'detail': str(e)}, http_status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class ProgressBatchAPIView(APIView):
+    """
+    POST /api/progress/batch/
+    Body : {"items": [{"level": "bloc|sequence|module|cours", "id": 12, "est_termine": true}, ...]}
+
+    Met à jour la progression de l'apprenant connecté en une transaction et
+    recalcule la cascade une fois par séquence / module / cours concerné.
+    Retourne les lignes modifiées (cascade comprise) pour réconciliation.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    SERIALIZERS = {
+        'bloc': BlocProgressSerializer,
+        'sequence': SequenceProgressSerializer,
+        'module': ModuleProgressSerializer,
+        'cours': CoursProgressSerializer,
+    }
+
+    def post(self, request):
+        apprenant = request.user.apprenant if hasattr(request.user, 'apprenant') else None
+        if not apprenant:
+            return api_error("Utilisateur non autorisé", http_status=status.HTTP_403_FORBIDDEN)
+
+        serializer = ProgressBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return api_error("Erreur de validation", errors=serializer.errors, http_status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            changed = progress_batch.apply_progress_batch(apprenant.id, serializer.validated_data['items'])
+        except progress_batch.ProgressBatchError as e:
+            return api_error("Objets introuvables", errors={'missing': e.missing}, http_status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return api_error("Erreur lors de la mise à jour de la progression", errors={'detail': str(e)}, http_status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        rows = progress_batch.changed_rows(apprenant.id, changed)
+        data = {
+            level: self.SERIALIZERS[level](objs, many=True).data
+            for level, objs in rows.items()
+        }
+        return api_success("Progression mise à jour avec succès", data, status.HTTP_200_OK)
+
+
 # ============================================================================
 # PROGRESSION - SÉQUENCES
 # ============================================================================
@@ -1314,8 +1752,7 @@ class SequenceProgressListAPIView(APIView):
                     qs = SequenceProgress.objects.all()
 
             qs = qs.select_related('apprenant', 'sequence').order_by('-updated_at')
-            serializer = SequenceProgressSerializer(qs, many=True)
-            return api_success("Liste des progressions de séquences récupérée avec succès", serializer.data, status.HTTP_200_OK)
+            return api_list(request, qs, SequenceProgressSerializer, "Liste des progressions de séquences récupérée avec succès", "updated_at")
         except Exception as e:
             return api_error("Erreur lors de la récupération des progressions", errors={'detail': str(e)}, http_status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -1334,15 +1771,12 @@ class SequenceProgressToggleAPIView(APIView):
             if not apprenant:
                 return api_error("Utilisateur non autorisé", http_status=status.HTTP_403_FORBIDDEN)
 
-            progress, created = SequenceProgress.objects.get_or_create(
-                apprenant=apprenant,
-                sequence_id=sequence_id,
-                defaults={'est_termine': False}
+            # État forcé ; le moteur remonte la bascule aux niveaux supérieurs
+            progression.propagate(
+                apprenant.id,
+                explicit={'sequence': {int(sequence_id): serializer.validated_data['est_termine']}},
             )
-
-            progress.est_termine = serializer.validated_data['est_termine']
-            progress.completed_at = timezone.now() if progress.est_termine else None
-            progress.save()
+            progress = SequenceProgress.objects.get(apprenant=apprenant, sequence_id=sequence_id)
 
             return api_success("Progression mise à jour avec succès", SequenceProgressSerializer(progress).data, status.HTTP_200_OK)
         except Exception as e:
@@ -1369,8 +1803,7 @@ class ModuleProgressListAPIView(APIView):
                     qs = ModuleProgress.objects.all()
 
             qs = qs.select_related('apprenant', 'module').order_by('-updated_at')
-            serializer = ModuleProgressSerializer(qs, many=True)
-            return api_success("Liste des progressions de modules récupérée avec succès", serializer.data, status.HTTP_200_OK)
+            return api_list(request, qs, ModuleProgressSerializer, "Liste des progressions de modules récupérée avec succès", "updated_at")
         except Exception as e:
             return api_error("Erreur lors de la récupération des progressions", errors={'detail': str(e)}, http_status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -1389,15 +1822,12 @@ class ModuleProgressToggleAPIView(APIView):
             if not apprenant:
                 return api_error("Utilisateur non autorisé", http_status=status.HTTP_403_FORBIDDEN)
 
-            progress, created = ModuleProgress.objects.get_or_create(
-                apprenant=apprenant,
-                module_id=module_id,
-                defaults={'est_termine': False}
+            # État forcé ; le moteur remonte la bascule aux niveaux supérieurs
+            progression.propagate(
+                apprenant.id,
+                explicit={'module': {int(module_id): serializer.validated_data['est_termine']}},
             )
-
-            progress.est_termine = serializer.validated_data['est_termine']
-            progress.completed_at = timezone.now() if progress.est_termine else None
-            progress.save()
+            progress = ModuleProgress.objects.get(apprenant=apprenant, module_id=module_id)
 
             return api_success("Progression mise à jour avec succès", ModuleProgressSerializer(progress).data, status.HTTP_200_OK)
         except Exception as e:
@@ -1424,8 +1854,7 @@ class CoursProgressListAPIView(APIView):
                     qs = CoursProgress.objects.all()
 
             qs = qs.select_related('apprenant', 'cours').order_by('-updated_at')
-            serializer = CoursProgressSerializer(qs, many=True)
-            return api_success("Liste des progressions de cours récupérée avec succès", serializer.data, status.HTTP_200_OK)
+            return api_list(request, qs, CoursProgressSerializer, "Liste des progressions de cours récupérée avec succès", "updated_at")
         except Exception as e:
             return api_error("Erreur lors de la récupération des progressions", errors={'detail': str(e)}, http_status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -1444,15 +1873,12 @@ class CoursProgressToggleAPIView(APIView):
             if not apprenant:
                 return api_error("Utilisateur non autorisé", http_status=status.HTTP_403_FORBIDDEN)
 
-            progress, created = CoursProgress.objects.get_or_create(
-                apprenant=apprenant,
-                cours_id=cours_id,
-                defaults={'est_termine': False}
+            # État forcé ; le moteur remonte la bascule aux niveaux supérieurs
+            progression.propagate(
+                apprenant.id,
+                explicit={'cours': {int(cours_id): serializer.validated_data['est_termine']}},
             )
-
-            progress.est_termine = serializer.validated_data['est_termine']
-            progress.completed_at = timezone.now() if progress.est_termine else None
-            progress.save()
+            progress = CoursProgress.objects.get(apprenant=apprenant, cours_id=cours_id)
 
             return api_success("Progression mise à jour avec succès", CoursProgressSerializer(progress).data, status.HTTP_200_OK)
         except Exception as e:
@@ -1468,7 +1894,10 @@ class CoursIndicateursAPIView(APIView):
 
     def get(self, request, pk):
         try:
-            cours = get_filtered_object(Cours, pk, request, 'Cours')
+            cours = get_filtered_object(
+                Cours, pk, request, 'Cours',
+                queryset=Cours.objects.with_execution_metrics(),
+            )
         except Http404:
             return api_error("Cours introuvable", http_status=status.HTTP_404_NOT_FOUND)
 
@@ -1503,6 +1932,7 @@ class CoursIndicateursAPIView(APIView):
         blocs_termines = BlocProgress.objects.filter(
             apprenant_id=apprenant_id,
             bloc__sequence__module__cours=cours,
+            bloc__est_visible=True,
             est_termine=True,
         ).count()
 
@@ -1550,4 +1980,31 @@ class CoursIndicateursAPIView(APIView):
                 'total_blocs':      total_blocs,
                 'source':           'apprenant',
             }
-        })
\ No newline at end of file
+        })
+
+
+class CoursIndicateursClasseAPIView(APIView):
+    """
+    GET /api/cours/<id>/indicateurs/classe/
+    Indicateurs de tous les apprenants inscrits en un seul appel
+    (blocs_termines, progression_pct, heures_realisees), mis en cache par cours.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    # Noms, matricules et progression de toute la classe : ni Apprenant ni Parent
+    roles_autorises = ('Admin', 'Responsable', 'ResponsableAcademique', 'Formateur')
+
+    def get(self, request, pk):
+        context = get_user_context(request)
+        if not context['bypass'] and context['role_name'] not in self.roles_autorises:
+            return api_error("Utilisateur non autorisé", http_status=status.HTTP_403_FORBIDDEN)
+        try:
+            cours = get_filtered_object(Cours, pk, request, 'Cours')
+        except Http404:
+            return api_error("Cours introuvable", http_status=status.HTTP_404_NOT_FOUND)
+
+        data = indicateurs.indicateurs_classe(cours.id)
+        return api_success("Indicateurs de la classe récupérés avec succès", {
+            'cours_id':       cours.id,
+            'volume_horaire': cours.volume_horaire or 0,
+            **data,
+        }, status.HTTP_200_OK)
\ No newline at end of file
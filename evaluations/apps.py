@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class EvaluationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'evaluations'
+
+    def ready(self):
+        import evaluations.signals  # noqa — déclenche l'enregistrement des signaux
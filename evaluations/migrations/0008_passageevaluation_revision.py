@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-17 02:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluations', '0007_merge_20260212_1727'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='passageevaluation',
+            name='revision',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
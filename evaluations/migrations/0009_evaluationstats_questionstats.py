@@ -0,0 +1,50 @@
+# Generated by Django 5.1.6 on 2026-10-17 02:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluations', '0008_passageevaluation_revision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EvaluationStats',
+            fields=[
+                ('evaluation', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='evaluations.evaluation')),
+                ('nb_passages', models.PositiveIntegerField(default=0)),
+                ('nb_passages_soumis', models.PositiveIntegerField(default=0)),
+                ('nb_passages_corriges', models.PositiveIntegerField(default=0)),
+                ('nb_passages_en_cours', models.PositiveIntegerField(default=0)),
+                ('nb_notes', models.PositiveIntegerField(default=0)),
+                ('somme_notes', models.FloatField(default=0.0)),
+                ('note_min', models.FloatField(blank=True, null=True)),
+                ('note_max', models.FloatField(blank=True, null=True)),
+                ('nb_reussites', models.PositiveIntegerField(default=0, help_text='Notes supérieures ou égales à la moitié du barème')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': "Statistiques d'évaluation",
+                'verbose_name_plural': "Statistiques d'évaluations",
+            },
+        ),
+        migrations.CreateModel(
+            name='QuestionStats',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='evaluations.question')),
+                ('nb_reponses', models.PositiveIntegerField(default=0)),
+                ('nb_correctes', models.PositiveIntegerField(default=0, help_text='Réponses ayant obtenu tous les points')),
+                ('nb_corriges', models.PositiveIntegerField(default=0)),
+                ('somme_points_corriges', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('evaluation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='question_stats', to='evaluations.evaluation')),
+            ],
+            options={
+                'verbose_name': 'Statistiques de question',
+                'verbose_name_plural': 'Statistiques de questions',
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.6 on 2026-10-17 02:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluations', '0009_evaluationstats_questionstats'),
+        ('users', '0027_user_photo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='passageevaluation',
+            name='reservation_expire_le',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='passageevaluation',
+            name='reserve_par',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='passages_reserves', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='passageevaluation',
+            index=models.Index(fields=['statut', 'date_soumission', 'id'], name='passage_file_correction_idx'),
+        ),
+    ]
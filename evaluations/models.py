@@ -465,11 +465,27 @@ class PassageEvaluation(models.Model):
     date_soumission = models.DateTimeField(null=True, blank=True)
     date_correction = models.DateTimeField(null=True, blank=True)
 
+    # Révision des réponses (sauvegarde automatique par delta, voir services/autosave.py)
+    revision = models.PositiveIntegerField(default=0, editable=False)
+
+    # Réservation par un correcteur (file de correction, voir services/file_correction.py)
+    reserve_par = models.ForeignKey(
+        'users.User',
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='passages_reserves',
+        editable=False
+    )
+    reservation_expire_le = models.DateTimeField(null=True, blank=True, editable=False)
+
     class Meta:
         unique_together = ('apprenant', 'evaluation')
         verbose_name = "Passage d'évaluation"
         verbose_name_plural = "Passages d'évaluations"
         ordering = ['-date_debut']
+        indexes = [
+            models.Index(fields=['statut', 'date_soumission', 'id'], name='passage_file_correction_idx'),
+        ]
 
     def clean(self):
         if self.note is not None:
@@ -530,34 +546,15 @@ class PassageEvaluation(models.Model):
         """
         Auto-correction pour les évaluations 100% QCM
         Retourne True si l'auto-correction a été effectuée, False sinon
+        (les QCM d'une évaluation mixte sont tout de même corrigés)
         """
-        if not self.evaluation.est_auto_corrigeable():
-            return False
-        
-        # Auto-corriger toutes les questions QCM
-        for reponse in self.reponses_questions.all():
-            if reponse.question.mode_correction == 'automatique':
-                reponse.calculer_points_automatique()
-        
-        # Calculer la note finale
-        total_points = sum(
-            float(r.points_obtenus or 0) 
-            for r in self.reponses_questions.all()
-        )
-        
-        self.note = total_points
-        self.statut = 'corrige'
-        self.date_correction = timezone.now()
-        self.save()
-        
-        return True
+        from evaluations.services.grading import corriger_soumission
+        return corriger_soumission(self)
 
     def auto_corriger_qcm_uniquement(self):
         """Auto-corriger uniquement les QCM (pour évaluations mixtes)"""
-        for reponse in self.reponses_questions.filter(
-            question__mode_correction='automatique'
-        ):
-            reponse.calculer_points_automatique()
+        from evaluations.services.grading import corriger_soumission
+        corriger_soumission(self)
 
 
 # ============================================================================
@@ -675,38 +672,8 @@ class ReponseQuestion(models.Model):
 
     def calculer_points_automatique(self):
         """Calcule automatiquement les points pour les QCM"""
-        if self.question.mode_correction != 'automatique':
-            return None
-        
-        choix_corrects = set(
-            self.question.reponses_predefinies.filter(est_correcte=True).values_list('id', flat=True)
-        )
-        choix_selectionnes = set(self.choix_selectionnes.values_list('id', flat=True))
-        
-        if self.question.type_question == 'choix_unique':
-            # Choix unique : tout ou rien
-            if choix_selectionnes == choix_corrects:
-                self.points_obtenus = self.question.points
-            else:
-                self.points_obtenus = 0.0
-        
-        elif self.question.type_question == 'choix_multiple':
-            # Choix multiple : proportionnel
-            if not choix_corrects:
-                self.points_obtenus = 0.0
-            else:
-                bonnes_reponses = len(choix_selectionnes & choix_corrects)
-                mauvaises_reponses = len(choix_selectionnes - choix_corrects)
-                total_correct = len(choix_corrects)
-                
-                # Formule : (bonnes - mauvaises) / total_correct * points_max
-                score = (bonnes_reponses - mauvaises_reponses) / total_correct
-                self.points_obtenus = max(0, score * self.question.points)
-        
-        self.statut = 'corrige'
-        self.date_correction = timezone.now()
-        self.save()
-        return self.points_obtenus
+        from evaluations.services.grading import grade_answer
+        return grade_answer(self)
 
     def __str__(self):
         return f"{self.passage_evaluation.apprenant} - Q: {self.question.enonce_texte[:30]}..."
@@ -750,15 +717,8 @@ class PassageQuiz(models.Model):
 
     def calculer_score(self):
         """Calcule le score total du quiz"""
-        total_points = 0
-        for reponse in self.reponses_quiz.all():
-            if reponse.question.mode_correction == 'automatique':
-                reponse.calculer_points_automatique()
-            total_points += reponse.points_obtenus
-        
-        self.score = total_points
-        self.save()
-        return self.score
+        from evaluations.services.grading import calculer_score_quiz
+        return calculer_score_quiz(self)
 
 
 class ReponseQuiz(models.Model):
@@ -790,33 +750,89 @@ class ReponseQuiz(models.Model):
 
     def calculer_points_automatique(self):
         """Calcule automatiquement les points (identique à ReponseQuestion)"""
-        if self.question.mode_correction != 'automatique':
-            return None
-        
-        choix_corrects = set(
-            self.question.reponses_predefinies.filter(est_correcte=True).values_list('id', flat=True)
-        )
-        choix_selectionnes = set(self.choix_selectionnes.values_list('id', flat=True))
-        
-        if self.question.type_question == 'choix_unique':
-            if choix_selectionnes == choix_corrects:
-                self.points_obtenus = self.question.points
-            else:
-                self.points_obtenus = 0.0
-        
-        elif self.question.type_question == 'choix_multiple':
-            if not choix_corrects:
-                self.points_obtenus = 0.0
-            else:
-                bonnes_reponses = len(choix_selectionnes & choix_corrects)
-                mauvaises_reponses = len(choix_selectionnes - choix_corrects)
-                total_correct = len(choix_corrects)
-                
-                score = (bonnes_reponses - mauvaises_reponses) / total_correct
-                self.points_obtenus = max(0, score * self.question.points)
-        
-        self.save()
-        return self.points_obtenus
+        from evaluations.services.grading import grade_answer
+        return grade_answer(self)
+
+    def __str__(self):
+        return f"{self.passage_quiz.apprenant} - Quiz Q: {self.question.enonce_texte[:30]}..."
+
+# ============================================================================
+# STATISTIQUES MATÉRIALISÉES (voir evaluations/services/statistiques.py)
+# ============================================================================
+
+class EvaluationStats(models.Model):
+    """Statistiques des passages d'une évaluation, recalculées à chaque correction."""
+    evaluation = models.OneToOneField(
+        Evaluation,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+
+    nb_passages = models.PositiveIntegerField(default=0)
+    nb_passages_soumis = models.PositiveIntegerField(default=0)
+    nb_passages_corriges = models.PositiveIntegerField(default=0)
+    nb_passages_en_cours = models.PositiveIntegerField(default=0)
+
+    # Passages corrigés ayant une note
+    nb_notes = models.PositiveIntegerField(default=0)
+    somme_notes = models.FloatField(default=0.0)
+    note_min = models.FloatField(null=True, blank=True)
+    note_max = models.FloatField(null=True, blank=True)
+    nb_reussites = models.PositiveIntegerField(
+        default=0,
+        help_text="Notes supérieures ou égales à la moitié du barème"
+    )
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Statistiques d'évaluation"
+        verbose_name_plural = "Statistiques d'évaluations"
 
     def __str__(self):
-        return f"{self.passage_quiz.apprenant} - Quiz Q: {self.question.enonce_texte[:30]}..."
\ No newline at end of file
+        return f"Stats {self.evaluation_id} ({self.nb_passages} passages)"
+
+    @property
+    def moyenne_note(self):
+        return round(self.somme_notes / self.nb_notes, 2) if self.nb_notes else None
+
+    @property
+    def taux_reussite(self):
+        return round(self.nb_reussites / self.nb_notes * 100, 2) if self.nb_notes else None
+
+
+class QuestionStats(models.Model):
+    """Statistiques d'une question sur les passages soumis / corrigés."""
+    question = models.OneToOneField(
+        Question,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    evaluation = models.ForeignKey(
+        Evaluation,
+        on_delete=models.CASCADE,
+        related_name='question_stats'
+    )
+
+    nb_reponses = models.PositiveIntegerField(default=0)
+    nb_correctes = models.PositiveIntegerField(
+        default=0,
+        help_text="Réponses ayant obtenu tous les points"
+    )
+    nb_corriges = models.PositiveIntegerField(default=0)
+    somme_points_corriges = models.FloatField(default=0.0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Statistiques de question"
+        verbose_name_plural = "Statistiques de questions"
+
+    def __str__(self):
+        return f"Stats question {self.question_id} ({self.nb_reponses} réponses)"
+
+    @property
+    def moyenne_points(self):
+        return round(self.somme_points_corriges / self.nb_corriges, 2) if self.nb_corriges else None
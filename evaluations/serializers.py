@@ -499,13 +499,19 @@ class PassageEvaluationSerializer(serializers.ModelSerializer):
             'est_corrige',
             'necessite_correction',
             'peut_etre_repris',
-            'peut_etre_soumis'
+            'peut_etre_soumis',
+            'revision',
+            'reserve_par',
+            'reservation_expire_le'
         ]
         read_only_fields = [
             'id', 
             'date_debut', 
             'date_soumission', 
-            'date_correction'
+            'date_correction',
+            'revision',
+            'reserve_par',
+            'reservation_expire_le'
         ]
     
     def get_apprenant_nom(self, obj):
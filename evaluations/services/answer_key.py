@@ -0,0 +1,134 @@
+# evaluations/services/answer_key.py
+"""
+Corrigé compilé par évaluation / quiz, mis en cache.
+
+    {question_id: KeyEntry(type_question, points, mode_correction, correctes)}
+
+- compilé en 2 requêtes (questions + ids des réponses correctes)
+- construit dès la publication (EvaluationPublierAPIView → warm_evaluation)
+- stocké dans le cache Django sous une clé versionnée par parent :
+  answer_key:<evaluation|quiz>:<id>:<version>
+- invalidé par les signaux save / delete de Question et Reponse
+  (voir evaluations/signals.py)
+- sans cache partagé (ANSWER_KEY_CACHE_TIMEOUT = 0), compilé à chaque appel :
+  une invalidation en mémoire locale n'atteindrait pas les autres processus
+
+Lu par la correction (services/grading.py), les statistiques et les exports.
+"""
+
+import time
+from collections import defaultdict, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from evaluations.models import Question, Reponse
+
+
+CACHE_PREFIX = "answer_key"
+
+TYPES_QCM = ("choix_unique", "choix_multiple")
+
+KeyEntry = namedtuple("KeyEntry", "type_question points mode_correction correctes")
+
+
+def _timeout():
+    return getattr(settings, "ANSWER_KEY_CACHE_TIMEOUT", 24 * 3600)
+
+
+def _version_key(kind, parent_id):
+    return f"{CACHE_PREFIX}:ver:{kind}:{parent_id}"
+
+
+def _get_version(kind, parent_id):
+    key = _version_key(kind, parent_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+# ============================================================================
+# COMPILATION
+# ============================================================================
+
+def compile_answer_key(**question_filter):
+    """{question_id: KeyEntry} pour les questions filtrées (sans cache)."""
+    questions = {
+        qid: (type_question, points, mode)
+        for qid, type_question, points, mode in Question.objects.filter(**question_filter)
+        .order_by().values_list("id", "type_question", "points", "mode_correction")
+    }
+    correctes = defaultdict(set)
+    for qid, rid in Reponse.objects.filter(
+        question_id__in=list(questions), est_correcte=True
+    ).values_list("question_id", "id"):
+        correctes[qid].add(rid)
+    return {
+        qid: KeyEntry(type_question, points, mode, frozenset(correctes[qid]))
+        for qid, (type_question, points, mode) in questions.items()
+    }
+
+
+def _cached(kind, parent_id, rebuild=False):
+    if _timeout() <= 0:
+        return compile_answer_key(**{f"{kind}_id": parent_id})
+    key = f"{CACHE_PREFIX}:{kind}:{parent_id}:{_get_version(kind, parent_id)}"
+    compiled = None if rebuild else cache.get(key)
+    if compiled is None:
+        compiled = compile_answer_key(**{f"{kind}_id": parent_id})
+        cache.set(key, compiled, _timeout())
+    return compiled
+
+
+def for_evaluation(evaluation_id):
+    return _cached("evaluation", evaluation_id)
+
+
+def for_quiz(quiz_id):
+    return _cached("quiz", quiz_id)
+
+
+def for_question(question_id):
+    """Corrigé du parent (évaluation ou quiz) de la question."""
+    parent = Question.objects.filter(pk=question_id).values_list("evaluation_id", "quiz_id").first()
+    if not parent:
+        return {}
+    evaluation_id, quiz_id = parent
+    if evaluation_id:
+        return for_evaluation(evaluation_id)
+    if quiz_id:
+        return for_quiz(quiz_id)
+    return compile_answer_key(id=question_id)
+
+
+def warm_evaluation(evaluation_id):
+    """Compile et met en cache le corrigé (à la publication)."""
+    return _cached("evaluation", evaluation_id, rebuild=True)
+
+
+def est_auto_corrigeable(evaluation, key):
+    """Équivalent de Evaluation.est_auto_corrigeable() à partir du corrigé."""
+    if evaluation.type_evaluation == "simple" or not key:
+        return False
+    return all(entry.type_question in TYPES_QCM for entry in key.values())
+
+
+# ============================================================================
+# INVALIDATION
+# ============================================================================
+
+def invalidate(evaluation_ids=(), quiz_ids=()):
+    """Rend caduc le corrigé des évaluations / quiz donnés (après commit)."""
+    targets = [("evaluation", i) for i in set(evaluation_ids) if i]
+    targets += [("quiz", i) for i in set(quiz_ids) if i]
+    if not targets or _timeout() <= 0:
+        return
+
+    def _bump():
+        for kind, parent_id in targets:
+            cache.set(_version_key(kind, parent_id), time.time_ns(), None)
+
+    transaction.on_commit(_bump)
@@ -0,0 +1,289 @@
+# evaluations/services/autosave.py
+"""
+Sauvegarde automatique par delta d'un passage d'évaluation.
+
+Le client envoie uniquement les réponses modifiées depuis sa révision :
+
+    {"revision": 7,
+     "reponses": [{"question": 12, "choix_selectionnes": [40, 41]},
+                  {"question": 13, "reponse_texte": "..."}],
+     "reponse_texte": "..."}            ← évaluation simple (optionnel)
+
+- révision différente de la révision courante → 409 (+ révision courante)
+- écriture : UPDATE conditionnel de la révision, upsert des réponses par
+  bulk_create(update_conflicts=True), remplacement en bloc des lignes M2M
+  choix_selectionnes → nombre de requêtes fixe quel que soit le delta
+- anti-rebond : une sauvegarde qui suit une écriture de moins de
+  AUTOSAVE_DEBOUNCE_SECONDS est fusionnée dans un tampon en cache (une
+  entrée par passage) ; le tampon est écrit en base par une tâche Celery
+  différée, replanifiée dès qu'une sauvegarde le complète après son
+  passage, et avant toute lecture ou soumission du passage (flush) ; la
+  révision courante est la plus haute du tampon et de la base, un tampon
+  déjà écrit (ou dépassé par une autre écriture) est ignoré
+- concurrence : chaque révision est réservée par cache.add avant d'être
+  écrite ou mise en tampon ; deux sauvegardes à la même révision → une
+  seule passe, l'autre reçoit 409
+
+Le tampon suppose un cache partagé entre processus (Redis) : l'anti-rebond
+est désactivé par défaut sans REDIS_URL.
+"""
+
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from evaluations.models import PassageEvaluation, Reponse, ReponseQuestion
+from evaluations.services import answer_key
+
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = "autosave"
+
+# Une révision écrite se lit ensuite dans le tampon ou en base : la
+# réservation n'a qu'à couvrir la sauvegarde en cours
+RESERVATION_TIMEOUT = 30
+
+
+class AutosaveError(Exception):
+    """Sauvegarde refusée ; http_status indique le code à renvoyer."""
+
+    def __init__(self, message, http_status=400, revision=None):
+        super().__init__(message)
+        self.http_status = http_status
+        self.revision = revision
+
+
+def _debounce():
+    return getattr(settings, "AUTOSAVE_DEBOUNCE_SECONDS", 0) or 0
+
+
+def _buffer_key(passage_id):
+    return f"{CACHE_PREFIX}:buf:{passage_id}"
+
+
+def _recent_key(passage_id):
+    return f"{CACHE_PREFIX}:ecrit:{passage_id}"
+
+
+def _revision_key(passage_id, revision):
+    return f"{CACHE_PREFIX}:rev:{passage_id}:{revision}"
+
+
+def _flush_key(passage_id):
+    return f"{CACHE_PREFIX}:flush:{passage_id}"
+
+
+def _buffer_timeout():
+    return max(_debounce() * 20, 300)
+
+
+# ============================================================================
+# VALIDATION
+# ============================================================================
+
+def normalize(passage, items):
+    """
+    Valide les réponses reçues et retourne le delta {question_id: {champ: valeur}}.
+    Les questions doivent appartenir à l'évaluation, les choix à leur question.
+    """
+    key = answer_key.for_evaluation(passage.evaluation_id)
+    delta = {}
+    for item in items or []:
+        try:
+            question_id = int(item.get("question"))
+            choix = [int(c) for c in item.get("choix_selectionnes") or []]
+        except (TypeError, ValueError, AttributeError):
+            raise AutosaveError("Réponse invalide : 'question' et 'choix_selectionnes' doivent être des ids.")
+        entry = key.get(question_id)
+        if entry is None:
+            raise AutosaveError(f"La question {question_id} ne fait pas partie de cette évaluation.")
+
+        fields = delta.setdefault(question_id, {})
+        if "choix_selectionnes" in item:
+            if entry.type_question not in answer_key.TYPES_QCM:
+                raise AutosaveError(f"La question {question_id} n'accepte pas de choix.")
+            fields["choix_selectionnes"] = sorted(set(choix))
+        if "reponse_texte" in item:
+            if entry.type_question in answer_key.TYPES_QCM:
+                raise AutosaveError(f"La question {question_id} n'accepte pas de réponse texte.")
+            fields["reponse_texte"] = str(item.get("reponse_texte") or "")
+
+    choix = {c for fields in delta.values() for c in fields.get("choix_selectionnes", [])}
+    if choix:
+        owners = dict(Reponse.objects.filter(id__in=choix).values_list("id", "question_id"))
+        for question_id, fields in delta.items():
+            for c in fields.get("choix_selectionnes", []):
+                if owners.get(c) != question_id:
+                    raise AutosaveError(f"Le choix {c} n'appartient pas à la question {question_id}.")
+    return delta
+
+
+# ============================================================================
+# ÉCRITURE
+# ============================================================================
+
+def _upsert_reponses(passage_id, items):
+    if not items:
+        return
+    now = timezone.now()
+    through = ReponseQuestion.choix_selectionnes.through
+
+    existing = {
+        question_id: (reponse_id, texte, fichier)
+        for question_id, reponse_id, texte, fichier in ReponseQuestion.objects.filter(
+            passage_evaluation_id=passage_id, question_id__in=list(items)
+        ).order_by().values_list("question_id", "id", "reponse_texte", "fichier_reponse")
+    }
+    # Choix actuels des réponses dont le delta ne modifie pas les choix (pour le statut)
+    sans_choix = [
+        existing[q][0] for q, fields in items.items()
+        if q in existing and "choix_selectionnes" not in fields
+    ]
+    avec_choix_actuels = set(
+        through.objects.filter(reponsequestion_id__in=sans_choix).values_list("reponsequestion_id", flat=True)
+    ) if sans_choix else set()
+
+    rows = []
+    for question_id, fields in items.items():
+        reponse_id, texte, fichier = existing.get(question_id, (None, "", ""))
+        texte = fields.get("reponse_texte", texte)
+        if "choix_selectionnes" in fields:
+            a_choix = bool(fields["choix_selectionnes"])
+        else:
+            a_choix = reponse_id in avec_choix_actuels
+        rows.append(ReponseQuestion(
+            passage_evaluation_id=passage_id,
+            question_id=question_id,
+            reponse_texte=texte,
+            statut="repondu" if (a_choix or texte or fichier) else "non_repondu",
+            date_modification=now,
+        ))
+    ReponseQuestion.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["passage_evaluation", "question"],
+        update_fields=["reponse_texte", "statut", "date_modification"],
+    )
+
+    choix = {q: fields["choix_selectionnes"] for q, fields in items.items() if "choix_selectionnes" in fields}
+    if choix:
+        ids = dict(ReponseQuestion.objects.filter(
+            passage_evaluation_id=passage_id, question_id__in=list(choix)
+        ).values_list("question_id", "id"))
+        through.objects.filter(reponsequestion_id__in=list(ids.values())).delete()
+        through.objects.bulk_create([
+            through(reponsequestion_id=ids[q], reponse_id=c)
+            for q, selection in choix.items() for c in selection
+        ])
+
+
+@transaction.atomic
+def _write(passage_id, items, texte_passage, nouvelle, attendue=None):
+    """
+    Écrit le delta et pose la révision `nouvelle`.
+    attendue=None (vidage du tampon) : n'écrit que si la base est plus ancienne.
+    """
+    passages = PassageEvaluation.objects.filter(pk=passage_id, statut="en_cours")
+    passages = passages.filter(revision=attendue) if attendue is not None else passages.filter(revision__lt=nouvelle)
+    fields = {"revision": nouvelle}
+    if texte_passage is not None:
+        fields["reponse_texte"] = texte_passage
+    if not passages.update(**fields):
+        if attendue is None:
+            return False
+        courante, statut = PassageEvaluation.objects.filter(pk=passage_id).values_list("revision", "statut").first()
+        if statut != "en_cours":
+            raise AutosaveError("Impossible de sauvegarder après soumission.")
+        raise AutosaveError("Révision périmée : rechargez le passage.", 409, courante)
+
+    _upsert_reponses(passage_id, items)
+    if _debounce():
+        cache.set(_recent_key(passage_id), 1, _debounce())
+    return True
+
+
+# ============================================================================
+# POINT D'ENTRÉE
+# ============================================================================
+
+def autosave(passage, revision, delta, texte_passage=None):
+    """
+    Applique un delta à la révision `revision`.
+    Retourne (nouvelle révision, différé ?) ; lève AutosaveError (409 si périmée).
+    """
+    if passage.statut != "en_cours":
+        raise AutosaveError("Impossible de sauvegarder après soumission.")
+
+    buffered = cache.get(_buffer_key(passage.pk))
+    if buffered and buffered["revision"] <= passage.revision:
+        # Tampon déjà écrit, ou dépassé par une écriture directe
+        # (sauvegarde d'une réponse) : la base fait foi
+        buffered = None
+    courante = buffered["revision"] if buffered else passage.revision
+    if revision != courante:
+        raise AutosaveError("Révision périmée : rechargez le passage.", 409, courante)
+    nouvelle = courante + 1
+
+    debounce = _debounce()
+    if not debounce:
+        _write(passage.pk, delta, texte_passage, nouvelle, attendue=courante)
+        return nouvelle, False
+
+    # Réservation de la révision : la lecture du tampon et son écriture ne
+    # sont pas atomiques, deux sauvegardes concurrentes ne peuvent pas
+    # produire la même révision
+    reservation = _revision_key(passage.pk, nouvelle)
+    if not cache.add(reservation, 1, RESERVATION_TIMEOUT):
+        raise AutosaveError("Révision périmée : rechargez le passage.", 409, courante)
+    try:
+        if buffered or cache.get(_recent_key(passage.pk)):
+            # Fenêtre d'anti-rebond : fusion dans le tampon, écriture différée
+            buffered = buffered or {"items": {}, "texte": None}
+            buffered["revision"] = nouvelle
+            for question_id, fields in delta.items():
+                buffered["items"].setdefault(question_id, {}).update(fields)
+            if texte_passage is not None:
+                buffered["texte"] = texte_passage
+            cache.set(_buffer_key(passage.pk), buffered, _buffer_timeout())
+            # Après l'écriture du tampon : un flush qui démarre ensuite le verra
+            if cache.add(_flush_key(passage.pk), 1, _buffer_timeout()):
+                _planifier_flush(passage.pk, debounce)
+            return nouvelle, True
+
+        _write(passage.pk, delta, texte_passage, nouvelle, attendue=courante)
+        return nouvelle, False
+    except Exception:
+        cache.delete(reservation)
+        raise
+
+
+def flush(passage_id):
+    """
+    Écrit en base le tampon d'anti-rebond du passage ; retourne True si la
+    base a changé.
+
+    Le tampon n'est pas supprimé (il expire seul) : une sauvegarde qui le
+    complète pendant l'écriture ne peut pas être perdue ; elle replanifie
+    un flush puisque la marque de planification est retirée ici, d'abord.
+    Une fois écrit, sa révision n'est plus au-dessus de celle de la base et
+    autosave() l'ignore.
+    """
+    cache.delete(_flush_key(passage_id))
+    buffered = cache.get(_buffer_key(passage_id))
+    if not buffered:
+        return False
+    return _write(passage_id, buffered["items"], buffered["texte"], buffered["revision"])
+
+
+def _planifier_flush(passage_id, countdown):
+    try:
+        from master_backend_api.tasks import vider_autosave_passage
+        vider_autosave_passage.apply_async((passage_id,), countdown=countdown)
+    except Exception:
+        # Pas de broker : écriture immédiate plutôt qu'un tampon sans flush
+        logger.warning("[autosave] planification du flush impossible (passage %s)", passage_id, exc_info=True)
+        flush(passage_id)
@@ -0,0 +1,221 @@
+# evaluations/services/correction_lot.py
+"""
+Correction manuelle par lot (plusieurs réponses, plusieurs passages).
+
+    {"reponses": [{"id": 501, "points_obtenus": 1.5, "commentaire_correcteur": "…"}, …],
+     "passages": [{"id": 42, "commentaire_enseignant": "…"}, …],     ← optionnel
+     "finaliser": true}                                             ← défaut true
+
+- validation complète avant toute écriture (tout ou rien)
+- réponses écrites en un bulk_update
+- points de chaque passage touché recalculés en une requête d'agrégat
+  (GROUP BY passage) ; les passages dont toutes les réponses manuelles sont
+  corrigées passent en 'corrige' si finaliser ; la note d'un passage déjà
+  corrigé est ajustée de la variation des points — un bulk_update pour l'ensemble
+- passages verrouillés (select_for_update) avant la lecture des réponses
+- bulk_update ne déclenche pas post_save : passages corrigés ou renotés
+  notifiés après commit, une notification par type et par apprenant (et
+  tuteur) pour tout le lot, avec les alertes de la correction unitaire ;
+  statistiques matérialisées rafraîchies une fois par évaluation,
+  statistiques des apprenants concernés invalidées
+"""
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from evaluations.models import PassageEvaluation, ReponseQuestion
+from evaluations.services import file_correction, statistiques, stats_apprenants
+
+
+class CorrectionLotError(Exception):
+    """Lot refusé ; errors détaille les éléments invalides."""
+
+    def __init__(self, message, errors=None, http_status=400):
+        super().__init__(message)
+        self.errors = errors or []
+        self.http_status = http_status
+
+
+def max_lot():
+    return getattr(settings, "CORRECTION_LOT_MAX", 500)
+
+
+# ============================================================================
+# VALIDATION
+# ============================================================================
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _charger(user, items, peut_corriger):
+    """Réponses du lot, validées ; lève CorrectionLotError avec toutes les erreurs."""
+    if not isinstance(items, list) or not items:
+        raise CorrectionLotError("'reponses' doit être une liste non vide.")
+    if len(items) > max_lot():
+        raise CorrectionLotError(f"Lot limité à {max_lot()} réponses.")
+
+    ids = [i for i in (item.get("id") for item in items if isinstance(item, dict)) if isinstance(i, int)]
+    # Passages verrouillés avant la lecture des réponses : une correction
+    # concurrente des mêmes copies attend la fin du lot, dont les variations
+    # de note partent de l'état relu ici
+    passages = PassageEvaluation.objects.select_for_update(of=("self",)).select_related(
+        "evaluation__cours",
+    ).order_by("pk").in_bulk(list(set(
+        ReponseQuestion.objects.filter(id__in=ids).values_list("passage_evaluation_id", flat=True)
+    )))
+    reponses = {
+        rid: reponse
+        for rid, reponse in ReponseQuestion.objects.select_related("question").in_bulk(ids).items()
+        if reponse.passage_evaluation_id in passages
+    }
+    for reponse in reponses.values():
+        reponse.passage_evaluation = passages[reponse.passage_evaluation_id]
+
+    errors, vus = [], set()
+    for index, item in enumerate(items):
+        rid = item.get("id") if isinstance(item, dict) else None
+        reponse = reponses.get(rid)
+        if reponse is None:
+            errors.append({"index": index, "id": rid, "detail": "Réponse introuvable."})
+            continue
+        if rid in vus:
+            errors.append({"index": index, "id": rid, "detail": "Réponse en double dans le lot."})
+            continue
+        vus.add(rid)
+
+        passage = reponse.passage_evaluation
+        points = _float(item.get("points_obtenus"))
+        if not peut_corriger(passage.evaluation.cours):
+            detail = "Accès refusé."
+        elif reponse.question.mode_correction == "automatique":
+            detail = "Cette question est corrigée automatiquement."
+        elif passage.statut not in ("soumis", "corrige"):
+            detail = "Le passage doit être soumis pour être corrigé."
+        elif file_correction.reservee_par_autre(passage, user):
+            detail = "Copie réservée par un autre correcteur."
+        elif points is None or points < 0 or points > reponse.question.points:
+            detail = f"points_obtenus doit être compris entre 0 et {reponse.question.points}."
+        else:
+            continue
+        errors.append({"index": index, "id": rid, "detail": detail})
+
+    if errors:
+        raise CorrectionLotError("Lot invalide : aucune correction enregistrée.", errors)
+    return [(reponses[item["id"]], item) for item in items]
+
+
+# ============================================================================
+# ÉCRITURE
+# ============================================================================
+
+@transaction.atomic
+def corriger_lot(user, items, passages_items=None, finaliser=True, peut_corriger=lambda cours: True):
+    """
+    Applique le lot. Retourne {nb_reponses, passages: [{id, statut, note, reste_a_corriger}]}.
+    peut_corriger(cours) : contrôle d'accès du correcteur.
+    """
+    lot = _charger(user, items, peut_corriger)
+    now = timezone.now()
+
+    reponses, deltas = [], defaultdict(float)
+    for reponse, item in lot:
+        points = _float(item["points_obtenus"])
+        deltas[reponse.passage_evaluation_id] += points - float(reponse.points_obtenus or 0)
+        reponse.points_obtenus = points
+        if "commentaire_correcteur" in item:
+            reponse.commentaire_correcteur = str(item.get("commentaire_correcteur") or "")
+        reponse.statut = "corrige"
+        reponse.date_correction = now
+        reponse.date_modification = now
+        reponses.append(reponse)
+    ReponseQuestion.objects.bulk_update(
+        reponses, ["points_obtenus", "commentaire_correcteur", "statut", "date_correction", "date_modification"]
+    )
+
+    passages = {r.passage_evaluation_id: r.passage_evaluation for r in reponses}
+    commentaires = {
+        p.get("id"): str(p.get("commentaire_enseignant") or "")
+        for p in passages_items or [] if isinstance(p, dict) and p.get("id") in passages
+    }
+
+    # Points et réponses manuelles restantes de chaque passage, en une requête
+    totaux = {
+        row["passage_evaluation_id"]: row
+        for row in ReponseQuestion.objects.filter(passage_evaluation_id__in=list(passages))
+        .order_by().values("passage_evaluation_id").annotate(
+            total=Sum("points_obtenus"),
+            reste=Count("id", filter=Q(question__mode_correction="manuelle",
+                                       statut__in=("non_repondu", "repondu"))),
+        )
+    }
+
+    modifies, corriges, resultat = [], [], []
+    for passage_id, passage in passages.items():
+        row = totaux.get(passage_id, {"total": 0, "reste": 0})
+        total = round(float(row["total"] or 0), 2)
+        if passage_id in commentaires:
+            passage.commentaire_enseignant = commentaires[passage_id]
+        if passage.statut == "corrige":
+            # Recorrection : variation des points, l'ajustement de l'enseignant est conservé
+            note = max(0.0, round(float(passage.note or 0) + deltas[passage_id], 2))
+            if note != passage.note:
+                corriges.append(passage)
+            passage.note = note
+        elif finaliser and not row["reste"] and passage.evaluation.type_evaluation != "simple":
+            passage.note = total
+            passage.statut = "corrige"
+            passage.date_correction = now
+            passage.reserve_par = None
+            passage.reservation_expire_le = None
+            corriges.append(passage)
+        modifies.append(passage)
+        resultat.append({"id": passage_id, "statut": passage.statut, "note": passage.note,
+                         "reste_a_corriger": row["reste"]})
+
+    PassageEvaluation.objects.bulk_update(modifies, [
+        "note", "statut", "date_correction", "commentaire_enseignant",
+        "reserve_par", "reservation_expire_le",
+    ])
+    for evaluation_id in {p.evaluation_id for p in modifies}:
+        statistiques.planifier_rafraichissement(evaluation_id)
+    stats_apprenants.invalidate(*(p.apprenant_id for p in modifies))
+    if corriges:
+        transaction.on_commit(lambda: notifier_resultats(corriges))
+
+    return {"nb_reponses": len(reponses), "passages": resultat}
+
+
+# ============================================================================
+# NOTIFICATIONS
+# ============================================================================
+
+def notifier_resultats(passages):
+    """
+    Résultats du lot (passages corrigés ou renotés) regroupés par apprenant :
+    mêmes notifications qu'une correction unitaire — résultat, alertes de
+    progression faible et d'encouragement (notifications/services/resultats.py)
+    — mais une par type et par destinataire pour tous ses passages.
+    """
+    from notifications.services import resultats
+    from notifications.services.fanout import FanOut
+    from users.models import Apprenant
+
+    par_apprenant = defaultdict(list)
+    for passage in passages:
+        par_apprenant[passage.apprenant_id].append((passage.pk, passage.evaluation, passage.note))
+    apprenants = Apprenant.objects.in_bulk(list(par_apprenant))
+
+    fo = FanOut("correction_lot")
+    for apprenant_id, siens in par_apprenant.items():
+        apprenant = apprenants.get(apprenant_id)
+        if apprenant is not None:
+            resultats.ajouter(fo, apprenant, siens)
+    return fo.envoyer()
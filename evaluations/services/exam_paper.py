@@ -0,0 +1,155 @@
+# evaluations/services/exam_paper.py
+"""
+Sujet d'examen pré-rendu (mode « rush » au démarrage d'une évaluation).
+
+Le sujet masqué (questions + choix, sans est_correcte) est rendu une fois
+en octets JSON par évaluation — et par variante mélangée si
+EXAM_PAPER_VARIANTS > 1 — puis mis en cache et servi tel quel. Seules les
+réponses de l'apprenant sont lues à chaque appel :
+
+    {"success": …, "data": {<passage>, "reponses_questions": […],
+                            "evaluation_detail": <octets en cache>}}
+
+- rendu au moment de la publication (warm)
+- clé versionnée par évaluation : invalidée par les modifications de
+  l'évaluation, de ses questions et de leurs choix (evaluations/signals.py)
+- sans cache partagé (EXAM_PAPER_CACHE_TIMEOUT = 0), rendu à chaque appel :
+  une invalidation en mémoire locale n'atteindrait pas les autres processus
+"""
+
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from evaluations.models import ReponseQuestion
+from evaluations.serializers import (
+    PassageEvaluationSerializer, QuestionSerializer, ReponseQuestionSerializer,
+)
+from evaluations.services import answer_key
+
+
+CACHE_PREFIX = "exam_paper"
+
+
+def _timeout():
+    return getattr(settings, "EXAM_PAPER_CACHE_TIMEOUT", 6 * 3600)
+
+
+def nb_variantes():
+    return max(getattr(settings, "EXAM_PAPER_VARIANTS", 0) or 0, 0)
+
+
+def variante_for(apprenant_id):
+    """Variante attribuée à un apprenant (None si le mélange est désactivé)."""
+    n = nb_variantes()
+    return apprenant_id % n if n > 1 else None
+
+
+def _version_key(evaluation_id):
+    return f"{CACHE_PREFIX}:ver:{evaluation_id}"
+
+
+def _get_version(evaluation_id):
+    key = _version_key(evaluation_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate(*evaluation_ids):
+    """Rend caduc le sujet pré-rendu des évaluations données (après commit)."""
+    evaluation_ids = {e for e in evaluation_ids if e}
+    if not evaluation_ids or _timeout() <= 0:
+        return
+
+    def _bump():
+        for evaluation_id in evaluation_ids:
+            cache.set(_version_key(evaluation_id), time.time_ns(), None)
+
+    transaction.on_commit(_bump)
+
+
+# ============================================================================
+# RENDU DU SUJET
+# ============================================================================
+
+def _render(evaluation, variante):
+    questions = QuestionSerializer(
+        evaluation.questions.prefetch_related("reponses_predefinies").all(), many=True
+    ).data
+    for question in questions:
+        for reponse in question.get("reponses_predefinies", []):
+            reponse.pop("est_correcte", None)
+
+    if variante is not None:
+        # Mélange déterministe : une variante donnée est toujours identique
+        rnd = random.Random(f"{evaluation.id}:{variante}")
+        rnd.shuffle(questions)
+        for question in questions:
+            rnd.shuffle(question["reponses_predefinies"])
+
+    return JSONRenderer().render({
+        "id": evaluation.id,
+        "titre": evaluation.titre,
+        "type_evaluation": evaluation.type_evaluation,
+        "bareme": evaluation.bareme,
+        "duree_minutes": evaluation.duree_minutes,
+        "consigne_texte": evaluation.consigne_texte,
+        "fichier_sujet": evaluation.fichier_sujet.url if evaluation.fichier_sujet else None,
+        "date_debut": evaluation.date_debut,
+        "date_fin": evaluation.date_fin,
+        "est_auto_corrigeable": answer_key.est_auto_corrigeable(
+            evaluation, answer_key.for_evaluation(evaluation.id)
+        ),
+        "variante": variante,
+        "questions": questions,
+    })
+
+
+def paper_bytes(evaluation, variante=None, rebuild=False):
+    """Sujet masqué de l'évaluation, en octets JSON, depuis le cache."""
+    if _timeout() <= 0:
+        return _render(evaluation, variante)
+    key = f"{CACHE_PREFIX}:{evaluation.id}:{_get_version(evaluation.id)}:{variante}"
+    paper = None if rebuild else cache.get(key)
+    if paper is None:
+        paper = _render(evaluation, variante)
+        cache.set(key, paper, _timeout())
+    return paper
+
+
+def warm(evaluation):
+    """Rend et met en cache le sujet (toutes les variantes) à la publication."""
+    if _timeout() <= 0:
+        return
+    n = nb_variantes()
+    for variante in (range(n) if n > 1 else [None]):
+        paper_bytes(evaluation, variante, rebuild=True)
+
+
+# ============================================================================
+# PASSAGE + SUJET
+# ============================================================================
+
+def passage_bytes(passage):
+    """
+    data d'un passage en cours : champs du passage, réponses de l'apprenant
+    (lues en une passe) et sujet masqué pré-rendu.
+    """
+    renderer = JSONRenderer()
+    reponses = ReponseQuestion.objects.filter(passage_evaluation=passage) \
+        .select_related("question").prefetch_related("choix_selectionnes")
+
+    head = renderer.render({
+        **PassageEvaluationSerializer(passage).data,
+        "reponses_questions": ReponseQuestionSerializer(reponses, many=True).data,
+    })
+    paper = paper_bytes(passage.evaluation, variante_for(passage.apprenant_id))
+    return head[:-1] + b',"evaluation_detail":' + paper + b"}"
+
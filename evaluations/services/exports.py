@@ -0,0 +1,100 @@
+# evaluations/services/exports.py
+"""
+Lignes d'export des passages d'une évaluation (résumé / détail).
+
+Mémoire constante quel que soit le nombre de passages : les lignes sont
+produites par des générateurs sur .iterator(chunk_size=…) (les prefetch des
+choix sélectionnés sont faits par paquet), puis écrites en CSV / XLSX par
+core/exports.py.
+"""
+
+from django.conf import settings
+
+from evaluations.models import PassageEvaluation, ReponseQuestion
+from evaluations.services import answer_key
+
+
+ENTETES_RESUME = [
+    "evaluation_id", "evaluation", "cours", "apprenant_id", "nom", "prenom",
+    "email", "statut", "note", "bareme", "pourcentage",
+    "date_debut", "date_soumission", "date_correction",
+]
+ENTETES_DETAIL = [
+    "evaluation_id", "evaluation", "cours", "apprenant_id", "nom", "prenom",
+    "email", "statut_passage", "question_id", "ordre", "type_question", "enonce",
+    "statut_reponse", "points_obtenus", "points_question",
+    "reponse_texte", "fichier_reponse", "choix_selectionnes",
+]
+
+
+def _chunk_size():
+    return getattr(settings, "EXPORT_CHUNK_SIZE", 2000)
+
+
+def _user_info(apprenant):
+    return (
+        getattr(apprenant, 'nom', '') or '',
+        getattr(apprenant, 'prenom', '') or '',
+        getattr(apprenant, 'email', '') or '',
+    )
+
+
+def nom_fichier(evaluation, detail, export_format):
+    return f"evaluation_{evaluation.id}_{'detail' if detail else 'resume'}.{export_format}"
+
+
+# ============================================================================
+# LIGNES
+# ============================================================================
+
+def lignes_resume(evaluation):
+    """Une ligne par passage."""
+    cours = evaluation.cours.titre if evaluation.cours else ""
+    passages = (
+        PassageEvaluation.objects
+        .select_related("apprenant", "evaluation")
+        .filter(evaluation=evaluation)
+        .order_by("apprenant__nom", "apprenant__prenom", "id")
+    )
+    for p in passages.iterator(chunk_size=_chunk_size()):
+        pct = p.pourcentage()
+        yield [
+            evaluation.id, evaluation.titre, cours,
+            p.apprenant_id, *_user_info(p.apprenant),
+            p.statut, p.note if p.note is not None else "", evaluation.bareme,
+            pct if pct is not None else "",
+            p.date_debut, p.date_soumission, p.date_correction,
+        ]
+
+
+def lignes_detail(evaluation):
+    """Une ligne par réponse de passage ; textes des choix lus depuis le prefetch."""
+    cours = evaluation.cours.titre if evaluation.cours else ""
+    key = answer_key.for_evaluation(evaluation.id)
+    reponses = (
+        ReponseQuestion.objects
+        .select_related("passage_evaluation", "passage_evaluation__apprenant", "question")
+        .prefetch_related("choix_selectionnes")
+        .filter(passage_evaluation__evaluation=evaluation)
+        .order_by("passage_evaluation__apprenant__nom", "passage_evaluation__apprenant__prenom",
+                  "passage_evaluation_id", "question__ordre")
+    )
+    for rq in reponses.iterator(chunk_size=_chunk_size()):
+        p = rq.passage_evaluation
+        entry = key.get(rq.question_id)
+        yield [
+            evaluation.id, evaluation.titre, cours,
+            p.apprenant_id, *_user_info(p.apprenant), p.statut,
+            rq.question_id, rq.question.ordre,
+            entry.type_question if entry else rq.question.type_question,
+            (rq.question.enonce_texte or '')[:200], rq.statut, rq.points_obtenus,
+            entry.points if entry else rq.question.points, (rq.reponse_texte or '')[:200],
+            rq.fichier_reponse.url if rq.fichier_reponse else "",
+            "; ".join(c.texte for c in rq.choix_selectionnes.all()),
+        ]
+
+
+def entetes_et_lignes(evaluation, detail):
+    if detail:
+        return ENTETES_DETAIL, lignes_detail(evaluation)
+    return ENTETES_RESUME, lignes_resume(evaluation)
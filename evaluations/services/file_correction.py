@@ -0,0 +1,163 @@
+# evaluations/services/file_correction.py
+"""
+File de correction partagée entre correcteurs.
+
+- file des passages 'soumis' du périmètre du correcteur, paginée par
+  curseur (keyset) sur (date_soumission, id) : plus ancienne copie d'abord
+- décompte par évaluation en une requête d'agrégat (GROUP BY evaluation)
+- réservation d'un lot avec bail (CORRECTION_RESERVATION_MINUTES) :
+    * SELECT … FOR UPDATE SKIP LOCKED si la base le permet (PostgreSQL, MySQL 8)
+    * sinon (SQLite) UPDATE conditionnel « encore libre » sur les candidats,
+      puis relecture des lignes obtenues : SQLite sérialise les écritures,
+      deux correcteurs ne peuvent obtenir la même copie
+- un bail expiré rend la copie de nouveau disponible sans intervention ;
+  les champs sont remis à zéro par la tâche liberer_reservations_expirees
+  et à la correction du passage
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from evaluations.models import PassageEvaluation
+
+
+def _bail():
+    return timedelta(minutes=getattr(settings, "CORRECTION_RESERVATION_MINUTES", 30))
+
+
+def max_lot():
+    return getattr(settings, "CORRECTION_RESERVATION_MAX_LOT", 50)
+
+
+def _libre(user, now):
+    """Copies non réservées, au bail expiré, ou déjà réservées par user."""
+    return (
+        Q(reserve_par__isnull=True)
+        | Q(reservation_expire_le__lte=now)
+        | Q(reserve_par_id=user.id)
+    )
+
+
+def _reservee_par_autre(user, now):
+    return Q(reserve_par__isnull=False, reservation_expire_le__gt=now) & ~Q(reserve_par_id=user.id)
+
+
+# ============================================================================
+# PÉRIMÈTRE ET LECTURE
+# ============================================================================
+
+def perimetre(user, role, annee_scolaire_id=None, enseignant_id=None, evaluation_id=None):
+    """Passages soumis (à corriger) visibles par le correcteur."""
+    qs = PassageEvaluation.objects.filter(statut='soumis')
+    if role in ('Admin', 'ResponsableAcademique'):
+        qs = qs.filter(evaluation__cours__institution_id=getattr(user, 'institution_id', None))
+    elif role == 'Formateur':
+        qs = qs.filter(evaluation__cours__enseignant=user)
+    else:
+        return qs.none()
+    if annee_scolaire_id:
+        qs = qs.filter(evaluation__cours__annee_scolaire_id=annee_scolaire_id)
+    if enseignant_id:
+        qs = qs.filter(evaluation__enseignant_id=enseignant_id)
+    if evaluation_id:
+        qs = qs.filter(evaluation_id=evaluation_id)
+    return qs
+
+
+def file_attente(qs, user, disponibles_seulement=False):
+    """Queryset de la file (date_soumission renseignée), libres seulement si demandé."""
+    qs = qs.filter(date_soumission__isnull=False)
+    if disponibles_seulement:
+        qs = qs.filter(_libre(user, timezone.now()))
+    return qs
+
+
+def decompte_par_evaluation(qs, user):
+    """
+    [{evaluation_id, titre, nb_a_corriger, nb_reservees_autres, nb_reservees_moi,
+    plus_ancienne}] en une requête.
+    """
+    now = timezone.now()
+    return [
+        {
+            'evaluation_id': row['evaluation_id'],
+            'titre': row['evaluation__titre'],
+            'nb_a_corriger': row['nb'],
+            'nb_reservees_autres': row['nb_reservees'],
+            'nb_reservees_moi': row['nb_moi'],
+            'plus_ancienne': row['plus_ancienne'],
+        }
+        for row in qs.order_by().values('evaluation_id', 'evaluation__titre').annotate(
+            nb=Count('id'),
+            nb_reservees=Count('id', filter=_reservee_par_autre(user, now)),
+            nb_moi=Count('id', filter=Q(reserve_par_id=user.id, reservation_expire_le__gt=now)),
+            plus_ancienne=Min('date_soumission'),
+        ).order_by('plus_ancienne')
+    ]
+
+
+# ============================================================================
+# RÉSERVATION
+# ============================================================================
+
+@transaction.atomic
+def reserver(qs, user, nombre):
+    """
+    Réserve jusqu'à `nombre` copies libres (plus anciennes d'abord) pour user.
+    Retourne la liste des ids réservés (bail renouvelé pour ses propres copies).
+    """
+    now = timezone.now()
+    expire = now + _bail()
+    candidats = file_attente(qs, user, disponibles_seulement=True).order_by('date_soumission', 'id')
+
+    if connection.features.has_select_for_update_skip_locked:
+        of = ('self',) if connection.features.has_select_for_update_of else ()
+        ids = list(
+            candidats.select_for_update(skip_locked=True, of=of)
+            .values_list('id', flat=True)[:nombre]
+        )
+        PassageEvaluation.objects.filter(id__in=ids).update(reserve_par=user, reservation_expire_le=expire)
+        return ids
+
+    # Repli sans SKIP LOCKED : UPDATE conditionnel, puis relecture de ce qui a été obtenu
+    obtenus = []
+    for _ in range(3):
+        ids = list(candidats.exclude(id__in=obtenus).values_list('id', flat=True)[:nombre - len(obtenus)])
+        if not ids:
+            break
+        PassageEvaluation.objects.filter(id__in=ids, statut='soumis').filter(_libre(user, now)).update(
+            reserve_par=user, reservation_expire_le=expire
+        )
+        obtenus += PassageEvaluation.objects.filter(
+            id__in=ids, reserve_par=user, reservation_expire_le=expire
+        ).order_by('date_soumission', 'id').values_list('id', flat=True)
+        if len(obtenus) >= nombre:
+            break
+    return obtenus
+
+
+def liberer(user, passage_ids=None):
+    """Rend les copies réservées par user (toutes si passage_ids est None)."""
+    qs = PassageEvaluation.objects.filter(reserve_par=user)
+    if passage_ids is not None:
+        qs = qs.filter(id__in=passage_ids)
+    return qs.update(reserve_par=None, reservation_expire_le=None)
+
+
+def liberer_expirees():
+    """Remet à zéro les réservations au bail expiré ; retourne leur nombre."""
+    return PassageEvaluation.objects.filter(reservation_expire_le__lte=timezone.now()).update(
+        reserve_par=None, reservation_expire_le=None
+    )
+
+
+def reservee_par_autre(passage, user):
+    """Vrai si la copie est sous bail d'un autre correcteur."""
+    return bool(
+        passage.reserve_par_id and passage.reserve_par_id != user.id
+        and passage.reservation_expire_le and passage.reservation_expire_le > timezone.now()
+    )
@@ -0,0 +1,227 @@
+# evaluations/services/grading.py
+"""
+Moteur de correction automatique (QCM) par lots.
+
+- le corrigé compilé d'une évaluation / d'un quiz est lu depuis le cache
+  (services/answer_key.py)
+- toutes les sélections des réponses traitées sont lues en une requête
+  sur la table de liaison M2M choix_selectionnes
+- les points sont calculés en mémoire puis écrits par bulk_update
+
+Correction d'un passage ≈ 4 requêtes (corrigé en cache) quel que soit le
+nombre de questions ; recorrection de tous les passages d'une évaluation en une passe
+(regrade_evaluation) après modification du corrigé. Les statistiques
+matérialisées de l'évaluation sont rafraîchies après commit (services/statistiques.py).
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from evaluations.models import PassageEvaluation, ReponseQuestion, PassageQuiz, ReponseQuiz
+from evaluations.services import answer_key, statistiques, stats_apprenants
+
+
+# ============================================================================
+# BARÈME
+# ============================================================================
+
+def score_choices(entry, selected):
+    """Points d'une réponse QCM (None si la question n'est pas un QCM)."""
+    if entry.type_question == "choix_unique":
+        # Tout ou rien
+        return entry.points if selected == entry.correctes else 0.0
+    if entry.type_question == "choix_multiple":
+        # Proportionnel : (bonnes - mauvaises) / total_correct * points_max
+        if not entry.correctes:
+            return 0.0
+        bonnes = len(selected & entry.correctes)
+        mauvaises = len(selected - entry.correctes)
+        return max(0, (bonnes - mauvaises) / len(entry.correctes) * entry.points)
+    return None
+
+
+# ============================================================================
+# NOYAU
+# ============================================================================
+
+def _selections(model, answer_ids):
+    """{id réponse apprenant: {ids Reponse sélectionnés}} en une requête."""
+    if not answer_ids:
+        return {}
+    field = model._meta.get_field("choix_selectionnes")
+    src, dst = field.m2m_field_name(), field.m2m_reverse_field_name()
+    out = defaultdict(set)
+    for answer_id, reponse_id in field.remote_field.through.objects.filter(
+        **{f"{src}_id__in": answer_ids}
+    ).values_list(f"{src}_id", f"{dst}_id"):
+        out[answer_id].add(reponse_id)
+    return out
+
+
+def _grade(model, answers, key, extra=None):
+    """
+    Calcule les points des réponses auto-corrigées et les écrit en un bulk_update.
+    extra : {champ: valeur} posés sur chaque ligne corrigée.
+    Retourne la liste des réponses modifiées (instances mises à jour en mémoire).
+    """
+    extra = extra or {}
+    auto = [
+        a for a in answers
+        if a.question_id in key and key[a.question_id].mode_correction == "automatique"
+    ]
+    selections = _selections(model, [a.id for a in auto])
+
+    graded = []
+    for answer in auto:
+        points = score_choices(key[answer.question_id], selections.get(answer.id, set()))
+        if points is None:
+            continue
+        answer.points_obtenus = points
+        for field, value in extra.items():
+            setattr(answer, field, value)
+        graded.append(answer)
+
+    if graded:
+        model.objects.bulk_update(graded, ["points_obtenus", *extra])
+    return graded
+
+
+def _extra_reponse_question(now):
+    # bulk_update ne renseigne pas les champs auto_now
+    return {"statut": "corrige", "date_correction": now, "date_modification": now}
+
+
+def grade_answer(answer):
+    """
+    Correction d'une réponse isolée (ReponseQuestion ou ReponseQuiz).
+    Retourne les points, ou None si la question n'est pas auto-corrigée.
+    """
+    key = answer_key.for_question(answer.question_id)
+    extra = _extra_reponse_question(timezone.now()) if isinstance(answer, ReponseQuestion) else {}
+    if not _grade(type(answer), [answer], key, extra):
+        return None
+    return answer.points_obtenus
+
+
+# ============================================================================
+# ÉVALUATIONS
+# ============================================================================
+
+def _grade_evaluation_answers(passage_ids, key, now):
+    """
+    Corrige les réponses QCM des passages donnés.
+    Retourne ({passage_id: total des points}, {passage_id: variation des points}).
+    """
+    answers = list(
+        ReponseQuestion.objects.filter(passage_evaluation_id__in=passage_ids)
+        .order_by()
+        .only("id", "passage_evaluation_id", "question_id", "points_obtenus")
+    )
+    avant = {a.id: float(a.points_obtenus or 0) for a in answers}
+    _grade(ReponseQuestion, answers, key, _extra_reponse_question(now))
+
+    totaux, deltas = defaultdict(float), defaultdict(float)
+    for a in answers:
+        points = float(a.points_obtenus or 0)
+        totaux[a.passage_evaluation_id] += points
+        deltas[a.passage_evaluation_id] += points - avant[a.id]
+    return totaux, deltas
+
+
+@transaction.atomic
+def corriger_soumission(passage):
+    """
+    Correction à la soumission d'un passage d'évaluation structurée :
+    - 100 % QCM : points + note finale, statut 'corrige' → True
+    - mixte     : seuls les QCM sont corrigés, le passage attend l'enseignant → False
+    """
+    key = answer_key.for_evaluation(passage.evaluation_id)
+    now = timezone.now()
+    totaux, _ = _grade_evaluation_answers([passage.id], key, now)
+    statistiques.planifier_rafraichissement(passage.evaluation_id)
+
+    if not answer_key.est_auto_corrigeable(passage.evaluation, key):
+        return False
+
+    passage.note = totaux.get(passage.id, 0.0)
+    passage.statut = "corrige"
+    passage.date_correction = now
+    passage.save(update_fields=["note", "statut", "date_correction"])
+    return True
+
+
+@transaction.atomic
+def regrade_evaluation(evaluation):
+    """
+    Recorrige en une passe tous les passages soumis / corrigés d'une évaluation
+    (après correction du corrigé). La note d'un passage déjà corrigé est
+    ajustée de la variation des points QCM : les points manuels et un
+    éventuel ajustement de l'enseignant sont conservés.
+    Retourne le nombre de passages traités.
+    """
+    key = answer_key.for_evaluation(evaluation.id)
+    passages = list(
+        PassageEvaluation.objects.filter(evaluation=evaluation, statut__in=("soumis", "corrige"))
+        .order_by()
+        .only("id", "apprenant_id", "statut", "note")
+    )
+    if not passages:
+        return 0
+
+    _, deltas = _grade_evaluation_answers([p.id for p in passages], key, timezone.now())
+    statistiques.planifier_rafraichissement(evaluation.id)
+
+    renotes = []
+    for passage in passages:
+        delta = deltas.get(passage.id, 0.0)
+        if passage.statut == "corrige" and passage.note is not None and delta:
+            passage.note = max(0.0, passage.note + delta)
+            renotes.append(passage)
+    if renotes:
+        PassageEvaluation.objects.bulk_update(renotes, ["note"])
+        stats_apprenants.invalidate(*(p.apprenant_id for p in renotes))
+    return len(passages)
+
+
+# ============================================================================
+# QUIZ
+# ============================================================================
+
+@transaction.atomic
+def calculer_score_quiz(passage):
+    """Corrige toutes les réponses d'un passage de quiz et enregistre le score."""
+    key = answer_key.for_quiz(passage.quiz_id)
+    answers = list(
+        ReponseQuiz.objects.filter(passage_quiz=passage)
+        .order_by()
+        .only("id", "passage_quiz_id", "question_id", "points_obtenus")
+    )
+    _grade(ReponseQuiz, answers, key)
+
+    passage.score = sum(float(a.points_obtenus or 0) for a in answers)
+    passage.save(update_fields=["score"])
+    return passage.score
+
+
+@transaction.atomic
+def regrade_quiz(quiz):
+    """Recalcule les points et le score de tous les passages terminés d'un quiz."""
+    key = answer_key.for_quiz(quiz.id)
+    passages = list(PassageQuiz.objects.filter(quiz=quiz, termine=True).order_by().only("id", "apprenant_id", "score"))
+    answers = list(
+        ReponseQuiz.objects.filter(passage_quiz_id__in=[p.id for p in passages])
+        .order_by()
+        .only("id", "passage_quiz_id", "question_id", "points_obtenus")
+    )
+    _grade(ReponseQuiz, answers, key)
+
+    scores = defaultdict(float)
+    for a in answers:
+        scores[a.passage_quiz_id] += float(a.points_obtenus or 0)
+    for passage in passages:
+        passage.score = scores.get(passage.id, 0.0)
+    PassageQuiz.objects.bulk_update(passages, ["score"])
+    stats_apprenants.invalidate(*(p.apprenant_id for p in passages))
+    return len(passages)
@@ -0,0 +1,185 @@
+# evaluations/services/statistiques.py
+"""
+Statistiques d'évaluation matérialisées (EvaluationStats / QuestionStats).
+
+Calcul en deux requêtes d'agrégats conditionnels :
+  1. PassageEvaluation : comptes par statut, somme / min / max des notes,
+     nombre de réussites (note >= barème / 2)
+  2. ReponseQuestion GROUP BY question_id (passages soumis ou corrigés) :
+     réponses, réponses à points pleins, réponses corrigées, somme des points
+
+Les tables sont rafraîchies (upsert) après commit, à chaque correction
+(automatique, manuelle, recorrection), soumission ou création / suppression
+de passage, ainsi qu'à la modification des points d'une question ou du
+barème de l'évaluation (evaluations/signals.py). L'endpoint de statistiques ne fait alors que les lire.
+Min / max ne se maintiennent pas par deltas : chaque rafraîchissement
+recalcule l'évaluation entière, de façon ensembliste.
+
+Un seul rafraîchissement par évaluation et par transaction (la correction
+et le post_save du passage le demandent tous deux) ; la ligne
+EvaluationStats est verrouillée pendant le calcul, de sorte que deux
+rafraîchissements concurrents s'exécutent l'un après l'autre et que le
+dernier écrit lit l'état le plus récent.
+"""
+
+import threading
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.db.models.functions import Coalesce
+
+from evaluations.models import (
+    Evaluation, EvaluationStats, PassageEvaluation, Question, QuestionStats, ReponseQuestion,
+)
+
+
+STATUTS_SOUMIS = ("soumis", "corrige")
+
+
+# ============================================================================
+# CALCUL
+# ============================================================================
+
+def _stats_passages(evaluation):
+    corrige = Q(statut="corrige", note__isnull=False)
+    return PassageEvaluation.objects.filter(evaluation_id=evaluation.id).aggregate(
+        nb_passages=Count("id"),
+        nb_passages_soumis=Count("id", filter=Q(statut="soumis")),
+        nb_passages_corriges=Count("id", filter=Q(statut="corrige")),
+        nb_passages_en_cours=Count("id", filter=Q(statut="en_cours")),
+        nb_notes=Count("id", filter=corrige),
+        somme_notes=Coalesce(Sum("note", filter=corrige), 0.0),
+        note_min=Min("note", filter=corrige),
+        note_max=Max("note", filter=corrige),
+        nb_reussites=Count("id", filter=corrige & Q(note__gte=evaluation.bareme / 2)),
+    )
+
+
+def _stats_questions(evaluation_id):
+    corrige = Q(statut="corrige")
+    return {
+        row.pop("question_id"): row
+        for row in ReponseQuestion.objects.filter(
+            passage_evaluation__evaluation_id=evaluation_id,
+            passage_evaluation__statut__in=STATUTS_SOUMIS,
+        ).order_by().values("question_id").annotate(
+            nb_reponses=Count("id", filter=~Q(statut="non_repondu")),
+            nb_correctes=Count("id", filter=Q(points_obtenus=F("question__points"))),
+            nb_corriges=Count("id", filter=corrige),
+            somme_points_corriges=Coalesce(Sum("points_obtenus", filter=corrige), 0.0),
+        )
+    }
+
+
+@transaction.atomic
+def rafraichir(evaluation):
+    """Recalcule et enregistre les statistiques de l'évaluation."""
+    # Ligne créée si besoin puis verrouillée avant les agrégats
+    EvaluationStats.objects.bulk_create([EvaluationStats(evaluation_id=evaluation.id)], ignore_conflicts=True)
+    list(EvaluationStats.objects.select_for_update().filter(pk=evaluation.id).values_list("pk", flat=True))
+
+    stats = EvaluationStats(evaluation_id=evaluation.id, **_stats_passages(evaluation))
+    champs = [f.name for f in EvaluationStats._meta.concrete_fields if f.name != "evaluation"]
+    EvaluationStats.objects.bulk_create(
+        [stats], update_conflicts=True, unique_fields=["evaluation"], update_fields=champs,
+    )
+
+    par_question = _stats_questions(evaluation.id)
+    vide = {"nb_reponses": 0, "nb_correctes": 0, "nb_corriges": 0, "somme_points_corriges": 0.0}
+    question_ids = Question.objects.filter(evaluation_id=evaluation.id).values_list("id", flat=True)
+    champs = [f.name for f in QuestionStats._meta.concrete_fields if f.name != "question"]
+    QuestionStats.objects.bulk_create(
+        [
+            QuestionStats(question_id=qid, evaluation_id=evaluation.id, **par_question.get(qid, vide))
+            for qid in question_ids
+        ],
+        update_conflicts=True, unique_fields=["question"], update_fields=champs,
+    )
+    return stats
+
+
+_lots = threading.local()
+
+
+def _rafraichir_ids(evaluation_ids):
+    for evaluation in Evaluation.objects.filter(pk__in=evaluation_ids).only("id", "bareme").order_by("pk"):
+        rafraichir(evaluation)
+
+
+def planifier_rafraichissement(evaluation_id):
+    """
+    Rafraîchit les statistiques après commit de la transaction courante,
+    une fois par évaluation quel que soit le nombre de demandes.
+    """
+    if not evaluation_id:
+        return
+    if not connection.in_atomic_block:
+        _rafraichir_ids({evaluation_id})
+        return
+    lot = getattr(_lots, "en_attente", None)
+    # Lot encore enregistré ? (retiré après exécution, ou par un rollback)
+    if lot is None or not any(f is lot["rappel"] for _, f, *_ in connection.run_on_commit):
+        lot = {"ids": set()}
+
+        def rappel(lot=lot):
+            if getattr(_lots, "en_attente", None) is lot:
+                _lots.en_attente = None
+            _rafraichir_ids(lot["ids"])
+
+        lot["rappel"] = rappel
+        _lots.en_attente = lot
+        transaction.on_commit(rappel)
+    lot["ids"].add(evaluation_id)
+
+
+# ============================================================================
+# LECTURE
+# ============================================================================
+
+def statistiques_evaluation(evaluation):
+    """Dictionnaire servi par StatistiquesEvaluationAPIView (lecture des tables)."""
+    stats = EvaluationStats.objects.filter(pk=evaluation.id).first() or rafraichir(evaluation)
+
+    data = {
+        'evaluation_id': evaluation.id,
+        'nb_passages': stats.nb_passages,
+        'nb_passages_soumis': stats.nb_passages_soumis,
+        'nb_passages_corriges': stats.nb_passages_corriges,
+        'nb_passages_en_cours': stats.nb_passages_en_cours,
+        'bareme': evaluation.bareme,
+        'moyenne_note': stats.moyenne_note,
+        'note_min': round(stats.note_min, 2) if stats.note_min is not None else None,
+        'note_max': round(stats.note_max, 2) if stats.note_max is not None else None,
+        'taux_reussite': stats.taux_reussite,
+        'stats_par_question': [], 'nb_questions': 0,
+    }
+
+    if evaluation.type_evaluation in ('structuree', 'mixte'):
+        stats_par_question = []
+        questions = Question.objects.filter(evaluation_id=evaluation.id).select_related('stats').only(
+            'id', 'enonce_texte', 'type_question', 'points', 'mode_correction', 'ordre',
+            'stats__nb_reponses', 'stats__nb_correctes', 'stats__nb_corriges', 'stats__somme_points_corriges',
+        ).order_by('ordre')
+        for question in questions:
+            qs = getattr(question, 'stats', None) or QuestionStats(question=question)
+            if question.mode_correction == 'automatique':
+                stats_par_question.append({
+                    'question_id': question.id, 'enonce': question.enonce_texte,
+                    'type_question': question.type_question, 'points': question.points,
+                    'nb_reponses': qs.nb_reponses, 'nb_correctes': qs.nb_correctes,
+                    'moyenne_points': None,
+                    'taux_reussite': round(qs.nb_correctes / qs.nb_reponses * 100, 2) if qs.nb_reponses else None,
+                })
+            else:
+                moyenne_pts = qs.moyenne_points
+                stats_par_question.append({
+                    'question_id': question.id, 'enonce': question.enonce_texte,
+                    'type_question': question.type_question, 'points': question.points,
+                    'nb_reponses': qs.nb_reponses, 'nb_correctes': None,
+                    'moyenne_points': moyenne_pts,
+                    'taux_reussite': round(moyenne_pts / question.points * 100, 2) if moyenne_pts else None,
+                })
+        data['stats_par_question'] = stats_par_question
+        data['nb_questions'] = len(stats_par_question)
+
+    return data
@@ -0,0 +1,135 @@
+# evaluations/services/stats_apprenants.py
+"""
+Statistiques d'apprenants (quiz et évaluations), pour un ou plusieurs apprenants.
+
+Deux requêtes quel que soit le nombre d'apprenants, en agrégats conditionnels :
+  1. PassageQuiz terminés        GROUP BY apprenant : nombre, score moyen
+  2. PassageEvaluation           GROUP BY apprenant : passées, corrigées,
+     en attente (Count(filter=…)), note moyenne des corrigées (Avg(filter=…))
+
+Résultat mis en cache par apprenant (et année scolaire) sous une clé
+versionnée ; la version change après commit à toute création, suppression
+ou changement de statut / note d'un passage (evaluations/signals.py) et
+après les écritures en masse (correction par lot, recorrections).
+Sans cache partagé (STATS_APPRENANT_CACHE_TIMEOUT = 0), calculé à chaque
+appel : une invalidation en mémoire locale n'atteindrait pas les autres
+processus.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, Q
+
+from evaluations.models import PassageEvaluation, PassageQuiz
+
+
+CACHE_PREFIX = "stats_apprenant"
+
+
+def _timeout():
+    return getattr(settings, "STATS_APPRENANT_CACHE_TIMEOUT", 600)
+
+
+def max_apprenants():
+    return getattr(settings, "STATS_APPRENANTS_MAX", 200)
+
+
+def _version_key(apprenant_id):
+    return f"{CACHE_PREFIX}:ver:{apprenant_id}"
+
+
+def _versions(apprenant_ids):
+    keys = {_version_key(a): a for a in apprenant_ids}
+    found = cache.get_many(list(keys))
+    missing = {k: time.time_ns() for k in keys if k not in found}
+    if missing:
+        for key, version in missing.items():
+            cache.add(key, version, None)
+        found.update(cache.get_many(list(missing)))
+    return {keys[k]: v for k, v in found.items()}
+
+
+def invalidate(*apprenant_ids):
+    """Rend caduques les statistiques des apprenants donnés (après commit)."""
+    apprenant_ids = {a for a in apprenant_ids if a}
+    if not apprenant_ids or _timeout() <= 0:
+        return
+
+    def _bump():
+        cache.set_many({_version_key(a): time.time_ns() for a in apprenant_ids}, None)
+
+    transaction.on_commit(_bump)
+
+
+# ============================================================================
+# CALCUL
+# ============================================================================
+
+def _vide(apprenant_id):
+    return {
+        'apprenant_id': apprenant_id,
+        'nombre_quiz_passes': 0,
+        'score_moyen_quiz': 0,
+        'nombre_evaluations_passees': 0,
+        'nombre_evaluations_corrigees': 0,
+        'nombre_evaluations_en_attente': 0,
+        'note_moyenne': 0,
+    }
+
+
+def _calculer(apprenant_ids, annee_scolaire_id=None):
+    quiz = PassageQuiz.objects.filter(apprenant_id__in=apprenant_ids, termine=True)
+    evals = PassageEvaluation.objects.filter(apprenant_id__in=apprenant_ids)
+    if annee_scolaire_id:
+        quiz = quiz.filter(quiz__sequence__module__cours__annee_scolaire_id=annee_scolaire_id)
+        evals = evals.filter(evaluation__cours__annee_scolaire_id=annee_scolaire_id)
+
+    stats = {a: _vide(a) for a in apprenant_ids}
+    for row in quiz.order_by().values('apprenant_id').annotate(nb=Count('id'), score=Avg('score')):
+        s = stats[row['apprenant_id']]
+        s['nombre_quiz_passes'] = row['nb']
+        s['score_moyen_quiz'] = round(row['score'], 2) if row['score'] else 0
+
+    corrige = Q(statut='corrige')
+    for row in evals.order_by().values('apprenant_id').annotate(
+        nb=Count('id'),
+        corriges=Count('id', filter=corrige),
+        en_attente=Count('id', filter=Q(statut='soumis')),
+        note=Avg('note', filter=corrige),
+    ):
+        s = stats[row['apprenant_id']]
+        s['nombre_evaluations_passees'] = row['nb']
+        s['nombre_evaluations_corrigees'] = row['corriges']
+        s['nombre_evaluations_en_attente'] = row['en_attente']
+        s['note_moyenne'] = round(row['note'], 2) if row['note'] else 0
+    return stats
+
+
+def stats_apprenants(apprenant_ids, annee_scolaire_id=None):
+    """{apprenant_id: stats} ; seuls les apprenants absents du cache sont recalculés."""
+    apprenant_ids = list(dict.fromkeys(int(a) for a in apprenant_ids))
+    if not apprenant_ids:
+        return {}
+    if _timeout() <= 0:
+        return _calculer(apprenant_ids, annee_scolaire_id)
+    versions = _versions(apprenant_ids)
+    keys = {
+        a: f"{CACHE_PREFIX}:{a}:{annee_scolaire_id or 'toutes'}:{versions.get(a)}"
+        for a in apprenant_ids
+    }
+    cached = cache.get_many(list(keys.values()))
+    result = {a: cached[k] for a, k in keys.items() if k in cached}
+
+    manquants = [a for a in apprenant_ids if a not in result]
+    if manquants:
+        calcules = _calculer(manquants, annee_scolaire_id)
+        cache.set_many({keys[a]: s for a, s in calcules.items()}, _timeout())
+        result.update(calcules)
+    return result
+
+
+def stats_apprenant(apprenant_id, annee_scolaire_id=None):
+    return stats_apprenants([apprenant_id], annee_scolaire_id)[int(apprenant_id)]
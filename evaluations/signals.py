@@ -0,0 +1,113 @@
+# evaluations/signals.py
+
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from evaluations.services import answer_key, exam_paper, statistiques, stats_apprenants
+from .models import Evaluation, PassageEvaluation, PassageQuiz, Question, Reponse
+
+
+# ============================================================================
+# CORRIGÉ COMPILÉ ET SUJET PRÉ-RENDU (caches, voir evaluations.services)
+# ============================================================================
+
+def _invalider(evaluation_ids=(), quiz_ids=()):
+    answer_key.invalidate(evaluation_ids=evaluation_ids, quiz_ids=quiz_ids)
+    exam_paper.invalidate(*evaluation_ids)
+
+
+@receiver(post_init, sender=Question)
+def memoriser_parent_question(sender, instance, **kwargs):
+    # via __dict__ : pas de requête sur les champs différés (only())
+    instance._parent_initial = (instance.__dict__.get('evaluation_id'), instance.__dict__.get('quiz_id'))
+    instance._points_initiaux = instance.__dict__.get('points')
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalider_corrige_question(sender, instance, **kwargs):
+    evaluation_initiale, quiz_initial = getattr(instance, '_parent_initial', (None, None))
+    _invalider(
+        evaluation_ids=(instance.evaluation_id, evaluation_initiale),
+        quiz_ids=(instance.quiz_id, quiz_initial),
+    )
+    # Statistiques : les réponses à points pleins dépendent de Question.points
+    if (
+        kwargs.get('created', True)
+        or instance.points != getattr(instance, '_points_initiaux', None)
+        or instance.evaluation_id != evaluation_initiale
+    ):
+        for evaluation_id in {instance.evaluation_id, evaluation_initiale} - {None}:
+            statistiques.planifier_rafraichissement(evaluation_id)
+    instance._parent_initial = (instance.evaluation_id, instance.quiz_id)
+    instance._points_initiaux = instance.points
+
+
+@receiver(post_save, sender=Reponse)
+@receiver(post_delete, sender=Reponse)
+def invalider_corrige_reponse(sender, instance, **kwargs):
+    parent = Question.objects.filter(pk=instance.question_id).values_list('evaluation_id', 'quiz_id').first()
+    if parent:
+        _invalider(evaluation_ids=(parent[0],), quiz_ids=(parent[1],))
+
+
+@receiver(post_init, sender=Evaluation)
+def memoriser_bareme_evaluation(sender, instance, **kwargs):
+    instance._bareme_initial = instance.__dict__.get('bareme')
+
+
+@receiver(post_save, sender=Evaluation)
+def invalider_sujet_evaluation(sender, instance, created, **kwargs):
+    # Titre, consigne, dates… font partie de l'en-tête du sujet pré-rendu
+    exam_paper.invalidate(instance.pk)
+    # Le seuil de réussite des statistiques est bareme / 2
+    if not created and instance.bareme != getattr(instance, '_bareme_initial', None):
+        statistiques.planifier_rafraichissement(instance.pk)
+    instance._bareme_initial = instance.bareme
+
+
+# ============================================================================
+# STATISTIQUES MATÉRIALISÉES (voir evaluations.services.statistiques)
+# ============================================================================
+
+@receiver(post_init, sender=PassageEvaluation)
+def memoriser_etat_passage(sender, instance, **kwargs):
+    instance._etat_initial = (instance.__dict__.get('statut'), instance.__dict__.get('note'))
+
+
+@receiver(post_save, sender=PassageEvaluation)
+def rafraichir_stats_passage(sender, instance, created, **kwargs):
+    # Les sauvegardes de brouillon ne changent ni le statut ni la note
+    etat = (instance.statut, instance.note)
+    if created or etat != getattr(instance, '_etat_initial', None):
+        statistiques.planifier_rafraichissement(instance.evaluation_id)
+        stats_apprenants.invalidate(instance.apprenant_id)
+    instance._etat_initial = etat
+
+
+@receiver(post_delete, sender=PassageEvaluation)
+def rafraichir_stats_passage_supprime(sender, instance, **kwargs):
+    statistiques.planifier_rafraichissement(instance.evaluation_id)
+    stats_apprenants.invalidate(instance.apprenant_id)
+
+
+# ============================================================================
+# STATISTIQUES APPRENANT (voir evaluations.services.stats_apprenants)
+# ============================================================================
+
+@receiver(post_init, sender=PassageQuiz)
+def memoriser_etat_passage_quiz(sender, instance, **kwargs):
+    instance._etat_initial = (instance.__dict__.get('termine'), instance.__dict__.get('score'))
+
+
+@receiver(post_save, sender=PassageQuiz)
+def invalider_stats_passage_quiz(sender, instance, created, **kwargs):
+    etat = (instance.termine, instance.score)
+    if created or etat != getattr(instance, '_etat_initial', None):
+        stats_apprenants.invalidate(instance.apprenant_id)
+    instance._etat_initial = etat
+
+
+@receiver(post_delete, sender=PassageQuiz)
+def invalider_stats_passage_quiz_supprime(sender, instance, **kwargs):
+    stats_apprenants.invalidate(instance.apprenant_id)
@@ -1,3 +1,474 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from courses.tests import creer_cours
+from notifications.models import Notification, TypeNotification
+from users.models import ResponsableAcademique, UserRole
+
+from .models import (
+    Evaluation, EvaluationStats, PassageEvaluation, Question, QuestionStats, Reponse, ReponseQuestion,
+)
+from .services import autosave, correction_lot, file_correction, grading, statistiques, stats_apprenants
+from .services.answer_key import KeyEntry
+
+
+def creer_evaluation(cours, mixte=False):
+    """Évaluation : Q0 choix unique (2 pts, R1 correcte), Q1 choix multiple (3 pts, R0 et R2 correctes)."""
+    evaluation = Evaluation.objects.create(
+        cours=cours, enseignant=cours.enseignant, titre="E", type_evaluation="structuree",
+        bareme=5, est_publiee=True,
+    )
+    unique = Question.objects.create(evaluation=evaluation, enonce_texte="Q0", type_question="choix_unique",
+                                     points=2, ordre=0)
+    multiple = Question.objects.create(evaluation=evaluation, enonce_texte="Q1", type_question="choix_multiple",
+                                       points=3, ordre=1)
+    choix = {
+        question.id: [
+            Reponse.objects.create(question=question, texte=f"R{k}", est_correcte=k in correctes, ordre=k)
+            for k in range(4)
+        ]
+        for question, correctes in ((unique, {1}), (multiple, {0, 2}))
+    }
+    texte = None
+    if mixte:
+        texte = Question.objects.create(evaluation=evaluation, enonce_texte="Q2", type_question="texte_court",
+                                        points=4, ordre=2)
+    return evaluation, unique, multiple, choix, texte
+
+
+# ============================================================================
+# MOTEUR DE CORRECTION
+# ============================================================================
+
+class BaremeTests(TestCase):
+
+    def test_choix_unique_tout_ou_rien(self):
+        entry = KeyEntry("choix_unique", 2.0, "automatique", frozenset({7}))
+        self.assertEqual(grading.score_choices(entry, {7}), 2.0)
+        self.assertEqual(grading.score_choices(entry, {8}), 0.0)
+        self.assertEqual(grading.score_choices(entry, {7, 8}), 0.0)
+
+    def test_choix_multiple_proportionnel_plancher_zero(self):
+        entry = KeyEntry("choix_multiple", 3.0, "automatique", frozenset({1, 2}))
+        self.assertEqual(grading.score_choices(entry, {1, 2}), 3.0)
+        self.assertEqual(grading.score_choices(entry, {1}), 1.5)
+        self.assertEqual(grading.score_choices(entry, {1, 3}), 0.0)
+        self.assertEqual(grading.score_choices(entry, {3, 4}), 0)
+
+    def test_question_non_qcm(self):
+        entry = KeyEntry("texte_court", 4.0, "manuelle", frozenset())
+        self.assertIsNone(grading.score_choices(entry, set()))
+
+
+class CorrectionTests(TestCase):
+
+    def setUp(self):
+        self.cours, _, _, (self.apprenant,) = creer_cours(nb_sequences=0)
+
+    def passage(self, evaluation, selections):
+        passage = PassageEvaluation.objects.create(apprenant=self.apprenant, evaluation=evaluation, statut="soumis")
+        for question, choix in selections.items():
+            reponse = ReponseQuestion.objects.create(passage_evaluation=passage, question=question, statut="repondu")
+            reponse.choix_selectionnes.set(choix)
+        return passage
+
+    def test_passage_100_pourcent_qcm_corrige(self):
+        evaluation, unique, multiple, choix, _ = creer_evaluation(self.cours)
+        passage = self.passage(evaluation, {
+            unique: [choix[unique.id][1]],
+            multiple: [choix[multiple.id][0]],
+        })
+
+        self.assertTrue(grading.corriger_soumission(passage))
+        passage.refresh_from_db()
+        self.assertEqual((passage.statut, passage.note), ("corrige", 3.5))
+        self.assertEqual(
+            dict(passage.reponses_questions.values_list("question_id", "points_obtenus")),
+            {unique.id: 2.0, multiple.id: 1.5},
+        )
+        self.assertFalse(passage.reponses_questions.exclude(statut="corrige").exists())
+
+    def test_correction_unitaire_notifie_le_resultat(self):
+        evaluation, unique, multiple, choix, _ = creer_evaluation(self.cours)
+        with self.captureOnCommitCallbacks(execute=True):
+            passage = self.passage(evaluation, {
+                unique: [choix[unique.id][1]],
+                multiple: [choix[multiple.id][0], choix[multiple.id][2]],
+            })
+            grading.corriger_soumission(passage)
+        self.assertEqual(
+            dict(Notification.objects.filter(
+                recipient=self.apprenant,
+                type__in=(TypeNotification.EVALUATION_CORRIGEE, TypeNotification.ENCOURAGEMENT),
+            ).values_list("type", "message")),
+            {
+                TypeNotification.EVALUATION_CORRIGEE: "Votre évaluation « E » a été corrigée. Note : 5.0/5.0.",
+                TypeNotification.ENCOURAGEMENT: "Félicitations ! Vous avez obtenu 100% à « E ».",
+            },
+        )
+
+    def test_passage_mixte_attend_l_enseignant(self):
+        evaluation, unique, multiple, choix, texte = creer_evaluation(self.cours, mixte=True)
+        passage = self.passage(evaluation, {unique: [choix[unique.id][1]], multiple: [], texte: []})
+
+        self.assertFalse(grading.corriger_soumission(passage))
+        passage.refresh_from_db()
+        self.assertEqual((passage.statut, passage.note), ("soumis", None))
+        points = dict(passage.reponses_questions.values_list("question_id", "points_obtenus"))
+        self.assertEqual((points[unique.id], points[multiple.id]), (2.0, 0.0))
+        self.assertEqual(passage.reponses_questions.get(question=texte).statut, "repondu")
+
+    def test_recorrection_apres_changement_du_corrige(self):
+        evaluation, unique, multiple, choix, _ = creer_evaluation(self.cours)
+        passage = self.passage(evaluation, {
+            unique: [choix[unique.id][1]],
+            multiple: [choix[multiple.id][0]],
+        })
+        grading.corriger_soumission(passage)
+        PassageEvaluation.objects.filter(pk=passage.pk).update(note=4.0)    # ajustement de l'enseignant
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for reponse in choix[unique.id]:
+                reponse.est_correcte = reponse.ordre == 3
+                reponse.save()
+        self.assertEqual(grading.regrade_evaluation(evaluation), 1)
+
+        passage.refresh_from_db()
+        # Variation QCM (-2) appliquée à la note ajustée
+        self.assertEqual(passage.note, 2.0)
+        self.assertEqual(passage.reponses_questions.get(question=unique).points_obtenus, 0.0)
+
+
+# ============================================================================
+# CORRECTION PAR LOT
+# ============================================================================
+
+class CorrectionLotTests(TestCase):
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            cours, _, _, self.apprenants = creer_cours(nb_sequences=0, nb_apprenants=2)
+            self.evaluation, self.unique, self.multiple, self.choix, self.texte = creer_evaluation(cours, mixte=True)
+            # Q0 : 2 pts pour le premier apprenant, 0 pour le second ; Q2 (texte) à corriger
+            self.copies = [self.soumettre(apprenant, k) for apprenant, k in zip(self.apprenants, (1, 0))]
+
+    def soumettre(self, apprenant, k):
+        passage = PassageEvaluation.objects.create(apprenant=apprenant, evaluation=self.evaluation, statut="soumis")
+        ReponseQuestion.objects.create(passage_evaluation=passage, question=self.unique, statut="repondu") \
+            .choix_selectionnes.set([self.choix[self.unique.id][k]])
+        ReponseQuestion.objects.create(passage_evaluation=passage, question=self.multiple, statut="non_repondu")
+        texte = ReponseQuestion.objects.create(passage_evaluation=passage, question=self.texte, statut="repondu",
+                                               reponse_texte="…")
+        grading.corriger_soumission(passage)
+        return passage, texte
+
+    def corriger(self, *points):
+        items = [{"id": texte.id, "points_obtenus": p} for (_, texte), p in zip(self.copies, points)]
+        with self.captureOnCommitCallbacks(execute=True):
+            return correction_lot.corriger_lot(None, items)
+
+    def types(self, apprenant):
+        resultats = (TypeNotification.EVALUATION_CORRIGEE, TypeNotification.ENCOURAGEMENT,
+                     TypeNotification.PROGRESSION_FAIBLE)
+        return sorted(Notification.objects.filter(recipient=apprenant, type__in=resultats)
+                      .values_list("type", flat=True))
+
+    def test_tout_ou_rien(self):
+        (_, valide), (_, invalide) = self.copies
+        with self.assertRaises(correction_lot.CorrectionLotError) as ctx:
+            correction_lot.corriger_lot(None, [
+                {"id": valide.id, "points_obtenus": 2},
+                {"id": invalide.id, "points_obtenus": 9},
+            ])
+        self.assertEqual([e["index"] for e in ctx.exception.errors], [1])
+        valide.refresh_from_db()
+        self.assertEqual((valide.statut, valide.points_obtenus), ("repondu", 0.0))
+
+    def test_notes_recalculees_et_alertes_par_apprenant(self):
+        resultat = self.corriger(2, 1)
+        self.assertEqual([(p["statut"], p["note"]) for p in resultat["passages"]], [("corrige", 4.0), ("corrige", 1.0)])
+
+        premier, second = self.apprenants
+        # 80 % → encouragement ; 20 % → progression faible, comme une correction unitaire
+        self.assertEqual(self.types(premier), sorted([TypeNotification.EVALUATION_CORRIGEE,
+                                                      TypeNotification.ENCOURAGEMENT]))
+        self.assertEqual(self.types(second), sorted([TypeNotification.EVALUATION_CORRIGEE,
+                                                     TypeNotification.PROGRESSION_FAIBLE]))
+        self.assertEqual(
+            Notification.objects.get(recipient=second, type=TypeNotification.PROGRESSION_FAIBLE).message,
+            "Vous avez obtenu 20% à « E ». N'hésitez pas à revoir le cours.",
+        )
+
+    def test_recorrection_notifiee(self):
+        self.corriger(2, 1)
+        self.corriger(1, 1)
+        premier, second = self.apprenants
+        self.assertEqual(PassageEvaluation.objects.get(pk=self.copies[0][0].pk).note, 3.0)
+        # Note modifiée → nouveau résultat ; note inchangée → rien
+        self.assertEqual(self.types(premier).count(TypeNotification.EVALUATION_CORRIGEE), 2)
+        self.assertEqual(self.types(second).count(TypeNotification.EVALUATION_CORRIGEE), 1)
+
+
+# ============================================================================
+# STATISTIQUES MATÉRIALISÉES
+# ============================================================================
+
+class StatistiquesTests(TestCase):
+
+    def setUp(self):
+        # Rafraîchissements regroupés par transaction : exécutés comme au commit
+        with self.captureOnCommitCallbacks(execute=True):
+            cours, _, _, self.apprenants = creer_cours(nb_sequences=0, nb_apprenants=3)
+            self.evaluation, self.unique, self.multiple, self.choix, _ = creer_evaluation(cours)
+
+    def soumettre(self, apprenant, selections):
+        passage = PassageEvaluation.objects.create(apprenant=apprenant, evaluation=self.evaluation, statut="soumis")
+        for question, ordres in selections.items():
+            reponse = ReponseQuestion.objects.create(passage_evaluation=passage, question=question, statut="repondu")
+            reponse.choix_selectionnes.set([self.choix[question.id][k] for k in ordres])
+        grading.corriger_soumission(passage)
+        return passage
+
+    def corriger_la_classe(self):
+        premier, second, troisieme = self.apprenants
+        with self.captureOnCommitCallbacks(execute=True):
+            self.soumettre(premier, {self.unique: [1], self.multiple: [0, 2]})     # 5 / 5
+            self.soumettre(second, {self.unique: [0], self.multiple: [0]})         # 1.5 / 5
+            PassageEvaluation.objects.create(apprenant=troisieme, evaluation=self.evaluation, statut="en_cours")
+
+    def test_tables_apres_correction(self):
+        self.corriger_la_classe()
+        stats = EvaluationStats.objects.get(pk=self.evaluation.pk)
+        self.assertEqual(
+            (stats.nb_passages, stats.nb_passages_corriges, stats.nb_passages_en_cours),
+            (3, 2, 1),
+        )
+        self.assertEqual((stats.note_min, stats.note_max, stats.moyenne_note, stats.taux_reussite),
+                         (1.5, 5.0, 3.25, 50.0))
+        self.assertEqual(
+            dict(QuestionStats.objects.filter(evaluation=self.evaluation).values_list("question_id", "nb_correctes")),
+            {self.unique.id: 1, self.multiple.id: 1},
+        )
+
+    def test_un_rafraichissement_par_transaction(self):
+        with mock.patch.object(statistiques, "rafraichir", wraps=statistiques.rafraichir) as rafraichir:
+            self.corriger_la_classe()
+        self.assertEqual(rafraichir.call_count, 1)
+
+    def test_changement_de_bareme(self):
+        self.corriger_la_classe()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.evaluation.bareme = 20
+            self.evaluation.save()
+        self.assertEqual(EvaluationStats.objects.get(pk=self.evaluation.pk).nb_reussites, 0)
+
+    def test_endpoint_lit_les_tables(self):
+        self.corriger_la_classe()
+        with self.assertNumQueries(2):
+            data = statistiques.statistiques_evaluation(self.evaluation)
+        self.assertEqual((data["nb_passages_corriges"], data["nb_questions"]), (2, 2))
+        self.assertEqual([q["taux_reussite"] for q in data["stats_par_question"]], [50.0, 50.0])
+
+
+# ============================================================================
+# SAUVEGARDE AUTOMATIQUE
+# ============================================================================
+
+class AutosaveTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        cours, _, _, (apprenant,) = creer_cours(nb_sequences=0)
+        self.evaluation, self.unique, self.multiple, self.choix, _ = creer_evaluation(cours)
+        self.passage = PassageEvaluation.objects.create(apprenant=apprenant, evaluation=self.evaluation,
+                                                        statut="en_cours")
+
+    def sauver(self, revision, k=1):
+        passage = PassageEvaluation.objects.get(pk=self.passage.pk)
+        delta = autosave.normalize(passage, [
+            {"question": self.unique.id, "choix_selectionnes": [self.choix[self.unique.id][k].id]},
+        ])
+        return autosave.autosave(passage, revision, delta)
+
+    def test_revisions_et_conflit(self):
+        self.assertEqual(self.sauver(0), (1, False))
+        self.assertEqual(self.sauver(1, k=2), (2, False))
+        reponse = ReponseQuestion.objects.get(passage_evaluation=self.passage, question=self.unique)
+        self.assertEqual(list(reponse.choix_selectionnes.values_list("ordre", flat=True)), [2])
+
+        with self.assertRaises(autosave.AutosaveError) as ctx:
+            self.sauver(1)
+        self.assertEqual((ctx.exception.http_status, ctx.exception.revision), (409, 2))
+
+    def test_refus_apres_soumission(self):
+        PassageEvaluation.objects.filter(pk=self.passage.pk).update(statut="soumis")
+        with self.assertRaises(autosave.AutosaveError) as ctx:
+            self.sauver(0)
+        self.assertEqual(ctx.exception.http_status, 400)
+
+    def test_question_hors_evaluation(self):
+        with self.assertRaises(autosave.AutosaveError):
+            autosave.normalize(self.passage, [{"question": 0, "choix_selectionnes": []}])
+
+    @override_settings(AUTOSAVE_DEBOUNCE_SECONDS=5)
+    def test_anti_rebond_tampon_puis_flush(self):
+        with mock.patch.object(autosave, "_planifier_flush") as planifier:
+            self.assertEqual(self.sauver(0), (1, False))
+            self.assertEqual(self.sauver(1, k=2), (2, True))
+            self.assertEqual(self.sauver(2, k=3), (3, True))
+        # Un seul flush planifié pour le tampon
+        self.assertEqual(planifier.call_count, 1)
+        self.assertEqual(PassageEvaluation.objects.get(pk=self.passage.pk).revision, 1)
+
+        self.assertTrue(autosave.flush(self.passage.pk))
+        self.assertEqual(PassageEvaluation.objects.get(pk=self.passage.pk).revision, 3)
+        reponse = ReponseQuestion.objects.get(passage_evaluation=self.passage, question=self.unique)
+        self.assertEqual(list(reponse.choix_selectionnes.values_list("ordre", flat=True)), [3])
+        self.assertFalse(autosave.flush(self.passage.pk))
+
+    @override_settings(AUTOSAVE_DEBOUNCE_SECONDS=5)
+    def test_anti_rebond_revision_reservee(self):
+        with mock.patch.object(autosave, "_planifier_flush"):
+            self.sauver(0)
+            # Une sauvegarde concurrente a déjà réservé la révision 2
+            cache.add(autosave._revision_key(self.passage.pk, 2), 1)
+            with self.assertRaises(autosave.AutosaveError) as ctx:
+                self.sauver(1)
+        self.assertEqual(ctx.exception.http_status, 409)
+
+    @override_settings(AUTOSAVE_DEBOUNCE_SECONDS=5)
+    def test_tampon_ecrit_puis_revision_avancee_par_une_reponse(self):
+        with mock.patch.object(autosave, "_planifier_flush"):
+            self.sauver(0)
+            self.assertEqual(self.sauver(1, k=2), (2, True))
+            self.assertTrue(autosave.flush(self.passage.pk))
+            # Sauvegarde d'une réponse seule : vidage puis révision + 1 en base
+            PassageEvaluation.objects.filter(pk=self.passage.pk).update(revision=3)
+
+            with self.assertRaises(autosave.AutosaveError) as ctx:
+                self.sauver(2)
+            self.assertEqual((ctx.exception.http_status, ctx.exception.revision), (409, 3))
+            self.assertEqual(self.sauver(3, k=3), (4, True))
+
+        self.assertTrue(autosave.flush(self.passage.pk))
+        reponse = ReponseQuestion.objects.get(passage_evaluation=self.passage, question=self.unique)
+        self.assertEqual(list(reponse.choix_selectionnes.values_list("ordre", flat=True)), [3])
+
+
+# ============================================================================
+# FILE DE CORRECTION (réservation avec bail)
+# ============================================================================
+
+class FileCorrectionTests(TestCase):
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            cours, _, _, apprenants = creer_cours(nb_sequences=0, nb_apprenants=3)
+            evaluation, *_ = creer_evaluation(cours)
+            self.formateur = cours.enseignant
+            role = UserRole.objects.get_or_create(name="ResponsableAcademique")[0]
+            self.responsable = ResponsableAcademique.objects.create(
+                email="r@test.sn", nom="N", prenom="R", role=role, institution=cours.institution,
+            )
+            debut = timezone.now() - timedelta(hours=1)
+            self.passages = [
+                PassageEvaluation.objects.create(apprenant=apprenant, evaluation=evaluation, statut="soumis",
+                                                 date_soumission=debut + timedelta(minutes=k))
+                for k, apprenant in enumerate(apprenants)
+            ]
+        self.ids = [p.id for p in self.passages]
+
+    def reserver(self, user, role, nombre):
+        return file_correction.reserver(file_correction.perimetre(user, role), user, nombre)
+
+    def test_lots_disjoints_plus_anciennes_d_abord(self):
+        self.assertEqual(self.reserver(self.formateur, "Formateur", 2), self.ids[:2])
+        self.assertEqual(self.reserver(self.responsable, "ResponsableAcademique", 2), self.ids[2:])
+        self.assertEqual(self.reserver(self.responsable, "ResponsableAcademique", 2), [self.ids[2]])
+        # Ses propres copies : bail renouvelé
+        self.assertEqual(self.reserver(self.formateur, "Formateur", 3), self.ids[:2])
+
+    def test_bail_expire_copie_de_nouveau_disponible(self):
+        self.reserver(self.formateur, "Formateur", 3)
+        PassageEvaluation.objects.filter(id=self.ids[0]).update(
+            reservation_expire_le=timezone.now() - timedelta(minutes=1),
+        )
+        passage = PassageEvaluation.objects.get(id=self.ids[1])
+        self.assertTrue(file_correction.reservee_par_autre(passage, self.responsable))
+        self.assertEqual(self.reserver(self.responsable, "ResponsableAcademique", 3), [self.ids[0]])
+
+        PassageEvaluation.objects.filter(id=self.ids[1]).update(
+            reservation_expire_le=timezone.now() - timedelta(minutes=1),
+        )
+        self.assertEqual(file_correction.liberer_expirees(), 1)
+        self.assertIsNone(PassageEvaluation.objects.get(id=self.ids[1]).reserve_par_id)
+
+    def test_liberation(self):
+        self.reserver(self.formateur, "Formateur", 3)
+        self.assertEqual(file_correction.liberer(self.formateur, [self.ids[0]]), 1)
+        self.assertEqual(file_correction.liberer(self.responsable), 0)
+        self.assertEqual(self.reserver(self.responsable, "ResponsableAcademique", 3), [self.ids[0]])
+
+    def test_decompte_par_evaluation(self):
+        self.reserver(self.formateur, "Formateur", 1)
+        (ligne,) = file_correction.decompte_par_evaluation(
+            file_correction.perimetre(self.responsable, "ResponsableAcademique"), self.responsable,
+        )
+        self.assertEqual((ligne["nb_a_corriger"], ligne["nb_reservees_autres"], ligne["nb_reservees_moi"]), (3, 1, 0))
+
+
+# ============================================================================
+# STATISTIQUES D'APPRENANTS (lot)
+# ============================================================================
+
+class StatsApprenantsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        with self.captureOnCommitCallbacks(execute=True):
+            cours, _, _, self.apprenants = creer_cours(nb_sequences=0, nb_apprenants=3)
+            self.evaluations = [creer_evaluation(cours)[0] for _ in range(2)]
+            premier, second, _ = self.apprenants
+            self.passer(premier, 0, "corrige", 4)
+            self.passer(premier, 1, "soumis")
+            self.passer(second, 0, "corrige", 2)
+        self.ids = [a.id for a in self.apprenants]
+
+    def passer(self, apprenant, k, statut, note=None):
+        return PassageEvaluation.objects.create(apprenant=apprenant, evaluation=self.evaluations[k],
+                                                statut=statut, note=note)
+
+    def resume(self, stats):
+        return {
+            a: (s["nombre_evaluations_passees"], s["nombre_evaluations_corrigees"],
+                s["nombre_evaluations_en_attente"], s["note_moyenne"])
+            for a, s in stats.items()
+        }
+
+    def test_lot_en_deux_requetes(self):
+        with self.assertNumQueries(2):
+            stats = stats_apprenants.stats_apprenants(self.ids)
+        premier, second, troisieme = self.ids
+        self.assertEqual(self.resume(stats), {
+            premier: (2, 1, 1, 4.0), second: (1, 1, 0, 2.0), troisieme: (0, 0, 0, 0),
+        })
+
+    @override_settings(STATS_APPRENANT_CACHE_TIMEOUT=600)
+    def test_cache_par_apprenant_invalide_apres_commit(self):
+        stats_apprenants.stats_apprenants(self.ids[:2])
+        # Seul le troisième apprenant est calculé
+        with self.assertNumQueries(2):
+            stats_apprenants.stats_apprenants(self.ids)
+        with self.assertNumQueries(0):
+            stats_apprenants.stats_apprenants(self.ids)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.passer(self.apprenants[2], 0, "corrige", 5)
+        with self.assertNumQueries(2):
+            stats = stats_apprenants.stats_apprenants(self.ids)
+        self.assertEqual(self.resume(stats)[self.ids[2]], (1, 1, 0, 5.0))
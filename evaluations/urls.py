@@ -25,21 +25,30 @@ from .views import (
     PassageEvaluationDemarrerAPIView,
     PassageEvaluationReprendreAPIView,
     PassageEvaluationSauvegarderAPIView,
+    PassageEvaluationAutosaveAPIView,
     PassageEvaluationSoumettreAPIView,
     PassageEvaluationListAPIView,
     PassageEvaluationDetailAPIView,
+    PassageEvaluationFichierAPIView,
     
     # Réponses aux questions
     ReponseQuestionSauvegarderAPIView,
     ReponseQuestionDetailAPIView,
+    ReponseQuestionFichierAPIView,
     
     # Correction
     CorrectionReponseAPIView,
     CorrectionEvaluationAPIView,
+    RecorrectionEvaluationAPIView,
+    CorrectionLotAPIView,
     EvaluationsACorrigerAPIView,
+    FileCorrectionAPIView,
+    FileCorrectionLibererAPIView,
+    FileCorrectionReserverAPIView,
     
     # Statistiques
     StatistiquesApprenantAPIView,
+    StatistiquesApprenantsAPIView,
     StatistiquesEvaluationAPIView,
 )
 
@@ -134,6 +143,11 @@ urlpatterns = [
          PassageEvaluationSauvegarderAPIView.as_view(), 
          name='passage-evaluation-sauvegarder'),
     
+    # Sauvegarde automatique par delta (révision + anti-rebond)
+    path('passages-evaluations/<int:pk>/autosave/', 
+         PassageEvaluationAutosaveAPIView.as_view(), 
+         name='passage-evaluation-autosave'),
+    
     # Soumettre l'évaluation (bascule irréversible)
     path('passages-evaluations/<int:pk>/soumettre/', 
          PassageEvaluationSoumettreAPIView.as_view(), 
@@ -146,6 +160,9 @@ urlpatterns = [
     path('passages-evaluations/<int:pk>/', 
          PassageEvaluationDetailAPIView.as_view(), 
          name='passage-evaluation-detail'),
+    path('passages-evaluations/<int:pk>/fichier/', 
+         PassageEvaluationFichierAPIView.as_view(), 
+         name='passage-evaluation-fichier'),
     
     
     # ============================================================================
@@ -161,6 +178,9 @@ urlpatterns = [
     path('reponses-questions/<int:pk>/', 
          ReponseQuestionDetailAPIView.as_view(), 
          name='reponse-question-detail'),
+    path('reponses-questions/<int:pk>/fichier/', 
+         ReponseQuestionFichierAPIView.as_view(), 
+         name='reponse-question-fichier'),
     
     
     # ============================================================================
@@ -177,10 +197,31 @@ urlpatterns = [
          CorrectionEvaluationAPIView.as_view(), 
          name='correction-evaluation'),
     
+    # Recorriger tous les passages après modification du corrigé
+    path('corrections/evaluation/<int:pk>/recorriger/', 
+         RecorrectionEvaluationAPIView.as_view(), 
+         name='recorrection-evaluation'),
+
+    # Correction manuelle par lot (plusieurs réponses, plusieurs passages)
+    path('corrections/lot/', 
+         CorrectionLotAPIView.as_view(), 
+         name='correction-lot'),
+    
     # Liste des évaluations à corriger
     path('corrections/a-corriger/', 
          EvaluationsACorrigerAPIView.as_view(), 
          name='evaluations-a-corriger'),
+
+    # File de correction partagée (curseur + réservation avec bail)
+    path('corrections/file/', 
+         FileCorrectionAPIView.as_view(), 
+         name='file-correction'),
+    path('corrections/file/reserver/', 
+         FileCorrectionReserverAPIView.as_view(), 
+         name='file-correction-reserver'),
+    path('corrections/file/liberer/', 
+         FileCorrectionLibererAPIView.as_view(), 
+         name='file-correction-liberer'),
     
     
     # ============================================================================
@@ -191,6 +232,11 @@ urlpatterns = [
     path('statistiques/apprenant/<int:apprenant_id>/', 
          StatistiquesApprenantAPIView.as_view(), 
          name='stats-apprenant'),
+
+    # Statistiques de plusieurs apprenants (?ids=1,2,3 ou ?cours_id=…)
+    path('statistiques/apprenants/',
+         StatistiquesApprenantsAPIView.as_view(),
+         name='stats-apprenants'),
     
     # Statistiques d'une évaluation
     path('statistiques/evaluation/<int:evaluation_id>/', 
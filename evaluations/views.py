@@ -1,16 +1,23 @@
 # evaluations/views.py
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
-from django.db.models import Avg, Count, Q, Sum
+from django.db.models import Count, F, Q, Sum
 from django.utils import timezone
-import csv
-from io import BytesIO
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.db.models import Prefetch
 from users.models import Apprenant, Parent as ParentModel
+from core.exports import CONTENT_TYPE_CSV, CONTENT_TYPE_XLSX, csv_stream, xlsx_tempfile
+from core.file_delivery import serve_file
+from core.scope_context import resolve_annee_scolaire_id
+from courses.pagination import InvalidCursor, paginate_keyset, use_cursor_pagination
+from evaluations.services import (
+    answer_key, autosave, correction_lot, exam_paper, exports, file_correction, grading, statistiques,
+    stats_apprenants,
+)
 from courses.models import InscriptionCours
 from .models import Evaluation, PassageEvaluation, ReponseQuestion
 from .models import (
@@ -107,19 +114,18 @@ def _get_annee_scolaire_id(request):
       2. Query param annee_scolaire_id
       3. Attribut profil utilisateur
     """
-    def _to_int(v):
-        if v is None:
-            return None
-        try:
-            return int(str(v).strip())
-        except (ValueError, TypeError):
-            return None
+    return resolve_annee_scolaire_id(request)
 
-    return (
-        _to_int(request.headers.get("X-Annee-Scolaire-ID"))
-        or _to_int(request.query_params.get("annee_scolaire_id"))
-        or _to_int(getattr(request.user, "annee_scolaire_active_id", None))
-    )
+
+def _int_param(params, name):
+    """Paramètre entier optionnel (None si absent) ; ValueError si invalide."""
+    valeur = params.get(name)
+    if valeur in (None, ''):
+        return None
+    try:
+        return int(valeur)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{name}' doit être un entier.")
 
 
 def _apply_annee_filter_eval(qs, annee_scolaire_id):
@@ -147,6 +153,13 @@ def api_success(message: str, data=None, http_status=status.HTTP_200_OK):
     )
 
 
+def api_success_raw(message: str, data_bytes: bytes, http_status=status.HTTP_200_OK):
+    """Même enveloppe que api_success, avec un data déjà rendu en octets JSON."""
+    head = JSONRenderer().render({"success": True, "status": http_status, "message": message})
+    return HttpResponse(head[:-1] + b',"data":' + data_bytes + b'}',
+                        status=http_status, content_type="application/json")
+
+
 def api_error(message: str, errors=None, http_status=status.HTTP_400_BAD_REQUEST, data=None):
     payload = {"success": False, "status": http_status, "message": message, "data": data}
     if errors is not None:
@@ -702,6 +715,10 @@ class EvaluationPublierAPIView(APIView):
 
             evaluation.est_publiee = (action == 'publier')
             evaluation.save()
+            if evaluation.est_publiee and evaluation.type_evaluation != 'simple':
+                # Corrigé compilé dès la publication : la correction le lit en cache
+                answer_key.warm_evaluation(evaluation.id)
+                exam_paper.warm(evaluation)
             msg = "Évaluation publiée." if action == 'publier' else "Évaluation dépubliée."
             return api_success(msg, EvaluationSerializer(evaluation).data)
         except Exception as e:
@@ -804,14 +821,16 @@ class PassageEvaluationDemarrerAPIView(APIView):
                                  http_status=status.HTTP_403_FORBIDDEN)
 
             evaluation = get_object_or_404(Evaluation, pk=evaluation_id)
-            passage_existant = PassageEvaluation.objects.filter(
+            passage_existant = PassageEvaluation.objects.select_related('evaluation').filter(
                 apprenant_id=apprenant_id, evaluation=evaluation
             ).first()
 
             if passage_existant:
                 if passage_existant.statut == 'en_cours':
-                    return api_success("Passage en cours récupéré.",
-                                       PassageEvaluationDetailSerializer(passage_existant).data)
+                    if autosave.flush(passage_existant.id):
+                        passage_existant.refresh_from_db()
+                    return api_success_raw("Passage en cours récupéré.",
+                                           exam_paper.passage_bytes(passage_existant))
                 return api_error(
                     f"Évaluation déjà soumise (statut: {passage_existant.statut}).",
                     data={'passage_id': passage_existant.id, 'statut': passage_existant.statut}
@@ -825,14 +844,15 @@ class PassageEvaluationDemarrerAPIView(APIView):
                 apprenant_id=apprenant_id, evaluation=evaluation, statut='en_cours'
             )
             if evaluation.type_evaluation in ('structuree', 'mixte'):
-                for question in evaluation.questions.all():
-                    ReponseQuestion.objects.create(
-                        passage_evaluation=passage, question=question, statut='non_repondu'
-                    )
-
-            return api_success("Évaluation démarrée.",
-                               PassageEvaluationDetailSerializer(passage).data,
-                               status.HTTP_201_CREATED)
+                ReponseQuestion.objects.bulk_create([
+                    ReponseQuestion(passage_evaluation=passage, question_id=question_id, statut='non_repondu')
+                    for question_id in answer_key.for_evaluation(evaluation.id)
+                ])
+
+            # Sujet masqué pré-rendu (cache) + réponses de l'apprenant
+            return api_success_raw("Évaluation démarrée.",
+                                   exam_paper.passage_bytes(passage),
+                                   status.HTTP_201_CREATED)
         except Exception as e:
             import traceback
             traceback.print_exc()
@@ -849,14 +869,16 @@ class PassageEvaluationReprendreAPIView(APIView):
         if err:
             return err
         try:
-            passage = get_object_or_404(PassageEvaluation, pk=pk)
+            passage = get_object_or_404(PassageEvaluation.objects.select_related('evaluation'), pk=pk)
             if passage.apprenant_id != request.user.id:
                 return api_error("Accès refusé.", http_status=status.HTTP_403_FORBIDDEN)
             if passage.statut != 'en_cours':
                 return api_error(f"Ce passage ne peut pas être repris (statut: {passage.statut}).")
             if not passage.peut_etre_repris():
                 return api_error("La date limite est dépassée.", http_status=status.HTTP_403_FORBIDDEN)
-            return api_success("Passage récupéré.", PassageEvaluationDetailSerializer(passage).data)
+            if autosave.flush(passage.id):
+                passage.refresh_from_db()
+            return api_success_raw("Passage récupéré.", exam_paper.passage_bytes(passage))
         except Exception as e:
             return api_error("Erreur serveur.", errors={'detail': str(e)},
                              http_status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -878,16 +900,64 @@ class PassageEvaluationSauvegarderAPIView(APIView):
                 return api_error("Impossible de sauvegarder après soumission.")
             if passage.evaluation.type_evaluation != 'simple':
                 return api_error("Route uniquement pour les évaluations simples.")
+            autosave.flush(passage.id)
+            passage.refresh_from_db()
             serializer = PassageEvaluationSerializer(passage, data=request.data, partial=True)
             if serializer.is_valid():
-                return api_success("Progression sauvegardée.",
-                                   PassageEvaluationSerializer(serializer.save()).data)
+                passage = serializer.save()
+                PassageEvaluation.objects.filter(pk=passage.pk).update(revision=F('revision') + 1)
+                passage.refresh_from_db(fields=['revision'])
+                return api_success("Progression sauvegardée.", PassageEvaluationSerializer(passage).data)
             return api_error("Erreur de validation.", errors=serializer.errors)
         except Exception as e:
             return api_error("Erreur serveur.", errors={'detail': str(e)},
                              http_status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class PassageEvaluationAutosaveAPIView(APIView):
+    """
+    Sauvegarde automatique par delta : Apprenant (le sien) uniquement.
+    Body : {"revision": n, "reponses": [{"question", "choix_selectionnes"?, "reponse_texte"?}],
+            "reponse_texte"?: "..." (évaluation simple)}
+    409 si la révision n'est plus la révision courante.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        err = _require_roles(request.user, 'Apprenant')
+        if err:
+            return err
+        try:
+            passage = get_object_or_404(PassageEvaluation.objects.select_related('evaluation'), pk=pk)
+            if passage.apprenant_id != request.user.id:
+                return api_error("Accès refusé.", http_status=status.HTTP_403_FORBIDDEN)
+            try:
+                revision = int(request.data.get('revision'))
+            except (TypeError, ValueError):
+                return api_error("'revision' est requis.")
+
+            texte_passage = request.data.get('reponse_texte')
+            if texte_passage is not None and passage.evaluation.type_evaluation != 'simple':
+                return api_error("'reponse_texte' n'est accepté que pour les évaluations simples.")
+
+            try:
+                delta = autosave.normalize(passage, request.data.get('reponses') or [])
+                nouvelle, differe = autosave.autosave(passage, revision, delta, texte_passage)
+            except autosave.AutosaveError as e:
+                return api_error(str(e), data={'revision': e.revision} if e.revision is not None else None,
+                                 http_status=e.http_status)
+
+            return api_success("Progression sauvegardée.", {
+                'passage_id': passage.id,
+                'revision': nouvelle,
+                'nb_reponses': len(delta),
+                'differe': differe,
+            })
+        except Exception as e:
+            return api_error("Erreur serveur.", errors={'detail': str(e)},
+                             http_status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class PassageEvaluationSoumettreAPIView(APIView):
     """Soumettre : Apprenant (le sien) uniquement."""
     permission_classes = [IsAuthenticated]
@@ -902,6 +972,9 @@ class PassageEvaluationSoumettreAPIView(APIView):
                 return api_error("Accès refusé.", http_status=status.HTTP_403_FORBIDDEN)
             if passage.statut != 'en_cours':
                 return api_error(f"Déjà soumise (statut: {passage.statut}).")
+            # Les sauvegardes différées doivent être en base avant la correction
+            if autosave.flush(passage.id):
+                passage.refresh_from_db()
             if not passage.peut_etre_soumis():
                 return api_error("Date limite dépassée.", http_status=status.HTTP_403_FORBIDDEN)
 
@@ -917,11 +990,10 @@ class PassageEvaluationSoumettreAPIView(APIView):
             passage.save()
 
             if passage.evaluation.type_evaluation == 'structuree':
-                if passage.evaluation.est_auto_corrigeable():
-                    passage.auto_corriger()
+                # Corrigé chargé une fois : QCM corrigés, note finale si 100 % QCM
+                if grading.corriger_soumission(passage):
                     msg = "Évaluation soumise et corrigée automatiquement."
                 else:
-                    passage.auto_corriger_qcm_uniquement()
                     msg = "Évaluation soumise, en attente de correction."
             else:
                 msg = "Évaluation soumise, en attente de correction."
@@ -990,6 +1062,20 @@ class PassageEvaluationListAPIView(APIView):
                              http_status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def _check_passage_access(user, role, passage):
+    """Accès d'un utilisateur à un passage (détail, fichier, réponses). Retourne une Response 403 ou None."""
+    if role == 'Apprenant' and passage.apprenant_id != user.id:
+        return api_error("Accès refusé.", http_status=status.HTTP_403_FORBIDDEN)
+    if role == 'Parent':
+        enfants_ids = list(Apprenant.objects.filter(tuteur=user).values_list('id', flat=True))
+        if passage.apprenant_id not in enfants_ids:
+            return api_error("Accès refusé.", http_status=status.HTTP_403_FORBIDDEN)
+    if role == 'Formateur':
+        if not _formateur_owns_cours(user, passage.evaluation.cours):
+            return api_error("Accès refusé.", http_status=status.HTTP_403_FORBIDDEN)
+    return None
+
+
 class PassageEvaluationDetailAPIView(APIView):
     """Détail d'un passage selon rôle."""
     permission_classes = [IsAuthenticated]
@@ -1001,20 +1087,32 @@ class PassageEvaluationDetailAPIView(APIView):
         role = _get_role(request.user)
 
         passage = get_object_or_404(PassageEvaluation, pk=pk)
-
-        if role == 'Apprenant' and passage.apprenant_id != request.user.id:
-            return api_error("Accès refusé.", http_status=status.HTTP_403_FORBIDDEN)
-        if role == 'Parent':
-            enfants_ids = list(Apprenant.objects.filter(tuteur=request.user).values_list('id', flat=True))
-            if passage.apprenant_id not in enfants_ids:
-                return api_error("Accès refusé.", http_status=status.HTTP_403_FORBIDDEN)
-        if role == 'Formateur':
-            if not _formateur_owns_cours(request.user, passage.evaluation.cours):
-                return api_error("Accès refusé.", http_status=status.HTTP_403_FORBIDDEN)
+        err = _check_passage_access(request.user, role, passage)
+        if err:
+            return err
 
         return api_success("Passage trouvé.", PassageEvaluationDetailSerializer(passage).data)
 
 
+class PassageEvaluationFichierAPIView(APIView):
+    """Fichier réponse d'un passage (évaluation simple), servi avec Range."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        err = _block_super_admin(request.user)
+        if err:
+            return err
+        passage = get_object_or_404(
+            PassageEvaluation.objects.select_related('evaluation__cours'), pk=pk
+        )
+        err = _check_passage_access(request.user, _get_role(request.user), passage)
+        if err:
+            return err
+        if not passage.fichier_reponse:
+            return api_error("Fichier non trouvé.", http_status=status.HTTP_404_NOT_FOUND)
+        return serve_file(request, passage.fichier_reponse)
+
+
 # ============================================================================
 # RÉPONSES AUX QUESTIONS
 # ============================================================================
@@ -1039,6 +1137,8 @@ class ReponseQuestionSauvegarderAPIView(APIView):
             if passage.statut != 'en_cours':
                 return api_error("Impossible de modifier après soumission.")
 
+            # Le tampon d'autosave ne doit pas écraser cette réponse plus tard
+            autosave.flush(passage.id)
             reponse, _ = ReponseQuestion.objects.get_or_create(
                 passage_evaluation_id=passage_evaluation_id,
                 question_id=question_id
@@ -1054,6 +1154,7 @@ class ReponseQuestionSauvegarderAPIView(APIView):
                 reponse.choix_selectionnes.exists() or reponse.reponse_texte or reponse.fichier_reponse
             ) else 'non_repondu'
             reponse.save()
+            PassageEvaluation.objects.filter(pk=passage.pk).update(revision=F('revision') + 1)
 
             return api_success("Réponse sauvegardée.", ReponseQuestionSerializer(reponse).data)
         except Exception as e:
@@ -1079,6 +1180,25 @@ class ReponseQuestionDetailAPIView(APIView):
         return api_success("Réponse trouvée.", ReponseQuestionSerializer(reponse).data)
 
 
+class ReponseQuestionFichierAPIView(APIView):
+    """Fichier réponse d'une question, servi avec Range."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        err = _block_super_admin(request.user)
+        if err:
+            return err
+        reponse = get_object_or_404(
+            ReponseQuestion.objects.select_related('passage_evaluation__evaluation__cours'), pk=pk
+        )
+        err = _check_passage_access(request.user, _get_role(request.user), reponse.passage_evaluation)
+        if err:
+            return err
+        if not reponse.fichier_reponse:
+            return api_error("Fichier non trouvé.", http_status=status.HTTP_404_NOT_FOUND)
+        return serve_file(request, reponse.fichier_reponse)
+
+
 # ============================================================================
 # CORRECTION
 # ============================================================================
@@ -1100,6 +1220,9 @@ class CorrectionReponseAPIView(APIView):
                 return api_error("Cette question est corrigée automatiquement.")
             if reponse.passage_evaluation.statut not in ('soumis', 'corrige'):
                 return api_error("Le passage doit être soumis pour être corrigé.")
+            if file_correction.reservee_par_autre(reponse.passage_evaluation, request.user):
+                return api_error("Copie réservée par un autre correcteur.",
+                                 http_status=status.HTTP_409_CONFLICT)
 
             serializer = CorrectionReponseSerializer(reponse, data=request.data, partial=True)
             if serializer.is_valid():
@@ -1107,6 +1230,7 @@ class CorrectionReponseAPIView(APIView):
                 reponse.statut = 'corrige'
                 reponse.date_correction = timezone.now()
                 reponse.save()
+                statistiques.planifier_rafraichissement(reponse.passage_evaluation.evaluation_id)
                 return api_success("Réponse corrigée.", ReponseQuestionSerializer(reponse).data)
             return api_error("Erreur de validation.", errors=serializer.errors)
         except Exception as e:
@@ -1129,6 +1253,9 @@ class CorrectionEvaluationAPIView(APIView):
                     return api_error("Accès refusé.", http_status=status.HTTP_403_FORBIDDEN)
             if passage.statut not in ('soumis', 'corrige'):
                 return api_error("Le passage doit être soumis pour être corrigé.")
+            if file_correction.reservee_par_autre(passage, request.user):
+                return api_error("Copie réservée par un autre correcteur.",
+                                 http_status=status.HTTP_409_CONFLICT)
 
             if passage.evaluation.type_evaluation == 'structuree':
                 non_corriges = passage.reponses_questions.filter(
@@ -1149,6 +1276,9 @@ class CorrectionEvaluationAPIView(APIView):
             passage.commentaire_enseignant = request.data.get('commentaire_enseignant', '')
             passage.statut = 'corrige'
             passage.date_correction = timezone.now()
+            # Copie corrigée : la réservation n'a plus lieu d'être
+            passage.reserve_par = None
+            passage.reservation_expire_le = None
             passage.save()
             return api_success("Évaluation corrigée.", PassageEvaluationDetailSerializer(passage).data)
         except Exception as e:
@@ -1156,34 +1286,99 @@ class CorrectionEvaluationAPIView(APIView):
                              http_status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class EvaluationsACorrigerAPIView(APIView):
-    """Liste des évaluations à corriger : Formateur/Admin/Responsable."""
+class RecorrectionEvaluationAPIView(APIView):
+    """
+    Recorriger tous les passages d'une évaluation après modification du
+    corrigé (réponses correctes, points) : Admin, Responsable, Formateur.
+    """
     permission_classes = [IsAuthenticated]
 
-    def get(self, request):
+    def post(self, request, pk):
         err = _require_roles(request.user, 'Admin', 'ResponsableAcademique', 'Formateur')
         if err:
             return err
         try:
-            role = _get_role(request.user)
-            annee_scolaire_id = _get_annee_scolaire_id(request)
-            qs = PassageEvaluation.objects.select_related('apprenant', 'evaluation').filter(statut='soumis')
+            evaluation = get_object_or_404(Evaluation.objects.select_related('cours'), pk=pk)
+            if _get_role(request.user) == 'Formateur':
+                if not _formateur_owns_cours(request.user, evaluation.cours):
+                    return api_error("Accès refusé.", http_status=status.HTTP_403_FORBIDDEN)
+            if evaluation.type_evaluation == 'simple':
+                return api_error("Une évaluation simple n'a pas de correction automatique.")
 
-            if role in ('Admin', 'ResponsableAcademique'):
-                institution_id = getattr(request.user, 'institution_id', None)
-                qs = qs.filter(evaluation__cours__institution_id=institution_id)
-                # ✅ Filtre par année scolaire
-                if annee_scolaire_id:
-                    qs = qs.filter(evaluation__cours__annee_scolaire_id=annee_scolaire_id)
+            nb_passages = grading.regrade_evaluation(evaluation)
+            return api_success("Passages recorrigés.", {'evaluation_id': evaluation.id, 'nb_passages': nb_passages})
+        except Exception as e:
+            return api_error("Erreur serveur.", errors={'detail': str(e)},
+                             http_status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            elif role == 'Formateur':
-                qs = qs.filter(evaluation__cours__enseignant=request.user)
-                if annee_scolaire_id:
-                    qs = qs.filter(evaluation__cours__annee_scolaire_id=annee_scolaire_id)
 
-            enseignant_id = request.query_params.get('enseignant')
-            if enseignant_id:
-                qs = qs.filter(evaluation__enseignant_id=enseignant_id)
+class CorrectionLotAPIView(APIView):
+    """
+    Correction manuelle par lot : Formateur (ses cours), Admin, Responsable,
+    ResponsableAcademique (cours de leur institution).
+    Body : {reponses: [{id, points_obtenus, commentaire_correcteur}],
+            passages: [{id, commentaire_enseignant}], finaliser: true}
+    Tout ou rien : au moindre élément invalide, rien n'est enregistré (400 + errors).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        err = _require_roles(request.user, 'Admin', 'Responsable', 'ResponsableAcademique', 'Formateur')
+        if err:
+            return err
+        if _get_role(request.user) == 'Formateur':
+            def peut_corriger(cours):
+                return _formateur_owns_cours(request.user, cours)
+        else:
+            # Admin / Responsable / ResponsableAcademique : cours de leur institution
+            institution_id = getattr(request.user, 'institution_id', None)
+
+            def peut_corriger(cours):
+                return institution_id is not None and getattr(cours, 'institution_id', None) == institution_id
+
+        finaliser = str(request.data.get('finaliser', 'true')).lower() in ('1', 'true')
+        try:
+            resultat = correction_lot.corriger_lot(
+                request.user, request.data.get('reponses'), request.data.get('passages'),
+                finaliser=finaliser, peut_corriger=peut_corriger,
+            )
+        except correction_lot.CorrectionLotError as e:
+            return api_error(str(e), errors=e.errors, http_status=e.http_status)
+        except Exception as e:
+            return api_error("Erreur serveur.", errors={'detail': str(e)},
+                             http_status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return api_success(f"{resultat['nb_reponses']} réponse(s) corrigée(s).", resultat)
+
+
+class EvaluationsACorrigerAPIView(APIView):
+    """
+    Liste des évaluations à corriger : Formateur/Admin/Responsable.
+    Liste complète par défaut ; pagination par curseur (date_soumission, id)
+    avec ?cursor= / ?page_size= / ?pagination=cursor.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        err = _require_roles(request.user, 'Admin', 'ResponsableAcademique', 'Formateur')
+        if err:
+            return err
+        try:
+            qs = file_correction.perimetre(
+                request.user, _get_role(request.user),
+                annee_scolaire_id=_get_annee_scolaire_id(request),
+                enseignant_id=request.query_params.get('enseignant'),
+            ).select_related('apprenant', 'evaluation')
+
+            if use_cursor_pagination(request):
+                try:
+                    page = paginate_keyset(file_correction.file_attente(qs, request.user), request,
+                                           'date_soumission', ascending=True)
+                except InvalidCursor as e:
+                    return api_error(str(e))
+                return api_success("Évaluations à corriger récupérées.", {
+                    'results': PassageEvaluationSerializer(page.items, many=True).data,
+                    'pagination': page.as_meta(),
+                })
 
             return api_success("Évaluations à corriger récupérées.",
                                PassageEvaluationSerializer(qs, many=True).data)
@@ -1192,6 +1387,96 @@ class EvaluationsACorrigerAPIView(APIView):
                              http_status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class FileCorrectionAPIView(APIView):
+    """
+    File de correction partagée : Formateur/Admin/Responsable.
+    GET : page (curseur, plus ancienne copie d'abord) + décompte par évaluation.
+    ?evaluation=<id>, ?enseignant=<id>, ?disponibles=true (hors copies réservées
+    par d'autres correcteurs), ?cursor=, ?page_size=.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        err = _require_roles(request.user, 'Admin', 'ResponsableAcademique', 'Formateur')
+        if err:
+            return err
+        params = request.query_params
+        try:
+            enseignant_id = _int_param(params, 'enseignant')
+            evaluation_id = _int_param(params, 'evaluation')
+        except ValueError as e:
+            return api_error(str(e))
+        qs = file_correction.perimetre(
+            request.user, _get_role(request.user),
+            annee_scolaire_id=_get_annee_scolaire_id(request),
+            enseignant_id=enseignant_id,
+            evaluation_id=evaluation_id,
+        )
+        disponibles = params.get('disponibles', 'false').lower() == 'true'
+        try:
+            page = paginate_keyset(
+                file_correction.file_attente(qs, request.user, disponibles).select_related('apprenant', 'evaluation'),
+                request, 'date_soumission', ascending=True,
+            )
+        except InvalidCursor as e:
+            return api_error(str(e))
+
+        return api_success("File de correction récupérée.", {
+            'results': PassageEvaluationSerializer(page.items, many=True).data,
+            'pagination': page.as_meta(),
+            'par_evaluation': file_correction.decompte_par_evaluation(qs, request.user),
+        })
+
+
+class FileCorrectionReserverAPIView(APIView):
+    """
+    POST : réserve un lot de copies (bail CORRECTION_RESERVATION_MINUTES).
+    Body : {nombre (défaut 10), evaluation (optionnel)}
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        err = _require_roles(request.user, 'Admin', 'ResponsableAcademique', 'Formateur')
+        if err:
+            return err
+        try:
+            nombre = int(request.data.get('nombre', 10))
+        except (TypeError, ValueError):
+            return api_error("'nombre' doit être un entier.")
+        try:
+            evaluation_id = _int_param(request.data, 'evaluation')
+        except ValueError as e:
+            return api_error(str(e))
+        if not 1 <= nombre <= file_correction.max_lot():
+            return api_error(f"'nombre' doit être compris entre 1 et {file_correction.max_lot()}.")
+
+        qs = file_correction.perimetre(
+            request.user, _get_role(request.user),
+            annee_scolaire_id=_get_annee_scolaire_id(request),
+            evaluation_id=evaluation_id,
+        )
+        ids = file_correction.reserver(qs, request.user, nombre)
+        passages = PassageEvaluation.objects.filter(id__in=ids).select_related('apprenant', 'evaluation') \
+            .order_by('date_soumission', 'id')
+        return api_success(f"{len(ids)} copie(s) réservée(s).",
+                           PassageEvaluationSerializer(passages, many=True).data)
+
+
+class FileCorrectionLibererAPIView(APIView):
+    """POST : rend des copies réservées. Body : {passages: [ids]} (toutes si absent)."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        err = _require_roles(request.user, 'Admin', 'ResponsableAcademique', 'Formateur')
+        if err:
+            return err
+        passage_ids = request.data.get('passages')
+        if passage_ids is not None and not isinstance(passage_ids, list):
+            return api_error("'passages' doit être une liste d'ids.")
+        nb = file_correction.liberer(request.user, passage_ids)
+        return api_success(f"{nb} copie(s) libérée(s).", {'nb_liberees': nb})
+
+
 # ============================================================================
 # PASSAGES QUIZ
 # ============================================================================
@@ -1341,6 +1626,7 @@ class StatistiquesApprenantAPIView(APIView):
     - Apprenant : ses propres stats
     - Admin/Responsable/Formateur : stats de tout apprenant de leur institution
     - Parent : stats de ses enfants
+    Agrégats conditionnels en cache (services/stats_apprenants.py).
     """
     permission_classes = [IsAuthenticated]
 
@@ -1354,47 +1640,101 @@ class StatistiquesApprenantAPIView(APIView):
             return api_error("Vous ne pouvez voir que vos propres statistiques.",
                              http_status=status.HTTP_403_FORBIDDEN)
         if role == 'Parent':
-            enfants_ids = list(Apprenant.objects.filter(tuteur=request.user).values_list('id', flat=True))
-            if int(apprenant_id) not in enfants_ids:
+            if not Apprenant.objects.filter(pk=apprenant_id, tuteur=request.user).exists():
                 return api_error("Accès refusé.", http_status=status.HTTP_403_FORBIDDEN)
 
-        annee_scolaire_id = _get_annee_scolaire_id(request)
+        # ✅ Filtre par année scolaire (sauf vue apprenant / parent)
+        annee_scolaire_id = None
+        if role not in ('Apprenant', 'Parent'):
+            annee_scolaire_id = _get_annee_scolaire_id(request)
 
         try:
-            passages_quiz = PassageQuiz.objects.filter(apprenant_id=apprenant_id, termine=True)
-            passages_eval = PassageEvaluation.objects.filter(apprenant_id=apprenant_id)
-            passages_corriges = passages_eval.filter(statut='corrige')
-
-            # ✅ Filtre par année scolaire pour les stats aussi
-            if annee_scolaire_id and role not in ('Apprenant', 'Parent'):
-                passages_quiz = passages_quiz.filter(
-                    quiz__sequence__module__cours__annee_scolaire_id=annee_scolaire_id
-                )
-                passages_eval = passages_eval.filter(
-                    evaluation__cours__annee_scolaire_id=annee_scolaire_id
-                )
-                passages_corriges = passages_corriges.filter(
-                    evaluation__cours__annee_scolaire_id=annee_scolaire_id
-                )
-
-            score_moyen = passages_quiz.aggregate(Avg('score'))['score__avg']
-            note_moyenne = passages_corriges.aggregate(Avg('note'))['note__avg']
-
-            stats = {
-                'apprenant_id': apprenant_id,
-                'nombre_quiz_passes': passages_quiz.count(),
-                'score_moyen_quiz': round(score_moyen, 2) if score_moyen else 0,
-                'nombre_evaluations_passees': passages_eval.count(),
-                'nombre_evaluations_corrigees': passages_corriges.count(),
-                'nombre_evaluations_en_attente': passages_eval.filter(statut='soumis').count(),
-                'note_moyenne': round(note_moyenne, 2) if note_moyenne else 0,
-            }
+            stats = stats_apprenants.stats_apprenant(apprenant_id, annee_scolaire_id)
             return api_success("Statistiques récupérées.", stats)
         except Exception as e:
             return api_error("Erreur serveur.", errors={'detail': str(e)},
                              http_status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class StatistiquesApprenantsAPIView(APIView):
+    """
+    Stats de plusieurs apprenants en un appel (tableaux de bord parent / enseignant).
+
+    GET statistiques/apprenants/?ids=1,2,3      (ou ?cours_id=… : inscrits du cours)
+    - Parent : ses enfants (tous si ni ids ni cours_id)
+    - Formateur : apprenants inscrits à ses cours
+    - Admin/Responsable : apprenants de leur institution
+    Les ids hors périmètre sont renvoyés dans 'ids_refuses'.
+    Sans 'ids', au plus STATS_APPRENANTS_MAX apprenants par ordre d'id :
+    'tronque' signale la suite, à demander avec ?apres=<suivant>.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def _ids_demandes(self, request):
+        brut = request.query_params.get('ids')
+        if not brut:
+            return None
+        try:
+            return list(dict.fromkeys(int(i) for i in brut.split(',') if i.strip()))
+        except ValueError:
+            raise ValueError("'ids' doit être une liste d'entiers séparés par des virgules.")
+
+    def get(self, request):
+        err = _require_roles(request.user, 'Admin', 'Responsable', 'ResponsableAcademique',
+                             'Formateur', 'Parent')
+        if err:
+            return err
+        role = _get_role(request.user)
+        try:
+            ids = self._ids_demandes(request)
+            cours_id = _int_param(request.query_params, 'cours_id')
+            apres = _int_param(request.query_params, 'apres')
+        except ValueError as e:
+            return api_error(str(e))
+        if ids is None and not cours_id and role != 'Parent':
+            return api_error("Paramètre 'ids' ou 'cours_id' requis.")
+        maximum = stats_apprenants.max_apprenants()
+        if ids is not None and len(ids) > maximum:
+            return api_error(f"{maximum} apprenants au plus par appel.")
+
+        # Périmètre du demandeur
+        if role == 'Parent':
+            autorises = Apprenant.objects.filter(tuteur=request.user)
+        elif role == 'Formateur':
+            autorises = Apprenant.objects.filter(
+                inscriptions_cours__cours__enseignant=request.user,
+                inscriptions_cours__cours__institution_id=request.user.institution_id,
+            )
+        else:
+            autorises = Apprenant.objects.filter(institution_id=request.user.institution_id)
+        if cours_id:
+            autorises = autorises.filter(inscriptions_cours__cours_id=cours_id)
+        tronque = False
+        if ids is not None:
+            autorises = set(autorises.filter(id__in=ids).values_list('id', flat=True).distinct())
+        else:
+            if apres is not None:
+                autorises = autorises.filter(id__gt=apres)
+            ids = list(autorises.values_list('id', flat=True).distinct().order_by('id')[:maximum + 1])
+            tronque = len(ids) > maximum
+            ids = ids[:maximum]
+            autorises = set(ids)
+        retenus = [i for i in ids if i in autorises]
+
+        annee_scolaire_id = None if role == 'Parent' else _get_annee_scolaire_id(request)
+        try:
+            stats = stats_apprenants.stats_apprenants(retenus, annee_scolaire_id)
+            return api_success("Statistiques récupérées.", {
+                'apprenants': [stats[i] for i in retenus],
+                'ids_refuses': [i for i in ids if i not in autorises],
+                'tronque': tronque,
+                'suivant': ids[-1] if tronque else None,
+            })
+        except Exception as e:
+            return api_error("Erreur serveur.", errors={'detail': str(e)},
+                             http_status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class StatistiquesEvaluationAPIView(APIView):
     """Stats évaluation : Admin, Responsable, Formateur uniquement."""
     permission_classes = [IsAuthenticated]
@@ -1409,65 +1749,8 @@ class StatistiquesEvaluationAPIView(APIView):
                 if not _formateur_owns_cours(request.user, evaluation.cours):
                     return api_error("Accès refusé.", http_status=status.HTTP_403_FORBIDDEN)
 
-            tous_passages = PassageEvaluation.objects.filter(evaluation_id=evaluation_id)
-            passages_corriges = tous_passages.filter(statut='corrige')
-
-            stats = {
-                'evaluation_id': evaluation_id,
-                'nb_passages': tous_passages.count(),
-                'nb_passages_soumis': tous_passages.filter(statut='soumis').count(),
-                'nb_passages_corriges': passages_corriges.count(),
-                'nb_passages_en_cours': tous_passages.filter(statut='en_cours').count(),
-                'bareme': evaluation.bareme,
-                'moyenne_note': None, 'note_min': None,
-                'note_max': None, 'taux_reussite': None,
-                'stats_par_question': [], 'nb_questions': 0,
-            }
-
-            if passages_corriges.exists():
-                notes = [n for n in passages_corriges.values_list('note', flat=True) if n is not None]
-                if notes:
-                    moyenne = sum(notes) / len(notes)
-                    stats.update({
-                        'moyenne_note': round(moyenne, 2),
-                        'note_min': round(min(notes), 2),
-                        'note_max': round(max(notes), 2),
-                        'taux_reussite': round(
-                            len([n for n in notes if n >= evaluation.bareme / 2]) / len(notes) * 100, 2
-                        ),
-                    })
-
-            if evaluation.type_evaluation in ('structuree', 'mixte'):
-                stats_par_question = []
-                for question in evaluation.questions.all().order_by('ordre'):
-                    reponses_q = ReponseQuestion.objects.filter(
-                        passage_evaluation__evaluation_id=evaluation_id, question=question
-                    )
-                    nb_reponses = reponses_q.exclude(statut='non_repondu').count()
-                    if question.mode_correction == 'automatique':
-                        nb_correctes = reponses_q.filter(points_obtenus=question.points).count()
-                        taux = round((nb_correctes / nb_reponses) * 100, 2) if nb_reponses > 0 else None
-                        stats_par_question.append({
-                            'question_id': question.id, 'enonce': question.enonce_texte,
-                            'type_question': question.type_question, 'points': question.points,
-                            'nb_reponses': nb_reponses, 'nb_correctes': nb_correctes,
-                            'moyenne_points': None, 'taux_reussite': taux,
-                        })
-                    else:
-                        points_list = list(
-                            reponses_q.filter(statut='corrige').values_list('points_obtenus', flat=True)
-                        )
-                        moyenne_pts = round(sum(points_list) / len(points_list), 2) if points_list else None
-                        taux = round((moyenne_pts / question.points) * 100, 2) if moyenne_pts else None
-                        stats_par_question.append({
-                            'question_id': question.id, 'enonce': question.enonce_texte,
-                            'type_question': question.type_question, 'points': question.points,
-                            'nb_reponses': nb_reponses, 'nb_correctes': None,
-                            'moyenne_points': moyenne_pts, 'taux_reussite': taux,
-                        })
-                stats['stats_par_question'] = stats_par_question
-                stats['nb_questions'] = len(stats_par_question)
-
+            # Lecture des tables matérialisées (services/statistiques.py)
+            stats = statistiques.statistiques_evaluation(evaluation)
             return api_success("Statistiques récupérées.", stats)
         except Exception as e:
             return api_error("Erreur serveur.", errors={'detail': str(e)},
@@ -1482,6 +1765,10 @@ class EvaluationExportAPIView(APIView):
     """Export : Admin, Responsable, Formateur (propriétaire)."""
     permission_classes = [IsAuthenticated]
 
+    def perform_content_negotiation(self, request, force=False):
+        # ?format=csv|xlsx désigne le fichier exporté, pas un renderer DRF
+        return super().perform_content_negotiation(request, force=True)
+
     def get(self, request, pk):
         err = _require_roles(request.user, 'Admin', 'Responsable', 'Formateur')
         if err:
@@ -1493,149 +1780,23 @@ class EvaluationExportAPIView(APIView):
 
         export_format = request.query_params.get("format", "csv").lower()
         detail = request.query_params.get("detail", "false").lower() == "true"
-
-        passages = (
-            PassageEvaluation.objects
-            .select_related("apprenant", "evaluation", "evaluation__cours")
-            .filter(evaluation=evaluation)
-            .order_by("apprenant__nom", "apprenant__prenom")
-        )
+        entetes, lignes = exports.entetes_et_lignes(evaluation, detail)
 
         if export_format == "xlsx":
             try:
-                from openpyxl import Workbook
+                import openpyxl  # noqa: F401
             except ImportError:
                 return api_error("openpyxl non installé.",
                                  http_status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            return self._export_detail_xlsx(evaluation, passages) if detail \
-                else self._export_resume_xlsx(evaluation, passages)
-
-        return self._export_detail_csv(evaluation, passages) if detail \
-            else self._export_resume_csv(evaluation, passages)
-
-    def _get_user_info(self, apprenant):
-        return {
-            'nom': getattr(apprenant, 'nom', '') or '',
-            'prenom': getattr(apprenant, 'prenom', '') or '',
-            'email': getattr(apprenant, 'email', '') or '',
-        }
-
-    def _export_resume_csv(self, evaluation, passages):
-        response = HttpResponse(content_type="text/csv; charset=utf-8-sig")
-        response["Content-Disposition"] = f'attachment; filename="evaluation_{evaluation.id}_resume.csv"'
-        writer = csv.writer(response, delimiter=';')
-        writer.writerow(["evaluation_id", "evaluation", "cours", "apprenant_id", "nom", "prenom",
-                         "email", "statut", "note", "bareme", "pourcentage",
-                         "date_debut", "date_soumission", "date_correction"])
-        for p in passages:
-            info = self._get_user_info(p.apprenant)
-            pct = p.pourcentage()
-            writer.writerow([
-                evaluation.id, evaluation.titre,
-                evaluation.cours.titre if evaluation.cours else "",
-                p.apprenant_id, info['nom'], info['prenom'], info['email'],
-                p.statut, p.note if p.note is not None else "", evaluation.bareme,
-                pct if pct is not None else "",
-                p.date_debut, p.date_soumission, p.date_correction,
-            ])
-        return response
-
-    def _export_detail_csv(self, evaluation, passages):
-        response = HttpResponse(content_type="text/csv; charset=utf-8-sig")
-        response["Content-Disposition"] = f'attachment; filename="evaluation_{evaluation.id}_detail.csv"'
-        writer = csv.writer(response, delimiter=';')
-        writer.writerow(["evaluation_id", "evaluation", "cours", "apprenant_id", "nom", "prenom",
-                         "email", "statut_passage", "question_id", "ordre", "type_question", "enonce",
-                         "statut_reponse", "points_obtenus", "points_question",
-                         "reponse_texte", "fichier_reponse", "choix_selectionnes"])
-        passage_ids = list(passages.values_list("id", flat=True))
-        reponses = (
-            ReponseQuestion.objects
-            .select_related("passage_evaluation", "passage_evaluation__apprenant", "question")
-            .prefetch_related("choix_selectionnes")
-            .filter(passage_evaluation_id__in=passage_ids)
-            .order_by("passage_evaluation__apprenant__nom", "question__ordre")
-        )
-        passage_map = {p.id: p for p in passages}
-        for rq in reponses:
-            p = passage_map.get(rq.passage_evaluation_id)
-            if not p:
-                continue
-            info = self._get_user_info(p.apprenant)
-            choix_txt = "; ".join(rq.choix_selectionnes.values_list("texte", flat=True))
-            writer.writerow([
-                evaluation.id, evaluation.titre,
-                evaluation.cours.titre if evaluation.cours else "",
-                p.apprenant_id, info['nom'], info['prenom'], info['email'], p.statut,
-                rq.question_id, rq.question.ordre, rq.question.type_question,
-                (rq.question.enonce_texte or '')[:200], rq.statut, rq.points_obtenus,
-                rq.question.points, (rq.reponse_texte or '')[:200],
-                rq.fichier_reponse.url if rq.fichier_reponse else "", choix_txt,
-            ])
-        return response
-
-    def _export_resume_xlsx(self, evaluation, passages):
-        from openpyxl import Workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Résumé"
-        ws.append(["evaluation_id", "evaluation", "cours", "apprenant_id", "nom", "prenom",
-                   "email", "statut", "note", "bareme", "pourcentage",
-                   "date_debut", "date_soumission", "date_correction"])
-        for p in passages:
-            info = self._get_user_info(p.apprenant)
-            pct = p.pourcentage()
-            ws.append([evaluation.id, evaluation.titre,
-                       evaluation.cours.titre if evaluation.cours else "",
-                       p.apprenant_id, info['nom'], info['prenom'], info['email'],
-                       p.statut, p.note if p.note is not None else "", evaluation.bareme,
-                       pct if pct is not None else "",
-                       p.date_debut, p.date_soumission, p.date_correction])
-        buff = BytesIO()
-        wb.save(buff)
-        buff.seek(0)
-        response = HttpResponse(buff.getvalue(),
-                                content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-        response["Content-Disposition"] = f'attachment; filename="evaluation_{evaluation.id}_resume.xlsx"'
-        return response
-
-    def _export_detail_xlsx(self, evaluation, passages):
-        from openpyxl import Workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Détail"
-        ws.append(["evaluation_id", "evaluation", "cours", "apprenant_id", "nom", "prenom",
-                   "email", "statut_passage", "question_id", "ordre", "type_question", "enonce",
-                   "statut_reponse", "points_obtenus", "points_question",
-                   "reponse_texte", "fichier_reponse", "choix_selectionnes"])
-        passage_ids = list(passages.values_list("id", flat=True))
-        reponses = (
-            ReponseQuestion.objects
-            .select_related("passage_evaluation", "passage_evaluation__apprenant", "question")
-            .prefetch_related("choix_selectionnes")
-            .filter(passage_evaluation_id__in=passage_ids)
-            .order_by("passage_evaluation__apprenant__nom", "question__ordre")
-        )
-        passage_map = {p.id: p for p in passages}
-        for rq in reponses:
-            p = passage_map.get(rq.passage_evaluation_id)
-            if not p:
-                continue
-            info = self._get_user_info(p.apprenant)
-            choix_txt = "; ".join(rq.choix_selectionnes.values_list("texte", flat=True))
-            ws.append([evaluation.id, evaluation.titre,
-                       evaluation.cours.titre if evaluation.cours else "",
-                       p.apprenant_id, info['nom'], info['prenom'], info['email'], p.statut,
-                       rq.question_id, rq.question.ordre, rq.question.type_question,
-                       (rq.question.enonce_texte or '')[:200], rq.statut, rq.points_obtenus,
-                       rq.question.points, (rq.reponse_texte or '')[:200],
-                       rq.fichier_reponse.url if rq.fichier_reponse else "", choix_txt])
-        buff = BytesIO()
-        wb.save(buff)
-        buff.seek(0)
-        response = HttpResponse(buff.getvalue(),
-                                content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-        response["Content-Disposition"] = f'attachment; filename="evaluation_{evaluation.id}_detail.xlsx"'
+            # Classeur write_only dans un fichier temporaire, servi par morceaux
+            fichier = xlsx_tempfile(entetes, lignes, "Détail" if detail else "Résumé")
+            return FileResponse(fichier, as_attachment=True, content_type=CONTENT_TYPE_XLSX,
+                                filename=exports.nom_fichier(evaluation, detail, "xlsx"))
+
+        response = StreamingHttpResponse(csv_stream(entetes, lignes),
+                                         content_type=CONTENT_TYPE_CSV)
+        response["Content-Disposition"] = \
+            f'attachment; filename="{exports.nom_fichier(evaluation, detail, "csv")}"'
         return response
 
 
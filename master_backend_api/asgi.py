@@ -3,6 +3,9 @@ ASGI config for prograppApi project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+HTTP : application Django ; WebSocket : Channels (centre de notifications,
+authentification par token DRF — voir notifications/consumers.py).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -11,6 +14,19 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'master-backend-api.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'master_backend_api.settings')
+
+# Charge Django avant tout import de modèles (consumers)
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+
+from notifications.consumers import TokenAuthMiddleware  # noqa: E402
+from notifications.routing import websocket_urlpatterns  # noqa: E402
 
-application = get_asgi_application()
+# Pas d'OriginValidator : l'authentification repose sur le token, pas sur un
+# cookie de session, et les clients mobiles n'envoient pas d'en-tête Origin.
+application = ProtocolTypeRouter({
+    "http":      django_asgi_app,
+    "websocket": TokenAuthMiddleware(URLRouter(websocket_urlpatterns)),
+})
@@ -27,6 +27,26 @@ app.conf.beat_schedule = {
         'task': 'analyser_progression_quotidienne',  # ← Utiliser le nom court
         'schedule': crontab(hour=22, minute=0),
     },
+    'purger-uploads-fragmentes': {
+        'task': 'purger_uploads_expires',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'purger-exports-expires': {
+        'task': 'purger_exports_expires',
+        'schedule': crontab(hour=3, minute=30),
+    },
+    'interrompre-exports-bloques': {
+        'task': 'interrompre_exports_bloques',
+        'schedule': crontab(minute='*/15'),
+    },
+    'liberer-reservations-correction': {
+        'task': 'liberer_reservations_expirees',
+        'schedule': crontab(minute='*/15'),
+    },
+    'relancer-evenements-notification': {
+        'task': 'relancer_evenements_notification',
+        'schedule': crontab(minute='*/5'),
+    },
 }
 
 @app.task(bind=True, ignore_result=True)
@@ -66,6 +66,7 @@ INSTALLED_APPS = [
     "analytics",
     'django_celery_results',  # ← Ajouter
     'django_celery_beat',
+    'channels',
 ]
 
 SITE_ID = 1
@@ -106,6 +107,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'master_backend_api.wsgi.application'
+ASGI_APPLICATION = 'master_backend_api.asgi.application'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -207,6 +209,135 @@ CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
 # ANTHROPIC_API_KEY = 'votre_cle_api_anthropic'
 
 USE_AI_MOCK = True
+
+# ========================================
+# CACHE
+# ========================================
+# Redis en production (REDIS_URL), mémoire locale sinon.
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# Durée de vie (secondes) du contexte rôle/institution/année mis en cache
+# par utilisateur — voir core/scope_context.py
+# 0 = pas de cache inter-requêtes : sans cache partagé, l'invalidation
+# n'atteindrait pas les autres processus
+SCOPE_CONTEXT_CACHE_TIMEOUT = config('SCOPE_CONTEXT_CACHE_TIMEOUT', default=300 if REDIS_URL else 0, cast=int)
+
+# Pagination par curseur des listes courses — voir courses/pagination.py
+# False = liste complète tant que le client ne demande pas ?cursor / ?page_size
+COURSES_CURSOR_PAGINATION_DEFAULT = config(
+    'COURSES_CURSOR_PAGINATION_DEFAULT', default=False, cast=bool
+)
+COURSES_CURSOR_PAGE_SIZE = 50
+COURSES_CURSOR_COUNT_TIMEOUT = 60
+
+# Upload fragmenté des fichiers de blocs — voir courses/services/chunked_upload.py
+CHUNKED_UPLOAD_TEMP_DIR = config('CHUNKED_UPLOAD_TEMP_DIR', default=str(BASE_DIR / 'tmp' / 'chunked_uploads'))
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE = 8 * 1024 * 1024
+CHUNKED_UPLOAD_EXPIRATION_HOURS = 24
+
+# Livraison des fichiers protégés — voir core/file_delivery.py
+# "python" (Range géré par Django), "x-accel" (nginx) ou "x-sendfile" (Apache)
+FILE_DELIVERY_BACKEND = config('FILE_DELIVERY_BACKEND', default='python')
+# Location nginx "internal" pointant sur MEDIA_ROOT (mode x-accel)
+FILE_DELIVERY_ACCEL_PREFIX = config('FILE_DELIVERY_ACCEL_PREFIX', default='/protected-media/')
+
+# Indicateurs de classe par cours — voir courses/services/indicateurs.py
+# 0 sans cache partagé : calculés à chaque appel
+COURS_INDICATEURS_CACHE_TIMEOUT = config('COURS_INDICATEURS_CACHE_TIMEOUT', default=300 if REDIS_URL else 0, cast=int)
+
+# Corrigés compilés des évaluations / quiz — voir evaluations/services/answer_key.py
+# (invalidés par les signaux Question / Reponse) ; 0 sans cache partagé : compilés à chaque appel
+ANSWER_KEY_CACHE_TIMEOUT = config('ANSWER_KEY_CACHE_TIMEOUT', default=24 * 3600 if REDIS_URL else 0, cast=int)
+
+# Sujets d'examen masqués pré-rendus — voir evaluations/services/exam_paper.py
+# EXAM_PAPER_VARIANTS > 1 : questions et choix mélangés, une variante par apprenant
+# 0 sans cache partagé : sujet rendu à chaque démarrage
+EXAM_PAPER_CACHE_TIMEOUT = config('EXAM_PAPER_CACHE_TIMEOUT', default=6 * 3600 if REDIS_URL else 0, cast=int)
+EXAM_PAPER_VARIANTS = config('EXAM_PAPER_VARIANTS', default=0, cast=int)
+
+# Sauvegarde automatique par delta — voir evaluations/services/autosave.py
+# Fenêtre d'anti-rebond (0 = écriture immédiate) ; nécessite un cache partagé
+AUTOSAVE_DEBOUNCE_SECONDS = config('AUTOSAVE_DEBOUNCE_SECONDS', default=5 if REDIS_URL else 0, cast=int)
+
+# Exports des passages d'évaluation — voir evaluations/services/exports.py
+# Taille des paquets lus en base (.iterator) : mémoire constante
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+# Exports asynchrones (ExportJob) — voir courses/services/export_jobs.py
+# Fichiers sous MEDIA_ROOT/exports/ ; export identique réutilisé pendant la fenêtre
+EXPORT_JOB_REUSE_SECONDS = 600
+EXPORT_JOB_TTL_HOURS = config('EXPORT_JOB_TTL_HOURS', default=24, cast=int)
+EXPORT_JOB_PROGRESS_EVERY = 500
+# Job en attente / en cours depuis plus longtemps : worker interrompu → échec
+EXPORT_JOB_STALE_MINUTES = config('EXPORT_JOB_STALE_MINUTES', default=60, cast=int)
+
+# File de correction — voir evaluations/services/file_correction.py
+# Durée du bail d'une copie réservée, taille maximale d'un lot
+CORRECTION_RESERVATION_MINUTES = config('CORRECTION_RESERVATION_MINUTES', default=30, cast=int)
+CORRECTION_RESERVATION_MAX_LOT = 50
+# Correction manuelle par lot — voir evaluations/services/correction_lot.py
+CORRECTION_LOT_MAX = 500
+# Statistiques apprenant en cache (clé versionnée, invalidée aux changements de passage)
+# et nombre maximal d'apprenants par appel groupé — voir evaluations/services/stats_apprenants.py
+# Cache seulement s'il est partagé (Redis) : 0 → calcul à chaque appel
+STATS_APPRENANT_CACHE_TIMEOUT = config('STATS_APPRENANT_CACHE_TIMEOUT', default=600 if REDIS_URL else 0, cast=int)
+STATS_APPRENANTS_MAX = 200
+# Diffusion des notifications : taille des paquets bulk_create et seuil (ms)
+# au-delà duquel la durée d'un événement est journalisée en avertissement
+# — voir notifications/services/fanout.py
+NOTIFICATION_BULK_CHUNK = 500
+NOTIFICATION_FANOUT_WARN_MS = config('NOTIFICATION_FANOUT_WARN_MS', default=500, cast=int)
+# Outbox des notifications : diffusion par Celery (False = sur place après commit),
+# tentatives maximales et taille des lots de relance — voir notifications/services/outbox.py
+# Par Celery seulement avec Redis : compteurs en cache et couche temps réel
+# doivent être partagés entre le worker et le serveur web
+NOTIFICATION_OUTBOX_ASYNC = config('NOTIFICATION_OUTBOX_ASYNC', default=bool(REDIS_URL), cast=bool)
+NOTIFICATION_OUTBOX_MAX_TENTATIVES = 5
+NOTIFICATION_OUTBOX_BATCH = 200
+# Regroupement des notifications à clé de déduplication : durée (minutes) des
+# fenêtres pendant lesquelles une notification non lue absorbe les événements
+# de même clé — voir notifications/services/coalescence.py
+NOTIFICATION_DEDUP_WINDOW_MINUTES = config('NOTIFICATION_DEDUP_WINDOW_MINUTES', default=1440, cast=int)
+# Durée de vie (secondes) des compteurs du badge en cache, reconstruits à la
+# demande — voir notifications/services/compteurs.py ; 0 sans cache partagé → une
+# requête GROUP BY par lecture
+NOTIFICATION_COMPTEUR_CACHE_TIMEOUT = config('NOTIFICATION_COMPTEUR_CACHE_TIMEOUT', default=900 if REDIS_URL else 0, cast=int)
+# Notifications poussées en WebSocket (notifications/consumers.py) après commit
+# — voir notifications/services/temps_reel.py. Couche Redis en production ;
+# en mémoire sinon, qui ne relie pas les processus (worker Celery → serveur
+# ASGI) : sans Redis, actif seulement si l'outbox diffuse sur place (défaut).
+NOTIFICATION_TEMPS_REEL = config(
+    'NOTIFICATION_TEMPS_REEL', default=bool(REDIS_URL) or not NOTIFICATION_OUTBOX_ASYNC, cast=bool
+)
+# Durée de validité (secondes) des tickets de connexion WebSocket
+# — voir notifications/services/tickets.py
+NOTIFICATION_WS_TICKET_SECONDS = config('NOTIFICATION_WS_TICKET_SECONDS', default=60, cast=int)
+if REDIS_URL:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [REDIS_URL]},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'},
+    }
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
 
@@ -250,4 +381,8 @@ CORS_ALLOW_HEADERS = [
     'x-requested-with',
     'x-institution-id',      # ← custom header
     'x-annee-scolaire-id',   # ← custom header
+    'upload-offset',         # ← upload fragmenté
+    'x-chunk-sha256',        # ← upload fragmenté
+    'range',                 # ← lecture partielle des fichiers
+    'if-range',
 ]
\ No newline at end of file
@@ -155,4 +155,87 @@ def analyser_progression_quotidienne():
         return f"{compteur} recommandations générées pour {apprenants.count()} apprenants"
     
     except Exception as e:
-        return f"Erreur globale: {str(e)}"
\ No newline at end of file
+        return f"Erreur globale: {str(e)}"
+
+
+@shared_task(name='purger_uploads_expires', bind=False)
+def purger_uploads_expires():
+    """
+    Supprime les uploads fragmentés abandonnés (fichiers temporaires inclus).
+    """
+    from courses.services.chunked_upload import purge_expired_uploads
+
+    return f"{purge_expired_uploads()} uploads fragmentés purgés"
+
+
+@shared_task(name='vider_autosave_passage', bind=False)
+def vider_autosave_passage(passage_id):
+    """
+    Écrit en base les sauvegardes automatiques fusionnées d'un passage
+    (fin de la fenêtre d'anti-rebond).
+    """
+    from evaluations.services.autosave import flush
+
+    return f"passage {passage_id} : {'tampon écrit' if flush(passage_id) else 'rien à écrire'}"
+
+
+@shared_task(name='generer_export', bind=False)
+def generer_export(job_id):
+    """
+    Construit le fichier d'un export asynchrone (ExportJob) et notifie le demandeur.
+    """
+    from courses.services.export_jobs import executer
+
+    job = executer(job_id)
+    return f"export {job_id} : {job.statut if job else 'déjà pris en charge'}"
+
+
+@shared_task(name='purger_exports_expires', bind=False)
+def purger_exports_expires():
+    """
+    Supprime les exports asynchrones expirés et leurs fichiers.
+    """
+    from courses.services.export_jobs import purger_expires
+
+    return f"{purger_expires()} exports expirés purgés"
+
+
+@shared_task(name='interrompre_exports_bloques', bind=False)
+def interrompre_exports_bloques():
+    """
+    Passe en échec les exports asynchrones bloqués en attente ou en cours.
+    """
+    from courses.services.export_jobs import interrompre_bloques
+
+    return f"{interrompre_bloques()} exports bloqués interrompus"
+
+
+@shared_task(name='liberer_reservations_expirees', bind=False)
+def liberer_reservations_expirees():
+    """
+    Remet à zéro les réservations de copies (file de correction) au bail expiré.
+    """
+    from evaluations.services.file_correction import liberer_expirees
+
+    return f"{liberer_expirees()} réservations expirées libérées"
+
+
+@shared_task(name='diffuser_evenement_notification', bind=False)
+def diffuser_evenement_notification(cle):
+    """
+    Développe un événement de l'outbox en notifications (fan-out par lots).
+    """
+    from notifications.services.outbox import traiter
+
+    return f"événement {cle} : {traiter(cle) or 'déjà pris en charge'}"
+
+
+@shared_task(name='relancer_evenements_notification', bind=False)
+def relancer_evenements_notification():
+    """
+    Replanifie les événements de notification en attente, en échec ou interrompus,
+    et purge les événements traités anciens.
+    """
+    from notifications.services.outbox import purger_traites, relancer
+
+    return f"{relancer()} événements relancés, {purger_traites()} purgés"
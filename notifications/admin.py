@@ -2,7 +2,7 @@
 
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Notification, PreferenceNotification, DigestNotification
+from .models import Notification, PreferenceNotification, DigestNotification, EvenementNotification
 
 
 # ============================================================================
@@ -122,4 +122,17 @@ class DigestNotificationAdmin(admin.ModelAdmin):
     list_filter   = ["frequence", "envoye"]
     search_fields = ["user__email"]
     readonly_fields = ["created_at", "envoye_le"]
-    ordering      = ["-created_at"]
\ No newline at end of file
+    ordering      = ["-created_at"]
+
+
+# ============================================================================
+# OUTBOX
+# ============================================================================
+
+@admin.register(EvenementNotification)
+class EvenementNotificationAdmin(admin.ModelAdmin):
+    list_display  = ["cle_idempotence", "type_evenement", "statut", "tentatives", "nb_notifications", "created_at", "traite_le"]
+    list_filter   = ["statut", "type_evenement"]
+    search_fields = ["cle_idempotence"]
+    readonly_fields = ["created_at", "pris_le", "traite_le", "erreur"]
+    ordering      = ["-created_at"]
@@ -0,0 +1,109 @@
+# notifications/consumers.py
+"""
+WebSocket du centre de notifications : ws/notifications/?ticket=<ticket>
+
+Ticket de courte durée obtenu par POST /notifications/ticket_ws/ (voir
+notifications/services/tickets.py) ; les clients qui peuvent poser des
+en-têtes s'authentifient aussi par Authorization: Token <token DRF>.
+
+Le client reçoit, sans interroger l'API :
+  {"type": "compteurs", "compteurs": {...}}         à la connexion / à la demande
+  {"type": "notification", "notification": {...}}  nouvelle notification (ou regroupée)
+  {"type": "compteur_delta", "delta": {...}}       variations du badge
+
+et peut envoyer {"type": "compteurs"} pour relire les compteurs.
+"""
+
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from .services import compteurs, tickets
+from .services.temps_reel import groupe
+
+
+# ============================================================================
+# AUTHENTIFICATION (TICKET SIGNÉ OU TOKEN DRF EN EN-TÊTE)
+# ============================================================================
+
+def _ticket(scope):
+    """Ticket en query string (?ticket=…, navigateurs)."""
+    return parse_qs(scope.get("query_string", b"").decode()).get("ticket", [None])[0]
+
+
+def _token(scope):
+    """En-tête Authorization: Token … (jamais en query string : journaux)."""
+    for nom, valeur in scope.get("headers", []):
+        if nom == b"authorization":
+            mots = valeur.decode().split()
+            if len(mots) == 2 and mots[0].lower() == "token":
+                return mots[1]
+    return None
+
+
+@database_sync_to_async
+def _utilisateur(ticket, token):
+    if ticket:
+        return tickets.utilisateur(ticket) or AnonymousUser()
+    if not token:
+        return AnonymousUser()
+    try:
+        user, _ = TokenAuthentication().authenticate_credentials(token)
+    except AuthenticationFailed:
+        return AnonymousUser()
+    return user
+
+
+class TokenAuthMiddleware(BaseMiddleware):
+    """scope["user"] depuis le ticket signé ou le token DRF (règles de TokenAuthentication)."""
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope, user=await _utilisateur(_ticket(scope), _token(scope)))
+        return await super().__call__(scope, receive, send)
+
+
+# ============================================================================
+# CONSUMER
+# ============================================================================
+
+class NotificationConsumer(AsyncJsonWebsocketConsumer):
+    groupe = None
+
+    async def connect(self):
+        user = self.scope.get("user")
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+        self.user_id = user.pk
+        self.groupe = groupe(user.pk)
+        await self.channel_layer.group_add(self.groupe, self.channel_name)
+        await self.accept()
+        await self._envoyer_compteurs()
+
+    async def disconnect(self, code):
+        if self.groupe:
+            await self.channel_layer.group_discard(self.groupe, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        if isinstance(content, dict) and content.get("type") == "compteurs":
+            await self._envoyer_compteurs()
+
+    async def _envoyer_compteurs(self):
+        valeurs = await database_sync_to_async(compteurs.compteurs)(self.user_id)
+        await self.send_json({"type": "compteurs", "compteurs": valeurs})
+
+    # ── Messages du groupe (notifications/services/temps_reel.py) ───────────
+
+    async def notification_nouvelle(self, event):
+        await self.send_json({"type": "notification", "notification": event["notification"]})
+
+    async def compteur_delta(self, event):
+        await self.send_json({"type": "compteur_delta", "delta": event["delta"]})
+
+    async def compteur_invalide(self, event):
+        await self._envoyer_compteurs()
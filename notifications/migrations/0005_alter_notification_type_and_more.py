@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-17 02:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_digestnotification_preferencenotification_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='type',
+            field=models.CharField(choices=[('activation_compte', 'Activation de compte'), ('reinitialisation_mdp', 'Réinitialisation de mot de passe'), ('compte_suspendu', 'Compte suspendu'), ('tentative_suspecte', 'Tentative suspecte sur compte'), ('inscription_cours', 'Inscription à un cours'), ('inscription_probleme', "Problème d'inscription"), ('creation_ressource', 'Nouvelle ressource académique'), ('modification_ressource', 'Ressource académique modifiée'), ('suppression_ressource', 'Ressource académique supprimée'), ('cours_cree', 'Cours créé'), ('cours_modifie', 'Cours modifié'), ('module_ajoute', 'Nouveau module ajouté'), ('sequence_ajoutee', 'Nouvelle séquence ajoutée'), ('ressource_pedagogique', 'Nouvelle ressource pédagogique'), ('contenu_publie', 'Contenu publié / modifié'), ('evaluation_publiee', 'Évaluation publiée'), ('evaluation_soumise', 'Évaluation soumise'), ('evaluation_corrigee', 'Résultat / Correction disponible'), ('copies_a_corriger', 'Copies à corriger'), ('rappel_evaluation', "Rappel d'évaluation imminente"), ('session_a_venir', 'Session à venir'), ('session_annulee', 'Session annulée'), ('session_deplacee', 'Session déplacée'), ('rappel_session', 'Rappel de session'), ('absence_enregistree', 'Absence enregistrée'), ('retard_enregistre', 'Retard enregistré'), ('absences_repetees', 'Absences répétées'), ('progression_faible', 'Alerte progression faible'), ('progression_anormale', 'Progression anormale détectée'), ('cours_termine', 'Cours terminé'), ('encouragement', 'Encouragement'), ('assignation_cours', 'Assignation à un cours / groupe'), ('changement_planning', "Changement d'emploi du temps"), ('paiement_du', 'Paiement / Échéance à venir'), ('paiement_rejete', 'Paiement rejeté'), ('facture_emise', 'Facture émise'), ('incident_securite', 'Incident de sécurité'), ('incident_systeme', 'Incident système majeur'), ('alerte_exploitation', "Alerte générale d'exploitation"), ('annonce_administrative', 'Annonce administrative'), ('export_termine', 'Export terminé')], max_length=50, verbose_name='Type'),
+        ),
+        migrations.AlterField(
+            model_name='preferencenotification',
+            name='type',
+            field=models.CharField(choices=[('activation_compte', 'Activation de compte'), ('reinitialisation_mdp', 'Réinitialisation de mot de passe'), ('compte_suspendu', 'Compte suspendu'), ('tentative_suspecte', 'Tentative suspecte sur compte'), ('inscription_cours', 'Inscription à un cours'), ('inscription_probleme', "Problème d'inscription"), ('creation_ressource', 'Nouvelle ressource académique'), ('modification_ressource', 'Ressource académique modifiée'), ('suppression_ressource', 'Ressource académique supprimée'), ('cours_cree', 'Cours créé'), ('cours_modifie', 'Cours modifié'), ('module_ajoute', 'Nouveau module ajouté'), ('sequence_ajoutee', 'Nouvelle séquence ajoutée'), ('ressource_pedagogique', 'Nouvelle ressource pédagogique'), ('contenu_publie', 'Contenu publié / modifié'), ('evaluation_publiee', 'Évaluation publiée'), ('evaluation_soumise', 'Évaluation soumise'), ('evaluation_corrigee', 'Résultat / Correction disponible'), ('copies_a_corriger', 'Copies à corriger'), ('rappel_evaluation', "Rappel d'évaluation imminente"), ('session_a_venir', 'Session à venir'), ('session_annulee', 'Session annulée'), ('session_deplacee', 'Session déplacée'), ('rappel_session', 'Rappel de session'), ('absence_enregistree', 'Absence enregistrée'), ('retard_enregistre', 'Retard enregistré'), ('absences_repetees', 'Absences répétées'), ('progression_faible', 'Alerte progression faible'), ('progression_anormale', 'Progression anormale détectée'), ('cours_termine', 'Cours terminé'), ('encouragement', 'Encouragement'), ('assignation_cours', 'Assignation à un cours / groupe'), ('changement_planning', "Changement d'emploi du temps"), ('paiement_du', 'Paiement / Échéance à venir'), ('paiement_rejete', 'Paiement rejeté'), ('facture_emise', 'Facture émise'), ('incident_securite', 'Incident de sécurité'), ('incident_systeme', 'Incident système majeur'), ('alerte_exploitation', "Alerte générale d'exploitation"), ('annonce_administrative', 'Annonce administrative'), ('export_termine', 'Export terminé')], max_length=50, verbose_name='Type de notification'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.6 on 2026-10-17 02:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_alter_notification_type_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EvenementNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_evenement', models.CharField(max_length=50, verbose_name="Type d'événement")),
+                ('objet_id', models.PositiveBigIntegerField(verbose_name="ID de l'objet source")),
+                ('donnees', models.JSONField(blank=True, default=dict, help_text="État de l'objet au moment de l'événement (statut, note…)", verbose_name='Données')),
+                ('cle_idempotence', models.CharField(help_text="Ex: 'module_ajoute:42' — un événement n'est publié et diffusé qu'une fois", max_length=255, unique=True, verbose_name="Clé d'idempotence")),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('traite', 'Traité'), ('echec', 'Échec')], default='en_attente', max_length=12, verbose_name='Statut')),
+                ('tentatives', models.PositiveSmallIntegerField(default=0, verbose_name='Tentatives')),
+                ('nb_notifications', models.PositiveIntegerField(default=0, verbose_name='Notifications créées')),
+                ('erreur', models.TextField(blank=True, verbose_name='Erreur')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Créé le')),
+                ('pris_le', models.DateTimeField(blank=True, null=True, verbose_name='Pris en charge le')),
+                ('traite_le', models.DateTimeField(blank=True, null=True, verbose_name='Traité le')),
+            ],
+            options={
+                'verbose_name': 'Événement de notification',
+                'verbose_name_plural': 'Événements de notification',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['statut', 'created_at'], name='notificatio_statut_a85467_idx')],
+            },
+        ),
+    ]
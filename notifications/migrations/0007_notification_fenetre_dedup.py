@@ -0,0 +1,25 @@
+# Generated by Django 5.1.6 on 2026-10-17 02:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0013_remove_classe_groupes'),
+        ('notifications', '0006_evenementnotification'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='fenetre_dedup',
+            field=models.PositiveBigIntegerField(blank=True, help_text='Numéro de la fenêtre de temps (voir notifications/services/coalescence.py)', null=True, verbose_name='Fenêtre de regroupement'),
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('groupe_deduplication__isnull', False), ('is_read', False)), fields=('recipient', 'groupe_deduplication', 'fenetre_dedup'), name='notif_dedup_ouverte_uniq'),
+        ),
+    ]
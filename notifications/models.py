@@ -45,6 +45,7 @@ class TypeNotification(models.TextChoices):
     INCIDENT_SYSTEME        = "incident_systeme",        "Incident système majeur"
     ALERTE_EXPLOITATION     = "alerte_exploitation",     "Alerte générale d'exploitation"
     ANNONCE_ADMINISTRATIVE  = "annonce_administrative",  "Annonce administrative"
+    EXPORT_TERMINE          = "export_termine",          "Export terminé"
 
 
 class PrioriteNotification(models.TextChoices):
@@ -170,6 +171,11 @@ class Notification(models.Model):
         verbose_name="Événements groupés",
         help_text="Nombre d'événements fusionnés dans cette notification",
     )
+    fenetre_dedup = models.PositiveBigIntegerField(
+        null=True, blank=True,
+        verbose_name="Fenêtre de regroupement",
+        help_text="Numéro de la fenêtre de temps (voir notifications/services/coalescence.py)",
+    )
 
     # ── État de lecture ──────────────────────────────────────────────────────
     is_read = models.BooleanField(default=False, verbose_name="Lu")
@@ -227,6 +233,14 @@ class Notification(models.Model):
             models.Index(fields=["scheduled_at"]),
             models.Index(fields=["expires_at"]),
         ]
+        constraints = [
+            # Une seule notification ouverte (non lue) par destinataire, clé et fenêtre
+            models.UniqueConstraint(
+                fields=["recipient", "groupe_deduplication", "fenetre_dedup"],
+                condition=models.Q(groupe_deduplication__isnull=False, is_read=False),
+                name="notif_dedup_ouverte_uniq",
+            ),
+        ]
 
     def __str__(self):
         return f"[{self.get_canal_display()}] {self.recipient} — {self.titre}"
@@ -283,7 +297,8 @@ class Notification(models.Model):
         expires_at                = None,
         **metadata,
     ) -> "Notification":
-        return cls.objects.create(
+        """Avec groupe_deduplication, fusionne dans la notification ouverte du même groupe."""
+        notification = cls(
             recipient            = recipient,
             sender               = sender,
             type                 = type_notif,
@@ -301,6 +316,64 @@ class Notification(models.Model):
             expires_at           = expires_at,
             metadata             = metadata or {},
         )
+        if not groupe_deduplication:
+            notification.save()
+            return notification
+
+        from notifications.services.coalescence import ecrire
+        ecrire([notification])
+        return cls.objects.get(
+            recipient_id=notification.recipient_id,
+            groupe_deduplication=groupe_deduplication,
+            fenetre_dedup=notification.fenetre_dedup,
+            is_read=False,
+        )
+
+
+# ============================================================================
+# OUTBOX — événements à diffuser (voir notifications/services/outbox.py)
+# ============================================================================
+
+class EvenementNotification(models.Model):
+    STATUT_CHOICES = [
+        ("en_attente", "En attente"),
+        ("en_cours",   "En cours"),
+        ("traite",     "Traité"),
+        ("echec",      "Échec"),
+    ]
+
+    type_evenement = models.CharField(max_length=50, verbose_name="Type d'événement")
+    objet_id = models.PositiveBigIntegerField(verbose_name="ID de l'objet source")
+    donnees = models.JSONField(
+        default=dict, blank=True,
+        verbose_name="Données",
+        help_text="État de l'objet au moment de l'événement (statut, note…)",
+    )
+    cle_idempotence = models.CharField(
+        max_length=255, unique=True,
+        verbose_name="Clé d'idempotence",
+        help_text="Ex: 'module_ajoute:42' — un événement n'est publié et diffusé qu'une fois",
+    )
+
+    statut = models.CharField(max_length=12, choices=STATUT_CHOICES, default="en_attente", verbose_name="Statut")
+    tentatives = models.PositiveSmallIntegerField(default=0, verbose_name="Tentatives")
+    nb_notifications = models.PositiveIntegerField(default=0, verbose_name="Notifications créées")
+    erreur = models.TextField(blank=True, verbose_name="Erreur")
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Créé le")
+    pris_le = models.DateTimeField(null=True, blank=True, verbose_name="Pris en charge le")
+    traite_le = models.DateTimeField(null=True, blank=True, verbose_name="Traité le")
+
+    class Meta:
+        verbose_name        = "Événement de notification"
+        verbose_name_plural = "Événements de notification"
+        ordering            = ["-created_at"]
+        indexes = [
+            models.Index(fields=["statut", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.cle_idempotence} ({self.statut})"
 
 
 # ============================================================================
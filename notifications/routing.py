@@ -0,0 +1,10 @@
+# notifications/routing.py
+
+from django.urls import path
+
+from .consumers import NotificationConsumer
+
+
+websocket_urlpatterns = [
+    path("ws/notifications/", NotificationConsumer.as_asgi()),
+]
@@ -0,0 +1,156 @@
+# notifications/services/coalescence.py
+"""
+Écriture des notifications avec regroupement (groupe_deduplication).
+
+Une notification portant une clé de déduplication est fusionnée avec la
+notification non lue du même destinataire, même clé, même fenêtre de
+NOTIFICATION_DEDUP_WINDOW_MINUTES : nb_evenements_groupes est incrémenté,
+titre / message / expéditeur / date prennent les valeurs du dernier
+événement.
+
+- index unique partiel (recipient, groupe_deduplication, fenetre_dedup)
+  WHERE groupe_deduplication IS NOT NULL AND NOT is_read : une notification
+  lue sort de l'index, l'événement suivant ouvre une nouvelle notification
+- INSERT … ON CONFLICT … DO UPDATE (SQLite ≥ 3.24, PostgreSQL) : une
+  instruction par paquet, incrément atomique côté base
+- doublons d'un même paquet fusionnés en mémoire avant l'écriture
+  (PostgreSQL refuse de mettre à jour deux fois la même ligne)
+- notifications sans clé : bulk_create ordinaire
+- compteurs du badge (notifications/services/compteurs.py) incrémentés pour
+  les seules lignes insérées : RETURNING distingue insertion et regroupement
+- notifications écrites poussées en WebSocket après commit
+  (notifications/services/temps_reel.py)
+"""
+
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from notifications.models import Notification
+from notifications.services import compteurs, temps_reel
+
+
+CONFLIT = (
+    '("recipient_id", "groupe_deduplication", "fenetre_dedup") '
+    'WHERE ("groupe_deduplication" IS NOT NULL AND NOT "is_read")'
+)
+MAJ = ("titre", "message", "sender_id", "created_at")
+
+
+def _fenetre_secondes():
+    return max(60, getattr(settings, "NOTIFICATION_DEDUP_WINDOW_MINUTES", 1440) * 60)
+
+
+def fenetre_courante():
+    """Numéro de la fenêtre de regroupement en cours (fenêtres fixes)."""
+    return int(time.time()) // _fenetre_secondes()
+
+
+def _fusionner(notifications):
+    """Un élément par (destinataire, clé) ; le dernier événement donne le contenu."""
+    fusion = {}
+    for n in notifications:
+        cle = (n.recipient_id, n.groupe_deduplication)
+        precedente = fusion.pop(cle, None)      # réinsertion : ordre du dernier événement
+        if precedente is not None:
+            n.nb_evenements_groupes += precedente.nb_evenements_groupes
+        fusion[cle] = n
+    return list(fusion.values())
+
+
+def _upsert_sql(fields, nb_lignes):
+    qn = connection.ops.quote_name
+    table = qn(Notification._meta.db_table)
+    colonnes = ", ".join(qn(f.column) for f in fields)
+    ligne = "(" + ", ".join(["%s"] * len(fields)) + ")"
+    maj = ", ".join(
+        [f"{qn('nb_evenements_groupes')} = {table}.{qn('nb_evenements_groupes')} + excluded.{qn('nb_evenements_groupes')}"]
+        + [f"{qn(c)} = excluded.{qn(c)}" for c in MAJ]
+    )
+    sql = (
+        f"INSERT INTO {table} ({colonnes}) VALUES {', '.join([ligne] * nb_lignes)} "
+        f"ON CONFLICT {CONFLIT} DO UPDATE SET {maj}"
+    )
+    if connection.features.can_return_rows_from_bulk_insert:
+        sql += (
+            f" RETURNING {qn('id')}, {qn('recipient_id')}, "
+            f"{qn('groupe_deduplication')}, {qn('nb_evenements_groupes')}"
+        )
+    return sql
+
+
+def _upsert(notifications, taille):
+    """Retourne les notifications insérées (None si la base ne sait pas le dire)."""
+    fields = [f for f in Notification._meta.concrete_fields if not f.primary_key]
+    taille = min(taille, connection.ops.bulk_batch_size(fields, notifications) or taille)
+    retour = connection.features.can_return_rows_from_bulk_insert
+    inserees = []
+    with connection.cursor() as cursor:
+        for i in range(0, len(notifications), taille):
+            paquet = notifications[i:i + taille]
+            params = [
+                f.get_db_prep_save(f.pre_save(n, True), connection)
+                for n in paquet for f in fields
+            ]
+            cursor.execute(_upsert_sql(fields, len(paquet)), params)
+            if retour:
+                par_cle = {(n.recipient_id, n.groupe_deduplication): n for n in paquet}
+                for pk, recipient_id, cle, nb in cursor.fetchall():
+                    n = par_cle[(recipient_id, cle)]
+                    # ligne regroupée : nb_evenements_groupes dépasse celui de l'événement
+                    if nb == n.nb_evenements_groupes:
+                        inserees.append(n)
+                    n.pk, n.nb_evenements_groupes = pk, nb
+    return inserees if retour else None
+
+
+def _regrouper_ligne_a_ligne(notifications):
+    """Repli pour les bases sans ON CONFLICT … WHERE (MySQL) : verrou puis incrément."""
+    inserees = []
+    for n in notifications:
+        maj = Notification.objects.select_for_update().filter(
+            recipient_id=n.recipient_id, groupe_deduplication=n.groupe_deduplication,
+            fenetre_dedup=n.fenetre_dedup, is_read=False,
+        ).update(
+            nb_evenements_groupes=F("nb_evenements_groupes") + n.nb_evenements_groupes,
+            titre=n.titre, message=n.message, sender_id=n.sender_id, created_at=timezone.now(),
+        )
+        if not maj:
+            Notification.objects.bulk_create([n])      # sans post_save : compteurs gérés ici
+            inserees.append(n)
+    return inserees
+
+
+def ecrire(notifications, taille=500):
+    """
+    Écrit les notifications (regroupées si elles portent une clé) ;
+    retourne le nombre d'événements enregistrés.
+    """
+    simples, groupees = [], []
+    fenetre = fenetre_courante()
+    for n in notifications:
+        if n.groupe_deduplication:
+            n.fenetre_dedup = fenetre
+            groupees.append(n)
+        else:
+            simples.append(n)
+
+    with transaction.atomic():
+        if simples:
+            Notification.objects.bulk_create(simples, batch_size=taille)
+            compteurs.creees(simples)
+        if groupees:
+            groupees = _fusionner(groupees)
+            if connection.vendor in ("sqlite", "postgresql"):
+                inserees = _upsert(groupees, taille)
+            else:
+                inserees = _regrouper_ligne_a_ligne(groupees)
+            if inserees is None:
+                compteurs.invalider(*(n.recipient_id for n in groupees))
+            else:
+                compteurs.creees(inserees)
+        temps_reel.notifications(simples + groupees)
+    return len(notifications)
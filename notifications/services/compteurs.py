@@ -0,0 +1,197 @@
+# notifications/services/compteurs.py
+"""
+Compteurs du centre de notifications (badge, NotificationViewSet.compteur).
+
+Une clé de cache par compteur et par utilisateur (total, non lues, non lues
+par priorité, par canal, prochaine expiration) : le badge se lit en un seul
+get_many, sans requête SQL.
+
+- reconstruction paresseuse (une requête GROUP BY) si une clé manque, si
+  une notification comptée a expiré depuis, ou après invalider()
+- créations : incréments (cache.incr, atomique) après commit — écrivain de
+  notifications/services/coalescence.py et post_save (notifications/signals.py)
+- lectures / suppressions en masse : décréments (vues marquer_lues,
+  marquer_lue, supprimer_lues)
+- tout autre changement (priorité, canal, expiration…) : invalidation
+- variations et invalidations poussées aussi en WebSocket
+  (notifications/services/temps_reel.py)
+- durée de vie NOTIFICATION_COMPTEUR_CACHE_TIMEOUT : borne la dérive d'une
+  course entre reconstruction et incrément
+- sans cache partagé (NOTIFICATION_COMPTEUR_CACHE_TIMEOUT = 0), une requête
+  GROUP BY par lecture : les incréments d'un worker Celery n'atteindraient
+  pas le cache en mémoire du serveur web
+"""
+
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from notifications.models import CanalNotification, Notification, PrioriteNotification
+from notifications.services import temps_reel
+
+
+CACHE_PREFIX = "notif_compteur"
+
+TOTAL, NON_LUES, EXPIRATION = "total", "non_lues", "expire"
+
+
+def _timeout():
+    return getattr(settings, "NOTIFICATION_COMPTEUR_CACHE_TIMEOUT", 900)
+
+
+def _champs():
+    return (
+        [TOTAL, NON_LUES, EXPIRATION]
+        + [f"p:{p}" for p in PrioriteNotification.values]
+        + [f"c:{c}" for c in CanalNotification.values]
+    )
+
+
+def _key(user_id, champ):
+    return f"{CACHE_PREFIX}:{user_id}:{champ}"
+
+
+def _keys(user_id):
+    return {_key(user_id, champ): champ for champ in _champs()}
+
+
+# ============================================================================
+# LECTURE
+# ============================================================================
+
+def _calculer(user_id):
+    """Compteurs depuis la base, en une requête."""
+    maintenant = timezone.now()
+    valeurs = dict.fromkeys(_champs(), 0)
+    expiration = None
+    for row in (
+        Notification.objects
+        .filter(recipient_id=user_id)
+        .filter(Q(expires_at__isnull=True) | Q(expires_at__gt=maintenant))
+        .order_by()
+        .values("is_read", "priorite", "canal")
+        .annotate(nb=Count("id"), expire=Min("expires_at"))
+    ):
+        valeurs[TOTAL] += row["nb"]
+        valeurs[f"c:{row['canal']}"] = valeurs.get(f"c:{row['canal']}", 0) + row["nb"]
+        if not row["is_read"]:
+            valeurs[NON_LUES] += row["nb"]
+            valeurs[f"p:{row['priorite']}"] = valeurs.get(f"p:{row['priorite']}", 0) + row["nb"]
+        if row["expire"] and (expiration is None or row["expire"] < expiration):
+            expiration = row["expire"]
+    # 0 : aucune notification comptée n'expire
+    valeurs[EXPIRATION] = int(expiration.timestamp()) if expiration else 0
+    return valeurs
+
+
+def _reconstruire(user_id):
+    """Compteurs depuis la base ; mis en cache."""
+    valeurs = _calculer(user_id)
+    cache.set_many({_key(user_id, champ): v for champ, v in valeurs.items()}, _timeout())
+    return valeurs
+
+
+def compteurs(user_id):
+    """
+    {total, non_lues, par_priorite, par_canal} de l'utilisateur ;
+    une lecture de cache, une requête si les compteurs sont à reconstruire.
+    """
+    if _timeout() <= 0:
+        valeurs = _calculer(user_id)
+    else:
+        keys = _keys(user_id)
+        found = cache.get_many(list(keys))
+        valeurs = {keys[k]: v for k, v in found.items()}
+        expiration = valeurs.get(EXPIRATION)
+        if len(valeurs) < len(keys) or (expiration and expiration <= time.time()):
+            valeurs = _reconstruire(user_id)
+
+    return {
+        "total":        valeurs[TOTAL],
+        "non_lues":     valeurs[NON_LUES],
+        "par_priorite": {c[2:]: v for c, v in valeurs.items() if c.startswith("p:") and v > 0},
+        "par_canal":    {c[2:]: v for c, v in valeurs.items() if c.startswith("c:") and v > 0},
+    }
+
+
+# ============================================================================
+# MISES À JOUR
+# ============================================================================
+
+def invalider(*user_ids):
+    """Compteurs à reconstruire à la prochaine lecture (après commit)."""
+    user_ids = {u for u in user_ids if u}
+    if not user_ids:
+        return
+
+    def _supprimer():
+        cache.delete_many([k for u in user_ids for k in _keys(u)])
+
+    if _timeout() > 0:
+        transaction.on_commit(_supprimer)
+    temps_reel.compteurs_invalides(user_ids)
+
+
+def _appliquer(deltas):
+    """{user_id: {champ: delta}} → cache.incr ; utilisateurs sans compteurs en cache ignorés."""
+    deltas = {u: d for u, d in deltas.items() if any(d.values())}
+    if not deltas or _timeout() <= 0:
+        return
+    presents = cache.get_many([_key(u, TOTAL) for u in deltas])
+    for user_id, delta in deltas.items():
+        if _key(user_id, TOTAL) not in presents:
+            continue                        # reconstruit à la prochaine lecture
+        try:
+            for champ, n in delta.items():
+                if n:
+                    cache.incr(_key(user_id, champ), n)
+        except ValueError:                  # clé expirée entre-temps
+            cache.delete_many(list(_keys(user_id)))
+
+
+def _planifier(deltas):
+    transaction.on_commit(lambda: _appliquer(deltas))
+    temps_reel.compteurs_delta(deltas)
+
+
+def creees(notifications):
+    """Incrémente, après commit, les compteurs des destinataires des notifications insérées."""
+    deltas = defaultdict(Counter)
+    a_invalider = set()
+    for n in notifications:
+        if n.expires_at:
+            # peut avancer la prochaine expiration : plus simple de tout recompter
+            a_invalider.add(n.recipient_id)
+            continue
+        d = deltas[n.recipient_id]
+        d[TOTAL] += 1
+        d[f"c:{n.canal}"] += 1
+        if not n.is_read:
+            d[NON_LUES] += 1
+            d[f"p:{n.priorite}"] += 1
+    invalider(*a_invalider)
+    if deltas:
+        _planifier(deltas)
+
+
+def lues(user_id, par_priorite):
+    """Décrémente les non lues ; par_priorite : {priorité: nombre marqué lu}."""
+    delta = Counter()
+    for priorite, n in par_priorite.items():
+        delta[NON_LUES] -= n
+        delta[f"p:{priorite}"] -= n
+    _planifier({user_id: delta})
+
+
+def supprimees(user_id, par_canal):
+    """Décrémente le total après suppression de notifications lues ; par_canal : {canal: nombre}."""
+    delta = Counter()
+    for canal, n in par_canal.items():
+        delta[TOTAL] -= n
+        delta[f"c:{canal}"] -= n
+    _planifier({user_id: delta})
@@ -0,0 +1,184 @@
+# notifications/services/fanout.py
+"""
+Diffusion (fan-out) des notifications d'un événement.
+
+Les notifications sont construites en mémoire puis écrites par paquets de
+NOTIFICATION_BULK_CHUNK (bulk_create, ou upsert de regroupement pour celles
+qui portent une clé de dédup — notifications/services/coalescence.py) :
+
+    with FanOut("module_ajoute", module.pk) as fo:
+        for a in fo.inscrits(module.cours_id):
+            fo.ajouter(a.id, TypeNotification.MODULE_AJOUTE, "…", "…")
+            if a.tuteur_id:
+                fo.ajouter(a.tuteur_id, …)
+        fo.ajouter_staff(institution_id, …)     # admins + responsables
+
+- destinataires lus une fois par événement : inscrits et tuteurs d'un cours
+  en une requête, admins et responsables d'une institution en une requête
+  (mémorisés dans le FanOut)
+- écriture dans un savepoint : un échec n'invalide pas la transaction de
+  la requête qui a déclenché l'événement
+- durée de chaque événement journalisée (logger notifications.fanout) ;
+  au-delà de NOTIFICATION_FANOUT_WARN_MS, en avertissement
+"""
+
+import logging
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.db.models import Q
+
+from notifications.models import CanalNotification, Notification, PrioriteNotification
+from notifications.services import coalescence
+
+
+logger = logging.getLogger("notifications.fanout")
+
+Inscrit = namedtuple("Inscrit", "id prenom nom tuteur_id")
+
+
+def _chunk_size():
+    return getattr(settings, "NOTIFICATION_BULK_CHUNK", 500)
+
+
+def _warn_ms():
+    return getattr(settings, "NOTIFICATION_FANOUT_WARN_MS", 500)
+
+
+def _pk(value):
+    """Objet modèle ou identifiant → identifiant."""
+    return getattr(value, "pk", value)
+
+
+class FanOut:
+    """Notifications d'un événement, écrites en bloc à la sortie du `with` (ou par envoyer())."""
+
+    def __init__(self, evenement, cle=None):
+        self.evenement = f"{evenement}:{cle}" if cle is not None else evenement
+        self.notifications = []
+        self._staff = {}
+        self._debut = time.perf_counter()
+        self._envoye = False
+
+    # ── Destinataires ────────────────────────────────────────────────────────
+
+    def inscrits(self, cours_id):
+        """Apprenants inscrits au cours (id, prénom, nom, tuteur_id), en une requête."""
+        from courses.models import InscriptionCours
+        return [
+            Inscrit(*row)
+            for row in InscriptionCours.objects.filter(cours_id=_pk(cours_id)).order_by().values_list(
+                "apprenant_id", "apprenant__prenom", "apprenant__nom", "apprenant__tuteur_id",
+            )
+        ]
+
+    def staff(self, institution):
+        """(ids admins, ids responsables) de l'institution, en une requête par institution."""
+        institution_id = _pk(institution)
+        if not institution_id:
+            return [], []
+        if institution_id not in self._staff:
+            from users.models import User
+            admins, responsables = [], []
+            for user_id, admin_id, resp_id in (
+                User.objects.filter(institution_id=institution_id)
+                .filter(Q(admin__isnull=False) | Q(responsableacademique__isnull=False))
+                .order_by()
+                .values_list("id", "admin__pk", "responsableacademique__pk")
+            ):
+                if admin_id:
+                    admins.append(user_id)
+                if resp_id:
+                    responsables.append(user_id)
+            self._staff[institution_id] = (admins, responsables)
+        return self._staff[institution_id]
+
+    def admins(self, institution):
+        return self.staff(institution)[0]
+
+    def responsables(self, institution):
+        return self.staff(institution)[1]
+
+    # ── Construction ─────────────────────────────────────────────────────────
+
+    def ajouter(self, recipient, type_notif, titre, message,
+                priorite=PrioriteNotification.MOYENNE,
+                sender=None, entity_type=None, entity_id=None,
+                action_url=None, institution=None, annee_scolaire=None,
+                groupe_dedup=None, canal=CanalNotification.IN_APP,
+                scheduled_at=None, expires_at=None, **metadata):
+        """Même signature que Notification.creer ; recipient / sender / FK : objet ou id."""
+        recipient_id = _pk(recipient)
+        if not recipient_id:
+            return None
+        notification = Notification(
+            recipient_id=recipient_id,
+            sender_id=_pk(sender),
+            type=type_notif,
+            titre=titre,
+            message=message,
+            canal=canal,
+            priorite=priorite,
+            entity_type=entity_type,
+            entity_id=entity_id,
+            action_url=action_url,
+            institution_id=_pk(institution),
+            annee_scolaire_id=_pk(annee_scolaire),
+            groupe_deduplication=groupe_dedup,
+            scheduled_at=scheduled_at,
+            expires_at=expires_at,
+            metadata=metadata or {},
+        )
+        self.notifications.append(notification)
+        return notification
+
+    def ajouter_staff(self, institution, type_notif, titre, message, priorite,
+                      admins=True, responsables=True, groupe_dedup=None, **kwargs):
+        """Une notification par admin et / ou responsable ; clé de dédup suffixée par destinataire."""
+        admin_ids, resp_ids = self.staff(institution)
+        ids = (admin_ids if admins else []) + (resp_ids if responsables else [])
+        for user_id in dict.fromkeys(ids):
+            self.ajouter(
+                user_id, type_notif, titre, message, priorite=priorite,
+                institution=institution,
+                groupe_dedup=f"{groupe_dedup}:{user_id}" if groupe_dedup else None,
+                **kwargs,
+            )
+
+    # ── Écriture ─────────────────────────────────────────────────────────────
+
+    def envoyer(self, lever=False):
+        """
+        Écrit les notifications collectées ; retourne leur nombre (0 en cas
+        d'échec, ou l'exception si lever — diffusion depuis l'outbox).
+        """
+        notifications, self.notifications = self.notifications, []
+        self._envoye = True
+        ecrites = 0
+        try:
+            if notifications:
+                ecrites = coalescence.ecrire(notifications, _chunk_size())
+        except Exception:
+            if lever:
+                raise
+            logger.exception("[fan-out] %s : écriture impossible (%d notifications)",
+                             self.evenement, len(notifications))
+        self._journaliser(ecrites)
+        return ecrites
+
+    def _journaliser(self, ecrites):
+        duree_ms = (time.perf_counter() - self._debut) * 1000
+        niveau = logging.WARNING if duree_ms >= _warn_ms() else logging.INFO
+        logger.log(niveau, "[fan-out] %s : %d notifications en %.1f ms",
+                   self.evenement, ecrites, duree_ms)
+        self.duree_ms = duree_ms
+
+    def __enter__(self):
+        self._debut = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None and (self.notifications or not self._envoye):
+            self.envoyer()
+        return False
@@ -0,0 +1,166 @@
+# notifications/services/outbox.py
+"""
+Boîte d'envoi (outbox) des notifications déclenchées par signaux.
+
+  1. publier   : le receiver post_save enregistre un EvenementNotification
+                 compact (type, objet, données) — une ligne dans la
+                 transaction de l'écriture, quelle que soit l'audience
+  2. après commit, l'événement est confié à Celery
+                 (tâche diffuser_evenement_notification) ; si le broker est
+                 indisponible, ou NOTIFICATION_OUTBOX_ASYNC = False, il est
+                 diffusé sur place
+  3. traiter   : prise de l'événement par UPDATE conditionnel, puis dans une
+                 même transaction : diffuseur enregistré pour le type
+                 (FanOut → bulk_create par paquets) et passage à 'traite'.
+                 Un échec annule tout : l'événement repasse en 'echec'
+  4. relancer  : tâche relancer_evenements_notification — événements jamais
+                 confiés au broker, en échec (moins de
+                 NOTIFICATION_OUTBOX_MAX_TENTATIVES) ou bloqués en cours
+
+Idempotence : cle_idempotence est unique ; un événement déjà publié n'est
+ni réinséré ni replanifié, et un événement traité ne peut plus être repris.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from notifications.models import EvenementNotification
+from notifications.services.fanout import FanOut
+
+
+logger = logging.getLogger(__name__)
+
+_DIFFUSEURS = {}
+
+
+def _async():
+    return getattr(settings, "NOTIFICATION_OUTBOX_ASYNC", True)
+
+
+def _max_tentatives():
+    return getattr(settings, "NOTIFICATION_OUTBOX_MAX_TENTATIVES", 5)
+
+
+def _lot():
+    return getattr(settings, "NOTIFICATION_OUTBOX_BATCH", 200)
+
+
+# ============================================================================
+# ENREGISTREMENT DES DIFFUSEURS
+# ============================================================================
+
+def diffuseur(type_evenement, model):
+    """
+    Déclare la fonction qui développe un événement en notifications :
+    fn(instance, fo, **donnees) ; instance relue depuis `model`.
+    """
+    def decorer(fn):
+        _DIFFUSEURS[type_evenement] = (model, fn)
+        return fn
+    return decorer
+
+
+# ============================================================================
+# PUBLICATION (chemin d'écriture)
+# ============================================================================
+
+def publier(type_evenement, instance, cle=None, **donnees):
+    """
+    Enregistre l'événement (ignoré si la clé existe déjà) et planifie sa
+    diffusion après commit — seulement s'il vient d'être inséré : un
+    événement déjà publié est déjà planifié, ou repris par relancer().
+    cle par défaut : "<type>:<pk>".
+    """
+    cle = cle or f"{type_evenement}:{instance.pk}"
+    _, cree = EvenementNotification.objects.get_or_create(
+        cle_idempotence=cle,
+        defaults={
+            "type_evenement": type_evenement,
+            "objet_id": instance.pk,
+            "donnees": donnees,
+        },
+    )
+    if cree:
+        transaction.on_commit(lambda: planifier(cle))
+    return cle
+
+
+def planifier(cle):
+    if not _async():
+        traiter(cle)
+        return
+    try:
+        from master_backend_api.tasks import diffuser_evenement_notification
+        diffuser_evenement_notification.delay(cle)
+    except Exception:
+        logger.warning("[outbox] broker indisponible, diffusion sur place (%s)", cle, exc_info=True)
+        traiter(cle)
+
+
+# ============================================================================
+# DIFFUSION (tâche Celery ou repli)
+# ============================================================================
+
+def traiter(cle):
+    """Diffuse l'événement ; retourne son statut final (None s'il n'est pas disponible)."""
+    maintenant = timezone.now()
+    if not EvenementNotification.objects.filter(
+        cle_idempotence=cle, statut__in=("en_attente", "echec"),
+        tentatives__lt=_max_tentatives(),
+    ).update(statut="en_cours", tentatives=F("tentatives") + 1, pris_le=maintenant):
+        return None
+    evenement = EvenementNotification.objects.get(cle_idempotence=cle)
+
+    try:
+        model, fn = _DIFFUSEURS[evenement.type_evenement]
+        with transaction.atomic():
+            nb = 0
+            instance = model.objects.filter(pk=evenement.objet_id).first()
+            if instance is not None:        # objet supprimé entre-temps : rien à diffuser
+                fo = FanOut(evenement.type_evenement, evenement.objet_id)
+                fn(instance, fo, **evenement.donnees)
+                nb = fo.envoyer(lever=True)
+            EvenementNotification.objects.filter(pk=evenement.pk).update(
+                statut="traite", nb_notifications=nb, erreur="", traite_le=timezone.now(),
+            )
+        return "traite"
+    except Exception as e:
+        logger.exception("[outbox] échec de l'événement %s (tentative %d)", cle, evenement.tentatives)
+        EvenementNotification.objects.filter(pk=evenement.pk).update(statut="echec", erreur=str(e))
+        return "echec"
+
+
+def relancer():
+    """
+    Replanifie, par lots de NOTIFICATION_OUTBOX_BATCH, les événements restés
+    en attente, en échec ou bloqués en cours ; retourne leur nombre.
+    """
+    maintenant = timezone.now()
+    # Un worker interrompu laisse l'événement 'en_cours' : repris comme un échec
+    EvenementNotification.objects.filter(
+        statut="en_cours", pris_le__lte=maintenant - timedelta(minutes=10),
+    ).update(statut="echec", erreur="Diffusion interrompue.")
+
+    cles = list(
+        EvenementNotification.objects.filter(
+            Q(statut="en_attente", created_at__lte=maintenant - timedelta(minutes=1))
+            | Q(statut="echec", tentatives__lt=_max_tentatives())
+        )
+        .order_by("created_at")
+        .values_list("cle_idempotence", flat=True)[:_lot()]
+    )
+    for cle in cles:
+        planifier(cle)
+    return len(cles)
+
+
+def purger_traites(jours=30):
+    """Supprime les événements traités depuis plus de `jours` jours."""
+    return EvenementNotification.objects.filter(
+        statut="traite", traite_le__lte=timezone.now() - timedelta(days=jours),
+    ).delete()[0]
@@ -0,0 +1,142 @@
+# notifications/services/resultats.py
+"""
+Notifications de résultats d'évaluation, communes à la correction unitaire
+(diffuseur 'passage_evaluation', notifications/signals.py) et à la
+correction par lot (evaluations/services/correction_lot.py).
+
+Pour un apprenant et ses résultats [(passage_id, evaluation, note)] :
+- EVALUATION_CORRIGEE : apprenant et tuteur
+- PROGRESSION_FAIBLE sous SEUIL_FAIBLE % du barème : apprenant, tuteur et
+  responsables de l'institution (un par évaluation, clé de dédup)
+- ENCOURAGEMENT à partir de SEUIL_ENCOURAGEMENT % : apprenant
+
+Un résultat → messages de la correction unitaire ; plusieurs (lot) → une
+notification par type et par destinataire qui les énumère.
+"""
+
+from notifications.models import EntityType, PrioriteNotification, TypeNotification
+
+
+SEUIL_FAIBLE = 50
+SEUIL_ENCOURAGEMENT = 80
+
+
+def _pourcentage(evaluation, note):
+    return (note / float(evaluation.bareme)) * 100 if evaluation.bareme else 0.0
+
+
+def _cible(evaluations):
+    """entity_id / action_url : l'évaluation si elle est seule, la liste sinon."""
+    if len(evaluations) == 1:
+        return evaluations[0].pk, f"/evaluations/{evaluations[0].pk}/resultat"
+    return None, "/evaluations"
+
+
+def ajouter(fo, apprenant, resultats):
+    """Ajoute au FanOut les notifications des résultats d'un apprenant."""
+    if not resultats:
+        return
+    passages = [passage_id for passage_id, _, _ in resultats]
+    premiere = resultats[0][1]
+    entity_id, action_url = _cible([evaluation for _, evaluation, _ in resultats])
+
+    # ── Résultat disponible ───────────────────────────────────────────────────
+    if len(resultats) == 1:
+        _, evaluation, note = resultats[0]
+        titre = "Résultat disponible"
+        message = f"Votre évaluation « {evaluation.titre} » a été corrigée. Note : {note}/{evaluation.bareme}."
+        message_tuteur = f"{apprenant.prenom} a obtenu {note}/{evaluation.bareme} à « {evaluation.titre} »."
+    else:
+        liste = ", ".join(f"« {evaluation.titre} » : {note}/{evaluation.bareme}" for _, evaluation, note in resultats)
+        titre = f"{len(resultats)} résultats disponibles"
+        message = f"Évaluations corrigées — {liste}."
+        message_tuteur = f"{apprenant.prenom} — {liste}."
+
+    ecrites = [fo.ajouter(
+        recipient=apprenant.pk,
+        type_notif=TypeNotification.EVALUATION_CORRIGEE,
+        titre=titre,
+        message=message,
+        priorite=PrioriteNotification.HAUTE,
+        entity_type=EntityType.EVALUATION,
+        entity_id=entity_id,
+        action_url=action_url,
+        institution=premiere.cours.institution_id,
+        annee_scolaire=premiere.cours.annee_scolaire_id,
+        passages=passages,
+    )]
+    if apprenant.tuteur_id:
+        ecrites.append(fo.ajouter(
+            recipient=apprenant.tuteur_id,
+            type_notif=TypeNotification.EVALUATION_CORRIGEE,
+            titre="Résultat disponible pour votre enfant",
+            message=message_tuteur,
+            priorite=PrioriteNotification.HAUTE,
+            entity_type=EntityType.EVALUATION,
+            entity_id=entity_id,
+            action_url=action_url,
+            passages=passages,
+        ))
+    for notification in ecrites:
+        notification.nb_evenements_groupes = len(resultats)
+
+    pourcentages = [(evaluation, _pourcentage(evaluation, note)) for _, evaluation, note in resultats]
+    faibles = [(evaluation, p) for evaluation, p in pourcentages if p < SEUIL_FAIBLE]
+    bons = [(evaluation, p) for evaluation, p in pourcentages if p >= SEUIL_ENCOURAGEMENT]
+
+    # ── Alerte progression faible ────────────────────────────────────────────
+    if faibles:
+        entity_id, action_url = _cible([evaluation for evaluation, _ in faibles])
+        liste = ", ".join(f"{p:.0f}% à « {evaluation.titre} »" for evaluation, p in faibles)
+        fo.ajouter(
+            recipient=apprenant.pk,
+            type_notif=TypeNotification.PROGRESSION_FAIBLE,
+            titre="Résultat en dessous de la moyenne",
+            message=f"Vous avez obtenu {liste}. N'hésitez pas à revoir le cours.",
+            priorite=PrioriteNotification.MOYENNE,
+            entity_type=EntityType.EVALUATION,
+            entity_id=entity_id,
+            action_url=action_url,
+        )
+
+        # Parent alerté si progression faible
+        if apprenant.tuteur_id:
+            fo.ajouter(
+                recipient=apprenant.tuteur_id,
+                type_notif=TypeNotification.PROGRESSION_FAIBLE,
+                titre="Risque académique — votre enfant",
+                message=f"{apprenant.prenom} a obtenu {liste}.",
+                priorite=PrioriteNotification.MOYENNE,
+                entity_type=EntityType.EVALUATION,
+                entity_id=entity_id,
+            )
+
+        # Responsables alertés, par évaluation
+        for evaluation, p in faibles:
+            for resp_id in fo.responsables(evaluation.cours.institution_id):
+                fo.ajouter(
+                    recipient=resp_id,
+                    type_notif=TypeNotification.PROGRESSION_FAIBLE,
+                    titre="Performance faible détectée",
+                    message=f"{apprenant.prenom} {apprenant.nom} : {p:.0f}% à « {evaluation.titre} ».",
+                    priorite=PrioriteNotification.BASSE,
+                    entity_type=EntityType.EVALUATION,
+                    entity_id=evaluation.pk,
+                    institution=evaluation.cours.institution_id,
+                    groupe_dedup=f"perf_faible_resp:{evaluation.pk}:{apprenant.pk}",
+                )
+
+    # ── Encouragement ────────────────────────────────────────────────────────
+    if bons:
+        entity_id, action_url = _cible([evaluation for evaluation, _ in bons])
+        liste = ", ".join(f"{p:.0f}% à « {evaluation.titre} »" for evaluation, p in bons)
+        fo.ajouter(
+            recipient=apprenant.pk,
+            type_notif=TypeNotification.ENCOURAGEMENT,
+            titre="Excellent résultat ! 🎉",
+            message=f"Félicitations ! Vous avez obtenu {liste}.",
+            priorite=PrioriteNotification.BASSE,
+            entity_type=EntityType.EVALUATION,
+            entity_id=entity_id,
+            action_url=action_url,
+        )
@@ -0,0 +1,112 @@
+# notifications/services/temps_reel.py
+"""
+Diffusion en temps réel (Django Channels) vers le centre de notifications.
+
+Chaque utilisateur connecté en WebSocket (notifications/consumers.py) est
+abonné au groupe "notifications_<user_id>". Après commit, l'écriture pousse :
+
+  - notification.nouvelle : notification insérée ou regroupée (même forme
+    que NotificationListSerializer ; regroupée → même id, nb mis à jour)
+  - compteur.delta        : variations des compteurs du badge
+  - compteur.invalide     : compteurs à relire (le consumer les renvoie)
+
+Couche : InMemoryChannelLayer en local (même processus uniquement : les
+notifications y sont diffusées par le serveur web, NOTIFICATION_OUTBOX_ASYNC
+valant False sans Redis), RedisChannelLayer dès que REDIS_URL est défini.
+NOTIFICATION_TEMPS_REEL vaut False par défaut si l'outbox passe par Celery
+sans Redis (le worker ne joindrait pas le serveur ASGI) ; un échec de la
+couche est journalisé, jamais remonté à l'écriture.
+"""
+
+import logging
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import transaction
+
+
+logger = logging.getLogger(__name__)
+
+
+def groupe(user_id):
+    return f"notifications_{user_id}"
+
+
+def _actif():
+    return getattr(settings, "NOTIFICATION_TEMPS_REEL", False)
+
+
+def _envoyer(messages):
+    """messages : [(user_id, message)] — envoyés dans l'ordre, erreurs journalisées."""
+    from channels.layers import get_channel_layer
+
+    layer = get_channel_layer()
+    if layer is None:
+        return
+    try:
+        envoyer = async_to_sync(layer.group_send)
+        for user_id, message in messages:
+            envoyer(groupe(user_id), message)
+    except Exception:
+        logger.warning("[temps réel] envoi impossible (%d messages)", len(messages), exc_info=True)
+
+
+def _apres_commit(construire):
+    if _actif():
+        transaction.on_commit(lambda: _envoyer(construire()))
+
+
+# ============================================================================
+# MESSAGES
+# ============================================================================
+
+def notifications(notifications):
+    """Pousse les notifications écrites à leurs destinataires (après commit)."""
+    notifications = [n for n in notifications if n.pk and n.recipient_id]
+    if not notifications:
+        return
+
+    def construire():
+        from notifications.serializers import NotificationListSerializer
+        from users.models import User
+
+        # expéditeurs lus en une requête (sender_nom)
+        sender_ids = {n.sender_id for n in notifications if n.sender_id}
+        senders = User.objects.only("prenom", "nom").in_bulk(sender_ids) if sender_ids else {}
+        for n in notifications:
+            if n.sender_id:
+                n.sender = senders.get(n.sender_id)
+        return [
+            (n.recipient_id, {
+                "type": "notification.nouvelle",
+                "notification": dict(NotificationListSerializer(n).data),
+            })
+            for n in notifications
+        ]
+
+    _apres_commit(construire)
+
+
+def compteurs_delta(deltas):
+    """deltas : {user_id: {champ: variation}} (champs de notifications/services/compteurs.py)."""
+    messages = []
+    for user_id, delta in deltas.items():
+        corps = {"total": 0, "non_lues": 0, "par_priorite": {}, "par_canal": {}}
+        for champ, n in delta.items():
+            if not n:
+                continue
+            if champ.startswith("p:"):
+                corps["par_priorite"][champ[2:]] = n
+            elif champ.startswith("c:"):
+                corps["par_canal"][champ[2:]] = n
+            elif champ in ("total", "non_lues"):
+                corps[champ] = n
+        messages.append((user_id, {"type": "compteur.delta", "delta": corps}))
+    if messages:
+        _apres_commit(lambda: messages)
+
+
+def compteurs_invalides(user_ids):
+    messages = [(u, {"type": "compteur.invalide"}) for u in user_ids]
+    if messages:
+        _apres_commit(lambda: messages)
@@ -0,0 +1,38 @@
+# notifications/services/tickets.py
+"""
+Tickets de connexion WebSocket (ws/notifications/?ticket=…).
+
+Les navigateurs ne peuvent pas poser d'en-tête Authorization sur un
+WebSocket : plutôt que le token DRF (longue durée) en query string, donc dans
+les journaux des proxys, le client demande un ticket signé par un appel
+authentifié (POST /notifications/ticket_ws/) et le présente à la connexion.
+
+- signé avec SECRET_KEY (TimestampSigner, sel propre), sans stockage
+- valable NOTIFICATION_WS_TICKET_SECONDS secondes après émission
+- vérifié contre un utilisateur toujours actif
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+
+
+SALT = "notifications.ws"
+
+
+def duree():
+    return getattr(settings, "NOTIFICATION_WS_TICKET_SECONDS", 60)
+
+
+def emettre(user):
+    """Ticket signé pour l'utilisateur."""
+    return signing.TimestampSigner(salt=SALT).sign(str(user.pk))
+
+
+def utilisateur(ticket):
+    """Utilisateur actif du ticket, ou None (signature invalide, ticket expiré)."""
+    try:
+        user_id = signing.TimestampSigner(salt=SALT).unsign(ticket, max_age=duree())
+    except signing.BadSignature:
+        return None
+    return get_user_model().objects.filter(pk=user_id, is_active=True).first()
@@ -1,9 +1,15 @@
 # notifications/signals.py
-
-from django.db.models.signals import post_save
+#
+# Outbox (notifications/services/outbox.py) : chaque receiver post_save ne
+# fait que des tests en mémoire puis publie un événement compact — un INSERT,
+# quelle que soit l'audience. Le diffuseur associé (@diffuseur) développe
+# l'événement en notifications après commit, dans un worker Celery ou sur
+# place à défaut de broker, via un FanOut (notifications/services/fanout.py).
+
+from django.db.models.signals import post_init, post_save
 from django.dispatch import receiver
 
-from courses.models import Cours, Module, Session, Participation
+from courses.models import Cours, InscriptionCours, Module, Session, Participation
 from evaluations.models import Evaluation, PassageEvaluation
 from academics.models import (
     Inscription, Classe, Groupe,
@@ -16,62 +22,16 @@ from .models import (
     Notification,
     TypeNotification,
     PrioriteNotification,
-    CanalNotification,
     EntityType,
 )
+from .services import compteurs, resultats, temps_reel
+from .services.outbox import diffuseur, publier
 
 
 # ============================================================================
 # UTILITAIRES
 # ============================================================================
 
-def _notifier(recipient, type_notif, titre, message,
-              priorite=PrioriteNotification.MOYENNE,
-              sender=None, entity_type=None, entity_id=None,
-              action_url=None, institution=None, annee_scolaire=None,
-              groupe_dedup=None, **metadata):
-    """Crée une notification in-app. Silencieux en cas d'erreur."""
-    try:
-        Notification.creer(
-            recipient=recipient,
-            type_notif=type_notif,
-            titre=titre,
-            message=message,
-            canal=CanalNotification.IN_APP,
-            priorite=priorite,
-            sender=sender,
-            entity_type=entity_type,
-            entity_id=entity_id,
-            action_url=action_url,
-            institution=institution,
-            annee_scolaire=annee_scolaire,
-            groupe_deduplication=groupe_dedup,
-            **metadata,
-        )
-    except Exception as e:
-        print(f"[Notification signal error] {e}")
-
-
-def _get_admins(institution):
-    """Admins d'une institution (queryset mis en cache par appelant)."""
-    if not institution:
-        return User.objects.none()
-    return User.objects.filter(
-        admin__isnull=False,
-        institution=institution,
-    ).select_related()
-
-
-def _get_responsables(institution):
-    """Responsables académiques d'une institution."""
-    if not institution:
-        return User.objects.none()
-    return User.objects.filter(
-        responsableacademique__isnull=False,
-        institution=institution,
-    ).select_related()
-
-
 def _compter_absences(apprenant, cours):
     """Nombre d'absences d'un apprenant dans un cours."""
     return Participation.objects.filter(
@@ -81,26 +41,58 @@ def _compter_absences(apprenant, cours):
     ).count()
 
 
-def _notifier_admins_et_responsables(institution, type_notif, titre,
+def _notifier_admins_et_responsables(fo, institution, type_notif, titre,
                                       message, priorite, entity_type=None,
                                       entity_id=None, action_url=None,
                                       annee_scolaire=None, groupe_dedup=None):
     """Helper : notifie tous les admins ET responsables d'une institution."""
-    destinataires = list(_get_admins(institution)) + list(_get_responsables(institution))
-    for dest in destinataires:
-        _notifier(
-            recipient=dest,
-            type_notif=type_notif,
-            titre=titre,
-            message=message,
-            priorite=priorite,
-            entity_type=entity_type,
-            entity_id=entity_id,
-            action_url=action_url,
-            institution=institution,
-            annee_scolaire=annee_scolaire,
-            groupe_dedup=f"{groupe_dedup}:{dest.pk}" if groupe_dedup else None,
-        )
+    fo.ajouter_staff(
+        institution,
+        type_notif=type_notif,
+        titre=titre,
+        message=message,
+        priorite=priorite,
+        entity_type=entity_type,
+        entity_id=entity_id,
+        action_url=action_url,
+        annee_scolaire=annee_scolaire,
+        groupe_dedup=groupe_dedup,
+    )
+
+
+# ============================================================================
+# COMPTEURS DU BADGE ET TEMPS RÉEL (voir notifications/services/compteurs.py
+# et notifications/services/temps_reel.py)
+# ============================================================================
+
+def _etat_compte(valeurs):
+    return (
+        valeurs.get('recipient_id'), valeurs.get('is_read'), valeurs.get('priorite'),
+        valeurs.get('canal'), valeurs.get('expires_at'),
+    )
+
+
+@receiver(post_init, sender=Notification)
+def memoriser_etat_notification(sender, instance, **kwargs):
+    # via __dict__ : pas de requête sur les champs différés (only())
+    instance._etat_compte = _etat_compte(instance.__dict__)
+
+
+@receiver(post_save, sender=Notification)
+def mettre_a_jour_compteurs(sender, instance, created: bool, **kwargs):
+    etat = _etat_compte(instance.__dict__)
+    initial = getattr(instance, '_etat_compte', None)
+    instance._etat_compte = etat
+    if created:
+        compteurs.creees([instance])
+        temps_reel.notifications([instance])
+    elif etat != initial:
+        # Seule la lecture d'une non lue se décompte ; le reste est recompté
+        if initial and etat[0] == initial[0] and etat[2:] == initial[2:] and etat[1] and not initial[1]:
+            if not instance.est_expiree:        # une expirée n'est plus comptée
+                compteurs.lues(instance.recipient_id, {instance.priorite: 1})
+        else:
+            compteurs.invalider(instance.recipient_id, initial and initial[0])
 
 
 # ============================================================================
@@ -114,14 +106,15 @@ def on_user_created(sender, instance: User, created: bool, **kwargs):
     NB : le signal d'activation de compte est géré séparément
          dans votre vue d'activation (code OTP).
     """
-    if not created:
-        return
-    if not instance.institution:
-        return
+    if created and instance.institution_id:
+        publier('new_user', instance)
+
 
-    for admin in _get_admins(instance.institution):
-        _notifier(
-            recipient=admin,
+@diffuseur('new_user', User)
+def diffuser_user_created(instance, fo):
+    for admin_id in fo.admins(instance.institution_id):
+        fo.ajouter(
+            recipient=admin_id,
             type_notif=TypeNotification.CREATION_RESSOURCE,
             titre="Nouveau compte créé",
             message=f"Nouveau compte : {instance.prenom} {instance.nom} ({instance.email}).",
@@ -129,7 +122,7 @@ def on_user_created(sender, instance: User, created: bool, **kwargs):
             entity_type=EntityType.USER,
             entity_id=instance.pk,
             action_url=f"/users/{instance.pk}",
-            institution=instance.institution,
+            institution=instance.institution_id,
             groupe_dedup=f"new_user:{instance.institution_id}",
         )
 
@@ -150,7 +143,12 @@ def on_apprenant_active(sender, instance: Apprenant, created: bool, **kwargs):
     if not instance.is_active:
         return
 
-    # Anti-doublon : ne notifier qu'une seule fois
+    # Anti-doublon : la clé d'idempotence n'autorise qu'un événement par apprenant
+    publier('activation_compte', instance)
+
+
+@diffuseur('activation_compte', Apprenant)
+def diffuser_apprenant_active(instance, fo):
     deja = Notification.objects.filter(
         recipient=instance,
         type=TypeNotification.ACTIVATION_COMPTE,
@@ -159,7 +157,7 @@ def on_apprenant_active(sender, instance: Apprenant, created: bool, **kwargs):
         return
 
     # Notifier l'apprenant
-    _notifier(
+    fo.ajouter(
         recipient=instance,
         type_notif=TypeNotification.ACTIVATION_COMPTE,
         titre="Bienvenue sur SomaPro !",
@@ -169,9 +167,9 @@ def on_apprenant_active(sender, instance: Apprenant, created: bool, **kwargs):
     )
 
     # Notifier le parent
-    if instance.tuteur:
-        _notifier(
-            recipient=instance.tuteur,
+    if instance.tuteur_id:
+        fo.ajouter(
+            recipient=instance.tuteur_id,
             type_notif=TypeNotification.ACTIVATION_COMPTE,
             titre="Compte activé pour votre enfant",
             message=f"Le compte de {instance.prenom} {instance.nom} a été activé sur SomaPro.",
@@ -190,20 +188,26 @@ def on_annee_scolaire_saved(sender, instance: AnneeScolaire, created: bool, **kw
     Nouvelle année scolaire créée ou activée
     → Admin + Responsable notifiés.
     """
-    if not instance.institution:
+    if not instance.institution_id:
         return
-
     if created:
+        publier('annee_scolaire', instance, cle=f"annee_scolaire:{instance.pk}:creee", cree=True)
+    elif instance.est_active:
+        publier('annee_scolaire', instance, cle=f"annee_scolaire:{instance.pk}:activee", cree=False)
+
+
+@diffuseur('annee_scolaire', AnneeScolaire)
+def diffuser_annee_scolaire(instance, fo, cree):
+    if cree:
         titre   = "Nouvelle année scolaire créée"
         message = f"L'année scolaire {instance.annee_format_classique or instance} a été créée."
-    elif instance.est_active:
+    else:
         titre   = "Année scolaire activée"
         message = f"L'année scolaire {instance.annee_format_classique or instance} est maintenant active."
-    else:
-        return
 
     _notifier_admins_et_responsables(
-        institution=instance.institution,
+        fo,
+        institution=instance.institution_id,
         type_notif=TypeNotification.ANNONCE_ADMINISTRATIVE,
         titre=titre,
         message=message,
@@ -219,12 +223,15 @@ def on_annee_scolaire_saved(sender, instance: AnneeScolaire, created: bool, **kw
 
 @receiver(post_save, sender=Classe)
 def on_classe_saved(sender, instance: Classe, created: bool, **kwargs):
-    if not created or not instance.institution:
-        return
+    if created and instance.institution_id:
+        publier('classe_creee', instance)
+
 
-    for resp in _get_responsables(instance.institution):
-        _notifier(
-            recipient=resp,
+@diffuseur('classe_creee', Classe)
+def diffuser_classe_creee(instance, fo):
+    for resp_id in fo.responsables(instance.institution_id):
+        fo.ajouter(
+            recipient=resp_id,
             type_notif=TypeNotification.CREATION_RESSOURCE,
             titre="Nouvelle classe créée",
             message=f"La classe « {instance.nom} » a été créée pour l'année {instance.annee_scolaire}.",
@@ -232,19 +239,22 @@ def on_classe_saved(sender, instance: Classe, created: bool, **kwargs):
             entity_type=EntityType.CLASSE,
             entity_id=instance.pk,
             action_url=f"/classes/{instance.pk}",
-            institution=instance.institution,
-            annee_scolaire=instance.annee_scolaire,
+            institution=instance.institution_id,
+            annee_scolaire=instance.annee_scolaire_id,
         )
 
 
 @receiver(post_save, sender=Groupe)
 def on_groupe_saved(sender, instance: Groupe, created: bool, **kwargs):
-    if not created or not instance.institution:
-        return
+    if created and instance.institution_id:
+        publier('groupe_cree', instance)
+
 
-    for resp in _get_responsables(instance.institution):
-        _notifier(
-            recipient=resp,
+@diffuseur('groupe_cree', Groupe)
+def diffuser_groupe_cree(instance, fo):
+    for resp_id in fo.responsables(instance.institution_id):
+        fo.ajouter(
+            recipient=resp_id,
             type_notif=TypeNotification.CREATION_RESSOURCE,
             titre="Nouveau groupe créé",
             message=f"Le groupe « {instance.nom} » a été créé.",
@@ -252,18 +262,22 @@ def on_groupe_saved(sender, instance: Groupe, created: bool, **kwargs):
             entity_type=EntityType.GROUPE,
             entity_id=instance.pk,
             action_url=f"/groupes/{instance.pk}",
-            institution=instance.institution,
-            annee_scolaire=instance.annee_scolaire,
+            institution=instance.institution_id,
+            annee_scolaire=instance.annee_scolaire_id,
         )
 
 
 @receiver(post_save, sender=Matiere)
 def on_matiere_saved(sender, instance: Matiere, created: bool, **kwargs):
-    if not created or not instance.institution:
-        return
+    if created and instance.institution_id:
+        publier('matiere_created', instance)
 
+
+@diffuseur('matiere_created', Matiere)
+def diffuser_matiere_creee(instance, fo):
     _notifier_admins_et_responsables(
-        institution=instance.institution,
+        fo,
+        institution=instance.institution_id,
         type_notif=TypeNotification.CREATION_RESSOURCE,
         titre="Nouvelle matière créée",
         message=f"La matière « {instance.nom} » a été ajoutée.",
@@ -275,11 +289,15 @@ def on_matiere_saved(sender, instance: Matiere, created: bool, **kwargs):
 
 @receiver(post_save, sender=Specialite)
 def on_specialite_saved(sender, instance: Specialite, created: bool, **kwargs):
-    if not created or not instance.institution:
-        return
+    if created and instance.institution_id:
+        publier('specialite_created', instance)
+
 
+@diffuseur('specialite_created', Specialite)
+def diffuser_specialite_creee(instance, fo):
     _notifier_admins_et_responsables(
-        institution=instance.institution,
+        fo,
+        institution=instance.institution_id,
         type_notif=TypeNotification.CREATION_RESSOURCE,
         titre="Nouvelle spécialité créée",
         message=f"La spécialité « {instance.nom} » a été ajoutée.",
@@ -295,12 +313,15 @@ def on_specialite_saved(sender, instance: Specialite, created: bool, **kwargs):
 
 @receiver(post_save, sender=Cours)
 def on_cours_saved(sender, instance: Cours, created: bool, **kwargs):
-    if not created:
-        return
+    if created:
+        publier('cours_created', instance)
+
 
+@diffuseur('cours_created', Cours)
+def diffuser_cours_cree(instance, fo):
     # Formateur — assignation
-    _notifier(
-        recipient=instance.enseignant,
+    fo.ajouter(
+        recipient=instance.enseignant_id,
         type_notif=TypeNotification.ASSIGNATION_COURS,
         titre="Nouveau cours assigné",
         message=f"Vous avez été assigné au cours « {instance.titre or instance.matiere.nom} » pour le groupe {instance.groupe.nom}.",
@@ -308,13 +329,14 @@ def on_cours_saved(sender, instance: Cours, created: bool, **kwargs):
         entity_type=EntityType.COURS,
         entity_id=instance.pk,
         action_url=f"/cours/{instance.pk}",
-        institution=instance.institution,
-        annee_scolaire=instance.annee_scolaire,
+        institution=instance.institution_id,
+        annee_scolaire=instance.annee_scolaire_id,
     )
 
     # Responsables + Admins
     _notifier_admins_et_responsables(
-        institution=instance.institution,
+        fo,
+        institution=instance.institution_id,
         type_notif=TypeNotification.COURS_CREE,
         titre="Nouveau cours créé",
         message=f"Cours « {instance.titre or instance.matiere.nom} » créé par {instance.enseignant.prenom} {instance.enseignant.nom} pour le groupe {instance.groupe.nom}.",
@@ -322,7 +344,7 @@ def on_cours_saved(sender, instance: Cours, created: bool, **kwargs):
         entity_type=EntityType.COURS,
         entity_id=instance.pk,
         action_url=f"/cours/{instance.pk}",
-        annee_scolaire=instance.annee_scolaire,
+        annee_scolaire=instance.annee_scolaire_id,
         groupe_dedup=f"cours_created:{instance.pk}",
     )
 
@@ -333,55 +355,55 @@ def on_cours_saved(sender, instance: Cours, created: bool, **kwargs):
 
 @receiver(post_save, sender=Module)
 def on_module_saved(sender, instance: Module, created: bool, **kwargs):
-    if not created:
-        return
+    if created:
+        publier('module_ajoute', instance)
 
-    from courses.models import InscriptionCours
-    inscriptions = InscriptionCours.objects.filter(
-        cours=instance.cours
-    ).select_related('apprenant', 'apprenant__tuteur')
 
-    for insc in inscriptions:
-        apprenant = insc.apprenant
+@diffuseur('module_ajoute', Module)
+def diffuser_module_ajoute(instance, fo):
+    cours = instance.cours
+    nom_cours = cours.titre or cours.matiere.nom
+
+    for apprenant in fo.inscrits(cours.pk):
 
         # Apprenant
-        _notifier(
-            recipient=apprenant,
+        fo.ajouter(
+            recipient=apprenant.id,
             type_notif=TypeNotification.MODULE_AJOUTE,
             titre="Nouveau module disponible",
-            message=f"Le module « {instance.titre} » est disponible dans « {instance.cours.titre or instance.cours.matiere.nom} ».",
+            message=f"Le module « {instance.titre} » est disponible dans « {nom_cours} ».",
             priorite=PrioriteNotification.BASSE,
-            sender=instance.cours.enseignant,
+            sender=cours.enseignant_id,
             entity_type=EntityType.MODULE,
             entity_id=instance.pk,
-            action_url=f"/cours/{instance.cours.pk}/modules/{instance.pk}",
-            institution=instance.institution,
-            annee_scolaire=instance.annee_scolaire,
+            action_url=f"/cours/{cours.pk}/modules/{instance.pk}",
+            institution=instance.institution_id,
+            annee_scolaire=instance.annee_scolaire_id,
             groupe_dedup=f"module_ajoute:{instance.pk}",
         )
 
         # Parent (optionnel)
-        if apprenant.tuteur:
-            _notifier(
-                recipient=apprenant.tuteur,
+        if apprenant.tuteur_id:
+            fo.ajouter(
+                recipient=apprenant.tuteur_id,
                 type_notif=TypeNotification.MODULE_AJOUTE,
                 titre="Nouveau contenu pour votre enfant",
-                message=f"Module « {instance.titre} » disponible pour {apprenant.prenom} dans « {instance.cours.titre or instance.cours.matiere.nom} ».",
+                message=f"Module « {instance.titre} » disponible pour {apprenant.prenom} dans « {nom_cours} ».",
                 priorite=PrioriteNotification.BASSE,
                 entity_type=EntityType.MODULE,
                 entity_id=instance.pk,
             )
 
     # Confirmation formateur
-    _notifier(
-        recipient=instance.cours.enseignant,
+    fo.ajouter(
+        recipient=cours.enseignant_id,
         type_notif=TypeNotification.CONTENU_PUBLIE,
         titre="Module ajouté avec succès",
         message=f"Le module « {instance.titre} » a bien été ajouté.",
         priorite=PrioriteNotification.BASSE,
         entity_type=EntityType.MODULE,
         entity_id=instance.pk,
-        action_url=f"/cours/{instance.cours.pk}/modules/{instance.pk}",
+        action_url=f"/cours/{cours.pk}/modules/{instance.pk}",
     )
 
 
@@ -391,10 +413,14 @@ def on_module_saved(sender, instance: Module, created: bool, **kwargs):
 
 @receiver(post_save, sender=Evaluation)
 def on_evaluation_saved(sender, instance: Evaluation, created: bool, **kwargs):
-    if not instance.est_publiee:
-        return
+    # Anti-doublon : une seule publication par évaluation (clé d'idempotence)
+    if instance.est_publiee:
+        publier('evaluation_publiee', instance)
+
 
-    # Anti-doublon
+@diffuseur('evaluation_publiee', Evaluation)
+def diffuser_evaluation_publiee(instance, fo):
+    # Publications notifiées avant l'outbox
     deja_notifie = Notification.objects.filter(
         groupe_deduplication=f"evaluation_publiee:{instance.pk}",
         type=TypeNotification.EVALUATION_PUBLIEE,
@@ -402,49 +428,46 @@ def on_evaluation_saved(sender, instance: Evaluation, created: bool, **kwargs):
     if deja_notifie:
         return
 
-    from courses.models import InscriptionCours
-    inscriptions = InscriptionCours.objects.filter(
-        cours=instance.cours
-    ).select_related('apprenant', 'apprenant__tuteur')
+    cours = instance.cours
+    nom_cours = cours.titre or cours.matiere.nom
 
-    for insc in inscriptions:
-        apprenant = insc.apprenant
+    for apprenant in fo.inscrits(cours.pk):
 
         # Apprenant
-        _notifier(
-            recipient=apprenant,
+        fo.ajouter(
+            recipient=apprenant.id,
             type_notif=TypeNotification.EVALUATION_PUBLIEE,
             titre="Nouvelle évaluation publiée",
-            message=f"L'évaluation « {instance.titre} » est disponible dans « {instance.cours.titre or instance.cours.matiere.nom} ».",
+            message=f"L'évaluation « {instance.titre} » est disponible dans « {nom_cours} ».",
             priorite=PrioriteNotification.MOYENNE,
-            sender=instance.enseignant,
+            sender=instance.enseignant_id,
             entity_type=EntityType.EVALUATION,
             entity_id=instance.pk,
             action_url=f"/evaluations/{instance.pk}",
-            institution=instance.cours.institution,
-            annee_scolaire=instance.cours.annee_scolaire,
+            institution=cours.institution_id,
+            annee_scolaire=cours.annee_scolaire_id,
             groupe_dedup=f"evaluation_publiee:{instance.pk}",
         )
 
         # Parent
-        if apprenant.tuteur:
-            _notifier(
-                recipient=apprenant.tuteur,
+        if apprenant.tuteur_id:
+            fo.ajouter(
+                recipient=apprenant.tuteur_id,
                 type_notif=TypeNotification.EVALUATION_PUBLIEE,
                 titre="Nouvelle évaluation pour votre enfant",
                 message=f"Évaluation « {instance.titre} » publiée pour {apprenant.prenom} {apprenant.nom}.",
                 priorite=PrioriteNotification.MOYENNE,
-                sender=instance.enseignant,
+                sender=instance.enseignant_id,
                 entity_type=EntityType.EVALUATION,
                 entity_id=instance.pk,
                 action_url=f"/evaluations/{instance.pk}",
-                institution=instance.cours.institution,
-                annee_scolaire=instance.cours.annee_scolaire,
+                institution=cours.institution_id,
+                annee_scolaire=cours.annee_scolaire_id,
             )
 
     # Confirmation formateur
-    _notifier(
-        recipient=instance.enseignant,
+    fo.ajouter(
+        recipient=instance.enseignant_id,
         type_notif=TypeNotification.EVALUATION_PUBLIEE,
         titre="Évaluation publiée avec succès",
         message=f"Votre évaluation « {instance.titre} » a bien été publiée.",
@@ -455,20 +478,23 @@ def on_evaluation_saved(sender, instance: Evaluation, created: bool, **kwargs):
     )
 
     # Supervision responsables
-    for resp in _get_responsables(instance.cours.institution):
-        _notifier(
-            recipient=resp,
-            type_notif=TypeNotification.EVALUATION_PUBLIEE,
-            titre="Nouvelle évaluation publiée",
-            message=f"Évaluation « {instance.titre} » publiée par {instance.enseignant.prenom} {instance.enseignant.nom}.",
-            priorite=PrioriteNotification.BASSE,
-            sender=instance.enseignant,
-            entity_type=EntityType.EVALUATION,
-            entity_id=instance.pk,
-            action_url=f"/evaluations/{instance.pk}",
-            institution=instance.cours.institution,
-            groupe_dedup=f"eval_publiee_resp:{instance.pk}",
-        )
+    responsables = fo.responsables(cours.institution_id)
+    if responsables:
+        enseignant = instance.enseignant
+        for resp_id in responsables:
+            fo.ajouter(
+                recipient=resp_id,
+                type_notif=TypeNotification.EVALUATION_PUBLIEE,
+                titre="Nouvelle évaluation publiée",
+                message=f"Évaluation « {instance.titre} » publiée par {enseignant.prenom} {enseignant.nom}.",
+                priorite=PrioriteNotification.BASSE,
+                sender=instance.enseignant_id,
+                entity_type=EntityType.EVALUATION,
+                entity_id=instance.pk,
+                action_url=f"/evaluations/{instance.pk}",
+                institution=cours.institution_id,
+                groupe_dedup=f"eval_publiee_resp:{instance.pk}",
+            )
 
 
 # ============================================================================
@@ -477,132 +503,56 @@ def on_evaluation_saved(sender, instance: Evaluation, created: bool, **kwargs):
 
 @receiver(post_save, sender=PassageEvaluation)
 def on_passage_evaluation_saved(sender, instance: PassageEvaluation, created: bool, **kwargs):
+    # Statut et note figés dans l'événement ; une nouvelle note → un nouvel événement
+    if instance.statut == 'soumis' or (instance.statut == 'corrige' and instance.note is not None):
+        note = float(instance.note) if instance.note is not None else None
+        publier(
+            'passage_evaluation', instance,
+            cle=f"passage_evaluation:{instance.pk}:{instance.statut}:{note}",
+            statut=instance.statut, note=note,
+        )
+
+
+@diffuseur('passage_evaluation', PassageEvaluation)
+def diffuser_passage_evaluation(instance, fo, statut, note):
+    evaluation = instance.evaluation
+    apprenant = instance.apprenant
 
     # ── Soumission ────────────────────────────────────────────────────────────
-    if instance.statut == 'soumis':
-        formateur = instance.evaluation.enseignant
-        groupe    = f"evaluation_soumise:{instance.evaluation.pk}"
-
-        existing = Notification.objects.filter(
-            groupe_deduplication=groupe,
-            is_read=False,
-            recipient=formateur,
-        ).first()
-
-        if existing:
-            existing.nb_evenements_groupes += 1
-            existing.message = f"{existing.nb_evenements_groupes} copies soumises pour « {instance.evaluation.titre} »."
-            existing.save(update_fields=['nb_evenements_groupes', 'message'])
-        else:
-            _notifier(
-                recipient=formateur,
-                type_notif=TypeNotification.EVALUATION_SOUMISE,
-                titre="Copie soumise",
-                message=f"{instance.apprenant.prenom} {instance.apprenant.nom} a soumis « {instance.evaluation.titre} ».",
-                priorite=PrioriteNotification.MOYENNE,
-                entity_type=EntityType.EVALUATION,
-                entity_id=instance.evaluation.pk,
-                action_url=f"/evaluations/{instance.evaluation.pk}/corrections",
-                institution=instance.evaluation.cours.institution,
-                groupe_dedup=groupe,
-            )
+    if statut == 'soumis':
+        formateur_id = evaluation.enseignant_id
+
+        # Regroupé à l'écriture : les soumissions suivantes incrémentent
+        # nb_evenements_groupes de la notification non lue
+        fo.ajouter(
+            recipient=formateur_id,
+            type_notif=TypeNotification.EVALUATION_SOUMISE,
+            titre="Copie soumise",
+            message=f"{apprenant.prenom} {apprenant.nom} a soumis « {evaluation.titre} ».",
+            priorite=PrioriteNotification.MOYENNE,
+            entity_type=EntityType.EVALUATION,
+            entity_id=evaluation.pk,
+            action_url=f"/evaluations/{evaluation.pk}/corrections",
+            institution=evaluation.cours.institution_id,
+            groupe_dedup=f"evaluation_soumise:{evaluation.pk}",
+        )
 
         # Copies à corriger (groupé)
-        _notifier(
-            recipient=formateur,
+        fo.ajouter(
+            recipient=formateur_id,
             type_notif=TypeNotification.COPIES_A_CORRIGER,
             titre="Copies à corriger",
-            message=f"Des copies attendent votre correction pour « {instance.evaluation.titre} ».",
+            message=f"Des copies attendent votre correction pour « {evaluation.titre} ».",
             priorite=PrioriteNotification.MOYENNE,
             entity_type=EntityType.EVALUATION,
-            entity_id=instance.evaluation.pk,
-            action_url=f"/evaluations/{instance.evaluation.pk}/corrections",
-            groupe_dedup=f"copies_a_corriger:{instance.evaluation.pk}",
-        )
-
-    # ── Résultat disponible ───────────────────────────────────────────────────
-    if instance.statut == 'corrige' and instance.note is not None:
-
-        # Apprenant
-        _notifier(
-            recipient=instance.apprenant,
-            type_notif=TypeNotification.EVALUATION_CORRIGEE,
-            titre="Résultat disponible",
-            message=f"Votre évaluation « {instance.evaluation.titre} » a été corrigée. Note : {instance.note}/{instance.evaluation.bareme}.",
-            priorite=PrioriteNotification.HAUTE,
-            entity_type=EntityType.EVALUATION,
-            entity_id=instance.evaluation.pk,
-            action_url=f"/evaluations/{instance.evaluation.pk}/resultat",
-            institution=instance.evaluation.cours.institution,
-            annee_scolaire=instance.evaluation.cours.annee_scolaire,
+            entity_id=evaluation.pk,
+            action_url=f"/evaluations/{evaluation.pk}/corrections",
+            groupe_dedup=f"copies_a_corriger:{evaluation.pk}",
         )
 
-        # Parent
-        if instance.apprenant.tuteur:
-            _notifier(
-                recipient=instance.apprenant.tuteur,
-                type_notif=TypeNotification.EVALUATION_CORRIGEE,
-                titre="Résultat disponible pour votre enfant",
-                message=f"{instance.apprenant.prenom} a obtenu {instance.note}/{instance.evaluation.bareme} à « {instance.evaluation.titre} ».",
-                priorite=PrioriteNotification.HAUTE,
-                entity_type=EntityType.EVALUATION,
-                entity_id=instance.evaluation.pk,
-                action_url=f"/evaluations/{instance.evaluation.pk}/resultat",
-            )
-
-        # Alerte progression faible < 50%
-        pourcentage = (float(instance.note) / float(instance.evaluation.bareme)) * 100
-        if pourcentage < 50:
-
-            _notifier(
-                recipient=instance.apprenant,
-                type_notif=TypeNotification.PROGRESSION_FAIBLE,
-                titre="Résultat en dessous de la moyenne",
-                message=f"Vous avez obtenu {pourcentage:.0f}% à « {instance.evaluation.titre} ». N'hésitez pas à revoir le cours.",
-                priorite=PrioriteNotification.MOYENNE,
-                entity_type=EntityType.EVALUATION,
-                entity_id=instance.evaluation.pk,
-                action_url=f"/evaluations/{instance.evaluation.pk}/resultat",
-            )
-
-            # Parent alerté si progression faible
-            if instance.apprenant.tuteur:
-                _notifier(
-                    recipient=instance.apprenant.tuteur,
-                    type_notif=TypeNotification.PROGRESSION_FAIBLE,
-                    titre="Risque académique — votre enfant",
-                    message=f"{instance.apprenant.prenom} a obtenu {pourcentage:.0f}% à « {instance.evaluation.titre} ».",
-                    priorite=PrioriteNotification.MOYENNE,
-                    entity_type=EntityType.EVALUATION,
-                    entity_id=instance.evaluation.pk,
-                )
-
-            # Responsable alerté
-            for resp in _get_responsables(instance.evaluation.cours.institution):
-                _notifier(
-                    recipient=resp,
-                    type_notif=TypeNotification.PROGRESSION_FAIBLE,
-                    titre="Performance faible détectée",
-                    message=f"{instance.apprenant.prenom} {instance.apprenant.nom} : {pourcentage:.0f}% à « {instance.evaluation.titre} ».",
-                    priorite=PrioriteNotification.BASSE,
-                    entity_type=EntityType.EVALUATION,
-                    entity_id=instance.evaluation.pk,
-                    institution=instance.evaluation.cours.institution,
-                    groupe_dedup=f"perf_faible_resp:{instance.evaluation.pk}:{instance.apprenant.pk}",
-                )
-
-        # Encouragement si >= 80%
-        elif pourcentage >= 80:
-            _notifier(
-                recipient=instance.apprenant,
-                type_notif=TypeNotification.ENCOURAGEMENT,
-                titre="Excellent résultat ! 🎉",
-                message=f"Félicitations ! Vous avez obtenu {pourcentage:.0f}% à « {instance.evaluation.titre} ».",
-                priorite=PrioriteNotification.BASSE,
-                entity_type=EntityType.EVALUATION,
-                entity_id=instance.evaluation.pk,
-                action_url=f"/evaluations/{instance.evaluation.pk}/resultat",
-            )
+    # ── Résultat disponible (+ alertes progression faible / encouragement) ───
+    if statut == 'corrige' and note is not None:
+        resultats.ajouter(fo, apprenant, [(instance.pk, evaluation, note)])
 
 
 # ============================================================================
@@ -611,39 +561,36 @@ def on_passage_evaluation_saved(sender, instance: PassageEvaluation, created: bo
 
 @receiver(post_save, sender=Session)
 def on_session_saved(sender, instance: Session, created: bool, **kwargs):
-    if not created:
-        return
+    if created:
+        publier('session_a_venir', instance)
 
-    from courses.models import InscriptionCours
-    inscriptions = InscriptionCours.objects.filter(
-        cours=instance.cours
-    ).select_related('apprenant', 'apprenant__tuteur')
 
+@diffuseur('session_a_venir', Session)
+def diffuser_session_a_venir(instance, fo):
     date_str = instance.date_debut.strftime('%d/%m/%Y à %Hh%M')
 
-    for insc in inscriptions:
-        apprenant = insc.apprenant
+    for apprenant in fo.inscrits(instance.cours_id):
 
         # Apprenant
-        _notifier(
-            recipient=apprenant,
+        fo.ajouter(
+            recipient=apprenant.id,
             type_notif=TypeNotification.SESSION_A_VENIR,
             titre="Nouvelle session planifiée",
             message=f"Session « {instance.titre} » prévue le {date_str}.",
             priorite=PrioriteNotification.MOYENNE,
-            sender=instance.formateur,
+            sender=instance.formateur_id,
             entity_type=EntityType.SESSION,
             entity_id=instance.pk,
             action_url=f"/sessions/{instance.pk}",
-            institution=instance.institution,
-            annee_scolaire=instance.annee_scolaire,
+            institution=instance.institution_id,
+            annee_scolaire=instance.annee_scolaire_id,
             groupe_dedup=f"session_a_venir:{instance.pk}",
         )
 
         # Parent
-        if apprenant.tuteur:
-            _notifier(
-                recipient=apprenant.tuteur,
+        if apprenant.tuteur_id:
+            fo.ajouter(
+                recipient=apprenant.tuteur_id,
                 type_notif=TypeNotification.SESSION_A_VENIR,
                 titre="Session planifiée pour votre enfant",
                 message=f"Session « {instance.titre} » prévue le {date_str} pour {apprenant.prenom}.",
@@ -654,8 +601,8 @@ def on_session_saved(sender, instance: Session, created: bool, **kwargs):
             )
 
     # Confirmation formateur
-    _notifier(
-        recipient=instance.formateur,
+    fo.ajouter(
+        recipient=instance.formateur_id,
         type_notif=TypeNotification.SESSION_A_VENIR,
         titre="Session créée avec succès",
         message=f"Session « {instance.titre} » du {date_str} créée.",
@@ -666,19 +613,22 @@ def on_session_saved(sender, instance: Session, created: bool, **kwargs):
     )
 
     # Responsables
-    for resp in _get_responsables(instance.institution):
-        _notifier(
-            recipient=resp,
-            type_notif=TypeNotification.SESSION_A_VENIR,
-            titre="Nouvelle session planifiée",
-            message=f"Session « {instance.titre} » le {date_str} par {instance.formateur.prenom} {instance.formateur.nom}.",
-            priorite=PrioriteNotification.BASSE,
-            sender=instance.formateur,
-            entity_type=EntityType.SESSION,
-            entity_id=instance.pk,
-            institution=instance.institution,
-            groupe_dedup=f"session_resp:{instance.pk}",
-        )
+    responsables = fo.responsables(instance.institution_id)
+    if responsables:
+        formateur = instance.formateur
+        for resp_id in responsables:
+            fo.ajouter(
+                recipient=resp_id,
+                type_notif=TypeNotification.SESSION_A_VENIR,
+                titre="Nouvelle session planifiée",
+                message=f"Session « {instance.titre} » le {date_str} par {formateur.prenom} {formateur.nom}.",
+                priorite=PrioriteNotification.BASSE,
+                sender=instance.formateur_id,
+                entity_type=EntityType.SESSION,
+                entity_id=instance.pk,
+                institution=instance.institution_id,
+                groupe_dedup=f"session_resp:{instance.pk}",
+            )
 
 
 # ============================================================================
@@ -687,88 +637,91 @@ def on_session_saved(sender, instance: Session, created: bool, **kwargs):
 
 @receiver(post_save, sender=Participation)
 def on_participation_saved(sender, instance: Participation, created: bool, **kwargs):
-    if not created:
-        return
-    if instance.statut not in ('absent', 'retard'):
-        return
+    if created and instance.statut in ('absent', 'retard'):
+        publier('participation', instance, statut=instance.statut)
+
 
-    est_absent = instance.statut == 'absent'
+@diffuseur('participation', Participation)
+def diffuser_participation(instance, fo, statut):
+    est_absent = statut == 'absent'
     type_notif = TypeNotification.ABSENCE_ENREGISTREE if est_absent else TypeNotification.RETARD_ENREGISTRE
     titre      = "Absence enregistrée" if est_absent else "Retard enregistré"
     mot        = "absent" if est_absent else "en retard"
-    date_str   = instance.session.date_debut.strftime('%d/%m/%Y')
+    session    = instance.session
+    apprenant  = instance.apprenant
+    date_str   = session.date_debut.strftime('%d/%m/%Y')
 
     # Apprenant
-    _notifier(
-        recipient=instance.apprenant,
+    fo.ajouter(
+        recipient=apprenant.pk,
         type_notif=type_notif,
         titre=titre,
-        message=f"Vous avez été marqué {mot} à la session « {instance.session.titre} » du {date_str}.",
+        message=f"Vous avez été marqué {mot} à la session « {session.titre} » du {date_str}.",
         priorite=PrioriteNotification.HAUTE,
         entity_type=EntityType.SESSION,
-        entity_id=instance.session.pk,
-        action_url=f"/sessions/{instance.session.pk}",
-        institution=instance.institution,
-        annee_scolaire=instance.annee_scolaire,
+        entity_id=session.pk,
+        action_url=f"/sessions/{session.pk}",
+        institution=instance.institution_id,
+        annee_scolaire=instance.annee_scolaire_id,
     )
 
     # Parent
-    if instance.apprenant.tuteur:
-        _notifier(
-            recipient=instance.apprenant.tuteur,
+    if apprenant.tuteur_id:
+        fo.ajouter(
+            recipient=apprenant.tuteur_id,
             type_notif=type_notif,
-            titre=f"{titre} — {instance.apprenant.prenom} {instance.apprenant.nom}",
-            message=f"Votre enfant {instance.apprenant.prenom} a été marqué {mot} à la session du {date_str}.",
+            titre=f"{titre} — {apprenant.prenom} {apprenant.nom}",
+            message=f"Votre enfant {apprenant.prenom} a été marqué {mot} à la session du {date_str}.",
             priorite=PrioriteNotification.HAUTE,
             entity_type=EntityType.SESSION,
-            entity_id=instance.session.pk,
-            action_url=f"/sessions/{instance.session.pk}",
+            entity_id=session.pk,
+            action_url=f"/sessions/{session.pk}",
         )
 
     # Confirmation formateur (groupée)
-    _notifier(
-        recipient=instance.session.formateur,
+    fo.ajouter(
+        recipient=session.formateur_id,
         type_notif=type_notif,
         titre=f"Présence enregistrée",
-        message=f"{instance.apprenant.prenom} {instance.apprenant.nom} marqué {mot} à « {instance.session.titre} ».",
+        message=f"{apprenant.prenom} {apprenant.nom} marqué {mot} à « {session.titre} ».",
         priorite=PrioriteNotification.BASSE,
         entity_type=EntityType.SESSION,
-        entity_id=instance.session.pk,
-        groupe_dedup=f"formateur_presence:{instance.session.pk}",
+        entity_id=session.pk,
+        groupe_dedup=f"formateur_presence:{session.pk}",
     )
 
     # Absences répétées (seuil 3) → Responsable + Admin
     if est_absent:
-        nb_absences = _compter_absences(instance.apprenant, instance.session.cours)
+        nb_absences = _compter_absences(apprenant, session.cours_id)
 
         if nb_absences >= 3:
-            cours = instance.session.cours
+            cours = session.cours
             nom_cours = cours.titre or cours.matiere.nom
 
-            for resp in _get_responsables(instance.institution):
-                _notifier(
-                    recipient=resp,
+            for resp_id in fo.responsables(instance.institution_id):
+                fo.ajouter(
+                    recipient=resp_id,
                     type_notif=TypeNotification.ABSENCES_REPETEES,
                     titre="Absences répétées détectées",
-                    message=f"{instance.apprenant.prenom} {instance.apprenant.nom} cumule {nb_absences} absences dans « {nom_cours} ».",
+                    message=f"{apprenant.prenom} {apprenant.nom} cumule {nb_absences} absences dans « {nom_cours} ».",
                     priorite=PrioriteNotification.HAUTE,
                     entity_type=EntityType.SESSION,
-                    entity_id=instance.session.pk,
-                    institution=instance.institution,
-                    groupe_dedup=f"abs_rep_resp:{instance.apprenant.pk}:{cours.pk}",
+                    entity_id=session.pk,
+                    institution=instance.institution_id,
+                    groupe_dedup=f"abs_rep_resp:{apprenant.pk}:{cours.pk}",
                 )
 
-            for admin in _get_admins(instance.institution):
-                _notifier(
-                    recipient=admin,
+            for admin_id in fo.admins(instance.institution_id):
+                fo.ajouter(
+                    recipient=admin_id,
                     type_notif=TypeNotification.ABSENCES_REPETEES,
                     titre="Absences répétées — Signalement",
-                    message=f"{instance.apprenant.prenom} {instance.apprenant.nom} : {nb_absences} absences dans « {nom_cours} ».",
+                    message=f"{apprenant.prenom} {apprenant.nom} : {nb_absences} absences dans « {nom_cours} ».",
                     priorite=PrioriteNotification.HAUTE,
                     entity_type=EntityType.SESSION,
-                    entity_id=instance.session.pk,
-                    institution=instance.institution,
-                    groupe_dedup=f"abs_rep_admin:{instance.apprenant.pk}:{cours.pk}",
+                    entity_id=session.pk,
+                    institution=instance.institution_id,
+                    groupe_dedup=f"abs_rep_admin:{apprenant.pk}:{cours.pk}",
                 )
 
 
@@ -781,40 +734,58 @@ def on_progression_saved(sender, instance: ProgressionApprenant, created: bool,
 
     # Cours terminé → encouragement
     if instance.statut == 'termine' and instance.pourcentage_completion >= 100:
-        deja = Notification.objects.filter(
-            recipient=instance.apprenant,
-            type=TypeNotification.COURS_TERMINE,
-            entity_id=instance.cours.pk,
-            entity_type=EntityType.COURS,
-        ).exists()
-        if not deja:
-            _notifier(
-                recipient=instance.apprenant,
-                type_notif=TypeNotification.COURS_TERMINE,
-                titre="Cours terminé ! 🎓",
-                message=f"Félicitations, vous avez terminé le cours « {instance.cours.titre or instance.cours.matiere.nom} » !",
-                priorite=PrioriteNotification.MOYENNE,
-                entity_type=EntityType.COURS,
-                entity_id=instance.cours.pk,
-                action_url=f"/cours/{instance.cours.pk}",
-            )
+        publier('cours_termine', instance)
 
     # Progression anormale → Responsable alerté
     if instance.pourcentage_completion > 0 and instance.pourcentage_completion < 10:
         update_fields = kwargs.get('update_fields')
         if update_fields and 'pourcentage_completion' in update_fields:
-            for resp in _get_responsables(instance.cours.institution):
-                _notifier(
-                    recipient=resp,
-                    type_notif=TypeNotification.PROGRESSION_ANORMALE,
-                    titre="Progression anormale détectée",
-                    message=f"{instance.apprenant.prenom} {instance.apprenant.nom} est à seulement {instance.pourcentage_completion:.0f}% dans « {instance.cours.titre or instance.cours.matiere.nom} ».",
-                    priorite=PrioriteNotification.MOYENNE,
-                    entity_type=EntityType.COURS,
-                    entity_id=instance.cours.pk,
-                    institution=instance.cours.institution,
-                    groupe_dedup=f"prog_anormale:{instance.apprenant.pk}:{instance.cours.pk}",
-                )
+            pourcentage = float(instance.pourcentage_completion)
+            publier(
+                'progression_anormale', instance,
+                cle=f"progression_anormale:{instance.pk}:{pourcentage:.0f}",
+                pourcentage=pourcentage,
+            )
+
+
+@diffuseur('cours_termine', ProgressionApprenant)
+def diffuser_cours_termine(instance, fo):
+    deja = Notification.objects.filter(
+        recipient_id=instance.apprenant_id,
+        type=TypeNotification.COURS_TERMINE,
+        entity_id=instance.cours_id,
+        entity_type=EntityType.COURS,
+    ).exists()
+    if deja:
+        return
+
+    fo.ajouter(
+        recipient=instance.apprenant_id,
+        type_notif=TypeNotification.COURS_TERMINE,
+        titre="Cours terminé ! 🎓",
+        message=f"Félicitations, vous avez terminé le cours « {instance.cours.titre or instance.cours.matiere.nom} » !",
+        priorite=PrioriteNotification.MOYENNE,
+        entity_type=EntityType.COURS,
+        entity_id=instance.cours_id,
+        action_url=f"/cours/{instance.cours_id}",
+    )
+
+
+@diffuseur('progression_anormale', ProgressionApprenant)
+def diffuser_progression_anormale(instance, fo, pourcentage):
+    cours = instance.cours
+    for resp_id in fo.responsables(cours.institution_id):
+        fo.ajouter(
+            recipient=resp_id,
+            type_notif=TypeNotification.PROGRESSION_ANORMALE,
+            titre="Progression anormale détectée",
+            message=f"{instance.apprenant.prenom} {instance.apprenant.nom} est à seulement {pourcentage:.0f}% dans « {cours.titre or cours.matiere.nom} ».",
+            priorite=PrioriteNotification.MOYENNE,
+            entity_type=EntityType.COURS,
+            entity_id=cours.pk,
+            institution=cours.institution_id,
+            groupe_dedup=f"prog_anormale:{instance.apprenant_id}:{cours.pk}",
+        )
 
 
 # ============================================================================
@@ -823,14 +794,18 @@ def on_progression_saved(sender, instance: ProgressionApprenant, created: bool,
 
 @receiver(post_save, sender=Inscription)
 def on_inscription_saved(sender, instance: Inscription, created: bool, **kwargs):
-    if not created:
-        return
+    if created:
+        publier('inscription', instance)
 
+
+@diffuseur('inscription', Inscription)
+def diffuser_inscription(instance, fo):
     nom_classe = instance.classe.nom if instance.classe else "formation"
+    apprenant = instance.apprenant
 
     # Apprenant
-    _notifier(
-        recipient=instance.apprenant,
+    fo.ajouter(
+        recipient=apprenant.pk,
         type_notif=TypeNotification.INSCRIPTION_COURS,
         titre="Inscription confirmée",
         message=f"Votre inscription en {nom_classe} pour l'année {instance.annee_scolaire} est confirmée.",
@@ -838,63 +813,63 @@ def on_inscription_saved(sender, instance: Inscription, created: bool, **kwargs)
         entity_type=EntityType.INSCRIPTION,
         entity_id=instance.pk,
         action_url="/mon-espace",
-        institution=instance.institution,
-        annee_scolaire=instance.annee_scolaire,
+        institution=instance.institution_id,
+        annee_scolaire=instance.annee_scolaire_id,
     )
 
     # Parent
-    if instance.apprenant.tuteur:
-        _notifier(
-            recipient=instance.apprenant.tuteur,
+    if apprenant.tuteur_id:
+        fo.ajouter(
+            recipient=apprenant.tuteur_id,
             type_notif=TypeNotification.INSCRIPTION_COURS,
             titre="Inscription de votre enfant confirmée",
-            message=f"{instance.apprenant.prenom} a été inscrit(e) en {nom_classe} pour {instance.annee_scolaire}.",
+            message=f"{apprenant.prenom} a été inscrit(e) en {nom_classe} pour {instance.annee_scolaire}.",
             priorite=PrioriteNotification.MOYENNE,
             entity_type=EntityType.INSCRIPTION,
             entity_id=instance.pk,
             action_url="/mon-espace",
-            institution=instance.institution,
-            annee_scolaire=instance.annee_scolaire,
+            institution=instance.institution_id,
+            annee_scolaire=instance.annee_scolaire_id,
         )
 
     # Admins (groupé par année)
-    for admin in _get_admins(instance.institution):
-        _notifier(
-            recipient=admin,
+    for admin_id in fo.admins(instance.institution_id):
+        fo.ajouter(
+            recipient=admin_id,
             type_notif=TypeNotification.INSCRIPTION_COURS,
             titre="Nouvelle inscription",
-            message=f"{instance.apprenant.prenom} {instance.apprenant.nom} inscrit(e) en {nom_classe}.",
+            message=f"{apprenant.prenom} {apprenant.nom} inscrit(e) en {nom_classe}.",
             priorite=PrioriteNotification.BASSE,
             entity_type=EntityType.INSCRIPTION,
             entity_id=instance.pk,
             action_url=f"/inscriptions/{instance.pk}",
-            institution=instance.institution,
-            annee_scolaire=instance.annee_scolaire,
+            institution=instance.institution_id,
+            annee_scolaire=instance.annee_scolaire_id,
             groupe_dedup=f"inscription_admin:{instance.institution_id}:{instance.annee_scolaire_id}",
         )
 
     # Formateurs des cours du groupe de l'apprenant
-    if instance.apprenant.groupe and instance.annee_scolaire:
-        from courses.models import Cours as CoursModel
-        cours_du_groupe = CoursModel.objects.filter(
-            groupe=instance.apprenant.groupe,
-            annee_scolaire=instance.annee_scolaire,
-        ).select_related('enseignant')
+    if apprenant.groupe_id and instance.annee_scolaire_id:
+        cours_du_groupe = Cours.objects.filter(
+            groupe_id=apprenant.groupe_id,
+            annee_scolaire_id=instance.annee_scolaire_id,
+        ).select_related('matiere')
 
         for cours in cours_du_groupe:
-            _notifier(
-                recipient=cours.enseignant,
+            fo.ajouter(
+                recipient=cours.enseignant_id,
                 type_notif=TypeNotification.INSCRIPTION_COURS,
                 titre="Nouvelle inscription dans votre cours",
-                message=f"{instance.apprenant.prenom} {instance.apprenant.nom} a rejoint « {cours.titre or cours.matiere.nom} ».",
+                message=f"{apprenant.prenom} {apprenant.nom} a rejoint « {cours.titre or cours.matiere.nom} ».",
                 priorite=PrioriteNotification.BASSE,
                 entity_type=EntityType.COURS,
                 entity_id=cours.pk,
                 action_url=f"/cours/{cours.pk}",
-                institution=instance.institution,
+                institution=instance.institution_id,
                 groupe_dedup=f"inscription_formateur:{cours.pk}:{instance.annee_scolaire_id}",
             )
-            
+
+
 # ============================================================================
 # SESSION ANNULÉE / DÉPLACÉE — détection de modification post-création
 # ============================================================================
@@ -904,6 +879,7 @@ def on_session_modifiee(sender, instance: Session, created: bool, **kwargs):
     """
     Détecte une annulation ou un déplacement de session après sa création.
     On surveille update_fields pour ne pas re-déclencher à chaque save.
+    Anti-doublon : une annulation et un déplacement au plus par session (clés d'idempotence).
     """
     if created:
         return
@@ -912,141 +888,146 @@ def on_session_modifiee(sender, instance: Session, created: bool, **kwargs):
 
     # Annulation
     if hasattr(instance, 'statut') and instance.statut == 'annulee':
-        groupe = f"session_annulee:{instance.pk}"
-        deja = Notification.objects.filter(groupe_deduplication=groupe).exists()
-        if deja:
-            return
+        publier('session_annulee', instance)
 
-        from courses.models import InscriptionCours
-        inscriptions = InscriptionCours.objects.filter(
-            cours=instance.cours
-        ).select_related('apprenant', 'apprenant__tuteur')
+    # Déplacement (date_debut a changé)
+    if 'date_debut' in update_fields or 'date_fin' in update_fields:
+        publier('session_deplacee', instance)
 
-        date_str = instance.date_debut.strftime('%d/%m/%Y à %Hh%M')
 
-        for insc in inscriptions:
-            apprenant = insc.apprenant
+@diffuseur('session_annulee', Session)
+def diffuser_session_annulee(instance, fo):
+    groupe = f"session_annulee:{instance.pk}"
+    deja = Notification.objects.filter(groupe_deduplication=groupe).exists()
+    if deja:
+        return
+
+    date_str = instance.date_debut.strftime('%d/%m/%Y à %Hh%M')
+
+    for apprenant in fo.inscrits(instance.cours_id):
+
+        fo.ajouter(
+            recipient=apprenant.id,
+            type_notif=TypeNotification.SESSION_ANNULEE,
+            titre="Session annulée",
+            message=f"La session « {instance.titre} » prévue le {date_str} a été annulée.",
+            priorite=PrioriteNotification.HAUTE,
+            sender=instance.formateur_id,
+            entity_type=EntityType.SESSION,
+            entity_id=instance.pk,
+            action_url=f"/sessions/{instance.pk}",
+            institution=instance.institution_id,
+            groupe_dedup=groupe,
+        )
 
-            _notifier(
-                recipient=apprenant,
+        if apprenant.tuteur_id:
+            fo.ajouter(
+                recipient=apprenant.tuteur_id,
                 type_notif=TypeNotification.SESSION_ANNULEE,
-                titre="Session annulée",
-                message=f"La session « {instance.titre} » prévue le {date_str} a été annulée.",
+                titre=f"Session annulée — {apprenant.prenom}",
+                message=f"La session « {instance.titre} » du {date_str} a été annulée pour {apprenant.prenom}.",
                 priorite=PrioriteNotification.HAUTE,
-                sender=instance.formateur,
                 entity_type=EntityType.SESSION,
                 entity_id=instance.pk,
-                action_url=f"/sessions/{instance.pk}",
-                institution=instance.institution,
-                groupe_dedup=groupe,
             )
 
-            if apprenant.tuteur:
-                _notifier(
-                    recipient=apprenant.tuteur,
-                    type_notif=TypeNotification.SESSION_ANNULEE,
-                    titre=f"Session annulée — {apprenant.prenom}",
-                    message=f"La session « {instance.titre} » du {date_str} a été annulée pour {apprenant.prenom}.",
-                    priorite=PrioriteNotification.HAUTE,
-                    entity_type=EntityType.SESSION,
-                    entity_id=instance.pk,
-                )
-
-        # Notifier les responsables
-        for resp in _get_responsables(instance.institution):
-            _notifier(
-                recipient=resp,
+    # Notifier les responsables
+    responsables = fo.responsables(instance.institution_id)
+    if responsables:
+        formateur = instance.formateur
+        for resp_id in responsables:
+            fo.ajouter(
+                recipient=resp_id,
                 type_notif=TypeNotification.SESSION_ANNULEE,
                 titre="Session annulée",
-                message=f"La session « {instance.titre} » du {date_str} a été annulée par {instance.formateur.prenom} {instance.formateur.nom}.",
+                message=f"La session « {instance.titre} » du {date_str} a été annulée par {formateur.prenom} {formateur.nom}.",
                 priorite=PrioriteNotification.HAUTE,
-                sender=instance.formateur,
+                sender=instance.formateur_id,
                 entity_type=EntityType.SESSION,
                 entity_id=instance.pk,
-                institution=instance.institution,
+                institution=instance.institution_id,
                 groupe_dedup=f"session_annulee_resp:{instance.pk}",
             )
 
-    # Déplacement (date_debut a changé)
-    if 'date_debut' in update_fields or 'date_fin' in update_fields:
-        groupe = f"session_deplacee:{instance.pk}"
-        deja = Notification.objects.filter(groupe_deduplication=groupe).exists()
-        if deja:
-            return
 
-        from courses.models import InscriptionCours
-        inscriptions = InscriptionCours.objects.filter(
-            cours=instance.cours
-        ).select_related('apprenant', 'apprenant__tuteur')
+@diffuseur('session_deplacee', Session)
+def diffuser_session_deplacee(instance, fo):
+    groupe = f"session_deplacee:{instance.pk}"
+    deja = Notification.objects.filter(groupe_deduplication=groupe).exists()
+    if deja:
+        return
 
-        nouvelle_date = instance.date_debut.strftime('%d/%m/%Y à %Hh%M')
+    nouvelle_date = instance.date_debut.strftime('%d/%m/%Y à %Hh%M')
 
-        for insc in inscriptions:
-            apprenant = insc.apprenant
+    for apprenant in fo.inscrits(instance.cours_id):
 
-            _notifier(
-                recipient=apprenant,
+        fo.ajouter(
+            recipient=apprenant.id,
+            type_notif=TypeNotification.SESSION_DEPLACEE,
+            titre="Session déplacée",
+            message=f"La session « {instance.titre} » a été déplacée au {nouvelle_date}.",
+            priorite=PrioriteNotification.HAUTE,
+            sender=instance.formateur_id,
+            entity_type=EntityType.SESSION,
+            entity_id=instance.pk,
+            action_url=f"/sessions/{instance.pk}",
+            institution=instance.institution_id,
+            groupe_dedup=groupe,
+        )
+
+        if apprenant.tuteur_id:
+            fo.ajouter(
+                recipient=apprenant.tuteur_id,
                 type_notif=TypeNotification.SESSION_DEPLACEE,
-                titre="Session déplacée",
-                message=f"La session « {instance.titre} » a été déplacée au {nouvelle_date}.",
-                priorite=PrioriteNotification.HAUTE,
-                sender=instance.formateur,
+                titre=f"Session déplacée — {apprenant.prenom}",
+                message=f"Session « {instance.titre} » déplacée au {nouvelle_date} pour {apprenant.prenom}.",
+                priorite=PrioriteNotification.MOYENNE,
                 entity_type=EntityType.SESSION,
                 entity_id=instance.pk,
-                action_url=f"/sessions/{instance.pk}",
-                institution=instance.institution,
-                groupe_dedup=groupe,
             )
 
-            if apprenant.tuteur:
-                _notifier(
-                    recipient=apprenant.tuteur,
-                    type_notif=TypeNotification.SESSION_DEPLACEE,
-                    titre=f"Session déplacée — {apprenant.prenom}",
-                    message=f"Session « {instance.titre} » déplacée au {nouvelle_date} pour {apprenant.prenom}.",
-                    priorite=PrioriteNotification.MOYENNE,
-                    entity_type=EntityType.SESSION,
-                    entity_id=instance.pk,
-                )
-
 
 # ============================================================================
 # INSCRIPTION DIRECTE AU COURS (InscriptionCours)
 # ============================================================================
 
-@receiver(post_save, sender='courses.InscriptionCours')
+@receiver(post_save, sender=InscriptionCours)
 def on_inscription_cours_saved(sender, instance, created: bool, **kwargs):
     """
     Notifie l'apprenant et le formateur lors d'une inscription directe à un cours.
     Couvre le cas où l'inscription se fait par InscriptionCours (pas Inscription académique).
     """
-    if not created:
-        return
+    if created:
+        publier('inscription_cours', instance)
+
 
+@diffuseur('inscription_cours', InscriptionCours)
+def diffuser_inscription_cours(instance, fo):
     cours = instance.cours
     apprenant = instance.apprenant
+    nom_cours = cours.titre or cours.matiere.nom
 
     # Apprenant
-    _notifier(
-        recipient=apprenant,
+    fo.ajouter(
+        recipient=apprenant.pk,
         type_notif=TypeNotification.INSCRIPTION_COURS,
         titre="Inscription au cours confirmée",
-        message=f"Vous êtes inscrit(e) au cours « {cours.titre or cours.matiere.nom} ».",
+        message=f"Vous êtes inscrit(e) au cours « {nom_cours} ».",
         priorite=PrioriteNotification.MOYENNE,
         entity_type=EntityType.COURS,
         entity_id=cours.pk,
         action_url=f"/cours/{cours.pk}",
-        institution=cours.institution,
-        annee_scolaire=cours.annee_scolaire,
+        institution=cours.institution_id,
+        annee_scolaire=cours.annee_scolaire_id,
     )
 
     # Parent
-    if apprenant.tuteur:
-        _notifier(
-            recipient=apprenant.tuteur,
+    if apprenant.tuteur_id:
+        fo.ajouter(
+            recipient=apprenant.tuteur_id,
             type_notif=TypeNotification.INSCRIPTION_COURS,
             titre="Inscription de votre enfant",
-            message=f"{apprenant.prenom} a été inscrit(e) au cours « {cours.titre or cours.matiere.nom} ».",
+            message=f"{apprenant.prenom} a été inscrit(e) au cours « {nom_cours} ».",
             priorite=PrioriteNotification.MOYENNE,
             entity_type=EntityType.COURS,
             entity_id=cours.pk,
@@ -1054,16 +1035,16 @@ def on_inscription_cours_saved(sender, instance, created: bool, **kwargs):
         )
 
     # Formateur
-    _notifier(
-        recipient=cours.enseignant,
+    fo.ajouter(
+        recipient=cours.enseignant_id,
         type_notif=TypeNotification.INSCRIPTION_COURS,
         titre="Nouvelle inscription dans votre cours",
-        message=f"{apprenant.prenom} {apprenant.nom} a rejoint « {cours.titre or cours.matiere.nom} ».",
+        message=f"{apprenant.prenom} {apprenant.nom} a rejoint « {nom_cours} ».",
         priorite=PrioriteNotification.BASSE,
         entity_type=EntityType.COURS,
         entity_id=cours.pk,
         action_url=f"/cours/{cours.pk}",
-        institution=cours.institution,
+        institution=cours.institution_id,
         groupe_dedup=f"inscription_formateur_cours:{cours.pk}:{cours.annee_scolaire_id}",
     )
 
@@ -1077,9 +1058,11 @@ try:
 
     @receiver(post_save, sender=Ressource)
     def on_ressource_saved(sender, instance, created: bool, **kwargs):
-        if not created:
-            return
+        if created:
+            publier('ressource', instance)
 
+    @diffuseur('ressource', Ressource)
+    def diffuser_ressource(instance, fo):
         # Récupérer le cours lié à la ressource
         cours = getattr(instance, 'cours', None) or getattr(instance, 'module', None)
         if not cours:
@@ -1089,14 +1072,9 @@ try:
         if hasattr(cours, 'cours'):
             cours = cours.cours
 
-        from courses.models import InscriptionCours
-        inscriptions = InscriptionCours.objects.filter(
-            cours=cours
-        ).select_related('apprenant')
-
-        for insc in inscriptions:
-            _notifier(
-                recipient=insc.apprenant,
+        for apprenant in fo.inscrits(cours.pk):
+            fo.ajouter(
+                recipient=apprenant.id,
                 type_notif=TypeNotification.RESSOURCE_PEDAGOGIQUE,
                 titre="Nouvelle ressource disponible",
                 message=f"Une nouvelle ressource « {instance.titre or instance.nom} » a été ajoutée.",
@@ -1120,45 +1098,44 @@ try:
 
     @receiver(post_save, sender=PassageQuiz)
     def on_passage_quiz_saved(sender, instance, created: bool, **kwargs):
+        # PassageQuiz n'a pas (encore) de champ statut : rien à publier sans lui
+        statut = getattr(instance, 'statut', None)
+        if statut == 'soumis' or (statut == 'corrige' and instance.score is not None):
+            publier(
+                'passage_quiz', instance,
+                cle=f"passage_quiz:{instance.pk}:{statut}:{instance.score}",
+                statut=statut, score=instance.score,
+            )
+
+    @diffuseur('passage_quiz', PassageQuiz)
+    def diffuser_passage_quiz(instance, fo, statut, score):
 
-        if instance.statut == 'soumis':
+        if statut == 'soumis':
             formateur = instance.quiz.cours.enseignant if hasattr(instance.quiz, 'cours') else None
             if not formateur:
                 return
 
-            groupe = f"quiz_soumis:{instance.quiz.pk}"
-            existing = Notification.objects.filter(
-                groupe_deduplication=groupe,
-                is_read=False,
+            fo.ajouter(
                 recipient=formateur,
-            ).first()
-
-            if existing:
-                existing.nb_evenements_groupes += 1
-                existing.message = f"{existing.nb_evenements_groupes} quiz soumis pour « {instance.quiz.titre} »."
-                existing.save(update_fields=['nb_evenements_groupes', 'message'])
-            else:
-                _notifier(
-                    recipient=formateur,
-                    type_notif=TypeNotification.EVALUATION_SOUMISE,
-                    titre="Quiz soumis",
-                    message=f"{instance.apprenant.prenom} {instance.apprenant.nom} a soumis le quiz « {instance.quiz.titre} ».",
-                    priorite=PrioriteNotification.BASSE,
-                    entity_type=EntityType.QUIZ,
-                    entity_id=instance.quiz.pk,
-                    groupe_dedup=groupe,
-                )
+                type_notif=TypeNotification.EVALUATION_SOUMISE,
+                titre="Quiz soumis",
+                message=f"{instance.apprenant.prenom} {instance.apprenant.nom} a soumis le quiz « {instance.quiz.titre} ».",
+                priorite=PrioriteNotification.BASSE,
+                entity_type=EntityType.QUIZ,
+                entity_id=instance.quiz.pk,
+                groupe_dedup=f"quiz_soumis:{instance.quiz.pk}",
+            )
 
-        if instance.statut == 'corrige' and instance.score is not None:
-            _notifier(
-                recipient=instance.apprenant,
+        if statut == 'corrige' and score is not None:
+            fo.ajouter(
+                recipient=instance.apprenant_id,
                 type_notif=TypeNotification.EVALUATION_CORRIGEE,
                 titre="Résultat de quiz disponible",
-                message=f"Votre quiz « {instance.quiz.titre} » a été noté : {instance.score}/{instance.quiz.total_points}.",
+                message=f"Votre quiz « {instance.quiz.titre} » a été noté : {score}/{instance.quiz.total_points}.",
                 priorite=PrioriteNotification.MOYENNE,
                 entity_type=EntityType.QUIZ,
                 entity_id=instance.quiz.pk,
             )
 
 except ImportError:
-    pass  # PassageQuiz pas encore disponible
\ No newline at end of file
+    pass  # PassageQuiz pas encore disponible
@@ -1,3 +1,280 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from courses.tests import creer_cours
+from users.models import User
+
+from .models import EvenementNotification, Notification, TypeNotification
+from .services import coalescence, outbox, tickets
+from .services.fanout import FanOut
+
+try:
+    from channels.db import database_sync_to_async
+    from channels.routing import URLRouter
+    from channels.testing import WebsocketCommunicator
+
+    from .consumers import TokenAuthMiddleware
+    from .routing import websocket_urlpatterns
+except ImportError:                     # channels.testing requiert daphne
+    WebsocketCommunicator = None
+
+
+TYPE_TEST = "test_evenement"
+
+
+def diffuser_test(instance, fo, message="m", echec=False):
+    if echec:
+        raise RuntimeError("diffusion impossible")
+    fo.ajouter(instance, TypeNotification.TENTATIVE_SUSPECTE, "T", message)
+
+
+# ============================================================================
+# OUTBOX (idempotence)
+# ============================================================================
+
+@override_settings(NOTIFICATION_OUTBOX_ASYNC=False)
+class OutboxTests(TestCase):
+
+    def setUp(self):
+        _, _, _, (self.user,) = creer_cours(nb_sequences=0)
+        diffuseurs = mock.patch.dict(outbox._DIFFUSEURS, {TYPE_TEST: (User, diffuser_test)})
+        diffuseurs.start()
+        self.addCleanup(diffuseurs.stop)
+
+    def notifications(self):
+        return Notification.objects.filter(recipient=self.user, type=TypeNotification.TENTATIVE_SUSPECTE)
+
+    def test_publication_en_double_diffusee_une_fois(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            cle = outbox.publier(TYPE_TEST, self.user)
+            self.assertEqual(outbox.publier(TYPE_TEST, self.user), cle)
+
+        evenement = EvenementNotification.objects.get(type_evenement=TYPE_TEST)
+        self.assertEqual((evenement.cle_idempotence, evenement.statut), (f"{TYPE_TEST}:{self.user.pk}", "traite"))
+        self.assertEqual((evenement.tentatives, evenement.nb_notifications), (1, 1))
+        self.assertEqual(self.notifications().count(), 1)
+
+    def test_publication_en_double_planifiee_une_fois(self):
+        with mock.patch.object(outbox, "planifier") as planifier:
+            with self.captureOnCommitCallbacks(execute=True):
+                outbox.publier(TYPE_TEST, self.user)
+                outbox.publier(TYPE_TEST, self.user)
+            with self.captureOnCommitCallbacks(execute=True):
+                outbox.publier(TYPE_TEST, self.user)
+        planifier.assert_called_once_with(f"{TYPE_TEST}:{self.user.pk}")
+
+    def test_evenement_traite_non_rejoue(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            cle = outbox.publier(TYPE_TEST, self.user)
+        self.assertIsNone(outbox.traiter(cle))
+        self.assertEqual(outbox.relancer(), 0)
+        self.assertEqual(self.notifications().count(), 1)
+
+    def test_echec_annule_puis_relance(self):
+        with self.assertLogs(outbox.logger, "ERROR"), self.captureOnCommitCallbacks(execute=True):
+            cle = outbox.publier(TYPE_TEST, self.user, echec=True)
+        evenement = EvenementNotification.objects.get(cle_idempotence=cle)
+        self.assertEqual((evenement.statut, evenement.tentatives), ("echec", 1))
+        self.assertFalse(self.notifications().exists())
+
+        EvenementNotification.objects.filter(pk=evenement.pk).update(donnees={"message": "ok"})
+        self.assertEqual(outbox.relancer(), 1)
+        evenement.refresh_from_db()
+        self.assertEqual((evenement.statut, evenement.tentatives), ("traite", 2))
+        self.assertEqual(list(self.notifications().values_list("message", flat=True)), ["ok"])
+
+    @override_settings(NOTIFICATION_OUTBOX_MAX_TENTATIVES=1)
+    def test_tentatives_epuisees(self):
+        with self.assertLogs(outbox.logger, "ERROR"), self.captureOnCommitCallbacks(execute=True):
+            cle = outbox.publier(TYPE_TEST, self.user, echec=True)
+        self.assertIsNone(outbox.traiter(cle))
+        self.assertEqual(EvenementNotification.objects.get(cle_idempotence=cle).tentatives, 1)
+
+    def test_evenement_bloque_en_cours_repris(self):
+        evenement = EvenementNotification.objects.create(
+            type_evenement=TYPE_TEST, objet_id=self.user.pk, cle_idempotence="bloque",
+            statut="en_cours", tentatives=1, pris_le=timezone.now() - timedelta(hours=1),
+        )
+        self.assertEqual(outbox.relancer(), 1)
+        evenement.refresh_from_db()
+        self.assertEqual(evenement.statut, "traite")
+        self.assertEqual(self.notifications().count(), 1)
+
+
+# ============================================================================
+# REGROUPEMENT (upsert ON CONFLICT)
+# ============================================================================
+
+class CoalescenceTests(TestCase):
+
+    def setUp(self):
+        _, _, _, self.users = creer_cours(nb_sequences=0, nb_apprenants=2)
+
+    def envoyer(self, *evenements):
+        fo = FanOut("test")
+        for user, message, groupe in evenements:
+            fo.ajouter(user, TypeNotification.TENTATIVE_SUSPECTE, "T", message, groupe_dedup=groupe)
+        return fo.envoyer(lever=True)
+
+    def lignes(self, user):
+        return list(
+            Notification.objects.filter(recipient=user, type=TypeNotification.TENTATIVE_SUSPECTE).order_by("id")
+            .values_list("message", "nb_evenements_groupes", "is_read")
+        )
+
+    def test_doublons_d_un_meme_paquet_fusionnes(self):
+        premier, _ = self.users
+        self.assertEqual(self.envoyer((premier, "a", "g"), (premier, "b", "g"), (premier, "c", "g")), 3)
+        self.assertEqual(self.lignes(premier), [("c", 3, False)])
+
+    def test_paquets_successifs_incrementent_la_ligne(self):
+        premier, second = self.users
+        self.envoyer((premier, "a", "g"), (second, "a", "g"))
+        self.envoyer((premier, "b", "g"))
+        self.assertEqual(self.lignes(premier), [("b", 2, False)])
+        self.assertEqual(self.lignes(second), [("a", 1, False)])
+
+    def test_notification_lue_sort_du_regroupement(self):
+        premier, _ = self.users
+        self.envoyer((premier, "a", "g"))
+        Notification.objects.filter(recipient=premier).update(is_read=True)
+        self.envoyer((premier, "b", "g"))
+        self.assertEqual(self.lignes(premier), [("a", 1, True), ("b", 1, False)])
+
+    def test_nouvelle_fenetre_nouvelle_notification(self):
+        premier, _ = self.users
+        self.envoyer((premier, "a", "g"))
+        with mock.patch.object(coalescence, "fenetre_courante", return_value=coalescence.fenetre_courante() + 1):
+            self.envoyer((premier, "b", "g"))
+        self.assertEqual(self.lignes(premier), [("a", 1, False), ("b", 1, False)])
+
+    def test_sans_cle_pas_de_regroupement(self):
+        premier, _ = self.users
+        self.envoyer((premier, "a", None), (premier, "b", None))
+        self.assertEqual(self.lignes(premier), [("a", 1, False), ("b", 1, False)])
+
+
+# ============================================================================
+# COMPTEURS DU BADGE
+# ============================================================================
+
+@override_settings(NOTIFICATION_COMPTEUR_CACHE_TIMEOUT=900)
+class CompteurTests(TestCase):
+
+    URL = "/api/notifications/compteur/"
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        _, _, _, (self.user,) = creer_cours(nb_sequences=0)
+        Notification.objects.filter(recipient=self.user).delete()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def creer(self, **champs):
+        champs.setdefault("type", TypeNotification.TENTATIVE_SUSPECTE)
+        with self.captureOnCommitCallbacks(execute=True):
+            return Notification.objects.create(recipient=self.user, **champs)
+
+    def compteur(self, params=""):
+        return self.client.get(self.URL + params).json()
+
+    def test_creations_incrementent_sans_requete(self):
+        self.creer(priorite="haute")
+        self.assertEqual(self.compteur()["total"], 1)   # reconstruction
+        self.creer(priorite="basse", canal="email")
+        with self.assertNumQueries(0):
+            data = self.client.get(self.URL).json()
+        self.assertEqual(data, {
+            "total": 2, "non_lues": 2,
+            "par_priorite": {"haute": 1, "basse": 1},
+            "par_canal": {"in_app": 1, "email": 1},
+        })
+
+    def test_lectures_et_suppressions_decrementent(self):
+        premiere = self.creer(priorite="haute")
+        self.creer(priorite="haute")
+        self.creer(priorite="basse")
+        self.compteur()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/api/notifications/{premiere.pk}/marquer_lue/")
+        self.assertEqual(self.compteur()["par_priorite"], {"haute": 1, "basse": 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/notifications/marquer_lues/", {}, format="json")
+        self.assertEqual((self.compteur()["non_lues"], self.compteur()["par_priorite"]), (0, {}))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete("/api/notifications/supprimer_lues/")
+        self.assertEqual(self.compteur(), {"total": 0, "non_lues": 0, "par_priorite": {}, "par_canal": {}})
+
+    def test_filtres_comptes_en_base(self):
+        self.creer(priorite="haute")
+        self.creer(priorite="basse", canal="email")
+        self.creer(type=TypeNotification.ENCOURAGEMENT, priorite="basse")
+        self.creer(priorite="basse", expires_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(self.compteur()["total"], 3)
+
+        self.assertEqual(self.compteur("?priorite=basse")["total"], 2)
+        self.assertEqual(self.compteur("?canal=email")["par_canal"], {"email": 1})
+        self.assertEqual(self.compteur(f"?type={TypeNotification.ENCOURAGEMENT}")["total"], 1)
+        self.assertEqual(self.compteur("?expirees=true")["total"], 4)
+        self.assertEqual(self.compteur("?is_read=true")["total"], 0)
+
+
+# ============================================================================
+# WEBSOCKET (couche en mémoire)
+# ============================================================================
+
+@skipIf(WebsocketCommunicator is None, "channels.testing indisponible (daphne)")
+@override_settings(
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+    NOTIFICATION_TEMPS_REEL=True,
+    NOTIFICATION_COMPTEUR_CACHE_TIMEOUT=0,
+)
+class WebSocketTests(TransactionTestCase):
+
+    def setUp(self):
+        _, _, _, (self.user,) = creer_cours(nb_sequences=0)
+        User.objects.filter(pk=self.user.pk).update(is_active=True)  # tickets : utilisateurs actifs
+        Notification.objects.filter(recipient=self.user).delete()
+
+    def communicator(self, ticket):
+        application = TokenAuthMiddleware(URLRouter(websocket_urlpatterns))
+        return WebsocketCommunicator(application, f"/ws/notifications/?ticket={ticket}")
+
+    def creer(self):
+        return Notification.objects.create(
+            recipient=self.user, type=TypeNotification.TENTATIVE_SUSPECTE, titre="T", message="m",
+        )
+
+    async def test_ticket_invalide_refuse(self):
+        communicator = self.communicator("faux")
+        connected, code = await communicator.connect()
+        self.assertEqual((connected, code), (False, 4401))
+
+    async def test_compteurs_puis_notification_poussee(self):
+        communicator = self.communicator(tickets.emettre(self.user))
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertEqual(await communicator.receive_json_from(), {
+            "type": "compteurs",
+            "compteurs": {"total": 0, "non_lues": 0, "par_priorite": {}, "par_canal": {}},
+        })
+
+        notification = await database_sync_to_async(self.creer)()
+        messages = [await communicator.receive_json_from() for _ in range(2)]
+        self.assertEqual(
+            {m["type"]: m for m in messages}["notification"]["notification"]["id"], notification.pk,
+        )
+        self.assertEqual({m["type"]: m for m in messages}["compteur_delta"]["delta"]["non_lues"], 1)
+
+        await communicator.send_json_to({"type": "compteurs"})
+        self.assertEqual((await communicator.receive_json_from())["compteurs"]["non_lues"], 1)
+        await communicator.disconnect()
@@ -1,5 +1,6 @@
 # notifications/views.py
 
+from django.db import transaction
 from django.utils import timezone
 from django.db.models import Count, Q
 from rest_framework import viewsets, status, permissions
@@ -7,6 +8,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 
 from .models import Notification, PreferenceNotification, DigestNotification, CanalNotification
+from .services import compteurs, tickets
 from .serializers import (
     NotificationSerializer,
     NotificationListSerializer,
@@ -31,6 +33,7 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     POST /notifications/marquer_lues/     → marquer une liste (ou toutes) comme lues
     POST /notifications/{id}/marquer_lue/ → marquer une seule comme lue
     DELETE /notifications/supprimer_lues/ → supprimer toutes les notifs lues
+    POST /notifications/ticket_ws/        → ticket de connexion WebSocket
     """
 
     permission_classes = [permissions.IsAuthenticated]
@@ -92,7 +95,15 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
             "par_priorite": { "basse": 1, "moyenne": 2, "haute": 1, "critique": 1 }
             "par_canal":    { "in_app": 10, "email": 2 }
         }
+        Sans filtre : compteurs en cache par utilisateur
+        (notifications/services/compteurs.py), une lecture de cache, sans
+        requête SQL, hors reconstruction.
+        Avec filtre (?type, ?canal, ?priorite, ?is_read, ?expirees=true) :
+        comptage en base sur get_queryset().
         """
+        if not _filtres_compteur(request.query_params):
+            return Response(compteurs.compteurs(request.user.pk))
+
         qs = self.get_queryset()
 
         total    = qs.count()
@@ -101,12 +112,13 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
         par_priorite = {
             item["priorite"]: item["count"]
             for item in qs.filter(is_read=False)
+                          .order_by()
                           .values("priorite")
                           .annotate(count=Count("id"))
         }
         par_canal = {
             item["canal"]: item["count"]
-            for item in qs.values("canal").annotate(count=Count("id"))
+            for item in qs.order_by().values("canal").annotate(count=Count("id"))
         }
 
         return Response({
@@ -116,6 +128,14 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
             "par_canal":    par_canal,
         })
 
+    @action(detail=False, methods=["post"], url_path="ticket_ws")
+    def ticket_ws(self, request):
+        """
+        Ticket signé de courte durée pour ws/notifications/?ticket=…
+        { "ticket": "…", "expire_dans": 60 }
+        """
+        return Response({"ticket": tickets.emettre(request.user), "expire_dans": tickets.duree()})
+
     @action(detail=False, methods=["post"], url_path="marquer_lues")
     def marquer_lues(self, request):
         """
@@ -132,7 +152,10 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
         if ids:
             qs = qs.filter(id__in=ids)
 
-        count = qs.update(is_read=True, read_at=timezone.now())
+        with transaction.atomic():
+            par_priorite = _repartition(qs, "priorite")
+            count = qs.update(is_read=True, read_at=timezone.now())
+        _decompter(request.user.pk, par_priorite, count, compteurs.lues)
         return Response({"marquees": count}, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=["post"], url_path="marquer_lue")
@@ -145,10 +168,43 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=["delete"], url_path="supprimer_lues")
     def supprimer_lues(self, request):
         """Supprime toutes les notifications déjà lues de l'utilisateur connecté."""
-        count, _ = self.get_queryset().filter(is_read=True).delete()
+        qs = self.get_queryset().filter(is_read=True)
+        with transaction.atomic():
+            par_canal = _repartition(qs, "canal")
+            _, par_modele = qs.delete()
+        count = par_modele.get(Notification._meta.label, 0)
+        _decompter(request.user.pk, par_canal, count, compteurs.supprimees)
         return Response({"supprimees": count}, status=status.HTTP_200_OK)
 
 
+def _filtres_compteur(params):
+    """Filtres de get_queryset() présents : les compteurs en cache ne s'appliquent pas."""
+    return (
+        any(params.get(p) for p in ("type", "canal", "priorite"))
+        or params.get("is_read") is not None
+        or params.get("expirees", "false").lower() != "false"
+    )
+
+
+def _repartition(qs, champ):
+    """{valeur: (nombre, nombre non expiré)} — les expirées ne sont pas comptées au badge."""
+    non_expirees = Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now())
+    return {
+        row[champ]: (row["nb"], row["comptees"])
+        for row in qs.order_by().values(champ).annotate(
+            nb=Count("id"), comptees=Count("id", filter=non_expirees),
+        )
+    }
+
+
+def _decompter(user_id, repartition, count, decompte):
+    # Écart (requête concurrente sur les mêmes lignes) : compteurs recomptés
+    if count != sum(nb for nb, _ in repartition.values()):
+        compteurs.invalider(user_id)
+    elif count:
+        decompte(user_id, {valeur: comptees for valeur, (_, comptees) in repartition.items()})
+
+
 # ============================================================================
 # PRÉFÉRENCES VIEWSET
 # ============================================================================
@@ -7,6 +7,8 @@ from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 
+from core.scope_context import resolve_annee_scolaire_id
+
 from .models import (
     ProgressionApprenant,
     ProgressionModule,
@@ -62,19 +64,7 @@ def _get_annee_scolaire_id(request):
     """
     Priorité : header X-Annee-Scolaire-ID > query param > profil utilisateur.
     """
-    def _to_int(v):
-        if v is None:
-            return None
-        try:
-            return int(str(v).strip())
-        except (ValueError, TypeError):
-            return None
-
-    return (
-        _to_int(request.headers.get("X-Annee-Scolaire-ID"))
-        or _to_int(request.query_params.get("annee_scolaire_id"))
-        or _to_int(getattr(request.user, "annee_scolaire_active_id", None))
-    )
+    return resolve_annee_scolaire_id(request)
 
 
 def _get_enfants_ids(user):
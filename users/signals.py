@@ -6,7 +6,7 @@ from django.contrib.contenttypes.models import ContentType
 from django.db.models.signals import post_migrate
 from django.dispatch import receiver
 
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode
 from django.core.mail import send_mail
@@ -14,6 +14,11 @@ from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.conf import settings
 
+from core.scope_context import invalidate_user_scope
+from users.models import (
+    Admin, Apprenant, Formateur, Parent, ResponsableAcademique, SuperAdmin, User,
+)
+
 
 @receiver(post_migrate)
 def create_super_admin_group(sender, **kwargs):
@@ -58,3 +63,33 @@ def send_verification_email(sender, instance, created, **kwargs):
     #         fail_silently=False,
     #     )
     pass
+
+
+# Champs du profil qui entrent dans le contexte de périmètre (core.scope_context)
+SCOPE_FIELDS = {"institution", "annee_scolaire_active", "role", "groupe", "is_superuser"}
+
+
+def invalider_contexte_utilisateur(sender, instance, update_fields=None, **kwargs):
+    """
+    Invalide le contexte en cache quand l'institution, l'année scolaire
+    active ou le rôle de l'utilisateur changent.
+    """
+    if update_fields is not None and not SCOPE_FIELDS.intersection(update_fields):
+        # ex. save(update_fields=["last_login"]) à la connexion
+        return
+    invalidate_user_scope(instance.pk)
+
+
+# post_save est émis avec le modèle concret (Apprenant, Formateur…) :
+# on se connecte sur User et sur chaque sous-modèle multi-table.
+for _model in (User, Admin, Parent, Apprenant, Formateur, ResponsableAcademique, SuperAdmin):
+    post_save.connect(
+        invalider_contexte_utilisateur,
+        sender=_model,
+        dispatch_uid=f"scope_ctx_save_{_model.__name__}",
+    )
+    post_delete.connect(
+        invalider_contexte_utilisateur,
+        sender=_model,
+        dispatch_uid=f"scope_ctx_delete_{_model.__name__}",
+    )